@@ -0,0 +1,416 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Benchmarks of libdlfind with the compiled analytic potentials.
+
+Every case is run repeatedly with the native potential as callback, and as
+often with the same potential called through an ordinary Python callback. The
+difference of the fastest wall times per energy evaluation is the overhead of
+the Python callback. Differences within the spread of the repeats are below
+the noise floor; they are reported as zero and flagged.
+
+Examples:
+    Run the default benchmarks and save the results::
+
+        $ python benchmarks/benchmark.py --save baseline.json
+
+    Run up to 10,000 atoms and compare with earlier results::
+
+        $ python benchmarks/benchmark.py --sizes 100 1000 10000 --compare baseline.json
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+import json
+import os
+import sys
+import time
+from typing import Any, Callable, Iterator, Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+from libdlfind import dl_find
+from libdlfind.callback import make_dlf_get_params
+from libdlfind.potentials import (
+    lennard_jones,
+    lennard_jones_cluster,
+    morse_chain,
+    morse_chain_coordinates,
+    muller_brown,
+    python_callback,
+)
+
+POTENTIALS = {
+    "muller_brown": muller_brown,
+    "lennard_jones": lennard_jones,
+    "morse_chain": morse_chain,
+}
+
+# P-RFO builds and diagonalizes a dense finite-difference Hessian, and HDLC a
+# dense transformation matrix also with the sparse B matrix
+MAX_ATOMS = {"prfo": 100, "hdlc": 100}
+
+
+@dataclass
+class Case:
+    """Benchmark case.
+
+    Attributes:
+        method: Name of the method
+        potential: Name of the potential
+        n_atoms: Number of atoms
+        params: Keyword arguments for make_dlf_get_params
+        nvarin2: Number of variables in coords2
+        options: Further keyword arguments for dl_find
+    """
+
+    method: str
+    potential: str
+    n_atoms: int
+    params: dict[str, Any]
+    nvarin2: int = 0
+    options: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class Timing:
+    """Result of a benchmark case.
+
+    Attributes:
+        method: Name of the method
+        potential: Name of the potential
+        n_atoms: Number of atoms
+        wall_time: Fastest wall time with the native callback (s)
+        wall_time_python: Fastest wall time with the Python callback (s)
+        n_energy_evaluations: Number of energy evaluations
+        n_cycles: Number of cycles
+        converged: Whether the run converged
+        overhead: Overhead of the Python callback per energy evaluation (s),
+            zero if below the noise floor
+        noise: Spread of the wall times over the repeats (s)
+        significant: Whether the overhead is above the noise floor
+    """
+
+    method: str
+    potential: str
+    n_atoms: int
+    wall_time: float
+    wall_time_python: float
+    n_energy_evaluations: int
+    n_cycles: int
+    converged: bool
+    overhead: float
+    noise: float = 0.0
+    significant: bool = True
+
+    @property
+    def key(self) -> str:
+        """Identifier of the case."""
+        return f"{self.method}/{self.potential}/{self.n_atoms}"
+
+
+def make_cases(sizes: list[int], maxcycle: int) -> Iterator[Case]:
+    """Make the benchmark cases.
+
+    Args:
+        sizes: Numbers of atoms for the size-dependent cases
+        maxcycle: Maximum number of cycles of each run
+
+    Yields:
+        Benchmark cases
+    """
+    common = {"printl": 0, "maxcycle": maxcycle, "maxene": 10 * maxcycle}
+    prfo = {"iopt": 10, "inithessian": 2}
+    mb_saddle = np.array([-0.8, 0.6, 0.0])
+    mb_minima = (np.array([-0.558, 1.442, 0.0]), np.array([0.623, 0.028, 0.0]))
+    # The z coordinate is frozen as it does not contribute to the energy
+    mb_common = {"spec": np.array([-4, 0]), **common}
+
+    # Mueller-Brown surface
+    yield Case("lbfgs", "muller_brown", 1, {"coords": mb_saddle, **mb_common})
+    yield Case("prfo", "muller_brown", 1, {"coords": mb_saddle, **prfo, **mb_common})
+    yield Case(
+        "dimer",
+        "muller_brown",
+        1,
+        {
+            "coords": mb_saddle,
+            "coords2": np.array([1.0, -1.0, 0.0]),
+            "nframe": 1,
+            "icoord": 210,
+            **mb_common,
+        },
+        nvarin2=3,
+    )
+    yield Case(
+        "neb",
+        "muller_brown",
+        1,
+        {
+            "coords": mb_minima[0],
+            "coords2": mb_minima[1],
+            "nframe": 1,
+            "icoord": 110,
+            "nimage": 10,
+            **mb_common,
+        },
+        nvarin2=3,
+    )
+
+    # Size-dependent cases
+    for n_atoms in sizes:
+        cluster = lennard_jones_cluster(n_atoms)
+        chain = morse_chain_coordinates(n_atoms)
+        mirrored = chain * np.array([1.0, -1.0, 1.0])
+        yield Case("lbfgs", "lennard_jones", n_atoms, {"coords": cluster, **common})
+        yield Case("lbfgs", "morse_chain", n_atoms, {"coords": chain, **common})
+        if n_atoms <= MAX_ATOMS["prfo"]:
+            yield Case(
+                "prfo", "lennard_jones", n_atoms, {"coords": cluster, **prfo, **common}
+            )
+        direction = np.random.default_rng(0).uniform(-0.5, 0.5, size=cluster.shape)
+        yield Case(
+            "dimer",
+            "lennard_jones",
+            n_atoms,
+            {
+                "coords": cluster,
+                "coords2": direction,
+                "nframe": 1,
+                "icoord": 210,
+                **common,
+            },
+            nvarin2=cluster.size,
+        )
+        yield Case(
+            "neb",
+            "morse_chain",
+            n_atoms,
+            {
+                "coords": chain,
+                "coords2": mirrored,
+                "nframe": 1,
+                "icoord": 110,
+                "nimage": 8,
+                **common,
+            },
+            nvarin2=chain.size,
+        )
+        if n_atoms <= MAX_ATOMS["hdlc"]:
+            # The whole chain as one HDLC residue, with dense and sparse B matrix
+            hdlc = {
+                "coords": chain,
+                "icoord": 1,
+                "spec": np.concatenate([np.ones(n_atoms), np.zeros(n_atoms)]),
+                **common,
+            }
+            yield Case("hdlc", "morse_chain", n_atoms, hdlc)
+            yield Case(
+                "hdlc-sparse",
+                "morse_chain",
+                n_atoms,
+                hdlc,
+                options={"sparse_hdlc": 1},
+            )
+
+
+@contextmanager
+def silence() -> Iterator[None]:
+    """Redirect the output of DL-FIND to /dev/null."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(devnull)
+        os.close(saved)
+
+
+def run_case(case: Case, callback: Callable) -> tuple[float, Any]:
+    """Run a case and return the wall time and the result."""
+    params = {
+        key: value.reshape(-1) if isinstance(value, np.ndarray) else value
+        for key, value in case.params.items()
+    }
+    coords: NDArray[np.float64] = params["coords"]
+    with silence():
+        start = time.perf_counter()
+        result = dl_find(
+            nvarin=coords.size,
+            nvarin2=case.nvarin2,
+            dlf_get_gradient=callback,
+            dlf_get_params=make_dlf_get_params(**params),
+            **case.options,
+        )
+        wall_time = time.perf_counter() - start
+    return wall_time, result
+
+
+def repeat_case(case: Case, callback: Callable, repeat: int) -> tuple[list[float], Any]:
+    """Run a case several times and return the wall times and the last result."""
+    wall_times = []
+    for _ in range(repeat):
+        wall_time, result = run_case(case, callback)
+        wall_times.append(wall_time)
+    return wall_times, result
+
+
+def run_benchmarks(sizes: list[int], maxcycle: int, repeat: int = 5) -> list[Timing]:
+    """Run all benchmark cases and print the results.
+
+    Args:
+        sizes: Numbers of atoms for the size-dependent cases
+        maxcycle: Maximum number of cycles of each run
+        repeat: Number of runs of each case and callback
+
+    Returns:
+        timings: Results of the cases
+    """
+    timings = []
+    print(
+        f"{'case':<28} {'time (s)':>10} {'python (s)':>11} {'n_ene':>6} "
+        f"{'cycles':>6} {'conv':>5} {'overhead (us/call)':>19}"
+    )
+    for case in make_cases(sizes, maxcycle):
+        potential = POTENTIALS[case.potential]
+        wall_times, result = repeat_case(case, potential, repeat)
+        wall_times_python, _ = repeat_case(case, python_callback(potential), repeat)
+        n_evaluations = result.n_energy_evaluations if result is not None else 0
+        # The fastest run is the least disturbed one, and the spread of the
+        # runs is the resolution of the difference
+        wall_time, wall_time_python = min(wall_times), min(wall_times_python)
+        noise = max(
+            np.median(wall_times) - wall_time,
+            np.median(wall_times_python) - wall_time_python,
+        )
+        difference = wall_time_python - wall_time
+        significant = difference > noise
+        timing = Timing(
+            method=case.method,
+            potential=case.potential,
+            n_atoms=case.n_atoms,
+            wall_time=wall_time,
+            wall_time_python=wall_time_python,
+            n_energy_evaluations=n_evaluations,
+            n_cycles=result.n_cycles if result is not None else 0,
+            converged=bool(result is not None and result.converged),
+            overhead=difference / max(n_evaluations, 1) if significant else 0.0,
+            noise=float(noise),
+            significant=significant,
+        )
+        overhead = f"{timing.overhead * 1e6:.1f}" if significant else "< noise"
+        print(
+            f"{timing.key:<28} {timing.wall_time:>10.4f} "
+            f"{timing.wall_time_python:>11.4f} {timing.n_energy_evaluations:>6} "
+            f"{timing.n_cycles:>6} {str(timing.converged):>5} {overhead:>19}",
+            flush=True,
+        )
+        timings.append(timing)
+    return timings
+
+
+def compare(
+    timings: list[Timing], baseline: dict[str, dict[str, Any]], threshold: float
+) -> list[str]:
+    """Compare timings with a baseline and return the regressions.
+
+    Args:
+        timings: Results of the cases
+        baseline: Earlier results keyed on the case
+        threshold: Allowed ratio of wall time per energy evaluation
+
+    Returns:
+        regressions: Descriptions of the regressions
+    """
+    regressions = []
+    for timing in timings:
+        reference = baseline.get(timing.key)
+        if reference is None:
+            continue
+        if timing.n_energy_evaluations != reference["n_energy_evaluations"]:
+            regressions.append(
+                f"{timing.key}: {timing.n_energy_evaluations} energy evaluations, "
+                f"was {reference['n_energy_evaluations']}"
+            )
+        per_call = timing.wall_time / max(timing.n_energy_evaluations, 1)
+        reference_per_call = reference["wall_time"] / max(
+            reference["n_energy_evaluations"], 1
+        )
+        if per_call > threshold * reference_per_call:
+            regressions.append(
+                f"{timing.key}: {per_call * 1e6:.1f} us per energy evaluation, "
+                f"was {reference_per_call * 1e6:.1f} us"
+            )
+    return regressions
+
+
+def main(argv: Optional[list[str]] = None) -> int:
+    """Run the benchmarks from the command line.
+
+    Args:
+        argv: Command line arguments
+
+    Returns:
+        exit_code: 1 if regressions were found, 0 otherwise
+    """
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--sizes", type=int, nargs="+", default=[10, 100, 1000], help="numbers of atoms"
+    )
+    parser.add_argument(
+        "--maxcycle", type=int, default=100, help="maximum number of cycles per run"
+    )
+    parser.add_argument(
+        "--repeat", type=int, default=5, help="number of runs of each case"
+    )
+    parser.add_argument("--save", help="save the results to this JSON file")
+    parser.add_argument("--compare", help="compare with results in this JSON file")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=1.25,
+        help="allowed ratio of wall time per energy evaluation for --compare",
+    )
+    args = parser.parse_args(argv)
+
+    timings = run_benchmarks(args.sizes, args.maxcycle, args.repeat)
+
+    if args.save is not None:
+        with open(args.save, "w") as f:
+            json.dump({timing.key: asdict(timing) for timing in timings}, f, indent=2)
+
+    if args.compare is not None:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(timings, baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
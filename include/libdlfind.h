@@ -1,34 +1,44 @@
+#ifndef LIBDLFIND_H
+#define LIBDLFIND_H
+
+#ifdef __cplusplus
+extern "C" {
+#endif
+
+/* Callbacks for api_dl_find. Scalars declared with value in mod_api.f90 are
+   passed by value, everything else by reference. */
+
 typedef void (*c_dlf_error)();
 
 typedef void (*c_dlf_get_gradient)(
-    int *nvar,
+    int nvar,
     double *coords,
     double *energy,
     double *gradient,
-    int *iimage,
-    int *kiter,
+    int iimage,
+    int kiter,
     int *status);
 
 typedef void (*c_dlf_get_hessian)(
-    int *nvar,
+    int nvar,
     double *coords,
     double *hessian,
     int *status);
 
 typedef void (*c_dlf_get_multistate_gradients)(
-    int *nvar,
+    int nvar,
     double *coords,
     double *energy,
     double *gradient,
     double *coupling,
-    int *needcoupling,
-    int *iimage,
+    int needcoupling,
+    int iimage,
     int *status);
 
 typedef void (*c_dlf_get_params)(
-    int *nvar,
-    int *nvar2,
-    int *nspec,
+    int nvar,
+    int nvar2,
+    int nspec,
     double *coords,
     double *coords2,
     int *spec,
@@ -110,23 +120,471 @@ typedef void (*c_dlf_get_params)(
     int *micro_esp_fit);
 
 typedef void (*c_dlf_put_coords)(
-    int *nvar,
-    int *switch_,
-    double *energy,
+    int nvar,
+    int switch_,
+    double energy,
     double *coords,
-    int *iam);
+    int iam);
 
 typedef void (*c_dlf_update)();
 
+/* All callbacks except c_dlf_get_params_ can be NULL. DL-FIND then does not
+   call them, and a missing energy or Hessian callback reports a non-zero
+   status when it is requested. */
 void api_dl_find(
     int nvarin,
     int nvarin2,
     int nspec,
     int master,
     c_dlf_error c_dlf_error_,
-    c_dlf_error c_dlf_get_gradient_,
+    c_dlf_get_gradient c_dlf_get_gradient_,
     c_dlf_get_hessian c_dlf_get_hessian_,
     c_dlf_get_multistate_gradients c_dlf_get_multistate_gradients_,
     c_dlf_get_params c_dlf_get_params_,
     c_dlf_put_coords c_dlf_put_coords_,
     c_dlf_update c_dlf_update_);
+
+/* Same as api_dl_find, but returns 1 instead of terminating the process if
+   DL-FIND fails, e.g., because a callback returned a non-zero status or the
+   energy is NaN. c_dlf_error_ is called before returning. DL-FIND can be
+   called again afterwards. Returns 0 on success.
+
+   The state of DL-FIND is global to the process, so runs are serialized: a
+   call from another thread waits until the running one has returned. A call
+   from a callback of a running call returns -1 without running.
+   api_dl_find itself takes no lock. */
+int api_dl_find_recoverable(
+    int nvarin,
+    int nvarin2,
+    int nspec,
+    int master,
+    c_dlf_error c_dlf_error_,
+    c_dlf_get_gradient c_dlf_get_gradient_,
+    c_dlf_get_hessian c_dlf_get_hessian_,
+    c_dlf_get_multistate_gradients c_dlf_get_multistate_gradients_,
+    c_dlf_get_params c_dlf_get_params_,
+    c_dlf_put_coords c_dlf_put_coords_,
+    c_dlf_update c_dlf_update_);
+
+/* The lock that serializes the runs of api_dl_find_recoverable. Taking it
+   around setting the options of a run (api_dlf_set_*), the run itself and
+   reading its results (api_dlf_get_*) keeps runs in other threads from
+   interfering. The lock is recursive. api_dlf_lock_runs returns 0 when it has
+   been taken, or -1 without taking it when called from a callback of a
+   running call. */
+int api_dlf_lock_runs(void);
+
+void api_dlf_unlock_runs(void);
+
+/* Failure of the last run: failed is 1 if the run failed, status is the last
+   non-zero status returned by an energy callback (0 if none) and message the
+   error message of DL-FIND, NUL-terminated and truncated to length
+   characters. coords are the coordinates when DL-FIND failed and has_coords
+   is 1 if they were set. */
+void api_dlf_get_error(
+    int nvar,
+    double *coords,
+    int *status,
+    char *message,
+    int length,
+    int *failed,
+    int *has_coords);
+
+/* Result of the last run of api_dl_find: coordinates, energy and gradient of
+   the last energy evaluation through c_dlf_get_gradient, the number of energy
+   evaluations, cycles and accepted steps and whether the run converged.
+   status is 1 if no energy evaluation was recorded or nvar does not match, in
+   which case only the counters are set. */
+void api_dlf_get_result(
+    int nvar,
+    double *coords,
+    double *energy,
+    double *gradient,
+    int *nenergy,
+    int *ncycle,
+    int *naccepted,
+    int *converged,
+    int *status);
+
+/* Timers and counters of the current or last run of api_dl_find. cpu_time
+   and wall_time hold the accumulated seconds of the clocks total, energy and
+   gradient, step direction, coordinate transformation, checkpoint file I/O
+   and xyz file I/O. counters holds the number of energy evaluations, energy
+   evaluations on this processor, cycles, accepted steps, microiterative
+   cycles and accepted microiterations. Can be called from a callback during
+   a run. */
+void api_dlf_get_timers(double *cpu_time, double *wall_time, int *counters);
+
+/* Values of the last convergence test of the current or last run of
+   api_dl_find and their tolerances: maximum gradient, RMS gradient, maximum
+   step, RMS step and energy change. tested is 0 before the first test of the
+   run, and values are then -1, as is the energy change when it was not
+   tested. Can be called from a callback, e.g., to adapt the precision of the
+   energy evaluations to how close the run is to convergence. */
+void api_dlf_get_convergence(double *values, double *tolerances, int *tested);
+
+/* Optional callback evaluating several geometries at once. coords and
+   gradient hold nbatch geometries of nvar values each, one after the other.
+   When set, the remaining images of each NEB cycle, the displaced
+   geometries of finite-difference Hessians and the populations of the
+   stochastic search and genetic algorithm in Cartesian coordinates are
+   passed to it together instead of one by one to c_dlf_get_gradient. Pass NULL to unset. The
+   callback stays set until unset. */
+
+typedef void (*c_dlf_get_gradient_batch)(
+    int nvar,
+    int nbatch,
+    double *coords,
+    double *energy,
+    double *gradient,
+    int *iimage,
+    int kiter,
+    int *status);
+
+void api_dlf_set_gradient_batch(c_dlf_get_gradient_batch c_dlf_get_gradient_batch_);
+
+/* Optional callback calculating the Hessians of several geometries at once.
+   coords holds nbatch geometries of nvar values each and hessian nbatch
+   Hessians of nvar * nvar values, one after the other. When set, the
+   Hessians of the remaining images of a QTS rate calculation (icoord 190,
+   inithessian 0) are passed to it together instead of one by one to
+   c_dlf_get_hessian. If it fails, they are calculated one by one. Pass NULL
+   to unset. The callback stays set until unset. */
+
+typedef void (*c_dlf_get_hessian_batch)(
+    int nvar,
+    int nbatch,
+    double *coords,
+    double *hessian,
+    int *status);
+
+void api_dlf_set_hessian_batch(c_dlf_get_hessian_batch c_dlf_get_hessian_batch_);
+
+/* Checkpoint files (dlf_*.chk) are written to and read from path instead of
+   the working directory. Pass NULL or an empty string to use the working
+   directory again. The directory must exist. */
+void api_dlf_set_checkpoint_dir(const char *path);
+
+/* Auxiliary files such as path.xyz, nebinfo, nebpath.xyz, qtsinfo and
+   etunnel are written to path instead of the working directory. Pass NULL or
+   an empty string to use the working directory again. The directory must
+   exist. Input files such as qts_coords.txt and qts_hessian*.txt are still
+   read from the working directory. */
+void api_dlf_set_output_dir(const char *path);
+
+/* The printout of DL-FIND is written to the file path, which is replaced,
+   instead of the standard output and error streams. Pass NULL or an empty
+   string to close the file and print to the standard streams again. */
+void api_dlf_set_log_file(const char *path);
+
+/* Optional callback that is called every time DL-FIND has written a complete
+   set of checkpoint files, with the number of energy evaluations and cycles
+   so far. The files can then be copied elsewhere. Pass NULL to unset. */
+typedef void (*c_dlf_checkpoint)(int nenergy, int ncycle);
+
+void api_dlf_set_checkpoint(c_dlf_checkpoint c_dlf_checkpoint_);
+
+/* Names of the files of the latest complete set of checkpoint files written
+   by the current or last run, each followed by a newline, NUL-terminated and
+   truncated to length characters. Other dlf_*.chk files in the directory,
+   e.g., of earlier runs, are not part of the set. */
+void api_dlf_get_checkpoint_files(char *names, int length);
+
+/* Stopping a run early. DL-FIND checks before every energy evaluation of its
+   main cycle whether to stop, and then ends the run as if maxcycle had been
+   reached. It stops once the int pointed to by flag is non-zero, which can be
+   set from another thread, once a run has taken longer than seconds of wall
+   time, and when the optional stop callback sets *stop to non-zero. The stop
+   callback is called with the last energy evaluation and the number of
+   energy evaluations and cycles so far. Pass NULL or 0 to unset. */
+void api_dlf_set_cancel_flag(int *flag);
+
+void api_dlf_set_time_limit(double seconds);
+
+typedef void (*c_dlf_stop)(
+    int nvar,
+    double *coords,
+    double energy,
+    int nenergy,
+    int ncycle,
+    int *stop);
+
+void api_dlf_set_stop(c_dlf_stop c_dlf_stop_);
+
+/* Why the last run was stopped: 0 if it was not, 1 if the cancel flag was
+   set, 2 if the time limit passed and 3 if the stop callback asked for it. */
+int api_dlf_get_stop_reason(void);
+
+/* HDLC residues with at least min_atoms atoms store the primitive B matrix
+   in sparse form, and the conversions of coordinates and gradients to
+   Cartesians and HDLC solve with the G matrix by conjugate gradients instead
+   of inverting it. Pays off for residues of a few dozen atoms and more. The
+   Ut matrix and the Hessian conversion stay dense. Pass 0 to turn off. */
+void api_dlf_set_sparse_hdlc(int min_atoms);
+
+/* State of the optimizer in internal coordinates, for starting a related run
+   where an earlier one ended. api_dlf_get_state_size and the getters read the
+   Hessian of the Hessian-based optimizers and the L-BFGS memory (steps and
+   gradient differences, oldest pair first, column-major) at the end of the
+   last run; the sizes are zero for what the optimizer did not keep. The
+   setters make all following runs start from them instead of the initial
+   Hessian and the steepest-descent step, until unset with n = 0. The number of
+   internal coordinates must match. */
+void api_dlf_set_initial_hessian(int n, const double *hessian);
+
+void api_dlf_set_initial_lbfgs(int n, int npair, const double *steps,
+                               const double *dgrads);
+
+void api_dlf_get_state_size(int *nhessian, int *nlbfgs, int *npair);
+
+void api_dlf_get_final_hessian(int n, double *hessian);
+
+void api_dlf_get_final_lbfgs(int n, int npair, double *steps, double *dgrads);
+
+/* The BLAS library that DL-FIND uses, found at run time as the one providing
+   dgemm. The vendor is "OpenBLAS", "MKL", "FlexiBLAS", "BLIS", "reference"
+   for other libraries or "unknown" if it could not be found, e.g., when
+   linked statically. api_dlf_set_blas_threads sets the number of threads of
+   the library for the whole process and returns the previous number, so that
+   it can be restored after a run. Both return -1 if the number of threads
+   cannot be controlled. */
+const char *api_dlf_get_blas_library(void);
+
+const char *api_dlf_get_blas_vendor(void);
+
+int api_dlf_get_blas_threads(void);
+
+int api_dlf_set_blas_threads(int nthreads);
+
+/* Analytic test potentials with the signature of c_dlf_get_gradient, which
+   can be passed directly to api_dl_find. The Mueller-Brown surface uses the x
+   and y coordinates of the first atom. The Lennard-Jones cluster includes all
+   pairs of atoms and the Morse chain bonds between neighbouring atoms. The
+   parameters are global to the process. */
+
+void potential_muller_brown(
+    int nvar, double *coords, double *energy, double *gradient, int iimage, int kiter, int *status);
+
+void potential_lennard_jones(
+    int nvar, double *coords, double *energy, double *gradient, int iimage, int kiter, int *status);
+
+void potential_morse_chain(
+    int nvar, double *coords, double *energy, double *gradient, int iimage, int kiter, int *status);
+
+void potential_set_lennard_jones(double epsilon, double sigma);
+
+void potential_set_morse(double d, double a, double r0);
+
+/* Serialized context API. The callbacks are the same as above, with an
+   additional user_data pointer as the last argument. A context owns its
+   callbacks, user_data and run parameters, but not the optimizer state, which
+   DL-FIND keeps in Fortran modules for the whole process. dlf_context_run
+   therefore holds the lock of api_dlf_lock_runs for the duration of a run:
+   runs on different contexts, and runs through the other entry points, are
+   executed one after another and never concurrently. Use separate processes
+   for concurrent optimizations. */
+
+typedef struct dlf_context dlf_context;
+
+typedef void (*dlf_error_ud)(void *user_data);
+
+typedef void (*dlf_get_gradient_ud)(
+    int nvar,
+    double *coords,
+    double *energy,
+    double *gradient,
+    int iimage,
+    int kiter,
+    int *status,
+    void *user_data);
+
+typedef void (*dlf_get_hessian_ud)(
+    int nvar,
+    double *coords,
+    double *hessian,
+    int *status,
+    void *user_data);
+
+typedef void (*dlf_get_multistate_gradients_ud)(
+    int nvar,
+    double *coords,
+    double *energy,
+    double *gradient,
+    double *coupling,
+    int needcoupling,
+    int iimage,
+    int *status,
+    void *user_data);
+
+typedef void (*dlf_get_params_ud)(
+    int nvar,
+    int nvar2,
+    int nspec,
+    double *coords,
+    double *coords2,
+    int *spec,
+    int *ierr,
+    double *tolerance,
+    int *printl,
+    int *maxcycle,
+    int *maxene,
+    int *tatoms,
+    int *icoord,
+    int *iopt,
+    int *iline,
+    double *maxstep,
+    double *scalestep,
+    int *lbfgs_mem,
+    int *nimage,
+    double *nebk,
+    int *dump,
+    int *restart,
+    int *nz,
+    int *ncons,
+    int *nconn,
+    int *update,
+    int *maxupd,
+    double *delta,
+    double *soft,
+    int *inithessian,
+    int *carthessian,
+    int *tsrel,
+    int *maxrot,
+    double *tolrot,
+    int *nframe,
+    int *nmass,
+    int *nweight,
+    double *timestep,
+    double *fric0,
+    double *fricfac,
+    double *fricp,
+    int *imultistate,
+    int *state_i,
+    int *state_j,
+    double *pf_c1,
+    double *pf_c2,
+    double *gp_c3,
+    double *gp_c4,
+    double *ln_t1,
+    double *ln_t2,
+    int *printfile,
+    double *tolerance_e,
+    double *distort,
+    int *massweight,
+    double *minstep,
+    int *maxdump,
+    int *task,
+    double *temperature,
+    int *po_pop_size,
+    double *po_radius,
+    double *po_contraction,
+    double *po_tolerance_r,
+    double *po_tolerance_g,
+    int *po_distribution,
+    int *po_maxcycle,
+    int *po_init_pop_size,
+    int *po_reset,
+    double *po_mutation_rate,
+    double *po_death_rate,
+    double *po_scalefac,
+    int *po_nsave,
+    int *ntasks,
+    int *tdlf_farm,
+    int *n_po_scaling,
+    double *neb_climb_test,
+    double *neb_freeze_test,
+    int *nzero,
+    int *coupled_states,
+    int *qtsflag,
+    int *imicroiter,
+    int *maxmicrocycle,
+    int *micro_esp_fit,
+    void *user_data);
+
+typedef void (*dlf_put_coords_ud)(
+    int nvar,
+    int switch_,
+    double energy,
+    double *coords,
+    int iam,
+    void *user_data);
+
+typedef void (*dlf_update_ud)(void *user_data);
+
+typedef void (*dlf_get_gradient_batch_ud)(
+    int nvar,
+    int nbatch,
+    double *coords,
+    double *energy,
+    double *gradient,
+    int *iimage,
+    int kiter,
+    int *status,
+    void *user_data);
+
+typedef void (*dlf_checkpoint_ud)(int nenergy, int ncycle, void *user_data);
+
+typedef void (*dlf_stop_ud)(
+    int nvar,
+    double *coords,
+    double energy,
+    int nenergy,
+    int ncycle,
+    int *stop,
+    void *user_data);
+
+typedef void (*dlf_get_hessian_batch_ud)(
+    int nvar,
+    int nbatch,
+    double *coords,
+    double *hessian,
+    int *status,
+    void *user_data);
+
+/* Callbacks left as NULL are replaced by no-ops, except get_params which is
+   required. get_gradient_batch, checkpoint, stop and get_hessian_batch are
+   optional, see c_dlf_get_gradient_batch, c_dlf_checkpoint, c_dlf_stop and
+   c_dlf_get_hessian_batch. */
+
+typedef struct dlf_callbacks {
+    dlf_error_ud error;
+    dlf_get_gradient_ud get_gradient;
+    dlf_get_hessian_ud get_hessian;
+    dlf_get_multistate_gradients_ud get_multistate_gradients;
+    dlf_get_params_ud get_params;
+    dlf_put_coords_ud put_coords;
+    dlf_update_ud update;
+    dlf_get_gradient_batch_ud get_gradient_batch;
+    dlf_checkpoint_ud checkpoint;
+    dlf_stop_ud stop;
+    dlf_get_hessian_batch_ud get_hessian_batch;
+} dlf_callbacks;
+
+/* Returns NULL if memory could not be allocated. nspec < 0 selects the
+   default of 2 * nvarin / 3. */
+dlf_context *dlf_context_create(
+    int nvarin,
+    int nvarin2,
+    int nspec,
+    int master,
+    const dlf_callbacks *callbacks,
+    void *user_data);
+
+/* Cancel flag and wall time limit for the runs of a context, see
+   api_dlf_set_cancel_flag and api_dlf_set_time_limit. */
+void dlf_context_set_cancel_flag(dlf_context *ctx, int *flag);
+
+void dlf_context_set_time_limit(dlf_context *ctx, double seconds);
+
+/* Returns 0 on success, 1 if DL-FIND failed (see api_dlf_get_error), -1 if
+   the context is invalid and -2 if called from a callback of a running run.
+   Waits for runs in other threads to finish. */
+int dlf_context_run(dlf_context *ctx);
+
+void dlf_context_destroy(dlf_context *ctx);
+
+#ifdef __cplusplus
+}
+#endif
+
+#endif /* LIBDLFIND_H */
@@ -20,10 +20,41 @@
 
 from importlib import metadata
 
-from libdlfind.lib import dl_find
+from libdlfind.lib import (
+    CancelToken,
+    dl_find,
+    DLFindError,
+    get_blas_info,
+    get_convergence,
+    get_statistics,
+)
+from libdlfind.pool import dl_find_many, Job
+from libdlfind.result import (
+    BLASInfo,
+    ConvergenceState,
+    OptimizationResult,
+    OptimizerState,
+    RunStatistics,
+)
+from libdlfind.stepping import dl_find_batched, GradientRequest, SteppingOptimizer
 
 __all__ = [
+    "BLASInfo",
+    "CancelToken",
+    "ConvergenceState",
     "dl_find",
+    "dl_find_batched",
+    "dl_find_many",
+    "DLFindError",
+    "get_blas_info",
+    "get_convergence",
+    "get_statistics",
+    "GradientRequest",
+    "Job",
+    "OptimizationResult",
+    "OptimizerState",
+    "RunStatistics",
+    "SteppingOptimizer",
 ]
 
 # Version
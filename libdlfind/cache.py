@@ -0,0 +1,379 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Caching of energies, gradients and Hessians."""
+
+from __future__ import annotations
+
+from collections import OrderedDict
+import os
+from pathlib import Path
+import threading
+from typing import Any, Callable, Iterator, Optional, Union
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+# Journal entries that are merged into the cache file at the least
+_MIN_COMPACT = 64
+
+
+def _journal_path(path: Path) -> Path:
+    """Path of the journal of a cache file."""
+    return path.with_name(path.name + ".log")
+
+
+def _append_journal(path: Path, arrays: list[NDArray]) -> None:
+    """Append an entry to the journal of a cache file."""
+    with open(_journal_path(path), "ab") as f:
+        for array in arrays:
+            np.save(f, array, allow_pickle=False)
+
+
+def _read_journal(path: Path, n_arrays: int) -> Iterator[list[NDArray]]:
+    """Read the entries of the journal of a cache file.
+
+    A truncated last entry, e.g., from a crash while it was written, is skipped.
+    """
+    journal_path = _journal_path(path)
+    if not journal_path.exists():
+        return
+    with open(journal_path, "rb") as f:
+        while True:
+            try:
+                entry = [np.load(f, allow_pickle=False) for _ in range(n_arrays)]
+            except (EOFError, ValueError):
+                return
+            yield entry
+
+
+class _CoordinateCache:
+    """Keyed storage, persistence and eviction shared by the caches.
+
+    Entries are keyed on a tag, e.g., kiter, and the bytes of the coordinates,
+    and hold the coordinates together with the values calculated for them.
+    Subclasses define how the values are normalized and packed into the arrays
+    of the journal and the .npz file, whose names are given by _FIELDS.
+    """
+
+    # Names of the arrays of an entry in the .npz file, in journal order
+    _FIELDS: tuple[str, ...] = ()
+
+    def __init__(
+        self,
+        func: Callable,
+        *,
+        tolerance: float = 0.0,
+        maxsize: Optional[int] = 1024,
+        path: Optional[Union[str, os.PathLike]] = None,
+        autosave: bool = True,
+    ) -> None:
+        self.func = func
+        self.tolerance = tolerance
+        self.maxsize = maxsize
+        self.path = Path(path) if path is not None else None
+        self.autosave = autosave
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[
+            tuple[int, bytes], tuple[NDArray[np.float64], tuple[Any, ...]]
+        ] = OrderedDict()
+        self._lock = threading.RLock()
+        self._n_journal = 0
+        if self.path is not None:
+            if self.path.exists():
+                self.load(self.path)
+            for arrays in _read_journal(self.path, len(self._FIELDS)):
+                self._add(*self._unpack(arrays))
+                self._n_journal += 1
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _normalize(
+        self, coordinates: NDArray[np.float64], values: tuple[Any, ...]
+    ) -> tuple[Any, ...]:
+        """Convert values to the form they are stored in."""
+        raise NotImplementedError
+
+    def _pack(
+        self, tag: int, coordinates: NDArray[np.float64], values: tuple[Any, ...]
+    ) -> list[NDArray]:
+        """Return the arrays of an entry in the order of _FIELDS."""
+        raise NotImplementedError
+
+    def _unpack(
+        self, arrays: list[NDArray]
+    ) -> tuple[int, NDArray[np.float64], tuple[Any, ...]]:
+        """Return tag, coordinates and values of an entry from its arrays."""
+        raise NotImplementedError
+
+    def _get(
+        self, coordinates: NDArray[np.float64], tag: int
+    ) -> Optional[tuple[Any, ...]]:
+        """Return the cached values for coordinates and count the hit or miss."""
+        with self._lock:
+            key = self._lookup(coordinates, tag)
+            if key is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return self._entries[key][1]
+
+    def _put(
+        self, coordinates: NDArray[np.float64], tag: int, values: tuple[Any, ...]
+    ) -> None:
+        """Add newly calculated values and append them to the journal."""
+        with self._lock:
+            self._add(tag, coordinates, values)
+            if self.autosave and self.path is not None:
+                _append_journal(self.path, self._pack(tag, coordinates, values))
+                self._n_journal += 1
+                if self._n_journal >= max(len(self._entries), _MIN_COMPACT):
+                    self.save()
+
+    def _lookup(
+        self, coordinates: NDArray[np.float64], tag: int
+    ) -> Optional[tuple[int, bytes]]:
+        """Return key of the entry matching coordinates, if any."""
+        key = (tag, coordinates.tobytes())
+        if key in self._entries:
+            return key
+        if self.tolerance > 0:
+            # Most recent entries are the most likely hits
+            for key in reversed(self._entries):
+                cached_coordinates = self._entries[key][0]
+                if key[0] == tag and cached_coordinates.shape == coordinates.shape:
+                    if (
+                        np.max(np.abs(cached_coordinates - coordinates))
+                        <= self.tolerance
+                    ):
+                        return key
+        return None
+
+    def _add(self, tag: int, coordinates: ArrayLike, values: tuple[Any, ...]) -> None:
+        """Add entry and evict the least recently used ones."""
+        coordinates = np.array(coordinates, dtype=np.float64)
+        key = (tag, coordinates.tobytes())
+        self._entries[key] = (coordinates, self._normalize(coordinates, values))
+        self._entries.move_to_end(key)
+        if self.maxsize is not None:
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Remove all entries and reset the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def save(self, path: Optional[Union[str, os.PathLike]] = None) -> None:
+        """Save all entries to a NumPy .npz file.
+
+        Saving to the path of the cache merges the journal into it.
+
+        Args:
+            path: File to save to. Defaults to the path of the cache.
+
+        Raises:
+            ValueError: If no path is given
+        """
+        path = Path(path) if path is not None else self.path
+        if path is None:
+            raise ValueError("No path given for saving the cache.")
+        with self._lock:
+            rows = [
+                self._pack(key[0], coordinates, values)
+                for key, (coordinates, values) in self._entries.items()
+            ]
+            tmp_path = path.with_name(path.name + ".tmp")
+            with open(tmp_path, "wb") as f:
+                np.savez(
+                    f,
+                    **{
+                        name: np.array([row[i] for row in rows])
+                        for i, name in enumerate(self._FIELDS)
+                    },
+                )
+            # Replace atomically so that a crash never leaves a truncated cache
+            os.replace(tmp_path, path)
+            if path == self.path:
+                _journal_path(path).unlink(missing_ok=True)
+                self._n_journal = 0
+
+    def close(self) -> None:
+        """Merge the journal into the cache file."""
+        with self._lock:
+            if self._n_journal > 0 and self.path is not None:
+                self.save()
+
+    def load(self, path: Union[str, os.PathLike]) -> None:
+        """Add entries from a NumPy .npz file written by save.
+
+        Args:
+            path: File to load from
+        """
+        with np.load(path) as data:
+            columns = [data[name] for name in self._FIELDS]
+        with self._lock:
+            for arrays in zip(*columns):
+                self._add(*self._unpack(list(arrays)))
+
+
+class GradientCache(_CoordinateCache):
+    """Cache of energies and gradients keyed on the coordinates.
+
+    Wraps a function with the signature expected by dlf_get_gradient_wrapper, so
+    that repeated requests for a geometry that has already been calculated are
+    served from the cache. Geometries are matched exactly or, if tolerance is
+    given, when no coordinate differs by more than tolerance. The least recently
+    used entries are evicted when the cache is full. The cache can be shared by
+    the threads of make_gradient_batch with a ThreadPoolExecutor, but not by the
+    workers of a ProcessPoolExecutor.
+
+    Args:
+        func: Function taking coordinates, iimage and kiter and returning the
+            energy and the gradient
+        tolerance: Maximum absolute difference of any coordinate for a cache hit.
+            0 requires an exact match.
+        maxsize: Maximum number of entries. None means no limit.
+        path: File to persist the cache to, in NumPy .npz format. Loaded on
+            creation if it exists, together with its journal.
+        autosave: Whether to append every new entry to a journal next to path
+            (path + ".log"). The journal is merged into path by save and close,
+            and automatically once it holds as many entries as the cache.
+
+    Attributes:
+        hits: Number of requests served from the cache
+        misses: Number of requests passed on to func
+    """
+
+    _FIELDS = ("kiters", "coordinates", "energies", "gradients")
+
+    def __enter__(self) -> GradientCache:
+        return self
+
+    def __call__(
+        self, coordinates: ArrayLike, iimage: int, kiter: int, *args, **kwargs
+    ) -> tuple[float, NDArray[np.float64]]:
+        """Return energy and gradient from the cache or from func."""
+        coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+        values = self._get(coordinates, kiter)
+        if values is not None:
+            return values
+
+        # Calculated outside the lock so that several misses run concurrently
+        energy, gradient = self.func(coordinates, iimage, kiter, *args, **kwargs)
+        self._put(coordinates, kiter, (energy, gradient))
+        return energy, gradient
+
+    def _normalize(
+        self, coordinates: NDArray[np.float64], values: tuple[Any, ...]
+    ) -> tuple[float, NDArray[np.float64]]:
+        energy, gradient = values
+        return float(energy), np.array(gradient, dtype=np.float64).reshape(
+            coordinates.shape
+        )
+
+    def _pack(
+        self, tag: int, coordinates: NDArray[np.float64], values: tuple[Any, ...]
+    ) -> list[NDArray]:
+        energy, gradient = values
+        return [
+            np.array(tag, dtype=np.int64),
+            coordinates,
+            np.array(energy, dtype=np.float64),
+            np.asarray(gradient, dtype=np.float64),
+        ]
+
+    def _unpack(
+        self, arrays: list[NDArray]
+    ) -> tuple[int, NDArray[np.float64], tuple[Any, ...]]:
+        kiter, coordinates, energy, gradient = arrays
+        return int(kiter), coordinates, (energy, gradient)
+
+
+class HessianCache(_CoordinateCache):
+    """Cache of Hessians keyed on the coordinates.
+
+    Wraps a function with the signature expected by dlf_get_hessian_wrapper, so
+    that Hessians of geometries that have already been calculated are served
+    from the cache, e.g., when the tunnelling rates of an instanton are
+    recalculated at a series of temperatures. Geometries are matched as in
+    GradientCache. The cache can be shared by the threads of make_hessian_batch
+    with a ThreadPoolExecutor, but not by the workers of a ProcessPoolExecutor.
+
+    Args:
+        func: Function taking coordinates and returning the Hessian
+        tolerance: Maximum absolute difference of any coordinate for a cache hit.
+            0 requires an exact match.
+        maxsize: Maximum number of entries. None means no limit.
+        path: File to persist the cache to, in NumPy .npz format. Loaded on
+            creation if it exists, together with its journal.
+        autosave: Whether to append every new entry to a journal next to path
+            (path + ".log"). The journal is merged into path by save and close,
+            and automatically once it holds as many entries as the cache.
+
+    Attributes:
+        hits: Number of requests served from the cache
+        misses: Number of requests passed on to func
+    """
+
+    _FIELDS = ("coordinates", "hessians")
+
+    def __enter__(self) -> HessianCache:
+        return self
+
+    def __call__(self, coordinates: ArrayLike, *args, **kwargs) -> NDArray[np.float64]:
+        """Return Hessian from the cache or from func."""
+        coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+        values = self._get(coordinates, 0)
+        if values is not None:
+            return values[0]
+
+        # Calculated outside the lock so that several misses run concurrently
+        hessian = self.func(coordinates, *args, **kwargs)
+        self._put(coordinates, 0, (hessian,))
+        return hessian
+
+    def _normalize(
+        self, coordinates: NDArray[np.float64], values: tuple[Any, ...]
+    ) -> tuple[NDArray[np.float64]]:
+        (hessian,) = values
+        return (
+            np.array(hessian, dtype=np.float64).reshape(
+                coordinates.size, coordinates.size
+            ),
+        )
+
+    def _pack(
+        self, tag: int, coordinates: NDArray[np.float64], values: tuple[Any, ...]
+    ) -> list[NDArray]:
+        (hessian,) = values
+        return [coordinates, np.asarray(hessian, dtype=np.float64)]
+
+    def _unpack(
+        self, arrays: list[NDArray]
+    ) -> tuple[int, NDArray[np.float64], tuple[Any, ...]]:
+        coordinates, hessian = arrays
+        return 0, coordinates, (hessian,)
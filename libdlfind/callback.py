@@ -20,17 +20,59 @@
 
 from __future__ import annotations
 
-from ctypes import c_double, c_int, pointer
+from concurrent.futures import Executor
+from ctypes import addressof, c_double, c_int, pointer
 import functools
 from typing import Callable, Optional
 
 import numpy as np
 from numpy.ctypeslib import as_array
-from numpy.typing import ArrayLike
+from numpy.typing import ArrayLike, NDArray
 
+from libdlfind.lib import get_convergence
 
-def dlf_get_gradient_wrapper(func: Callable) -> Callable:
-    """Factory function for dlf_get_gradient."""
+
+class _ArrayViewCache:
+    """Cache of NumPy views onto arrays owned by DL-FIND.
+
+    DL-FIND passes the same arrays to the callbacks on every call, so the views
+    are created once and then looked up by the address of the array.
+    """
+
+    def __init__(self, maxsize: int = 8) -> None:
+        self.maxsize = maxsize
+        self._views: dict[tuple[int, tuple[int, ...]], NDArray[np.float64]] = {}
+
+    def get(self, array: pointer[c_double], shape: tuple[int, ...]) -> NDArray:
+        """Return view with shape onto array."""
+        key = (addressof(array.contents), shape)
+        view = self._views.get(key)
+        if view is None:
+            if len(self._views) >= self.maxsize:
+                self._views.clear()
+            view = as_array(array, shape)
+            self._views[key] = view
+        return view
+
+
+def dlf_get_gradient_wrapper(
+    func: Optional[Callable] = None, *, convergence: bool = False
+) -> Callable:
+    """Factory function for dlf_get_gradient.
+
+    Can also be used as a decorator with arguments, e.g.,
+    @dlf_get_gradient_wrapper(convergence=True).
+
+    Args:
+        func: Function to wrap
+        convergence: Whether to pass the ConvergenceState of the run to func as
+            the keyword argument convergence, see get_convergence
+
+    Returns:
+        wrapper: dlf_get_gradient function for DL-FIND
+    """
+    if func is None:
+        return functools.partial(dlf_get_gradient_wrapper, convergence=convergence)
 
     @functools.wraps(func)
     def wrapper(
@@ -45,6 +87,8 @@ def dlf_get_gradient_wrapper(func: Callable) -> Callable:
         **kwargs,
     ) -> None:
         coords_ = as_array(coords, (nvar,)).reshape(-1, 3)
+        if convergence:
+            kwargs["convergence"] = get_convergence()
         e, g = func(coords_, iimage, kiter, *args, **kwargs)
         energy[0] = c_double(e)
         gradient_ = as_array(gradient, (nvar,))
@@ -55,6 +99,135 @@ def dlf_get_gradient_wrapper(func: Callable) -> Callable:
     return wrapper
 
 
+def dlf_get_gradient_inplace_wrapper(
+    func: Optional[Callable] = None, *, convergence: bool = False
+) -> Callable:
+    """Factory function for dlf_get_gradient writing the gradient in place.
+
+    The wrapped function takes the arguments coordinates, gradient, iimage and
+    kiter, fills the gradient array with shape (n_atoms, 3) in place and returns
+    the energy. Both arrays are views onto the arrays of DL-FIND that are
+    created once and reused between calls.
+
+    Args:
+        func: Function to wrap
+        convergence: Whether to pass the ConvergenceState of the run to func as
+            the keyword argument convergence, see get_convergence
+
+    Returns:
+        wrapper: dlf_get_gradient function for DL-FIND
+    """
+    if func is None:
+        return functools.partial(
+            dlf_get_gradient_inplace_wrapper, convergence=convergence
+        )
+    views = _ArrayViewCache()
+
+    @functools.wraps(func)
+    def wrapper(
+        nvar: int,
+        coords: pointer[c_double],
+        energy: pointer[c_double],
+        gradient: pointer[c_double],
+        iimage: int,
+        kiter: int,
+        status: pointer[c_int],
+        *args,
+        **kwargs,
+    ) -> None:
+        coords_ = views.get(coords, (nvar // 3, 3))
+        gradient_ = views.get(gradient, (nvar // 3, 3))
+        if convergence:
+            kwargs["convergence"] = get_convergence()
+        energy[0] = c_double(func(coords_, gradient_, iimage, kiter, *args, **kwargs))
+        status[0] = c_int(0)
+        return
+
+    return wrapper
+
+
+def dlf_get_gradient_batch_wrapper(
+    func: Optional[Callable] = None, *, convergence: bool = False
+) -> Callable:
+    """Factory function for dlf_get_gradient_batch.
+
+    The wrapped function takes the arguments coordinates with shape
+    (n_geometries, n_atoms, 3), iimages with the image number of each geometry
+    and kiter, and returns the energies with shape (n_geometries,) and the
+    gradients with shape (n_geometries, n_atoms, 3).
+
+    Args:
+        func: Function to wrap
+        convergence: Whether to pass the ConvergenceState of the run to func as
+            the keyword argument convergence, see get_convergence
+
+    Returns:
+        wrapper: dlf_get_gradient_batch function for DL-FIND
+    """
+    if func is None:
+        return functools.partial(
+            dlf_get_gradient_batch_wrapper, convergence=convergence
+        )
+
+    @functools.wraps(func)
+    def wrapper(
+        nvar: int,
+        nbatch: int,
+        coords: pointer[c_double],
+        energy: pointer[c_double],
+        gradient: pointer[c_double],
+        iimage: pointer[c_int],
+        kiter: int,
+        status: pointer[c_int],
+        *args,
+        **kwargs,
+    ) -> None:
+        coords_ = as_array(coords, (nbatch, nvar)).reshape(nbatch, -1, 3)
+        iimages = np.array(as_array(iimage, (nbatch,)))
+        if convergence:
+            kwargs["convergence"] = get_convergence()
+        e, g = func(coords_, iimages, kiter, *args, **kwargs)
+        energy_ = as_array(energy, (nbatch,))
+        energy_[:] = e
+        gradient_ = as_array(gradient, (nbatch, nvar))
+        gradient_[:, :] = np.reshape(g, (nbatch, nvar))
+        status[0] = c_int(0)
+        return
+
+    return wrapper
+
+
+def make_gradient_batch(func: Callable, executor: Executor) -> Callable:
+    """Make a batch function that evaluates single geometries concurrently.
+
+    The result can be wrapped with dlf_get_gradient_batch_wrapper.
+
+    Args:
+        func: Function taking coordinates, iimage and kiter and returning the
+            energy and the gradient, i.e., the undecorated version of a function
+            for dlf_get_gradient_wrapper
+        executor: Executor used to evaluate the geometries of a batch. For a
+            ProcessPoolExecutor, func must be picklable.
+
+    Returns:
+        batch_func: Function for dlf_get_gradient_batch_wrapper
+    """
+
+    def batch_func(
+        coordinates: NDArray[np.float64], iimages: NDArray[np.int32], kiter: int
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        futures = [
+            executor.submit(func, np.array(coordinates[i]), int(iimages[i]), kiter)
+            for i in range(len(coordinates))
+        ]
+        results = [future.result() for future in futures]
+        energies = np.array([result[0] for result in results], dtype=np.float64)
+        gradients = np.array([result[1] for result in results], dtype=np.float64)
+        return energies, gradients.reshape(coordinates.shape)
+
+    return batch_func
+
+
 def dlf_get_hessian_wrapper(func: Callable) -> Callable:
     """Factory function for dlf_get_hessian."""
 
@@ -64,10 +237,12 @@ def dlf_get_hessian_wrapper(func: Callable) -> Callable:
         coords: pointer[c_double],
         hessian: pointer[c_double],
         status: pointer[c_int],
+        *args,
+        **kwargs,
     ) -> None:
         coords_ = as_array(coords, shape=(nvar,)).reshape((-1, 3))
-        hessian_ = as_array(hessian, shape=(nvar,nvar))
-        hessian = func(coords_)
+        hessian_ = as_array(hessian, shape=(nvar, nvar))
+        hessian = func(coords_, *args, **kwargs)
         hessian_[:, :] = hessian
         status[0] = c_int(0)
         return
@@ -75,6 +250,101 @@ def dlf_get_hessian_wrapper(func: Callable) -> Callable:
     return wrapper
 
 
+def dlf_get_hessian_inplace_wrapper(func: Callable) -> Callable:
+    """Factory function for dlf_get_hessian writing the Hessian in place.
+
+    The wrapped function takes the arguments coordinates and hessian, and fills
+    the hessian array with shape (n_atoms * 3, n_atoms * 3) in place. Both
+    arrays are views onto the arrays of DL-FIND that are created once and
+    reused between calls. As the Hessian is symmetric, the memory order of
+    the Fortran array does not matter.
+
+    Args:
+        func: Function to wrap
+
+    Returns:
+        wrapper: dlf_get_hessian function for DL-FIND
+    """
+    views = _ArrayViewCache()
+
+    @functools.wraps(func)
+    def wrapper(
+        nvar: int,
+        coords: pointer[c_double],
+        hessian: pointer[c_double],
+        status: pointer[c_int],
+        *args,
+        **kwargs,
+    ) -> None:
+        coords_ = views.get(coords, (nvar // 3, 3))
+        hessian_ = views.get(hessian, (nvar, nvar))
+        func(coords_, hessian_, *args, **kwargs)
+        status[0] = c_int(0)
+        return
+
+    return wrapper
+
+
+def dlf_get_hessian_batch_wrapper(func: Callable) -> Callable:
+    """Factory function for dlf_get_hessian_batch.
+
+    The wrapped function takes the argument coordinates with shape
+    (n_geometries, n_atoms, 3) and returns the Hessians with shape
+    (n_geometries, n_atoms * 3, n_atoms * 3).
+
+    Args:
+        func: Function to wrap
+
+    Returns:
+        wrapper: dlf_get_hessian_batch function for DL-FIND
+    """
+
+    @functools.wraps(func)
+    def wrapper(
+        nvar: int,
+        nbatch: int,
+        coords: pointer[c_double],
+        hessian: pointer[c_double],
+        status: pointer[c_int],
+        *args,
+        **kwargs,
+    ) -> None:
+        coords_ = as_array(coords, (nbatch, nvar)).reshape(nbatch, -1, 3)
+        hessians = func(coords_, *args, **kwargs)
+        hessian_ = as_array(hessian, (nbatch, nvar, nvar))
+        hessian_[:, :, :] = np.reshape(hessians, (nbatch, nvar, nvar))
+        status[0] = c_int(0)
+        return
+
+    return wrapper
+
+
+def make_hessian_batch(func: Callable, executor: Executor) -> Callable:
+    """Make a batch function that calculates single Hessians concurrently.
+
+    The result can be wrapped with dlf_get_hessian_batch_wrapper.
+
+    Args:
+        func: Function taking coordinates and returning the Hessian, i.e., the
+            undecorated version of a function for dlf_get_hessian_wrapper
+        executor: Executor used to calculate the Hessians of a batch. For a
+            ProcessPoolExecutor, func must be picklable.
+
+    Returns:
+        batch_func: Function for dlf_get_hessian_batch_wrapper
+    """
+
+    def batch_func(coordinates: NDArray[np.float64]) -> NDArray[np.float64]:
+        futures = [
+            executor.submit(func, np.array(coordinates[i]))
+            for i in range(len(coordinates))
+        ]
+        hessians = [future.result() for future in futures]
+        return np.array(hessians, dtype=np.float64)
+
+    return batch_func
+
+
 def dlf_get_multistate_gradients_wrapper(func: Callable) -> Callable:
     """Factory function for dlf_get_multistate_gradients."""
 
@@ -88,9 +358,13 @@ def dlf_get_multistate_gradients_wrapper(func: Callable) -> Callable:
         needcoupling: int,
         iimage: int,
         status: pointer[c_int],
+        *args,
+        **kwargs,
     ) -> None:
         coordinates_ = as_array(coords, (nvar,)).reshape(-1, 3)
-        e_1, e_2, g_1, g_2, _ = func(coordinates_, needcoupling, iimage)
+        e_1, e_2, g_1, g_2, _ = func(
+            coordinates_, needcoupling, iimage, *args, **kwargs
+        )
         energy_ = as_array(energy, (2,))
         energy_[0] = e_1
         energy_[1] = e_2
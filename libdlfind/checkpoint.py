@@ -0,0 +1,231 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Checkpoints of DL-FIND as Python objects."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+import io
+import json
+import os
+from pathlib import Path
+import threading
+from typing import Iterable, Optional, Union
+import zipfile
+
+# Name of the archive member holding the counters
+_INFO = "libdlfind.json"
+
+
+@dataclass
+class Checkpoint:
+    """Complete set of checkpoint files written by DL-FIND.
+
+    Attributes:
+        files: Contents of the checkpoint files keyed on file name, e.g.,
+            dlf_global.chk
+        n_energy_evaluations: Number of energy evaluations when written
+        n_cycles: Number of cycles when written
+    """
+
+    files: dict[str, bytes] = field(default_factory=dict)
+    n_energy_evaluations: int = 0
+    n_cycles: int = 0
+
+    @classmethod
+    def read(
+        cls,
+        directory: Union[str, os.PathLike],
+        n_energy_evaluations: int = 0,
+        n_cycles: int = 0,
+        names: Optional[Iterable[str]] = None,
+    ) -> Checkpoint:
+        """Read the checkpoint files in a directory.
+
+        Args:
+            directory: Directory with the dlf_*.chk files
+            n_energy_evaluations: Number of energy evaluations when written
+            n_cycles: Number of cycles when written
+            names: Names of the files to read. All dlf_*.chk files in the
+                directory if None.
+
+        Returns:
+            checkpoint: Checkpoint with the contents of the files
+        """
+        directory = Path(directory)
+        if names is None:
+            paths = sorted(directory.glob("dlf_*.chk"))
+        else:
+            paths = [directory / name for name in sorted(names)]
+        files = {path.name: path.read_bytes() for path in paths}
+        return cls(files, n_energy_evaluations, n_cycles)
+
+    def write(self, directory: Union[str, os.PathLike]) -> None:
+        """Write the checkpoint files to a directory.
+
+        Every file is replaced atomically, so that an interrupted write never
+        leaves a truncated file.
+
+        Args:
+            directory: Directory to write to. Created if it does not exist.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        for name, data in self.files.items():
+            path = directory / name
+            tmp_path = path.with_name(path.name + ".tmp")
+            tmp_path.write_bytes(data)
+            os.replace(tmp_path, path)
+
+    def to_bytes(self) -> bytes:
+        """Serialize the checkpoint to a zip archive.
+
+        Returns:
+            data: Contents of the archive
+        """
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w") as archive:
+            for name, data in self.files.items():
+                archive.writestr(name, data)
+            info = {
+                "n_energy_evaluations": self.n_energy_evaluations,
+                "n_cycles": self.n_cycles,
+            }
+            archive.writestr(_INFO, json.dumps(info))
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> Checkpoint:
+        """Deserialize a checkpoint written by to_bytes.
+
+        Args:
+            data: Contents of the archive
+
+        Returns:
+            checkpoint: Checkpoint
+        """
+        with zipfile.ZipFile(io.BytesIO(data)) as archive:
+            files = {
+                name: archive.read(name) for name in archive.namelist() if name != _INFO
+            }
+            info = (
+                json.loads(archive.read(_INFO)) if _INFO in archive.namelist() else {}
+            )
+        return cls(files, **info)
+
+
+class CheckpointWriter:
+    """Write checkpoints to a directory, optionally in a background thread.
+
+    Can be passed as the checkpoint argument of dl_find. In the background, only
+    the latest checkpoint is written: if DL-FIND writes checkpoints faster than
+    they can be stored, the intermediate ones are skipped instead of holding up
+    the optimization.
+
+    Args:
+        directory: Directory to write the checkpoint files to
+        background: Whether to write in a background thread
+
+    Attributes:
+        latest: Latest checkpoint received
+        n_written: Number of checkpoints written
+    """
+
+    def __init__(
+        self, directory: Union[str, os.PathLike], *, background: bool = True
+    ) -> None:
+        self.directory = Path(directory)
+        self.background = background
+        self.latest: Optional[Checkpoint] = None
+        self.n_written = 0
+        self._pending: Optional[Checkpoint] = None
+        self._error: Optional[BaseException] = None
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread: Optional[threading.Thread] = None
+        if background:
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def __call__(self, checkpoint: Checkpoint) -> None:
+        """Store checkpoint."""
+        self.latest = checkpoint
+        if not self.background:
+            self._write(checkpoint)
+            return
+        with self._condition:
+            self._pending = checkpoint
+            self._condition.notify_all()
+
+    def __enter__(self) -> CheckpointWriter:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _write(self, checkpoint: Checkpoint) -> None:
+        """Write checkpoint to the directory."""
+        checkpoint.write(self.directory)
+        self.n_written += 1
+
+    def _run(self) -> None:
+        """Write pending checkpoints until closed."""
+        while True:
+            with self._condition:
+                while self._pending is None and not self._closed:
+                    self._condition.wait()
+                if self._pending is None:
+                    return
+                checkpoint, self._pending = self._pending, None
+                self._busy = True
+            try:
+                self._write(checkpoint)
+            except BaseException as e:
+                self._error = e
+            finally:
+                with self._condition:
+                    self._busy = False
+                    self._condition.notify_all()
+
+    def flush(self) -> None:
+        """Wait until the latest checkpoint has been written.
+
+        Raises:
+            RuntimeError: If writing a checkpoint failed
+        """
+        with self._condition:
+            while self._pending is not None or self._busy:
+                self._condition.wait()
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise RuntimeError("Writing the checkpoint failed.") from error
+
+    def close(self) -> None:
+        """Write the latest checkpoint and stop the background thread."""
+        if self._thread is None:
+            return
+        try:
+            self.flush()
+        finally:
+            with self._condition:
+                self._closed = True
+                self._condition.notify_all()
+            self._thread.join()
+            self._thread = None
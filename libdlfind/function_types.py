@@ -33,6 +33,34 @@ type_dlf_get_gradient = CFUNCTYPE(
     POINTER(c_int),  # integer(c_int), intent(out) :: status
 )
 
+type_dlf_get_gradient_batch = CFUNCTYPE(
+    None,
+    c_int,  # integer(c_int), intent(in), value :: nvar
+    c_int,  # integer(c_int), intent(in), value :: nbatch
+    POINTER(c_double),  # real(c_double), intent(in) :: coords(nvar, nbatch)
+    POINTER(c_double),  # real(c_double), intent(out) :: energy(nbatch)
+    POINTER(c_double),  # real(c_double), intent(out) :: gradient(nvar, nbatch)
+    POINTER(c_int),  # integer(c_int), intent(in) :: iimage(nbatch)
+    c_int,  # integer(c_int), intent(in), value :: kiter
+    POINTER(c_int),  # integer(c_int), intent(out) :: status
+)
+
+type_dlf_checkpoint = CFUNCTYPE(
+    None,
+    c_int,  # integer(c_int), intent(in), value :: nenergy
+    c_int,  # integer(c_int), intent(in), value :: ncycle
+)
+
+type_dlf_stop = CFUNCTYPE(
+    None,
+    c_int,  # integer(c_int), intent(in), value :: nvar
+    POINTER(c_double),  # real(c_double), intent(in) :: coords(nvar)
+    c_double,  # real(c_double), intent(in), value :: energy
+    c_int,  # integer(c_int), intent(in), value :: nenergy
+    c_int,  # integer(c_int), intent(in), value :: ncycle
+    POINTER(c_int),  # integer(c_int), intent(out) :: stop
+)
+
 type_dlf_get_hessian = CFUNCTYPE(
     None,
     c_int,  # integer(c_int), intent(in) :: nvar
@@ -41,6 +69,15 @@ type_dlf_get_hessian = CFUNCTYPE(
     POINTER(c_int),  # integer, intent(out) :: status
 )
 
+type_dlf_get_hessian_batch = CFUNCTYPE(
+    None,
+    c_int,  # integer(c_int), intent(in), value :: nvar
+    c_int,  # integer(c_int), intent(in), value :: nbatch
+    POINTER(c_double),  # real(c_double), intent(in) :: coords(nvar, nbatch)
+    POINTER(c_double),  # real(c_double), intent(out) :: hessian(nvar, nvar, nbatch)
+    POINTER(c_int),  # integer(c_int), intent(out) :: status
+)
+
 type_dlf_get_multistate_gradients = CFUNCTYPE(
     None,
     c_int,  # integer(c_int), intent(in), value :: nvar
@@ -20,28 +20,59 @@
 
 from __future__ import annotations
 
-from ctypes import c_int
+from _ctypes import CFuncPtr as _CFuncPtr
+from contextlib import contextmanager
+from ctypes import (
+    byref,
+    c_char_p,
+    c_double,
+    c_int,
+    cast,
+    create_string_buffer,
+    POINTER,
+    pointer,
+)
+import functools
+import os
 from pathlib import Path
-from typing import Callable
+import tempfile
+import time
+from typing import Callable, Iterator, Optional, Union
 
-from numpy.ctypeslib import load_library
+import numpy as np
+from numpy.ctypeslib import as_array, load_library
+from numpy.typing import NDArray
 
+from libdlfind.checkpoint import Checkpoint
 from libdlfind.function_types import (
+    type_dlf_checkpoint,
     type_dlf_error,
     type_dlf_get_gradient,
+    type_dlf_get_gradient_batch,
     type_dlf_get_hessian,
+    type_dlf_get_hessian_batch,
     type_dlf_get_multistate_gradients,
     type_dlf_get_params,
     type_dlf_put_coords,
+    type_dlf_stop,
     type_dlf_update,
 )
+from libdlfind.output import RunOutput
+from libdlfind.result import (
+    BLASInfo,
+    ConvergenceState,
+    OptimizationResult,
+    OptimizerState,
+    RunStatistics,
+)
 
 # Load shared library
 path = Path(__file__).parent
 lib = load_library("libdlfind", str(path))
 
 # Define function from shared library and create Python wrapper
-_dl_find = lib.api_dl_find
+_dl_find = lib.api_dl_find_recoverable
+_dl_find.restype = c_int
 _dl_find.argtypes = [
     c_int,  # integer(c_int), intent(in) :: nvarin ! number of variables to read in 3*nat
     c_int,  # integer(c_int), intent(in) :: nvarin2 ! number of variables to read in in the second array (coords2) # noqa: B950
@@ -56,6 +87,693 @@ _dl_find.argtypes = [
     type_dlf_update,  # type(c_funptr), intent(in), value :: c_dlf_update_
 ]
 
+_lock_runs = lib.api_dlf_lock_runs
+_lock_runs.restype = c_int
+_lock_runs.argtypes = []
+
+_unlock_runs = lib.api_dlf_unlock_runs
+_unlock_runs.restype = None
+_unlock_runs.argtypes = []
+
+_get_convergence = lib.api_dlf_get_convergence
+_get_convergence.argtypes = [
+    POINTER(c_double),  # real(c_double), intent(out) :: values(5)
+    POINTER(c_double),  # real(c_double), intent(out) :: tolerances(5)
+    POINTER(c_int),  # integer(c_int), intent(out) :: tested
+]
+
+_set_gradient_batch = lib.api_dlf_set_gradient_batch
+_set_gradient_batch.argtypes = [
+    type_dlf_get_gradient_batch,  # type(c_funptr), intent(in), value :: dlf_get_gradient_batch_c # noqa: B950
+]
+
+_set_hessian_batch = lib.api_dlf_set_hessian_batch
+_set_hessian_batch.argtypes = [
+    type_dlf_get_hessian_batch,  # type(c_funptr), intent(in), value :: dlf_get_hessian_batch_c # noqa: B950
+]
+
+_set_checkpoint_dir = lib.api_dlf_set_checkpoint_dir
+_set_checkpoint_dir.argtypes = [
+    c_char_p,  # type(c_ptr), intent(in), value :: path
+]
+
+_set_checkpoint = lib.api_dlf_set_checkpoint
+_set_checkpoint.argtypes = [
+    type_dlf_checkpoint,  # type(c_funptr), intent(in), value :: dlf_checkpoint_c
+]
+
+_get_checkpoint_files = lib.api_dlf_get_checkpoint_files
+_get_checkpoint_files.argtypes = [
+    c_char_p,  # character(kind=c_char), intent(out) :: names(length)
+    c_int,  # integer(c_int), intent(in), value :: length
+]
+
+_set_output_dir = lib.api_dlf_set_output_dir
+_set_output_dir.argtypes = [
+    c_char_p,  # type(c_ptr), intent(in), value :: path
+]
+
+_set_log_file = lib.api_dlf_set_log_file
+_set_log_file.argtypes = [
+    c_char_p,  # type(c_ptr), intent(in), value :: path
+]
+
+_get_result = lib.api_dlf_get_result
+_get_result.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: nvar
+    POINTER(c_double),  # real(c_double), intent(out) :: coords(nvar)
+    POINTER(c_double),  # real(c_double), intent(out) :: energy
+    POINTER(c_double),  # real(c_double), intent(out) :: gradient(nvar)
+    POINTER(c_int),  # integer(c_int), intent(out) :: nenergy
+    POINTER(c_int),  # integer(c_int), intent(out) :: ncycle
+    POINTER(c_int),  # integer(c_int), intent(out) :: naccepted
+    POINTER(c_int),  # integer(c_int), intent(out) :: converged
+    POINTER(c_int),  # integer(c_int), intent(out) :: status
+]
+
+_set_cancel_flag = lib.api_dlf_set_cancel_flag
+_set_cancel_flag.argtypes = [
+    POINTER(c_int),  # type(c_ptr), intent(in), value :: flag
+]
+
+_set_time_limit = lib.api_dlf_set_time_limit
+_set_time_limit.argtypes = [
+    c_double,  # real(c_double), intent(in), value :: seconds
+]
+
+_set_stop = lib.api_dlf_set_stop
+_set_stop.argtypes = [
+    type_dlf_stop,  # type(c_funptr), intent(in), value :: dlf_stop_c
+]
+
+_set_sparse_hdlc = lib.api_dlf_set_sparse_hdlc
+_set_sparse_hdlc.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: min_atoms
+]
+
+_set_initial_hessian = lib.api_dlf_set_initial_hessian
+_set_initial_hessian.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: n
+    POINTER(c_double),  # real(c_double), intent(in) :: hessian(n, n)
+]
+
+_set_initial_lbfgs = lib.api_dlf_set_initial_lbfgs
+_set_initial_lbfgs.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: n
+    c_int,  # integer(c_int), intent(in), value :: npair
+    POINTER(c_double),  # real(c_double), intent(in) :: steps(n, npair)
+    POINTER(c_double),  # real(c_double), intent(in) :: dgrads(n, npair)
+]
+
+_get_state_size = lib.api_dlf_get_state_size
+_get_state_size.argtypes = [
+    POINTER(c_int),  # integer(c_int), intent(out) :: nhessian
+    POINTER(c_int),  # integer(c_int), intent(out) :: nlbfgs
+    POINTER(c_int),  # integer(c_int), intent(out) :: npair
+]
+
+_get_final_hessian = lib.api_dlf_get_final_hessian
+_get_final_hessian.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: n
+    POINTER(c_double),  # real(c_double), intent(out) :: hessian(n, n)
+]
+
+_get_final_lbfgs = lib.api_dlf_get_final_lbfgs
+_get_final_lbfgs.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: n
+    c_int,  # integer(c_int), intent(in), value :: npair
+    POINTER(c_double),  # real(c_double), intent(out) :: steps(n, npair)
+    POINTER(c_double),  # real(c_double), intent(out) :: dgrads(n, npair)
+]
+
+_get_blas_library = lib.api_dlf_get_blas_library
+_get_blas_library.restype = c_char_p
+_get_blas_library.argtypes = []
+
+_get_blas_vendor = lib.api_dlf_get_blas_vendor
+_get_blas_vendor.restype = c_char_p
+_get_blas_vendor.argtypes = []
+
+_get_blas_threads = lib.api_dlf_get_blas_threads
+_get_blas_threads.restype = c_int
+_get_blas_threads.argtypes = []
+
+_set_blas_threads = lib.api_dlf_set_blas_threads
+_set_blas_threads.restype = c_int
+_set_blas_threads.argtypes = [
+    c_int,  # int nthreads
+]
+
+_get_stop_reason = lib.api_dlf_get_stop_reason
+_get_stop_reason.restype = c_int
+_get_stop_reason.argtypes = []
+
+# Stop reasons of api_dlf_get_stop_reason
+STOP_REASONS = {1: "cancelled", 2: "time_limit", 3: "early_stop"}
+
+_get_error = lib.api_dlf_get_error
+_get_error.argtypes = [
+    c_int,  # integer(c_int), intent(in), value :: nvar
+    POINTER(c_double),  # real(c_double), intent(out) :: coords(nvar)
+    POINTER(c_int),  # integer(c_int), intent(out) :: status
+    c_char_p,  # character(kind=c_char), intent(out) :: message(length)
+    c_int,  # integer(c_int), intent(in), value :: length
+    POINTER(c_int),  # integer(c_int), intent(out) :: failed
+    POINTER(c_int),  # integer(c_int), intent(out) :: has_coords
+]
+
+_get_timers = lib.api_dlf_get_timers
+_get_timers.argtypes = [
+    POINTER(c_double),  # real(c_double), intent(out) :: cpu_time(6)
+    POINTER(c_double),  # real(c_double), intent(out) :: wall_time(6)
+    POINTER(c_int),  # integer(c_int), intent(out) :: counters(6)
+]
+
+# Clocks of DL-FIND, in the order of dlf_time.f90
+CLOCKS = (
+    "total",
+    "energy_and_gradient",
+    "step_direction",
+    "coordinates",
+    "checkpoint",
+    "xyz",
+)
+
+# Position of the status argument of the callbacks that have one
+_STATUS_ARGUMENTS = {
+    "dlf_get_gradient": 6,
+    "dlf_get_hessian": 3,
+    "dlf_get_multistate_gradients": 7,
+    "dlf_get_params": 6,
+    "dlf_get_gradient_batch": 7,
+    "dlf_get_hessian_batch": 4,
+}
+
+# Wall time and number of calls of the Python callbacks of the current run
+_callback_wall_time: dict[str, float] = {}
+_callback_calls: dict[str, int] = {}
+
+# First exception raised by a callback with a status argument in the current run
+_callback_errors: list[Exception] = []
+
+# First KeyboardInterrupt, SystemExit or other BaseException raised by a
+# callback with a status argument, re-raised once DL-FIND has returned
+_callback_interrupts: list[BaseException] = []
+
+
+class DLFindError(RuntimeError):
+    """DL-FIND failed.
+
+    Raised by dl_find instead of terminating the process, e.g., if a callback
+    returned a non-zero status or raised an exception, or if the energy is NaN.
+    DL-FIND can be called again afterwards. An exception raised by a callback
+    is set as the cause.
+
+    Args:
+        message: Error message of DL-FIND
+        status: Last non-zero status returned by an energy callback, 0 if none
+        coordinates: Coordinates when DL-FIND failed
+
+    Attributes:
+        message: Error message of DL-FIND
+        status: Last non-zero status returned by an energy callback, 0 if none
+        coordinates: Coordinates with shape (n_atoms, 3) when DL-FIND failed, if
+            available
+    """
+
+    def __init__(
+        self,
+        message: str,
+        status: int = 0,
+        coordinates: Optional[NDArray[np.float64]] = None,
+    ) -> None:
+        super().__init__(message)
+        self.message = message
+        self.status = status
+        self.coordinates = coordinates
+
+    def __reduce__(self) -> tuple:
+        return type(self), (self.message, self.status, self.coordinates)
+
+
+class CancelToken:
+    """Token for stopping a run of dl_find from another thread.
+
+    DL-FIND checks the token before every energy evaluation and ends the run
+    as if maxcycle had been reached, so that dl_find returns the result so far.
+    A token can be cancelled before the run starts, in which case no energy is
+    evaluated.
+    """
+
+    def __init__(self) -> None:
+        self._flag = c_int(0)
+
+    def cancel(self) -> None:
+        """Ask the run to stop."""
+        self._flag.value = 1
+
+    @property
+    def cancelled(self) -> bool:
+        """Whether cancel has been called."""
+        return bool(self._flag.value)
+
+
+def _timed(func: Callable, name: str) -> Callable:
+    """Wrap a Python callback to record its wall time under name.
+
+    Exceptions raised by callbacks with a status argument are kept and reported
+    to DL-FIND as a non-zero status, as they cannot propagate through it. Other
+    BaseExceptions such as KeyboardInterrupt also stop DL-FIND with a non-zero
+    status, and are re-raised by dl_find as they are.
+    """
+    status_argument = _STATUS_ARGUMENTS.get(name)
+
+    @functools.wraps(func)
+    def wrapper(*args) -> None:
+        start = time.perf_counter()
+        try:
+            func(*args)
+        except Exception as e:
+            if status_argument is None:
+                raise
+            if not _callback_errors:
+                _callback_errors.append(e)
+            args[status_argument][0] = 1
+        except BaseException as e:
+            if status_argument is None:
+                raise
+            if not _callback_interrupts:
+                _callback_interrupts.append(e)
+            args[status_argument][0] = 1
+        finally:
+            _callback_wall_time[name] = (
+                _callback_wall_time.get(name, 0.0) + time.perf_counter() - start
+            )
+            _callback_calls[name] = _callback_calls.get(name, 0) + 1
+
+    return wrapper
+
+
+def as_function_pointer(
+    func: Optional[Union[Callable, int]],
+    function_type: type[_CFuncPtr],
+    name: Optional[str] = None,
+) -> _CFuncPtr:
+    """Convert a callback to a C function pointer of the given type.
+
+    Native function pointers are passed on as they are, so that DL-FIND calls
+    them directly without going through Python.
+
+    Args:
+        func: Python callable, ctypes function (e.g., from another shared
+            library), object with an integer address attribute (e.g.,
+            numba.cfunc), integer address of a C function, or None for a NULL
+            pointer
+        function_type: ctypes function type of the callback
+        name: Name to record the wall time of a Python callable under, see
+            get_statistics
+
+    Returns:
+        pointer: ctypes function pointer of function_type
+    """
+    if func is None:
+        return function_type()
+    if isinstance(func, function_type):
+        return func
+    if isinstance(func, _CFuncPtr):
+        return cast(func, function_type)
+    if isinstance(func, int):
+        return function_type(func)
+    address = getattr(func, "address", None)
+    if isinstance(address, int):
+        return function_type(address)
+    if name is not None:
+        func = _timed(func, name)
+    return function_type(func)
+
+
+def get_statistics() -> RunStatistics:
+    """Read the timers and counters of the current or last run from DL-FIND.
+
+    Can be called from a callback to follow a run while it is going on.
+
+    Returns:
+        statistics: Timers and counters
+    """
+    cpu_time = np.zeros(len(CLOCKS), dtype=np.float64)
+    wall_time = np.zeros(len(CLOCKS), dtype=np.float64)
+    counters = np.zeros(6, dtype=np.intc)
+    _get_timers(
+        cpu_time.ctypes.data_as(POINTER(c_double)),
+        wall_time.ctypes.data_as(POINTER(c_double)),
+        counters.ctypes.data_as(POINTER(c_int)),
+    )
+    return RunStatistics(
+        cpu_time={name: float(cpu_time[i]) for i, name in enumerate(CLOCKS)},
+        wall_time={name: float(wall_time[i]) for i, name in enumerate(CLOCKS)},
+        callback_wall_time=dict(_callback_wall_time),
+        callback_calls=dict(_callback_calls),
+        n_energy_evaluations=int(counters[0]),
+        n_cycles=int(counters[2]),
+        n_accepted=int(counters[3]),
+        n_micro_cycles=int(counters[4]),
+        n_micro_accepted=int(counters[5]),
+    )
+
+
+def get_blas_info() -> BLASInfo:
+    """Return the BLAS library that DL-FIND uses and its number of threads.
+
+    Returns:
+        info: Vendor, path and number of threads of the library
+    """
+    num_threads = _get_blas_threads()
+    return BLASInfo(
+        vendor=_get_blas_vendor().decode(),
+        library=os.fsdecode(_get_blas_library()),
+        num_threads=num_threads if num_threads > 0 else None,
+    )
+
+
+def get_optimizer_state() -> Optional[OptimizerState]:
+    """Read the state of the optimizer at the end of the last run from DL-FIND.
+
+    Returns:
+        state: Hessian or L-BFGS memory in internal coordinates, or None if the
+            optimizer kept neither
+    """
+    nhessian, nlbfgs, npair = c_int(), c_int(), c_int()
+    _get_state_size(byref(nhessian), byref(nlbfgs), byref(npair))
+    if nhessian.value == 0 and nlbfgs.value == 0:
+        return None
+    state = OptimizerState()
+    if nhessian.value > 0:
+        hessian = np.empty((nhessian.value, nhessian.value), order="F")
+        _get_final_hessian(nhessian, hessian.ctypes.data_as(POINTER(c_double)))
+        state.hessian = np.ascontiguousarray(hessian)
+    if nlbfgs.value > 0:
+        # Column-major (n, npair) in DL-FIND is row-major (npair, n)
+        steps = np.empty((npair.value, nlbfgs.value))
+        dgrads = np.empty((npair.value, nlbfgs.value))
+        _get_final_lbfgs(
+            nlbfgs,
+            npair,
+            steps.ctypes.data_as(POINTER(c_double)),
+            dgrads.ctypes.data_as(POINTER(c_double)),
+        )
+        state.lbfgs_steps = steps
+        state.lbfgs_gradient_differences = dgrads
+    return state
+
+
+def get_convergence() -> ConvergenceState:
+    """Read how close the current run is to convergence from DL-FIND.
+
+    Meant to be called from a callback, e.g., to loosen the precision of the
+    energy evaluations while the gradient is still large.
+
+    Returns:
+        state: Values and criteria of the last convergence test
+    """
+    values = (c_double * 5)()
+    tolerances = (c_double * 5)()
+    tested = c_int()
+    counters = (c_int * 6)()
+    _get_convergence(values, tolerances, byref(tested))
+    _get_timers((c_double * len(CLOCKS))(), (c_double * len(CLOCKS))(), counters)
+    measured = [value if tested.value else None for value in values]
+    energy_change = measured[4] if values[4] >= 0 else None
+    return ConvergenceState(
+        n_cycles=counters[2],
+        n_energy_evaluations=counters[0],
+        max_gradient=measured[0],
+        rms_gradient=measured[1],
+        max_step=measured[2],
+        rms_step=measured[3],
+        energy_change=energy_change,
+        tolerance=tolerances[0],
+        tolerance_rms_gradient=tolerances[1],
+        tolerance_step=tolerances[2],
+        tolerance_rms_step=tolerances[3],
+        tolerance_energy=tolerances[4],
+    )
+
+
+def get_error(nvar: int) -> Optional[DLFindError]:
+    """Read the failure of the last run from DL-FIND.
+
+    Args:
+        nvar: Number of variables (3 * number of atoms)
+
+    Returns:
+        error: Error describing the failure, or None if the last run did not fail
+    """
+    coords = np.empty(nvar, dtype=np.float64)
+    message = create_string_buffer(1024)
+    status, failed, has_coords = c_int(), c_int(), c_int()
+    _get_error(
+        c_int(nvar),
+        coords.ctypes.data_as(POINTER(c_double)),
+        byref(status),
+        message,
+        c_int(len(message)),
+        byref(failed),
+        byref(has_coords),
+    )
+    if not failed.value:
+        return None
+    text = message.value.decode(errors="replace").strip()
+    if _callback_errors:
+        text = f"{text} ({type(_callback_errors[0]).__name__}: {_callback_errors[0]})"
+    return DLFindError(
+        text,
+        status=status.value,
+        coordinates=coords.reshape(-1, 3) if has_coords.value else None,
+    )
+
+
+def get_result(nvar: int) -> Optional[OptimizationResult]:
+    """Read the result of the last run from DL-FIND.
+
+    Args:
+        nvar: Number of variables (3 * number of atoms)
+
+    Returns:
+        result: Result of the last run, or None if no energy evaluation through
+            dlf_get_gradient was recorded
+    """
+    coords = np.empty(nvar, dtype=np.float64)
+    gradient = np.empty(nvar, dtype=np.float64)
+    energy = c_double()
+    nenergy, ncycle, naccepted, converged, status = (c_int() for _ in range(5))
+    _get_result(
+        c_int(nvar),
+        coords.ctypes.data_as(POINTER(c_double)),
+        byref(energy),
+        gradient.ctypes.data_as(POINTER(c_double)),
+        byref(nenergy),
+        byref(ncycle),
+        byref(naccepted),
+        byref(converged),
+        byref(status),
+    )
+    if status.value != 0:
+        return None
+    return OptimizationResult(
+        coordinates=coords.reshape(-1, 3),
+        energy=energy.value,
+        gradient=gradient.reshape(-1, 3),
+        n_energy_evaluations=nenergy.value,
+        n_cycles=ncycle.value,
+        n_accepted=naccepted.value,
+        converged=bool(converged.value),
+        statistics=get_statistics(),
+        stop_reason=STOP_REASONS.get(_get_stop_reason()),
+        optimizer_state=get_optimizer_state(),
+    )
+
+
+@contextmanager
+def _checkpointing(
+    checkpoint_dir: Optional[Union[str, os.PathLike]],
+    checkpoint: Optional[Callable[[Checkpoint], None]],
+    restart_from: Optional[Union[Checkpoint, bytes]],
+) -> Iterator[None]:
+    """Route the checkpoint files of DL-FIND for the duration of a run."""
+    tmp_dir = None
+    # Checkpoints that are not kept on disk are still written to a temporary
+    # directory by DL-FIND and read back in the callback
+    if checkpoint_dir is None and (checkpoint is not None or restart_from is not None):
+        tmp_dir = tempfile.TemporaryDirectory(prefix="libdlfind_")
+        checkpoint_dir = tmp_dir.name
+    directory = checkpoint_dir
+    try:
+        if restart_from is not None:
+            if isinstance(restart_from, bytes):
+                restart_from = Checkpoint.from_bytes(restart_from)
+            restart_from.write(directory)
+
+        # Keep a reference to the callback as DL-FIND holds on to it
+        if checkpoint is not None:
+            callback = checkpoint
+
+            def dlf_checkpoint(nenergy: int, ncycle: int) -> None:
+                names = create_string_buffer(1024)
+                _get_checkpoint_files(names, c_int(len(names)))
+                callback(
+                    Checkpoint.read(
+                        directory, nenergy, ncycle, names=names.value.decode().split()
+                    )
+                )
+
+            c_dlf_checkpoint = as_function_pointer(
+                dlf_checkpoint, type_dlf_checkpoint, "dlf_checkpoint"
+            )
+        else:
+            c_dlf_checkpoint = type_dlf_checkpoint()
+        _set_checkpoint(c_dlf_checkpoint)
+        _set_checkpoint_dir(os.fsencode(directory) if directory is not None else None)
+        yield
+    finally:
+        _set_checkpoint(type_dlf_checkpoint())
+        _set_checkpoint_dir(None)
+        if tmp_dir is not None:
+            tmp_dir.cleanup()
+
+
+@contextmanager
+def _routing_output(
+    output_dir: Optional[Union[str, os.PathLike]], output: Optional[RunOutput]
+) -> Iterator[None]:
+    """Route the printout and auxiliary files of DL-FIND for the duration of a run."""
+    tmp_dir = None
+    log_file = None
+    files_dir = None
+    # Printout and files that only end up in memory go through a temporary directory
+    if output is not None:
+        tmp_dir = tempfile.TemporaryDirectory(prefix="libdlfind_")
+        log_file = Path(tmp_dir.name) / "dlfind.log"
+        if output_dir is None:
+            files_dir = Path(tmp_dir.name) / "files"
+            files_dir.mkdir()
+            output_dir = files_dir
+    try:
+        _set_output_dir(os.fsencode(output_dir) if output_dir is not None else None)
+        _set_log_file(os.fsencode(log_file) if log_file is not None else None)
+        yield
+    finally:
+        _set_log_file(None)
+        _set_output_dir(None)
+        if tmp_dir is not None:
+            try:
+                output.read(log_file, files_dir)
+            finally:
+                tmp_dir.cleanup()
+
+
+@contextmanager
+def _stopping(
+    cancel: Optional[CancelToken],
+    time_limit: Optional[float],
+    early_stop: Optional[Callable[[float, NDArray[np.float64]], bool]],
+) -> Iterator[None]:
+    """Set the conditions for stopping a run early for the duration of a run."""
+    # Keep a reference to the callback as DL-FIND holds on to it
+    if early_stop is not None:
+        predicate = early_stop
+
+        def dlf_stop(
+            nvar: int,
+            coords: pointer[c_double],
+            energy: float,
+            nenergy: int,
+            ncycle: int,
+            stop: pointer[c_int],
+        ) -> None:
+            coordinates = as_array(coords, (nvar,)).reshape(-1, 3)
+            stop[0] = c_int(int(bool(predicate(energy, coordinates))))
+
+        c_dlf_stop = as_function_pointer(dlf_stop, type_dlf_stop, "early_stop")
+    else:
+        c_dlf_stop = type_dlf_stop()
+    try:
+        _set_stop(c_dlf_stop)
+        _set_cancel_flag(byref(cancel._flag) if cancel is not None else None)
+        _set_time_limit(time_limit if time_limit is not None else 0.0)
+        yield
+    finally:
+        _set_stop(type_dlf_stop())
+        _set_cancel_flag(None)
+        _set_time_limit(0.0)
+
+
+@contextmanager
+def _blas_threads(num_threads: Optional[int]) -> Iterator[None]:
+    """Limit the threads of the BLAS library for the duration of a run."""
+    if num_threads is None:
+        yield
+        return
+    if num_threads < 1:
+        raise ValueError("blas_threads must be positive.")
+    previous = _set_blas_threads(num_threads)
+    try:
+        yield
+    finally:
+        if previous > 0:
+            _set_blas_threads(previous)
+
+
+@contextmanager
+def _serialized() -> Iterator[None]:
+    """Hold the lock that serializes the runs of DL-FIND in this process."""
+    if _lock_runs() != 0:
+        raise RuntimeError(
+            "dl_find cannot be called from a callback of a running dl_find."
+        )
+    try:
+        yield
+    finally:
+        _unlock_runs()
+
+
+@contextmanager
+def _initial_state(state: Optional[OptimizerState]) -> Iterator[None]:
+    """Start the optimizer from state for the duration of a run."""
+    if state is None:
+        yield
+        return
+    hessian = steps = dgrads = None
+    if state.hessian is not None:
+        hessian = np.asfortranarray(state.hessian, dtype=np.float64)
+        if hessian.ndim != 2 or hessian.shape[0] != hessian.shape[1]:
+            raise ValueError("hessian of initial_state must be square.")
+    if state.lbfgs_steps is not None or state.lbfgs_gradient_differences is not None:
+        steps = np.ascontiguousarray(state.lbfgs_steps, dtype=np.float64)
+        dgrads = np.ascontiguousarray(
+            state.lbfgs_gradient_differences, dtype=np.float64
+        )
+        if steps.ndim != 2 or steps.shape != dgrads.shape:
+            raise ValueError(
+                "lbfgs_steps and lbfgs_gradient_differences of initial_state must "
+                "have the same shape (n_pairs, n)."
+            )
+    try:
+        if hessian is not None:
+            _set_initial_hessian(
+                hessian.shape[0], hessian.ctypes.data_as(POINTER(c_double))
+            )
+        if steps is not None and dgrads is not None:
+            _set_initial_lbfgs(
+                steps.shape[1],
+                steps.shape[0],
+                steps.ctypes.data_as(POINTER(c_double)),
+                dgrads.ctypes.data_as(POINTER(c_double)),
+            )
+        yield
+    finally:
+        _set_initial_hessian(0, None)
+        _set_initial_lbfgs(0, 0, None, None)
+
 
 def dl_find(
     nvarin: int,
@@ -63,20 +781,46 @@ def dl_find(
     nspec: int | None = None,
     master: int = 1,
     *,
-    dlf_error: Callable = lambda *args: None,
-    dlf_get_gradient: Callable = lambda *args: None,
-    dlf_get_hessian: Callable = lambda *args: None,
-    dlf_get_multistate_gradients: Callable = lambda *args: None,
-    dlf_get_params: Callable,
-    dlf_put_coords: Callable = lambda *args: None,
-    dlf_update: Callable = lambda *args: None,
-) -> None:
+    dlf_error: Optional[Union[Callable, int]] = None,
+    dlf_get_gradient: Optional[Union[Callable, int]] = None,
+    dlf_get_hessian: Optional[Union[Callable, int]] = None,
+    dlf_get_multistate_gradients: Optional[Union[Callable, int]] = None,
+    dlf_get_params: Union[Callable, int],
+    dlf_put_coords: Optional[Union[Callable, int]] = None,
+    dlf_update: Optional[Union[Callable, int]] = None,
+    dlf_get_gradient_batch: Optional[Union[Callable, int]] = None,
+    dlf_get_hessian_batch: Optional[Union[Callable, int]] = None,
+    checkpoint_dir: Optional[Union[str, os.PathLike]] = None,
+    checkpoint: Optional[Callable[[Checkpoint], None]] = None,
+    restart_from: Optional[Union[Checkpoint, bytes]] = None,
+    cancel: Optional[CancelToken] = None,
+    time_limit: Optional[float] = None,
+    early_stop: Optional[Callable[[float, NDArray[np.float64]], bool]] = None,
+    output_dir: Optional[Union[str, os.PathLike]] = None,
+    output: Optional[RunOutput] = None,
+    sparse_hdlc: Optional[int] = None,
+    blas_threads: Optional[int] = None,
+    initial_state: Optional[OptimizerState] = None,
+) -> Optional[OptimizationResult]:
     """Run DL-FIND.
 
     For a description of the arguments, see the documentation in api.f90 and
-    the DL-FIND manual. dlf_put_coords is always needed, and either one of
-    dlf_get_gradient or dlf_get_multistate_gradients. The others can be
-    replaced with dummy functions.
+    the DL-FIND manual. Either one of dlf_get_gradient or
+    dlf_get_multistate_gradients is needed. The others can be left out, and
+    DL-FIND then does not call them at all. An energy or Hessian callback that
+    is left out reports a failure if it is requested. dlf_put_coords is only
+    needed to follow the trajectory, as the final state is returned.
+
+    Each callback can be a Python function made with the decorators and factory
+    functions in libdlfind.callback, or a native C function given as a ctypes
+    function, a numba.cfunc or an integer address. Native functions are called
+    by DL-FIND without any Python in between and must follow the prototypes in
+    libdlfind.h.
+
+    The state of DL-FIND is global to the process, so runs from several
+    threads, including those of the C context API, are executed one after
+    another. Use dl_find_many or SteppingOptimizer, which run DL-FIND in
+    worker processes, for concurrent optimizations.
 
     Args:
         nvarin: Number of variables to read for the coords array (3 * number of
@@ -92,23 +836,138 @@ def dl_find(
         dlf_get_params: dlf_get_params function for DL-FIND to call
         dlf_put_coords: dlf_put_coords function for DL-FIND to call
         dlf_update: dlf_update function for DL-FIND to call
+        dlf_get_gradient_batch: Optional function evaluating several geometries
+            at once. If given, the remaining images of each NEB cycle, the
+            displaced geometries of finite-difference Hessians and the
+            populations of the parallel optimizers in Cartesian coordinates are
+            passed to it together instead of one by one to dlf_get_gradient.
+        dlf_get_hessian_batch: Optional function calculating the Hessians of
+            several geometries at once. If given, the Hessians of the remaining
+            images of a QTS rate calculation are passed to it together instead
+            of one by one to dlf_get_hessian.
+        checkpoint_dir: Directory for the checkpoint files of DL-FIND instead of
+            the working directory. Must exist.
+        checkpoint: Function called with a Checkpoint every time DL-FIND has
+            written its checkpoint files, e.g., a CheckpointWriter. How often is
+            set with the dump parameter.
+        restart_from: Checkpoint, or its serialization from
+            Checkpoint.to_bytes, to restart from. Requires restart=1 in the
+            parameters.
+        cancel: Token for stopping the run from another thread
+        time_limit: Wall time after which the run is stopped (s)
+        early_stop: Function called with the energy and the coordinates of the
+            last energy evaluation before every new one. The run is stopped if
+            it returns True.
+        output_dir: Directory for the auxiliary files of DL-FIND, e.g.,
+            path.xyz or nebinfo, instead of the working directory. Must exist.
+        output: RunOutput that the printout of DL-FIND is captured in instead
+            of going to the standard output. Also receives the auxiliary files
+            if output_dir is not given.
+        sparse_hdlc: Minimum number of atoms of the HDLC residues that use a
+            sparse B matrix and iterative coordinate transformations, which
+            scale better with the size of the residue than the dense ones
+        blas_threads: Number of threads of the BLAS library during the run,
+            restored afterwards. The setting applies to the whole process, so
+            concurrent runs in threads of one process share it. Ignored if the
+            library does not support it, see get_blas_info.
+        initial_state: Optimizer state to start from, usually the
+            optimizer_state of the result of a related run. The Hessian replaces
+            the initial Hessian and the L-BFGS memory the first steepest-descent
+            step. Unlike restart_from, the geometry and the rest of the run are
+            new.
+
+    Returns:
+        result: Final coordinates, energy and gradient together with the
+            statistics and timers of the run, or None if no energy evaluation
+            through dlf_get_gradient was made. The timers are also available
+            from get_statistics.
+
+    Raises:
+        DLFindError: If DL-FIND failed
+        ValueError: If blas_threads is not positive or the arrays of
+            initial_state have the wrong shapes
+        RuntimeError: If called from a callback of a running dl_find
+        BaseException: KeyboardInterrupt, SystemExit and other exceptions that
+            are not Exceptions raised by a callback, after DL-FIND has stopped
     """
-    n_atoms = int(nvarin / 3)
-
-    # Set sensible default for nspec
-    if nspec is None:
-        nspec = 2 * n_atoms
-
-    _dl_find(
-        c_int(nvarin),
-        c_int(nvarin2),
-        c_int(nspec),
-        c_int(master),
-        type_dlf_error(dlf_error),
-        type_dlf_get_gradient(dlf_get_gradient),
-        type_dlf_get_hessian(dlf_get_hessian),
-        type_dlf_get_multistate_gradients(dlf_get_multistate_gradients),
-        type_dlf_get_params(dlf_get_params),
-        type_dlf_put_coords(dlf_put_coords),
-        type_dlf_update(dlf_update),
-    )
+    with _serialized():
+        n_atoms = int(nvarin / 3)
+
+        # Set sensible default for nspec
+        if nspec is None:
+            nspec = 2 * n_atoms
+
+        _callback_wall_time.clear()
+        _callback_calls.clear()
+        _callback_errors.clear()
+        _callback_interrupts.clear()
+
+        # Keep a reference to the callback as DL-FIND holds on to it during the run
+        if dlf_get_gradient_batch is not None:
+            c_dlf_get_gradient_batch = as_function_pointer(
+                dlf_get_gradient_batch,
+                type_dlf_get_gradient_batch,
+                "dlf_get_gradient_batch",
+            )
+        else:
+            c_dlf_get_gradient_batch = type_dlf_get_gradient_batch()
+        _set_gradient_batch(c_dlf_get_gradient_batch)
+        if dlf_get_hessian_batch is not None:
+            c_dlf_get_hessian_batch = as_function_pointer(
+                dlf_get_hessian_batch,
+                type_dlf_get_hessian_batch,
+                "dlf_get_hessian_batch",
+            )
+        else:
+            c_dlf_get_hessian_batch = type_dlf_get_hessian_batch()
+        _set_hessian_batch(c_dlf_get_hessian_batch)
+        _set_sparse_hdlc(sparse_hdlc if sparse_hdlc is not None else 0)
+        try:
+            with _checkpointing(checkpoint_dir, checkpoint, restart_from), _stopping(
+                cancel, time_limit, early_stop
+            ), _routing_output(output_dir, output), _blas_threads(blas_threads):
+                with _initial_state(initial_state):
+                    failed = _dl_find(
+                        c_int(nvarin),
+                        c_int(nvarin2),
+                        c_int(nspec),
+                        c_int(master),
+                        as_function_pointer(dlf_error, type_dlf_error, "dlf_error"),
+                        as_function_pointer(
+                            dlf_get_gradient, type_dlf_get_gradient, "dlf_get_gradient"
+                        ),
+                        as_function_pointer(
+                            dlf_get_hessian, type_dlf_get_hessian, "dlf_get_hessian"
+                        ),
+                        as_function_pointer(
+                            dlf_get_multistate_gradients,
+                            type_dlf_get_multistate_gradients,
+                            "dlf_get_multistate_gradients",
+                        ),
+                        as_function_pointer(
+                            dlf_get_params, type_dlf_get_params, "dlf_get_params"
+                        ),
+                        as_function_pointer(
+                            dlf_put_coords, type_dlf_put_coords, "dlf_put_coords"
+                        ),
+                        as_function_pointer(dlf_update, type_dlf_update, "dlf_update"),
+                    )
+        finally:
+            _set_gradient_batch(type_dlf_get_gradient_batch())
+            _set_hessian_batch(type_dlf_get_hessian_batch())
+            _set_sparse_hdlc(0)
+
+        if _callback_interrupts:
+            interrupt = _callback_interrupts[0]
+            _callback_interrupts.clear()
+            _callback_errors.clear()
+            raise interrupt
+
+        if failed:
+            error = get_error(nvarin)
+            cause = _callback_errors[0] if _callback_errors else None
+            _callback_errors.clear()
+            if error is not None:
+                raise error from cause
+
+        return get_result(nvarin)
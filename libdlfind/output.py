@@ -0,0 +1,100 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Printout and auxiliary files of DL-FIND held in memory."""
+
+from __future__ import annotations
+
+from collections import deque
+import logging
+import os
+from pathlib import Path
+from typing import Optional, Union
+
+
+class RunOutput:
+    """Printout and auxiliary files of runs of DL-FIND.
+
+    DL-FIND writes its printout to a log file instead of the standard output
+    while the run is going on, which is cheaper than printing to a terminal and
+    keeps concurrent runs apart. Afterwards, the lines are added to a buffer of
+    fixed length and passed on to the logger, if given. The auxiliary files,
+    e.g., path.xyz or nebinfo, are kept in files unless an output_dir is given
+    to dl_find.
+
+    The log file lives in a temporary directory that is removed after the run,
+    but it is not capped while the run is going on: it holds the whole printout
+    of the run, so long runs with a high printl need the disk space for it.
+    max_lines only bounds the memory used afterwards. The logger gets the lines
+    only once dl_find returns, not as they are printed, so it cannot be used to
+    follow a run live; use the callbacks or a TrajectoryRecorder for that.
+
+    Args:
+        max_lines: Number of lines of printout to keep. Older lines are
+            dropped.
+        logger: Logger to pass every line of printout to
+        level: Level of the log records
+
+    Attributes:
+        lines: Last lines of printout
+        files: Contents of the auxiliary files of the last run keyed on file
+            name
+        logger: Logger to pass every line of printout to
+        level: Level of the log records
+    """
+
+    def __init__(
+        self,
+        max_lines: Optional[int] = 10000,
+        logger: Optional[logging.Logger] = None,
+        level: int = logging.INFO,
+    ) -> None:
+        self.lines: deque[str] = deque(maxlen=max_lines)
+        self.files: dict[str, bytes] = {}
+        self.logger = logger
+        self.level = level
+
+    @property
+    def text(self) -> str:
+        """Kept lines of printout joined together."""
+        return "".join(f"{line}\n" for line in self.lines)
+
+    def read(
+        self,
+        log_file: Union[str, os.PathLike],
+        directory: Optional[Union[str, os.PathLike]] = None,
+    ) -> None:
+        """Read the log file and the auxiliary files of a run.
+
+        Args:
+            log_file: Log file with the printout
+            directory: Directory with the auxiliary files, which replace the
+                files of the previous run
+        """
+        with open(log_file, encoding="latin-1") as f:
+            for line in f:
+                line = line.rstrip("\n")
+                self.lines.append(line)
+                if self.logger is not None:
+                    self.logger.log(self.level, line)
+        if directory is not None:
+            self.files = {
+                path.name: path.read_bytes()
+                for path in sorted(Path(directory).iterdir())
+                if path.is_file()
+            }
@@ -0,0 +1,137 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Parallel execution of many independent optimizations."""
+
+from __future__ import annotations
+
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass, field
+import itertools
+from multiprocessing.context import BaseContext
+import os
+from typing import Any, Callable, Iterable, Iterator, Optional, Union
+
+import numpy as np
+
+from libdlfind.callback import dlf_get_gradient_wrapper, make_dlf_get_params
+from libdlfind.lib import DLFindError
+from libdlfind.result import OptimizationResult
+
+
+@dataclass
+class Job:
+    """Independent optimization to be run in a worker process.
+
+    Everything in a job is sent to the worker process and must therefore be
+    picklable. The callbacks for DL-FIND are constructed in the worker.
+
+    Attributes:
+        e_g_func: Function taking coordinates, iimage and kiter and returning the
+            energy and the gradient, i.e., the undecorated version of a function
+            for dlf_get_gradient_wrapper. Must be defined at module level.
+        params: Keyword arguments for make_dlf_get_params. Must contain coords.
+        nvarin2: Number of variables to read for the coords2 array
+        nspec: Number of values in the integer array spec
+    """
+
+    e_g_func: Callable
+    params: dict[str, Any] = field(default_factory=dict)
+    nvarin2: int = 0
+    nspec: Optional[int] = None
+
+
+def _init_worker() -> None:
+    """Load the shared library once per worker process."""
+    import libdlfind.lib  # noqa: F401
+
+
+def _run_job(job: Job, blas_threads: Optional[int]) -> Optional[OptimizationResult]:
+    """Run a single job in a worker process."""
+    from libdlfind.lib import dl_find
+
+    coords = np.ascontiguousarray(job.params["coords"], dtype=np.float64)
+    return dl_find(
+        nvarin=coords.size,
+        nvarin2=job.nvarin2,
+        nspec=job.nspec,
+        dlf_get_gradient=dlf_get_gradient_wrapper(job.e_g_func),
+        dlf_get_params=make_dlf_get_params(**job.params),
+        blas_threads=blas_threads,
+    )
+
+
+def dl_find_many(
+    jobs: Iterable[Job],
+    n_workers: Optional[int] = None,
+    *,
+    max_pending: Optional[int] = None,
+    mp_context: Optional[BaseContext] = None,
+    return_exceptions: bool = False,
+    blas_threads: Optional[int] = None,
+) -> Iterator[tuple[int, Union[OptimizationResult, DLFindError, None]]]:
+    """Run many independent optimizations in a pool of worker processes.
+
+    Every worker process loads its own copy of the shared library once and then
+    runs jobs one after another, so the global state of DL-FIND is never shared.
+    Jobs are handed out one at a time as workers become free, and results are
+    yielded in the order they finish.
+
+    Args:
+        jobs: Jobs to run. Can be a lazy iterable.
+        n_workers: Number of worker processes. Defaults to the number of CPUs.
+        max_pending: Maximum number of jobs submitted to the pool at any time.
+            Defaults to twice the number of workers.
+        mp_context: Multiprocessing context used to start the workers
+        return_exceptions: Whether to yield the DLFindError of a failed job as
+            its result instead of raising it. The worker process survives the
+            failure either way.
+        blas_threads: Number of threads of the BLAS library in each worker
+            during its runs, e.g., 1 to keep the workers from competing for the
+            cores with BLAS threads
+
+    Yields:
+        Index of the job in jobs and its result
+    """
+    if n_workers is None:
+        n_workers = os.cpu_count() or 1
+    if max_pending is None:
+        max_pending = 2 * n_workers
+
+    jobs_iter = enumerate(jobs)
+    pending: dict[Future, int] = {}
+
+    with ProcessPoolExecutor(
+        max_workers=n_workers, mp_context=mp_context, initializer=_init_worker
+    ) as executor:
+
+        def submit(n: int) -> None:
+            for index, job in itertools.islice(jobs_iter, n):
+                pending[executor.submit(_run_job, job, blas_threads)] = index
+
+        submit(max_pending)
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                error = future.exception()
+                if isinstance(error, DLFindError) and return_exceptions:
+                    yield index, error
+                else:
+                    yield index, future.result()
+            submit(len(done))
@@ -0,0 +1,180 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Compiled analytic test potentials.
+
+The potentials are native functions with the signature of dlf_get_gradient and
+can be passed directly to dl_find, which then calls them without going through
+Python. The parameters of the Lennard-Jones and Morse potentials are global to
+the process.
+"""
+
+from __future__ import annotations
+
+from ctypes import byref, c_double, c_int, cast, POINTER
+from typing import Callable
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from libdlfind.callback import dlf_get_gradient_wrapper
+from libdlfind.function_types import type_dlf_get_gradient
+from libdlfind.lib import lib
+
+muller_brown = cast(lib.potential_muller_brown, type_dlf_get_gradient)
+lennard_jones = cast(lib.potential_lennard_jones, type_dlf_get_gradient)
+morse_chain = cast(lib.potential_morse_chain, type_dlf_get_gradient)
+
+_set_lennard_jones = lib.potential_set_lennard_jones
+_set_lennard_jones.argtypes = [
+    c_double,  # real(c_double), intent(in), value :: epsilon
+    c_double,  # real(c_double), intent(in), value :: sigma
+]
+
+_set_morse = lib.potential_set_morse
+_set_morse.argtypes = [
+    c_double,  # real(c_double), intent(in), value :: d
+    c_double,  # real(c_double), intent(in), value :: a
+    c_double,  # real(c_double), intent(in), value :: r0
+]
+
+
+def set_lennard_jones_parameters(epsilon: float = 1.0, sigma: float = 1.0) -> None:
+    """Set the parameters of the Lennard-Jones potential.
+
+    Args:
+        epsilon: Well depth
+        sigma: Distance where the potential is zero
+    """
+    _set_lennard_jones(epsilon, sigma)
+
+
+def set_morse_parameters(d: float = 1.0, a: float = 1.0, r0: float = 1.0) -> None:
+    """Set the parameters of the Morse potential.
+
+    Args:
+        d: Well depth
+        a: Width parameter
+        r0: Equilibrium distance
+    """
+    _set_morse(d, a, r0)
+
+
+def evaluate(
+    potential: Callable, coordinates: ArrayLike, iimage: int = 1, kiter: int = -1
+) -> tuple[float, NDArray[np.float64]]:
+    """Evaluate a native potential.
+
+    Args:
+        potential: Native potential, e.g., muller_brown
+        coordinates: Coordinates (n_atoms, 3)
+        iimage: Image number passed on to the potential
+        kiter: kiter passed on to the potential
+
+    Returns:
+        energy: Energy
+        gradient: Gradient (n_atoms, 3)
+
+    Raises:
+        ValueError: If the potential returns a non-zero status
+    """
+    coordinates = np.ascontiguousarray(coordinates, dtype=np.float64)
+    gradient = np.empty_like(coordinates)
+    energy = c_double()
+    status = c_int()
+    potential(
+        coordinates.size,
+        coordinates.ctypes.data_as(POINTER(c_double)),
+        byref(energy),
+        gradient.ctypes.data_as(POINTER(c_double)),
+        iimage,
+        kiter,
+        byref(status),
+    )
+    if status.value != 0:
+        raise ValueError(f"Potential returned status {status.value}.")
+    return energy.value, gradient
+
+
+def python_callback(potential: Callable) -> Callable:
+    """Wrap a native potential in an ordinary Python callback.
+
+    The result calls the same compiled code through dlf_get_gradient_wrapper,
+    which is useful for measuring the overhead of Python callbacks.
+
+    Args:
+        potential: Native potential, e.g., muller_brown
+
+    Returns:
+        callback: dlf_get_gradient function for DL-FIND
+    """
+
+    def e_g_func(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        return evaluate(potential, coordinates, iimage, kiter)
+
+    return dlf_get_gradient_wrapper(e_g_func)
+
+
+def lennard_jones_cluster(
+    n_atoms: int, sigma: float = 1.0, seed: int = 0
+) -> NDArray[np.float64]:
+    """Starting coordinates for a Lennard-Jones cluster.
+
+    The atoms are placed on a simple cubic lattice near the minimum of the
+    pair potential and displaced randomly.
+
+    Args:
+        n_atoms: Number of atoms
+        sigma: Lennard-Jones sigma
+        seed: Seed for the random displacements
+
+    Returns:
+        coordinates: Coordinates (n_atoms, 3)
+    """
+    rng = np.random.default_rng(seed)
+    n_side = int(np.ceil(n_atoms ** (1 / 3)))
+    grid = np.indices((n_side, n_side, n_side)).reshape(3, -1).T[:n_atoms]
+    coordinates = np.asarray(grid * 2 ** (1 / 6) * sigma, dtype=np.float64)
+    coordinates += rng.uniform(-0.1, 0.1, size=coordinates.shape) * sigma
+    return coordinates
+
+
+def morse_chain_coordinates(
+    n_atoms: int, r0: float = 1.0, seed: int = 0
+) -> NDArray[np.float64]:
+    """Starting coordinates for a Morse chain.
+
+    The atoms are placed on a zigzag line with bonds stretched from r0 and
+    displaced randomly.
+
+    Args:
+        n_atoms: Number of atoms
+        r0: Morse equilibrium distance
+        seed: Seed for the random displacements
+
+    Returns:
+        coordinates: Coordinates (n_atoms, 3)
+    """
+    rng = np.random.default_rng(seed)
+    coordinates = np.zeros((n_atoms, 3))
+    coordinates[:, 0] = np.arange(n_atoms) * 1.1 * r0
+    coordinates[1::2, 1] = 0.3 * r0
+    coordinates += rng.uniform(-0.05, 0.05, size=coordinates.shape) * r0
+    return coordinates
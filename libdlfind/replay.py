@@ -0,0 +1,670 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Recording and replay of the exchanges with the callbacks of DL-FIND."""
+
+from __future__ import annotations
+
+from _ctypes import CFuncPtr as _CFuncPtr
+from ctypes import c_double, c_int, pointer
+from dataclasses import dataclass, field
+import os
+import struct
+from typing import Any, BinaryIO, Callable, Iterator, Optional, Union
+
+import numpy as np
+from numpy.ctypeslib import as_array
+from numpy.typing import NDArray
+
+from libdlfind.function_types import (
+    type_dlf_get_gradient,
+    type_dlf_get_gradient_batch,
+    type_dlf_get_hessian,
+    type_dlf_get_hessian_batch,
+    type_dlf_get_multistate_gradients,
+    type_dlf_get_params,
+)
+from libdlfind.lib import as_function_pointer
+
+# Start of every log file
+_MAGIC = b"DLFREC\x00\x01"
+
+# Record header: kind and four integers whose meaning depends on the kind
+_HEADER = struct.Struct("<B4i")
+
+# Kinds of records and the callbacks they belong to
+_KINDS = {
+    "dl_find": 5,
+    "dlf_get_params": 0,
+    "dlf_get_gradient": 1,
+    "dlf_get_hessian": 2,
+    "dlf_get_multistate_gradients": 3,
+    "dlf_get_gradient_batch": 4,
+    "dlf_get_hessian_batch": 6,
+}
+_NAMES = {kind: name for name, kind in _KINDS.items()}
+
+_FUNCTION_TYPES = {
+    "dlf_get_params": type_dlf_get_params,
+    "dlf_get_gradient": type_dlf_get_gradient,
+    "dlf_get_hessian": type_dlf_get_hessian,
+    "dlf_get_multistate_gradients": type_dlf_get_multistate_gradients,
+    "dlf_get_gradient_batch": type_dlf_get_gradient_batch,
+    "dlf_get_hessian_batch": type_dlf_get_hessian_batch,
+}
+
+
+@dataclass
+class Exchange:
+    """Recorded call of a callback by DL-FIND.
+
+    Attributes:
+        name: Name of the callback, e.g., dlf_get_gradient
+        values: Integer arguments and the status keyed on argument name
+        arrays: Arrays passed to the callback and filled in by it keyed on
+            argument name. For dlf_get_params, scalars holds the values of all
+            the scalar parameters in the order of the arguments.
+    """
+
+    name: str
+    values: dict[str, int] = field(default_factory=dict)
+    arrays: dict[str, NDArray] = field(default_factory=dict)
+
+
+# Integer arguments in the record header and arrays following it for every kind
+_LAYOUT: dict[str, tuple[tuple[str, ...], Callable[[dict[str, int]], dict]]] = {
+    "dl_find": (("nvarin", "nvarin2", "nspec", "master"), lambda v: {}),
+    "dlf_get_params": (
+        ("nvar", "nvar2", "nspec", "status"),
+        lambda v: {
+            "coords": (np.float64, v["nvar"]),
+            "coords2": (np.float64, v["nvar2"]),
+            "spec": (np.int32, v["nspec"]),
+            "scalars": (np.float64, len(type_dlf_get_params._argtypes_) - 7),
+        },
+    ),
+    "dlf_get_gradient": (
+        ("nvar", "iimage", "kiter", "status"),
+        lambda v: {
+            "coords": (np.float64, v["nvar"]),
+            "energy": (np.float64, 1),
+            "gradient": (np.float64, v["nvar"]),
+        },
+    ),
+    "dlf_get_hessian": (
+        ("nvar", "unused", "unused", "status"),
+        lambda v: {
+            "coords": (np.float64, v["nvar"]),
+            "hessian": (np.float64, v["nvar"] ** 2),
+        },
+    ),
+    "dlf_get_multistate_gradients": (
+        ("nvar", "iimage", "needcoupling", "status"),
+        lambda v: {
+            "coords": (np.float64, v["nvar"]),
+            "energy": (np.float64, 2),
+            "gradient": (np.float64, 2 * v["nvar"]),
+            "coupling": (np.float64, v["nvar"]),
+        },
+    ),
+    "dlf_get_gradient_batch": (
+        ("nvar", "nbatch", "kiter", "status"),
+        lambda v: {
+            "coords": (np.float64, v["nvar"] * v["nbatch"]),
+            "energy": (np.float64, v["nbatch"]),
+            "gradient": (np.float64, v["nvar"] * v["nbatch"]),
+            "iimage": (np.int32, v["nbatch"]),
+        },
+    ),
+    "dlf_get_hessian_batch": (
+        ("nvar", "nbatch", "unused", "status"),
+        lambda v: {
+            "coords": (np.float64, v["nvar"] * v["nbatch"]),
+            "hessian": (np.float64, v["nvar"] ** 2 * v["nbatch"]),
+        },
+    ),
+}
+
+
+def _is_native(callback: Any) -> bool:
+    """Return whether callback is a native function rather than a Python one."""
+    return isinstance(callback, (int, _CFuncPtr)) or isinstance(
+        getattr(callback, "address", None), int
+    )
+
+
+def _read_array(array: pointer, n: int, dtype: type) -> NDArray:
+    """Copy n values from a pointer into a new array."""
+    if n == 0:
+        return np.empty(0, dtype=dtype)
+    return np.array(as_array(array, (n,)), dtype=dtype)
+
+
+def _write_array(array: pointer, values: NDArray) -> None:
+    """Copy values to the memory a pointer points to."""
+    if len(values) > 0:
+        as_array(array, (len(values),))[:] = values
+
+
+def read_exchanges(path: Union[str, os.PathLike]) -> Iterator[Exchange]:
+    """Read the exchanges recorded by a CallbackRecorder.
+
+    Args:
+        path: Log file
+
+    Yields:
+        Exchanges in the order they were made
+
+    Raises:
+        ValueError: If the file is not a log of a CallbackRecorder
+    """
+    with open(path, "rb") as f:
+        if f.read(len(_MAGIC)) != _MAGIC:
+            raise ValueError(f"{path} is not a log of a CallbackRecorder.")
+        while header := f.read(_HEADER.size):
+            kind, *integers = _HEADER.unpack(header)
+            name = _NAMES[kind]
+            keys, layout = _LAYOUT[name]
+            values = {
+                key: value for key, value in zip(keys, integers) if key != "unused"
+            }
+            arrays = {}
+            for key, (dtype, n) in layout(values).items():
+                arrays[key] = np.frombuffer(
+                    f.read(n * np.dtype(dtype).itemsize), dtype=dtype
+                ).copy()
+            yield Exchange(name, values, arrays)
+
+
+class CallbackRecorder:
+    """Record every exchange between DL-FIND and its callbacks to a log file.
+
+    The coordinates passed to dlf_get_gradient, dlf_get_hessian,
+    dlf_get_multistate_gradients, dlf_get_gradient_batch and
+    dlf_get_hessian_batch are written
+    together with the results and the status returned, as well as all the
+    parameters set by dlf_get_params. CallbackReplayer can then run DL-FIND
+    again with the recorded results, without the original energy function.
+
+    The log is a compact binary file of fixed-size record headers followed by
+    the raw arrays. It can be read with read_exchanges.
+
+    Args:
+        path: Log file to write. Replaced if it exists.
+    """
+
+    def __init__(self, path: Union[str, os.PathLike]) -> None:
+        self.path = path
+        self._file: Optional[BinaryIO] = open(path, "wb")
+        self._file.write(_MAGIC)
+
+    def __enter__(self) -> CallbackRecorder:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Close the log file."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write(self, exchange: Exchange) -> None:
+        """Append exchange to the log."""
+        if self._file is None:
+            raise ValueError("The recorder has been closed.")
+        keys, layout = _LAYOUT[exchange.name]
+        integers = [exchange.values.get(key, 0) for key in keys]
+        self._file.write(_HEADER.pack(_KINDS[exchange.name], *integers))
+        for key, (dtype, n) in layout(exchange.values).items():
+            self._file.write(
+                np.ascontiguousarray(exchange.arrays[key], dtype).tobytes()
+            )
+
+    def wrap(
+        self,
+        nvarin: int,
+        nvarin2: int = 0,
+        nspec: Optional[int] = None,
+        master: int = 1,
+        **kwargs: Any,
+    ) -> dict[str, Any]:
+        """Wrap the arguments of dl_find so that the exchanges are recorded.
+
+        The callbacks can be given as to dl_find, also as native functions.
+        Python callbacks are called directly, so that exceptions they raise
+        reach dl_find and are reported as a DLFindError, and the failed call is
+        recorded with a non-zero status. Callbacks that are not recorded, e.g.,
+        dlf_put_coords, and other keyword arguments are returned unchanged.
+        Records one run.
+
+        Args:
+            nvarin: Number of variables to read for the coords array
+            nvarin2: Number of variables to read for the coords2 array
+            nspec: Number of values in the integer array spec
+            master: 1 if this task is the master of a parallel run, 0 otherwise
+            **kwargs: Keyword arguments of dl_find
+
+        Returns:
+            kwargs: Arguments to pass to dl_find
+        """
+        self._write(
+            Exchange(
+                "dl_find",
+                {
+                    "nvarin": nvarin,
+                    "nvarin2": nvarin2,
+                    "nspec": nspec if nspec is not None else -1,
+                    "master": master,
+                },
+            )
+        )
+        wrapped = {
+            "nvarin": nvarin,
+            "nvarin2": nvarin2,
+            "nspec": nspec,
+            "master": master,
+        }
+        for name, callback in kwargs.items():
+            if name in _FUNCTION_TYPES and callback is not None:
+                if _is_native(callback):
+                    callback = as_function_pointer(callback, _FUNCTION_TYPES[name])
+                wrapped[name] = getattr(self, f"_record_{name[4:]}")(callback)
+            else:
+                wrapped[name] = callback
+        return wrapped
+
+    def _record_get_params(self, callback: Callable) -> Callable:
+        """Wrap dlf_get_params."""
+
+        def dlf_get_params(nvar: int, nvar2: int, nspec: int, *args: pointer) -> None:
+            coords, coords2, spec, ierr, *scalars = args
+            ierr[0] = c_int(1)
+            try:
+                callback(nvar, nvar2, nspec, *args)
+            finally:
+                self._write(
+                    Exchange(
+                        "dlf_get_params",
+                        {
+                            "nvar": nvar,
+                            "nvar2": nvar2,
+                            "nspec": nspec,
+                            "status": ierr[0],
+                        },
+                        {
+                            "coords": _read_array(coords, nvar, np.float64),
+                            "coords2": _read_array(coords2, nvar2, np.float64),
+                            "spec": _read_array(spec, nspec, np.int32),
+                            "scalars": np.array([scalar[0] for scalar in scalars]),
+                        },
+                    )
+                )
+
+        return dlf_get_params
+
+    def _record_get_gradient(self, callback: Callable) -> Callable:
+        """Wrap dlf_get_gradient."""
+
+        def dlf_get_gradient(
+            nvar: int,
+            coords: pointer[c_double],
+            energy: pointer[c_double],
+            gradient: pointer[c_double],
+            iimage: int,
+            kiter: int,
+            status: pointer[c_int],
+        ) -> None:
+            coordinates = _read_array(coords, nvar, np.float64)
+            status[0] = c_int(1)
+            try:
+                callback(nvar, coords, energy, gradient, iimage, kiter, status)
+            finally:
+                self._write(
+                    Exchange(
+                        "dlf_get_gradient",
+                        {
+                            "nvar": nvar,
+                            "iimage": iimage,
+                            "kiter": kiter,
+                            "status": status[0],
+                        },
+                        {
+                            "coords": coordinates,
+                            "energy": np.array([energy[0]]),
+                            "gradient": _read_array(gradient, nvar, np.float64),
+                        },
+                    )
+                )
+
+        return dlf_get_gradient
+
+    def _record_get_hessian(self, callback: Callable) -> Callable:
+        """Wrap dlf_get_hessian."""
+
+        def dlf_get_hessian(
+            nvar: int,
+            coords: pointer[c_double],
+            hessian: pointer[c_double],
+            status: pointer[c_int],
+        ) -> None:
+            coordinates = _read_array(coords, nvar, np.float64)
+            status[0] = c_int(1)
+            try:
+                callback(nvar, coords, hessian, status)
+            finally:
+                self._write(
+                    Exchange(
+                        "dlf_get_hessian",
+                        {"nvar": nvar, "status": status[0]},
+                        {
+                            "coords": coordinates,
+                            "hessian": _read_array(hessian, nvar**2, np.float64),
+                        },
+                    )
+                )
+
+        return dlf_get_hessian
+
+    def _record_get_multistate_gradients(self, callback: Callable) -> Callable:
+        """Wrap dlf_get_multistate_gradients."""
+
+        def dlf_get_multistate_gradients(
+            nvar: int,
+            coords: pointer[c_double],
+            energy: pointer[c_double],
+            gradient: pointer[c_double],
+            coupling: pointer[c_double],
+            needcoupling: int,
+            iimage: int,
+            status: pointer[c_int],
+        ) -> None:
+            coordinates = _read_array(coords, nvar, np.float64)
+            status[0] = c_int(1)
+            try:
+                callback(
+                    nvar,
+                    coords,
+                    energy,
+                    gradient,
+                    coupling,
+                    needcoupling,
+                    iimage,
+                    status,
+                )
+            finally:
+                self._write(
+                    Exchange(
+                        "dlf_get_multistate_gradients",
+                        {
+                            "nvar": nvar,
+                            "iimage": iimage,
+                            "needcoupling": needcoupling,
+                            "status": status[0],
+                        },
+                        {
+                            "coords": coordinates,
+                            "energy": _read_array(energy, 2, np.float64),
+                            "gradient": _read_array(gradient, 2 * nvar, np.float64),
+                            "coupling": _read_array(coupling, nvar, np.float64),
+                        },
+                    )
+                )
+
+        return dlf_get_multistate_gradients
+
+    def _record_get_gradient_batch(self, callback: Callable) -> Callable:
+        """Wrap dlf_get_gradient_batch."""
+
+        def dlf_get_gradient_batch(
+            nvar: int,
+            nbatch: int,
+            coords: pointer[c_double],
+            energy: pointer[c_double],
+            gradient: pointer[c_double],
+            iimage: pointer[c_int],
+            kiter: int,
+            status: pointer[c_int],
+        ) -> None:
+            coordinates = _read_array(coords, nvar * nbatch, np.float64)
+            status[0] = c_int(1)
+            try:
+                callback(nvar, nbatch, coords, energy, gradient, iimage, kiter, status)
+            finally:
+                self._write(
+                    Exchange(
+                        "dlf_get_gradient_batch",
+                        {
+                            "nvar": nvar,
+                            "nbatch": nbatch,
+                            "kiter": kiter,
+                            "status": status[0],
+                        },
+                        {
+                            "coords": coordinates,
+                            "energy": _read_array(energy, nbatch, np.float64),
+                            "gradient": _read_array(
+                                gradient, nvar * nbatch, np.float64
+                            ),
+                            "iimage": _read_array(iimage, nbatch, np.int32),
+                        },
+                    )
+                )
+
+        return dlf_get_gradient_batch
+
+    def _record_get_hessian_batch(self, callback: Callable) -> Callable:
+        """Wrap dlf_get_hessian_batch."""
+
+        def dlf_get_hessian_batch(
+            nvar: int,
+            nbatch: int,
+            coords: pointer[c_double],
+            hessian: pointer[c_double],
+            status: pointer[c_int],
+        ) -> None:
+            coordinates = _read_array(coords, nvar * nbatch, np.float64)
+            status[0] = c_int(1)
+            try:
+                callback(nvar, nbatch, coords, hessian, status)
+            finally:
+                self._write(
+                    Exchange(
+                        "dlf_get_hessian_batch",
+                        {"nvar": nvar, "nbatch": nbatch, "status": status[0]},
+                        {
+                            "coords": coordinates,
+                            "hessian": _read_array(
+                                hessian, nvar**2 * nbatch, np.float64
+                            ),
+                        },
+                    )
+                )
+
+        return dlf_get_hessian_batch
+
+
+class CallbackReplayer:
+    """Run DL-FIND again with the exchanges recorded by a CallbackRecorder.
+
+    The callbacks serve the recorded parameters and results in the order they
+    were recorded, so that DL-FIND repeats the recorded run exactly without
+    the original energy function. Every call is checked against the
+    recording, and a RuntimeError is raised in the callback if the run
+    diverges from it, which DL-FIND reports as a DLFindError.
+
+    Args:
+        path: Log file written by a CallbackRecorder
+        atol: Tolerance for the coordinates passed by DL-FIND to differ from
+            the recorded ones
+
+    Raises:
+        ValueError: If the file is not a log of a CallbackRecorder
+
+    Attributes:
+        arguments: Integer arguments of the recorded call of dl_find
+        exchanges: Recorded exchanges with the callbacks
+        n_replayed: Number of exchanges replayed so far
+    """
+
+    def __init__(self, path: Union[str, os.PathLike], atol: float = 1e-10) -> None:
+        exchanges = list(read_exchanges(path))
+        if not exchanges or exchanges[0].name != "dl_find":
+            raise ValueError(f"{path} does not start with the arguments of dl_find.")
+        self.arguments = exchanges[0].values
+        self.exchanges = exchanges[1:]
+        self.atol = atol
+        self.n_replayed = 0
+
+    def dl_find_kwargs(self) -> dict[str, Any]:
+        """Arguments for dl_find to replay the recorded run.
+
+        Also starts the replay from the beginning.
+
+        Returns:
+            kwargs: nvarin, nvarin2, nspec, master and the callbacks that
+                appear in the recording
+        """
+        self.n_replayed = 0
+        nspec = self.arguments["nspec"]
+        kwargs: dict[str, Any] = {
+            "nvarin": self.arguments["nvarin"],
+            "nvarin2": self.arguments["nvarin2"],
+            "nspec": nspec if nspec >= 0 else None,
+            "master": self.arguments["master"],
+        }
+        for name in sorted({e.name for e in self.exchanges}):
+            kwargs[name] = getattr(self, name)
+        return kwargs
+
+    def _next(self, name: str, coords: Optional[NDArray] = None) -> Exchange:
+        """Return the next exchange, checking that it matches the call."""
+        if self.n_replayed >= len(self.exchanges):
+            raise RuntimeError(
+                f"Call of {name} after all {len(self.exchanges)} recorded exchanges."
+            )
+        exchange = self.exchanges[self.n_replayed]
+        if exchange.name != name:
+            raise RuntimeError(
+                f"Exchange {self.n_replayed} was recorded for {exchange.name}, "
+                f"not {name}."
+            )
+        if coords is not None and not (
+            coords.shape == exchange.arrays["coords"].shape
+            and np.allclose(coords, exchange.arrays["coords"], rtol=0, atol=self.atol)
+        ):
+            raise RuntimeError(
+                f"Coordinates of exchange {self.n_replayed} ({name}) differ from "
+                "the recording."
+            )
+        self.n_replayed += 1
+        return exchange
+
+    def dlf_get_params(self, nvar: int, nvar2: int, nspec: int, *args: pointer) -> None:
+        """Set the recorded parameters, with the signature of dlf_get_params."""
+        exchange = self._next("dlf_get_params")
+        coords, coords2, spec, ierr, *scalars = args
+        _write_array(coords, exchange.arrays["coords"])
+        _write_array(coords2, exchange.arrays["coords2"])
+        _write_array(spec, exchange.arrays["spec"])
+        for scalar, value in zip(scalars, exchange.arrays["scalars"]):
+            scalar[0] = int(value) if scalar._type_ is c_int else float(value)
+        ierr[0] = c_int(exchange.values["status"])
+
+    def dlf_get_gradient(
+        self,
+        nvar: int,
+        coords: pointer[c_double],
+        energy: pointer[c_double],
+        gradient: pointer[c_double],
+        iimage: int,
+        kiter: int,
+        status: pointer[c_int],
+    ) -> None:
+        """Return the recorded result, with the signature of dlf_get_gradient."""
+        exchange = self._next("dlf_get_gradient", _read_array(coords, nvar, np.float64))
+        energy[0] = c_double(exchange.arrays["energy"][0])
+        _write_array(gradient, exchange.arrays["gradient"])
+        status[0] = c_int(exchange.values["status"])
+
+    def dlf_get_hessian(
+        self,
+        nvar: int,
+        coords: pointer[c_double],
+        hessian: pointer[c_double],
+        status: pointer[c_int],
+    ) -> None:
+        """Return the recorded result, with the signature of dlf_get_hessian."""
+        exchange = self._next("dlf_get_hessian", _read_array(coords, nvar, np.float64))
+        _write_array(hessian, exchange.arrays["hessian"])
+        status[0] = c_int(exchange.values["status"])
+
+    def dlf_get_multistate_gradients(
+        self,
+        nvar: int,
+        coords: pointer[c_double],
+        energy: pointer[c_double],
+        gradient: pointer[c_double],
+        coupling: pointer[c_double],
+        needcoupling: int,
+        iimage: int,
+        status: pointer[c_int],
+    ) -> None:
+        """Return the recorded result, like dlf_get_multistate_gradients."""
+        exchange = self._next(
+            "dlf_get_multistate_gradients", _read_array(coords, nvar, np.float64)
+        )
+        _write_array(energy, exchange.arrays["energy"])
+        _write_array(gradient, exchange.arrays["gradient"])
+        _write_array(coupling, exchange.arrays["coupling"])
+        status[0] = c_int(exchange.values["status"])
+
+    def dlf_get_gradient_batch(
+        self,
+        nvar: int,
+        nbatch: int,
+        coords: pointer[c_double],
+        energy: pointer[c_double],
+        gradient: pointer[c_double],
+        iimage: pointer[c_int],
+        kiter: int,
+        status: pointer[c_int],
+    ) -> None:
+        """Return the recorded results, like dlf_get_gradient_batch."""
+        exchange = self._next(
+            "dlf_get_gradient_batch", _read_array(coords, nvar * nbatch, np.float64)
+        )
+        _write_array(energy, exchange.arrays["energy"])
+        _write_array(gradient, exchange.arrays["gradient"])
+        status[0] = c_int(exchange.values["status"])
+
+    def dlf_get_hessian_batch(
+        self,
+        nvar: int,
+        nbatch: int,
+        coords: pointer[c_double],
+        hessian: pointer[c_double],
+        status: pointer[c_int],
+    ) -> None:
+        """Return the recorded Hessians, like dlf_get_hessian_batch."""
+        exchange = self._next(
+            "dlf_get_hessian_batch", _read_array(coords, nvar * nbatch, np.float64)
+        )
+        _write_array(hessian, exchange.arrays["hessian"])
+        status[0] = c_int(exchange.values["status"])
@@ -0,0 +1,192 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Results of optimizations."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import Optional
+
+import numpy as np
+from numpy.typing import NDArray
+
+
+@dataclass
+class RunStatistics:
+    """Timers and counters of a DL-FIND run.
+
+    The clocks of DL-FIND are total, energy_and_gradient, step_direction,
+    coordinates (coordinate transformations, e.g., HDLC), checkpoint and xyz.
+    The time of energy_and_gradient includes the time spent in the callbacks,
+    so the time of dlf_get_gradient in callback_wall_time is the part of it
+    spent in Python, and the remainder is the overhead of libdlfind and ctypes.
+
+    Attributes:
+        cpu_time: Accumulated CPU time of each clock of DL-FIND (s)
+        wall_time: Accumulated wall time of each clock of DL-FIND (s)
+        callback_wall_time: Wall time spent in each Python callback (s). Native
+            callbacks are not timed.
+        callback_calls: Number of calls of each Python callback
+        n_energy_evaluations: Number of energy evaluations
+        n_cycles: Number of optimization cycles
+        n_accepted: Number of accepted steps
+        n_micro_cycles: Number of microiterative cycles
+        n_micro_accepted: Number of accepted microiterative steps
+    """
+
+    cpu_time: dict[str, float]
+    wall_time: dict[str, float]
+    callback_wall_time: dict[str, float] = field(default_factory=dict)
+    callback_calls: dict[str, int] = field(default_factory=dict)
+    n_energy_evaluations: int = 0
+    n_cycles: int = 0
+    n_accepted: int = 0
+    n_micro_cycles: int = 0
+    n_micro_accepted: int = 0
+
+
+@dataclass
+class ConvergenceState:
+    """Progress of a DL-FIND run towards convergence.
+
+    The values are those of the last convergence test of DL-FIND, which is
+    made after every cycle. For methods with microiterations or a dimer, it can
+    be the test of the microiterations or of the dimer midpoint. The criteria
+    of the maximum gradient, RMS gradient, maximum step and RMS step follow
+    from the tolerance parameter.
+
+    Attributes:
+        n_cycles: Number of optimization cycles so far
+        n_energy_evaluations: Number of energy evaluations so far, including one
+            in progress
+        max_gradient: Maximum gradient component, or None before the first test
+        rms_gradient: RMS gradient, or None before the first test
+        max_step: Maximum step component, or None before the first test
+        rms_step: RMS step, or None before the first test
+        energy_change: Change in energy since the last test, or None if not
+            tested
+        tolerance: Convergence criterion of the maximum gradient
+        tolerance_rms_gradient: Convergence criterion of the RMS gradient
+        tolerance_step: Convergence criterion of the maximum step
+        tolerance_rms_step: Convergence criterion of the RMS step
+        tolerance_energy: Convergence criterion of the energy change
+    """
+
+    n_cycles: int
+    n_energy_evaluations: int
+    max_gradient: Optional[float]
+    rms_gradient: Optional[float]
+    max_step: Optional[float]
+    rms_step: Optional[float]
+    energy_change: Optional[float]
+    tolerance: float
+    tolerance_rms_gradient: float
+    tolerance_step: float
+    tolerance_rms_step: float
+    tolerance_energy: float
+
+    @property
+    def gradient_ratio(self) -> Optional[float]:
+        """Maximum gradient relative to its criterion, or None before the first test.
+
+        Above 1 far from convergence and below 1 once the gradient criterion
+        is met.
+        """
+        if self.max_gradient is None:
+            return None
+        return self.max_gradient / self.tolerance
+
+
+@dataclass
+class BLASInfo:
+    """BLAS library that DL-FIND is linked against.
+
+    Attributes:
+        vendor: OpenBLAS, MKL, FlexiBLAS, BLIS, reference for other libraries or
+            unknown if the library could not be found, e.g., when linked
+            statically
+        library: Path of the library, or an empty string if unknown
+        num_threads: Number of threads the library uses, or None if it cannot
+            be controlled
+    """
+
+    vendor: str
+    library: str
+    num_threads: Optional[int]
+
+
+@dataclass
+class OptimizerState:
+    """State of the optimizer in DL-FIND's internal coordinates.
+
+    Taken at the end of a run and given to dl_find as initial_state to start a
+    related run from it, e.g., the next geometry of a scan. The internal
+    coordinates must be the same in both runs, which holds for Cartesians and
+    for HDLC or DLC of the same system and connectivity. Frozen atoms and
+    constraints change the number of coordinates.
+
+    Attributes:
+        hessian: Hessian of the Hessian-based optimizers, e.g., P-RFO, (n, n),
+            or None if the optimizer had none
+        lbfgs_steps: Steps in the L-BFGS memory, oldest first, (n_pairs, n), or
+            None if L-BFGS was not used
+        lbfgs_gradient_differences: Gradient differences belonging to the
+            steps, (n_pairs, n), or None if L-BFGS was not used
+    """
+
+    hessian: Optional[NDArray[np.float64]] = None
+    lbfgs_steps: Optional[NDArray[np.float64]] = None
+    lbfgs_gradient_differences: Optional[NDArray[np.float64]] = None
+
+
+@dataclass
+class OptimizationResult:
+    """Final state of a DL-FIND run, read from DL-FIND after the run.
+
+    The coordinates, energy and gradient are those of the last energy evaluation
+    through dlf_get_gradient, which is the final geometry of a converged
+    optimization. Displaced geometries of finite-difference Hessians are not
+    counted as the last energy evaluation. For NEB, they belong to the image
+    that was calculated last.
+
+    Attributes:
+        coordinates: Coordinates of the last energy evaluation (n_atoms, 3)
+        energy: Energy of the last energy evaluation
+        gradient: Gradient of the last energy evaluation (n_atoms, 3)
+        n_energy_evaluations: Number of energy evaluations
+        n_cycles: Number of optimization cycles
+        n_accepted: Number of accepted steps
+        converged: Whether the run converged
+        statistics: Timers and counters of the run
+        stop_reason: Why the run was stopped before it converged: "cancelled",
+            "time_limit" or "early_stop", or None if it was not
+        optimizer_state: Hessian or L-BFGS memory at the end of the run, or
+            None if the optimizer kept neither
+    """
+
+    coordinates: NDArray[np.float64]
+    energy: float
+    gradient: NDArray[np.float64]
+    n_energy_evaluations: int
+    n_cycles: int
+    n_accepted: int
+    converged: bool
+    statistics: Optional[RunStatistics] = None
+    stop_reason: Optional[str] = None
+    optimizer_state: Optional[OptimizerState] = None
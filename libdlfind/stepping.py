@@ -0,0 +1,422 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Ask/tell interface where the caller evaluates the energies."""
+
+from __future__ import annotations
+
+import asyncio
+from ctypes import c_double, c_int, pointer
+from dataclasses import dataclass
+import multiprocessing
+from multiprocessing.connection import Connection
+from multiprocessing.context import BaseContext
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Union
+
+import numpy as np
+from numpy.ctypeslib import as_array
+from numpy.typing import ArrayLike, NDArray
+
+from libdlfind.callback import make_dlf_get_params
+from libdlfind.lib import DLFindError
+from libdlfind.result import OptimizationResult
+
+
+@dataclass
+class GradientRequest:
+    """Geometry for which DL-FIND requests the energy and gradient.
+
+    Attributes:
+        coordinates: Coordinates (n_atoms, 3)
+        iimage: Current image (for NEB)
+        kiter: Flag related to microiterations
+    """
+
+    coordinates: NDArray[np.float64]
+    iimage: int
+    kiter: int
+
+
+def _optimize(
+    conn: Connection, params: dict[str, Any], nvarin2: int, nspec: Optional[int]
+) -> None:
+    """Run DL-FIND, passing every energy evaluation on through conn."""
+    from libdlfind.lib import dl_find
+
+    def dlf_get_gradient(
+        nvar: int,
+        coords: pointer[c_double],
+        energy: pointer[c_double],
+        gradient: pointer[c_double],
+        iimage: int,
+        kiter: int,
+        status: pointer[c_int],
+    ) -> None:
+        conn.send(("request", np.array(as_array(coords, (nvar,))), iimage, kiter))
+        message = conn.recv()
+        if message[0] == "tell":
+            energy[0] = c_double(message[1])
+            as_array(gradient, (nvar,))[:] = message[2]
+            status[0] = c_int(0)
+        else:
+            status[0] = c_int(message[1])
+
+    coords = np.ascontiguousarray(params["coords"], dtype=np.float64)
+    try:
+        result = dl_find(
+            nvarin=coords.size,
+            nvarin2=nvarin2,
+            nspec=nspec,
+            dlf_get_gradient=dlf_get_gradient,
+            dlf_get_params=make_dlf_get_params(**params),
+        )
+    except DLFindError as e:
+        conn.send(("error", e))
+    else:
+        conn.send(("result", result))
+
+
+def _run_worker(conn: Connection) -> None:
+    """Run the optimizations received through conn one after the other."""
+    try:
+        while True:
+            job = conn.recv()
+            if job is None:
+                break
+            _optimize(conn, *job)
+    finally:
+        conn.close()
+
+
+class _Worker:
+    """Worker process that runs one optimization after the other.
+
+    Args:
+        mp_context: Multiprocessing context used to start the process
+    """
+
+    def __init__(self, mp_context: BaseContext) -> None:
+        self.conn, worker_conn = mp_context.Pipe()
+        self.process = mp_context.Process(
+            target=_run_worker, args=(worker_conn,), daemon=True
+        )
+        self.process.start()
+        worker_conn.close()
+
+    def start(self, params: dict[str, Any], nvarin2: int, nspec: Optional[int]) -> None:
+        """Start an optimization. The previous one must have finished."""
+        self.conn.send((params, nvarin2, nspec))
+
+    def close(self, finished: bool = True) -> None:
+        """Stop the process, terminating it if an optimization is running."""
+        if self.process.is_alive():
+            if finished:
+                self.conn.send(None)
+            else:
+                self.process.terminate()
+        self.process.join()
+        self.conn.close()
+
+
+class SteppingOptimizer:
+    """Optimization driven by the caller with ask and tell.
+
+    Instead of DL-FIND calling a function for every energy evaluation, ask
+    returns the next geometry to evaluate and tell passes its energy and
+    gradient back. The optimizer state of DL-FIND is global to a process, so
+    every SteppingOptimizer runs DL-FIND in its own worker process. Many of them
+    can be advanced from one thread, e.g., with ask_async on an event loop.
+    dl_find_batched reuses the worker processes for the next optimizations.
+
+    Args:
+        params: Keyword arguments for make_dlf_get_params. Must contain coords.
+            Sent to the worker process and must therefore be picklable.
+        nvarin2: Number of variables to read for the coords2 array
+        nspec: Number of values in the integer array spec
+        mp_context: Multiprocessing context used to start the worker
+
+    Attributes:
+        result: Result of the optimization once it has finished. None if no
+            energy evaluation was recorded.
+        done: Whether the optimization has finished
+    """
+
+    def __init__(
+        self,
+        params: dict[str, Any],
+        *,
+        nvarin2: int = 0,
+        nspec: Optional[int] = None,
+        mp_context: Optional[BaseContext] = None,
+    ) -> None:
+        if mp_context is None:
+            mp_context = multiprocessing.get_context()
+        self._start(_Worker(mp_context), params, nvarin2, nspec, owns_worker=True)
+
+    @classmethod
+    def _on_worker(cls, worker: _Worker, params: dict[str, Any]) -> SteppingOptimizer:
+        """Run the optimization on an idle worker that outlives it."""
+        optimizer = cls.__new__(cls)
+        optimizer._start(worker, params, 0, None, owns_worker=False)
+        return optimizer
+
+    def _start(
+        self,
+        worker: _Worker,
+        params: dict[str, Any],
+        nvarin2: int,
+        nspec: Optional[int],
+        owns_worker: bool,
+    ) -> None:
+        """Start the optimization on worker."""
+        self._n_atoms = np.size(params["coords"]) // 3
+        self._worker = worker
+        self._owns_worker = owns_worker
+        self._conn = worker.conn
+        worker.start(params, nvarin2, nspec)
+        self._request: Optional[GradientRequest] = None
+        self._error: Optional[DLFindError] = None
+        self.result: Optional[OptimizationResult] = None
+        self.done = False
+
+    def __enter__(self) -> SteppingOptimizer:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def ask(self) -> Optional[GradientRequest]:
+        """Return the next geometry to evaluate, waiting for DL-FIND if needed.
+
+        Returns the same request again until it has been answered with tell.
+
+        Returns:
+            request: Geometry to evaluate, or None if the optimization has
+                finished
+
+        Raises:
+            DLFindError: If DL-FIND failed
+        """
+        if self._request is None and not self.done:
+            message = self._conn.recv()
+            if message[0] == "request":
+                coords, iimage, kiter = message[1:]
+                self._request = GradientRequest(
+                    coords.reshape(self._n_atoms, 3), iimage, kiter
+                )
+            else:
+                self.done = True
+                if message[0] == "result":
+                    self.result = message[1]
+                else:
+                    self._error = message[1]
+                self.close()
+        if self._error is not None:
+            raise self._error
+        return self._request
+
+    async def ask_async(self) -> Optional[GradientRequest]:
+        """Return the next geometry to evaluate without blocking the event loop.
+
+        Returns:
+            request: Geometry to evaluate, or None if the optimization has
+                finished
+
+        Raises:
+            DLFindError: If DL-FIND failed
+        """
+        if self._request is None and not self.done and not self._conn.poll():
+            loop = asyncio.get_running_loop()
+            ready = loop.create_future()
+            fd = self._conn.fileno()
+
+            def set_ready() -> None:
+                if not ready.done():
+                    ready.set_result(None)
+
+            try:
+                loop.add_reader(fd, set_ready)
+            except NotImplementedError:
+                # Event loops without add_reader, e.g., on Windows
+                await loop.run_in_executor(None, self._conn.poll, None)
+            else:
+                try:
+                    await ready
+                finally:
+                    loop.remove_reader(fd)
+        return self.ask()
+
+    def tell(self, energy: float, gradient: ArrayLike) -> None:
+        """Pass the energy and gradient of the requested geometry to DL-FIND.
+
+        Args:
+            energy: Energy
+            gradient: Gradient (n_atoms, 3)
+
+        Raises:
+            RuntimeError: If no geometry has been requested
+        """
+        self._answer(("tell", float(energy), np.ravel(gradient).astype(np.float64)))
+
+    def fail(self, status: int = 1) -> None:
+        """Report that the requested geometry could not be evaluated.
+
+        DL-FIND then fails, and the next call to ask raises DLFindError.
+
+        Args:
+            status: Non-zero status passed to DL-FIND
+
+        Raises:
+            RuntimeError: If no geometry has been requested
+        """
+        self._answer(("fail", status))
+
+    def _answer(self, message: tuple) -> None:
+        """Send the answer to the current request."""
+        if self._request is None:
+            raise RuntimeError("No geometry has been requested, call ask first.")
+        self._conn.send(message)
+        self._request = None
+
+    def close(self) -> None:
+        """Stop the worker process, also if the optimization has not finished.
+
+        A worker shared with other optimizations is only stopped if the
+        optimization has not finished.
+        """
+        if self._owns_worker or not self.done:
+            self._worker.close(finished=self.done)
+
+
+def _collect_requests(
+    optimizers: dict[int, SteppingOptimizer],
+    jobs: Iterator[tuple[int, dict[str, Any]]],
+    workers: list[_Worker],
+    batch_size: int,
+    mp_context: BaseContext,
+    batch: list[tuple[int, GradientRequest]],
+    return_exceptions: bool,
+) -> Iterator[tuple[int, Union[OptimizationResult, DLFindError, None]]]:
+    """Ask all optimizations for a geometry, starting new ones as others finish.
+
+    New optimizations run on the workers of finished ones. Workers are only
+    started until there are batch_size of them.
+    """
+    to_ask = list(optimizers)
+    idle = [
+        worker
+        for worker in workers
+        if all(optimizer._worker is not worker for optimizer in optimizers.values())
+    ]
+    while to_ask or len(optimizers) < batch_size:
+        if not to_ask:
+            job = next(jobs, None)
+            if job is None:
+                return
+            if not idle:
+                workers.append(_Worker(mp_context))
+                idle.append(workers[-1])
+            index, job_params = job
+            optimizers[index] = SteppingOptimizer._on_worker(idle.pop(), job_params)
+            to_ask.append(index)
+        index = to_ask.pop(0)
+        optimizer = optimizers[index]
+        try:
+            request = optimizer.ask()
+        except DLFindError as e:
+            del optimizers[index]
+            idle.append(optimizer._worker)
+            if not return_exceptions:
+                raise
+            yield index, e
+            continue
+        if request is None:
+            del optimizers[index]
+            idle.append(optimizer._worker)
+            yield index, optimizer.result
+        else:
+            batch.append((index, request))
+
+
+def dl_find_batched(
+    params: Iterable[dict[str, Any]],
+    batched_energy_gradient: Callable[
+        [list[NDArray[np.float64]]], tuple[Sequence[float], Sequence[ArrayLike]]
+    ],
+    batch_size: int = 256,
+    *,
+    mp_context: Optional[BaseContext] = None,
+    return_exceptions: bool = False,
+) -> Iterator[tuple[int, Union[OptimizationResult, DLFindError, None]]]:
+    """Run many optimizations in lockstep, evaluating their gradients in batches.
+
+    Up to batch_size optimizations are run at a time, each as a
+    SteppingOptimizer on one of up to batch_size long-lived worker processes.
+    In every round, the geometries requested by all of them
+    are collected and evaluated with one call to batched_energy_gradient. When
+    an optimization finishes, the next one is started on its worker in the same
+    round so that the batches stay full until the jobs run out. Results are yielded in the
+    order the optimizations finish.
+
+    Args:
+        params: Keyword arguments for make_dlf_get_params for every
+            optimization. Must contain coords. Can be a lazy iterable.
+        batched_energy_gradient: Function taking a list of coordinates (n_atoms,
+            3) and returning the energies and the gradients (n_atoms, 3) of them
+        batch_size: Maximum number of optimizations running at the same time,
+            and thereby geometries per batch
+        mp_context: Multiprocessing context used to start the worker processes
+        return_exceptions: Whether to yield the DLFindError of a failed
+            optimization as its result instead of raising it
+
+    Yields:
+        Index of the optimization in params and its result
+
+    Raises:
+        ValueError: If batch_size is not positive
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be positive.")
+    if mp_context is None:
+        mp_context = multiprocessing.get_context()
+    jobs = enumerate(params)
+    workers: list[_Worker] = []
+    optimizers: dict[int, SteppingOptimizer] = {}
+    try:
+        while True:
+            batch: list[tuple[int, GradientRequest]] = []
+            yield from _collect_requests(
+                optimizers,
+                jobs,
+                workers,
+                batch_size,
+                mp_context,
+                batch,
+                return_exceptions,
+            )
+            if not batch:
+                break
+            energies, gradients = batched_energy_gradient(
+                [request.coordinates for _, request in batch]
+            )
+            for (index, _), energy, gradient in zip(batch, energies, gradients):
+                optimizers[index].tell(energy, gradient)
+    finally:
+        busy = [optimizer._worker for optimizer in optimizers.values()]
+        for worker in workers:
+            worker.close(finished=worker not in busy)
@@ -0,0 +1,366 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Surrogate models of the energy for saving energy evaluations."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Optional
+
+import numpy as np
+from numpy.typing import ArrayLike, NDArray
+
+from libdlfind.callback import dlf_get_gradient_wrapper, make_dlf_get_params
+from libdlfind.lib import dl_find
+from libdlfind.result import OptimizationResult
+
+# Default convergence criterion of DL-FIND
+_DEFAULT_TOLERANCE = 4.5e-4
+# Criterion of the runs on the model relative to that of the optimization
+_MODEL_TOLERANCE = 0.1
+
+
+class _GaussianProcess:
+    """Gaussian process regression on energies and gradients.
+
+    Uses a Matern 5/2 kernel and a constant prior mean equal to the highest
+    energy seen, so that the model rises away from the data instead of
+    inventing minima there.
+    """
+
+    def __init__(
+        self,
+        points: NDArray[np.float64],
+        energies: NDArray[np.float64],
+        gradients: NDArray[np.float64],
+        length_scale: float,
+        variance: Optional[float],
+        noise: float,
+    ) -> None:
+        n_points, n_dims = points.shape
+        self.points = points
+        self.length_scale = length_scale
+        self.prior = float(np.max(energies))
+        if variance is None:
+            # Scale of the energy variations seen so far
+            variance = max(
+                float(np.ptp(energies)),
+                length_scale * float(np.max(np.abs(gradients))),
+                1e-8,
+            )
+            variance = variance**2
+        self.variance = variance
+
+        differences = points[:, None, :] - points[None, :, :]
+        k, g, h = self._kernel(differences)
+        # Covariance of the energies with the gradients, (n_points, n_points, n_dims)
+        k_eg = g[:, :, None] * differences
+        # Covariance of the gradients, (n_points, n_dims, n_points, n_dims)
+        k_gg = g[:, None, :, None] * np.eye(n_dims)[None, :, None, :] - h[
+            :, None, :, None
+        ] * (differences.transpose(0, 2, 1)[:, :, :, None] * differences[:, None, :, :])
+        size = n_points * (n_dims + 1)
+        covariance = np.empty((size, size))
+        covariance[:n_points, :n_points] = k
+        covariance[:n_points, n_points:] = k_eg.reshape(n_points, -1)
+        covariance[n_points:, :n_points] = covariance[:n_points, n_points:].T
+        covariance[n_points:, n_points:] = k_gg.reshape(n_points * n_dims, -1)
+        covariance[np.diag_indices(size)] += noise * variance
+
+        # Raises LinAlgError if the covariance is not positive definite
+        cholesky = np.linalg.cholesky(covariance)
+        self._cholesky_inv = np.linalg.inv(cholesky)
+        targets = np.concatenate([energies - self.prior, gradients.ravel()])
+        self._alpha = self._cholesky_inv.T @ (self._cholesky_inv @ targets)
+
+    def _kernel(
+        self, differences: NDArray[np.float64]
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64], NDArray[np.float64]]:
+        """Return the Matern 5/2 kernel k and the functions g and h of its derivatives.
+
+        For d = x - x', the derivatives are dk/dx' = g * d and
+        d2k/dx dx' = g * I - h * d d^T.
+        """
+        a = np.sqrt(5) / self.length_scale
+        r = np.sqrt(np.sum(differences**2, axis=-1))
+        exp = self.variance * np.exp(-a * r)
+        k = (1 + a * r + (a * r) ** 2 / 3) * exp
+        g = a**2 * (1 + a * r) / 3 * exp
+        h = a**4 / 3 * exp
+        return k, g, h
+
+    def predict(
+        self, point: NDArray[np.float64]
+    ) -> tuple[float, NDArray[np.float64], float]:
+        """Return the energy, gradient and standard deviation of the energy."""
+        differences = point[None, :] - self.points
+        k, g, h = self._kernel(differences)
+        k_eg = g[:, None] * differences
+        covariance = np.concatenate([k, k_eg.ravel()])
+        alpha_e = self._alpha[: len(k)]
+        alpha_g = self._alpha[len(k) :].reshape(differences.shape)
+
+        energy = self.prior + covariance @ self._alpha
+        gradient = (
+            -k_eg.T @ alpha_e
+            + g @ alpha_g
+            - (h * np.sum(differences * alpha_g, axis=1)) @ differences
+        )
+        reduced = self._cholesky_inv @ covariance
+        std = np.sqrt(max(self.variance - reduced @ reduced, 0.0))
+        return float(energy), gradient, float(std)
+
+
+class GPSurrogate:
+    """Optimization on a Gaussian process surrogate of an expensive energy.
+
+    For engines where every energy evaluation is expensive. All true energies
+    and gradients are fitted with a Gaussian process, and DL-FIND optimizes on
+    the model, with any of its optimizers, instead of on the true energy. Each
+    run on the model starts from the lowest-energy geometry evaluated so far and
+    is stopped when it leaves the region where the model is trusted: when the
+    predicted standard deviation of the energy is too large, or the geometry
+    moves further than max_step from the start. The function is then called for
+    the geometry reached, the model refitted, and DL-FIND run again, until the
+    true gradient meets the convergence criterion.
+
+    The model is built from the last max_points evaluations. Its cost grows
+    with the cube of max_points times the number of variables, which limits it
+    to small and medium-sized systems. Only the energy and gradient are
+    modelled, so the optimization must be of a single geometry, e.g., a
+    minimization or a transition state search with P-RFO.
+
+    Args:
+        func: Function taking coordinates, iimage and kiter and returning the
+            energy and the gradient. Called with iimage 1 and kiter -1.
+        length_scale: Length scale of the kernel in the units of the
+            coordinates
+        max_uncertainty: Largest standard deviation of the predicted energy
+            for which the model is trusted, relative to the standard deviation
+            of the kernel
+        max_step: Largest distance (norm of the displacement) from the start
+            of each run on the model
+        variance: Variance of the kernel. None estimates it from the spread of
+            the energies and gradients.
+        max_points: Maximum number of evaluations the model is built from
+        noise: Regularization added to the diagonal of the covariance,
+            relative to variance
+
+    Attributes:
+        n_true_evaluations: Number of calls to func
+        n_surrogate_evaluations: Number of energy evaluations DL-FIND made on
+            the model instead of calling func
+
+    Raises:
+        ValueError: If length_scale, max_step or max_points is not positive
+    """
+
+    def __init__(
+        self,
+        func: Callable,
+        *,
+        length_scale: float = 1.0,
+        max_uncertainty: float = 0.1,
+        max_step: float = 0.5,
+        variance: Optional[float] = None,
+        max_points: int = 20,
+        noise: float = 1e-12,
+    ) -> None:
+        if length_scale <= 0 or max_step <= 0 or max_points < 1:
+            raise ValueError("length_scale, max_step and max_points must be positive.")
+        self.func = func
+        self.length_scale = length_scale
+        self.max_uncertainty = max_uncertainty
+        self.max_step = max_step
+        self.variance = variance
+        self.max_points = max_points
+        self.noise = noise
+        self.n_true_evaluations = 0
+        self.n_surrogate_evaluations = 0
+        self._points: list[NDArray[np.float64]] = []
+        self._energies: list[float] = []
+        self._gradients: list[NDArray[np.float64]] = []
+
+    def __len__(self) -> int:
+        return len(self._energies)
+
+    def evaluate(self, coordinates: ArrayLike) -> tuple[float, NDArray[np.float64]]:
+        """Call func and add the energy and gradient to the data of the model.
+
+        Args:
+            coordinates: Coordinates (n_atoms, 3)
+
+        Returns:
+            energy: Energy
+            gradient: Gradient (n_atoms, 3)
+        """
+        coordinates = np.array(coordinates, dtype=np.float64)
+        energy, gradient = self.func(coordinates, 1, -1)
+        gradient = np.array(gradient, dtype=np.float64).reshape(coordinates.shape)
+        self.n_true_evaluations += 1
+        self._points.append(coordinates.ravel())
+        self._energies.append(float(energy))
+        self._gradients.append(gradient.ravel())
+        return float(energy), gradient
+
+    def fit(self) -> _GaussianProcess:
+        """Fit the model to the last max_points evaluations.
+
+        Returns:
+            model: Gaussian process
+
+        Raises:
+            ValueError: If there are no evaluations
+        """
+        if not self._energies:
+            raise ValueError("No energies have been evaluated.")
+        noise = self.noise
+        while True:
+            try:
+                return _GaussianProcess(
+                    np.array(self._points[-self.max_points :]),
+                    np.array(self._energies[-self.max_points :]),
+                    np.array(self._gradients[-self.max_points :]),
+                    self.length_scale,
+                    self.variance,
+                    noise,
+                )
+            except np.linalg.LinAlgError:
+                # Nearly coinciding geometries, regularize more strongly
+                if noise >= 1e-4:
+                    raise
+                noise = max(100 * noise, 1e-12)
+
+    def optimize(
+        self, params: dict[str, Any], *, max_evaluations: int = 100
+    ) -> OptimizationResult:
+        """Optimize on the model, calling func only for the geometries reached.
+
+        Args:
+            params: Keyword arguments for make_dlf_get_params for the runs on
+                the model. Must contain coords.
+            max_evaluations: Maximum number of calls to func
+
+        Returns:
+            result: The last true energy evaluation, with counters that refer
+                to the true energy function rather than to the model.
+                n_energy_evaluations is the number of calls to func, n_cycles
+                the number of runs on the model, each ending in one call to
+                func, and n_accepted the number of those runs whose geometry
+                the next run starts from: for minimizations the runs that
+                lowered the true energy, for saddle point searches all of them.
+                converged tells whether the true gradient meets the criterion.
+                statistics and optimizer_state are None, as they would only
+                describe the last run on the model.
+        """
+        tolerance = params.get("tolerance") or _DEFAULT_TOLERANCE
+        model_params = {**params, "tolerance": _MODEL_TOLERANCE * tolerance}
+        coordinates = np.array(params["coords"], dtype=np.float64).reshape(-1, 3)
+        n_start = self.n_true_evaluations
+        energy, gradient = self.evaluate(coordinates)
+        n_runs = 0
+        n_accepted = 0
+        while not self._converged(gradient, tolerance) and (
+            self.n_true_evaluations - n_start < max_evaluations
+        ):
+            start = self._start(params).reshape(-1, 3)
+            coordinates = self._run_model(start, model_params)
+            lowest = min(self._energies)
+            energy, gradient = self.evaluate(coordinates)
+            n_runs += 1
+            if self._is_saddle_search(params) or energy < lowest:
+                n_accepted += 1
+
+        return OptimizationResult(
+            coordinates=coordinates,
+            energy=energy,
+            gradient=gradient,
+            n_energy_evaluations=self.n_true_evaluations - n_start,
+            n_cycles=n_runs,
+            n_accepted=n_accepted,
+            converged=self._converged(gradient, tolerance),
+        )
+
+    def _start(self, params: dict[str, Any]) -> NDArray[np.float64]:
+        """Return the evaluated point to start the next run on the model from.
+
+        Minimizations start from the lowest energy. Saddle point searches with
+        P-RFO or the dimer method climb in energy, so they continue from the
+        last evaluation instead.
+        """
+        if self._is_saddle_search(params):
+            return self._points[-1]
+        return self._points[int(np.argmin(self._energies))]
+
+    @staticmethod
+    def _is_saddle_search(params: dict[str, Any]) -> bool:
+        """Test whether params ask for P-RFO or the dimer method."""
+        return params.get("iopt") == 10 or params.get("icoord", 0) // 100 == 2
+
+    @staticmethod
+    def _converged(gradient: NDArray[np.float64], tolerance: float) -> bool:
+        """Test the gradient criteria of DL-FIND."""
+        return bool(
+            np.max(np.abs(gradient)) <= tolerance
+            and np.sqrt(np.mean(gradient**2)) <= tolerance / 1.5
+        )
+
+    def _run_model(
+        self, start: NDArray[np.float64], params: dict[str, Any]
+    ) -> NDArray[np.float64]:
+        """Run DL-FIND on the model from start and return the geometry reached."""
+        model = self.fit()
+        max_std = self.max_uncertainty * np.sqrt(model.variance)
+        trusted = start
+        untrusted: Optional[NDArray[np.float64]] = None
+
+        def is_trusted(coordinates: NDArray[np.float64], std: float) -> bool:
+            return (
+                std <= max_std and np.linalg.norm(coordinates - start) <= self.max_step
+            )
+
+        @dlf_get_gradient_wrapper
+        def e_g_func(
+            coordinates: NDArray[np.float64], iimage: int, kiter: int
+        ) -> tuple[float, NDArray[np.float64]]:
+            nonlocal trusted, untrusted
+            self.n_surrogate_evaluations += 1
+            energy, gradient, std = model.predict(coordinates.ravel())
+            if is_trusted(coordinates, std):
+                trusted = coordinates.copy()
+            else:
+                untrusted = coordinates.copy()
+            return energy, gradient.reshape(coordinates.shape)
+
+        result = dl_find(
+            nvarin=start.size,
+            dlf_get_gradient=e_g_func,
+            dlf_get_params=make_dlf_get_params(**{**params, "coords": start}),
+            early_stop=lambda energy, coordinates: untrusted is not None,
+        )
+        if untrusted is None:
+            return result.coordinates if result is not None else trusted
+
+        # Go as far towards the untrusted geometry as allowed
+        step = untrusted - start
+        candidate = start + step * min(1.0, self.max_step / np.linalg.norm(step))
+        if is_trusted(candidate, model.predict(candidate.ravel())[2]):
+            return candidate
+        if not np.array_equal(trusted, start):
+            return trusted
+        return start + 0.5 * (candidate - start)
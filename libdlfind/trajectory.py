@@ -0,0 +1,225 @@
+#  Copyright 2021 Kjell Jorner
+#
+#  This file is part of libdlfind.
+#
+#  libdlfind is free software: you can redistribute it and/or modify
+#  it under the terms of the GNU Lesser General Public License as
+#  published by the Free Software Foundation, either version 3 of the
+#  License, or (at your option) any later version.
+#
+#  libdlfind is distributed in the hope that it will be useful,
+#  but WITHOUT ANY WARRANTY; without even the implied warranty of
+#  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#  GNU Lesser General Public License for more details.
+#
+#  You should have received a copy of the GNU Lesser General Public
+#  License along with libdlfind.  If not, see
+#  <http://www.gnu.org/licenses/>.
+
+"""Recording of trajectories."""
+
+from __future__ import annotations
+
+from ctypes import c_double, pointer
+import os
+from pathlib import Path
+from typing import BinaryIO, Optional, Union
+
+import numpy as np
+from numpy.ctypeslib import as_array
+from numpy.typing import NDArray
+
+# Size of the .npy headers, leaving room for the shape to grow
+_HEADER_SIZE = 128
+
+
+def _write_npy_header(f: BinaryIO, dtype: np.dtype, shape: tuple[int, ...]) -> None:
+    """Write a .npy version 1.0 header of fixed size at the start of f."""
+    header = repr({"descr": dtype.str, "fortran_order": False, "shape": shape}).encode(
+        "latin1"
+    )
+    prefix = b"\x93NUMPY\x01\x00" + (_HEADER_SIZE - 10).to_bytes(2, "little")
+    f.seek(0)
+    f.write(prefix + header.ljust(_HEADER_SIZE - len(prefix) - 1) + b"\n")
+
+
+class _NpyAppender:
+    """Array in a .npy file that frames can be appended to."""
+
+    def __init__(
+        self, path: Path, dtype: np.dtype, frame_shape: tuple[int, ...]
+    ) -> None:
+        self.path = path
+        self.dtype = np.dtype(dtype)
+        self.frame_shape = frame_shape
+        self.n_frames = 0
+        self._file = open(path, "w+b")
+        _write_npy_header(self._file, self.dtype, (0, *frame_shape))
+
+    def append(self, frames: NDArray) -> None:
+        """Append frames and update the shape in the header."""
+        self._file.seek(0, os.SEEK_END)
+        self._file.write(np.ascontiguousarray(frames, dtype=self.dtype).tobytes())
+        self.n_frames += len(frames)
+        _write_npy_header(self._file, self.dtype, (self.n_frames, *self.frame_shape))
+        self._file.flush()
+
+    def close(self) -> None:
+        """Close the file."""
+        self._file.close()
+
+
+class TrajectoryRecorder:
+    """Record the coordinates and energies passed to dlf_put_coords.
+
+    Can be passed directly as the dlf_put_coords argument of dl_find. Frames
+    are copied into preallocated arrays that grow geometrically, instead of
+    creating a new array for every frame. If path is given, the frames are
+    written to coordinates.npy, energies.npy and switches.npy in that
+    directory whenever chunk_size frames have been collected, so that at most
+    chunk_size frames are held in memory. The files can be read with np.load
+    at any time, also with mmap_mode.
+
+    The switch of each frame tells what it holds, see dlf_put_coords in the
+    documentation: 1 is a geometry of the optimization, 2 a transition mode and
+    negative values the images of NEB and the parallel optimizers.
+
+    Args:
+        n_atoms: Number of atoms. DL-FIND passes the number of atoms instead
+            of the number of variables for NEB images, so it is given here.
+        path: Directory to write the frames to. Created if it does not exist.
+        chunk_size: Number of frames to collect before they are written to
+            path
+        capacity: Initial number of frames to allocate for in memory
+
+    Raises:
+        ValueError: If chunk_size or capacity is not positive
+    """
+
+    def __init__(
+        self,
+        n_atoms: int,
+        path: Optional[Union[str, os.PathLike]] = None,
+        *,
+        chunk_size: int = 1024,
+        capacity: int = 64,
+    ) -> None:
+        if chunk_size < 1 or capacity < 1:
+            raise ValueError("chunk_size and capacity must be positive.")
+        self.n_atoms = n_atoms
+        self.path = Path(path) if path is not None else None
+        self.chunk_size = chunk_size
+        if self.path is not None:
+            capacity = min(capacity, chunk_size)
+        self._coordinates = np.empty((capacity, n_atoms, 3), dtype=np.float64)
+        self._energies = np.empty(capacity, dtype=np.float64)
+        self._switches = np.empty(capacity, dtype=np.int32)
+        self._n_buffered = 0
+        self._n_written = 0
+        self._files: Optional[tuple[_NpyAppender, ...]] = None
+        if self.path is not None:
+            self.path.mkdir(parents=True, exist_ok=True)
+            self._files = (
+                _NpyAppender(self.path / "coordinates.npy", np.float64, (n_atoms, 3)),
+                _NpyAppender(self.path / "energies.npy", np.float64, ()),
+                _NpyAppender(self.path / "switches.npy", np.int32, ()),
+            )
+
+    def __call__(
+        self,
+        nvar: int,
+        switch: int,
+        energy: float,
+        coords: pointer[c_double],
+        iam: int,
+    ) -> None:
+        """Record frame, with the signature of dlf_put_coords.
+
+        Raises:
+            ValueError: If nvar does not belong to n_atoms atoms
+        """
+        # NEB and QTS images come with the number of atoms as nvar
+        if nvar != 3 * self.n_atoms and not (switch < 0 and nvar == self.n_atoms):
+            raise ValueError(
+                f"DL-FIND passed {nvar} variables, but the recorder is for "
+                f"{self.n_atoms} atoms."
+            )
+        if self._n_buffered == len(self._energies):
+            self._grow()
+        i = self._n_buffered
+        self._coordinates[i] = as_array(coords, (self.n_atoms, 3))
+        self._energies[i] = energy
+        self._switches[i] = switch
+        self._n_buffered += 1
+        if self._files is not None and self._n_buffered >= self.chunk_size:
+            self.flush()
+
+    def __len__(self) -> int:
+        return self._n_written + self._n_buffered
+
+    def __enter__(self) -> TrajectoryRecorder:
+        return self
+
+    def __exit__(self, *args) -> None:
+        self.close()
+
+    def _grow(self) -> None:
+        """Double the capacity of the arrays in memory."""
+        capacity = 2 * len(self._energies)
+        if self._files is not None:
+            capacity = min(capacity, self.chunk_size)
+        n = self._n_buffered
+        for name in ("_coordinates", "_energies", "_switches"):
+            old = getattr(self, name)
+            new = np.empty((capacity, *old.shape[1:]), dtype=old.dtype)
+            new[:n] = old[:n]
+            setattr(self, name, new)
+
+    def flush(self) -> None:
+        """Write the frames held in memory to path, if given."""
+        if self._files is None or self._n_buffered == 0:
+            return
+        n = self._n_buffered
+        for file, array in zip(
+            self._files, (self._coordinates, self._energies, self._switches)
+        ):
+            file.append(array[:n])
+        self._n_written += n
+        self._n_buffered = 0
+
+    def close(self) -> None:
+        """Write the remaining frames and close the files."""
+        if self._files is None:
+            return
+        self.flush()
+        for file in self._files:
+            file.close()
+        self._files = None
+
+    def _get(self, name: str) -> NDArray:
+        """Return the recorded frames of one of the arrays."""
+        if self.path is None:
+            return getattr(self, f"_{name}")[: self._n_buffered]
+        self.flush()
+        # Empty files cannot be memory-mapped
+        mmap_mode = "r" if len(self) > 0 else None
+        return np.load(self.path / f"{name}.npy", mmap_mode=mmap_mode)
+
+    @property
+    def coordinates(self) -> NDArray[np.float64]:
+        """Coordinates with shape (n_frames, n_atoms, 3).
+
+        A view of the arrays in memory, or a read-only memory map of the file
+        if path is given.
+        """
+        return self._get("coordinates")
+
+    @property
+    def energies(self) -> NDArray[np.float64]:
+        """Energies with shape (n_frames,)."""
+        return self._get("energies")
+
+    @property
+    def switches(self) -> NDArray[np.int32]:
+        """Switch passed to dlf_put_coords with shape (n_frames,)."""
+        return self._get("switches")
@@ -20,7 +20,15 @@ subroutine api_dl_find(nvarin, nvarin2, nspec, master, dlf_error_c, dlf_get_grad
                        dlf_get_multistate_gradients_c, dlf_get_params_c, dlf_put_coords_c, dlf_update_c) bind(c)
   use mod_globals
   use mod_api
-  use iso_c_binding, only: c_int, c_double, c_funptr, c_f_procpointer
+  use mod_batch, only: batch_reset, hessian_batch_reset
+  use mod_result, only: result_reset
+  use mod_error, only: error_reset
+  use mod_stop, only: stop_reset
+  use mod_state, only: state_reset
+  use mod_checkpoint, only: checkpoint_reset
+  use dlf_task_module, only: tconverged
+  use dlf_convergence, only: ttested
+  use iso_c_binding, only: c_int, c_double, c_funptr, c_f_procpointer, c_associated
 
   implicit none
   integer(c_int), intent(in), value :: nvarin ! number of variables to read in 3*nat
@@ -30,30 +38,442 @@ subroutine api_dl_find(nvarin, nvarin2, nspec, master, dlf_error_c, dlf_get_grad
   type(c_funptr), intent(in), value :: dlf_error_c, dlf_get_gradient_c, dlf_get_hessian_c, dlf_get_multistate_gradients_c, &
                                        dlf_get_params_c, dlf_put_coords_c, dlf_update_c ! Functions received from C side
 
-  ! Assign procedure pointers
-  call c_f_procpointer(dlf_error_c, dlf_error_callback)
-  call c_f_procpointer(dlf_get_gradient_c, dlf_get_gradient_callback)
-  call c_f_procpointer(dlf_get_hessian_c, dlf_get_hessian_callback)
-  call c_f_procpointer(dlf_get_multistate_gradients_c, dlf_get_multistate_gradients_callback)
+  ! Assign procedure pointers. Callbacks other than dlf_get_params can be NULL.
+  nullify (dlf_error_callback, dlf_get_gradient_callback, dlf_get_hessian_callback, &
+           dlf_get_multistate_gradients_callback, dlf_put_coords_callback, dlf_update_callback)
+  if (c_associated(dlf_error_c)) call c_f_procpointer(dlf_error_c, dlf_error_callback)
+  if (c_associated(dlf_get_gradient_c)) call c_f_procpointer(dlf_get_gradient_c, dlf_get_gradient_callback)
+  if (c_associated(dlf_get_hessian_c)) call c_f_procpointer(dlf_get_hessian_c, dlf_get_hessian_callback)
+  if (c_associated(dlf_get_multistate_gradients_c)) &
+    call c_f_procpointer(dlf_get_multistate_gradients_c, dlf_get_multistate_gradients_callback)
   call c_f_procpointer(dlf_get_params_c, dlf_get_params_callback)
-  call c_f_procpointer(dlf_put_coords_c, dlf_put_coords_callback)
-  call c_f_procpointer(dlf_update_c, dlf_update_callback)
+  if (c_associated(dlf_put_coords_c)) call c_f_procpointer(dlf_put_coords_c, dlf_put_coords_callback)
+  if (c_associated(dlf_update_c)) call c_f_procpointer(dlf_update_c, dlf_update_callback)
 
   ! Call main DL-FIND subroutine
+  call batch_reset()
+  call hessian_batch_reset()
+  call result_reset()
+  call error_reset()
+  call stop_reset()
+  call state_reset()
+  call checkpoint_reset()
+  tconverged = .false.
+  ttested = .false.
   call dl_find(nvarin, nvarin2, nspec, master)
+  call batch_reset()
+  call hessian_batch_reset()
 end subroutine
 
+subroutine api_dlf_get_result(nvar, coords, energy, gradient, nenergy, ncycle, naccepted, converged, status) bind(c)
+  use mod_result, only: tresult, result_coords, result_energy, result_gradient
+  use dlf_stat, only: stat
+  use dlf_task_module, only: tconverged
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: nvar ! number of xyz variables (3*nat)
+  real(c_double), intent(out) :: coords(nvar) ! coordinates of the last energy evaluation
+  real(c_double), intent(out) :: energy ! energy of the last energy evaluation
+  real(c_double), intent(out) :: gradient(nvar) ! gradient of the last energy evaluation
+  integer(c_int), intent(out) :: nenergy ! number of energy evaluations
+  integer(c_int), intent(out) :: ncycle ! number of cycles
+  integer(c_int), intent(out) :: naccepted ! number of accepted steps
+  integer(c_int), intent(out) :: converged ! 1 if the last run converged, 0 otherwise
+  integer(c_int), intent(out) :: status ! 0 on success, 1 if no energy evaluation was recorded
+
+  nenergy = stat%sene
+  ncycle = stat%ccycle
+  naccepted = stat%caccepted
+  converged = merge(1, 0, tconverged)
+  status = 1
+  if (.not. tresult) return
+  if (size(result_coords) /= nvar) return
+  coords(:) = result_coords(:)
+  energy = result_energy
+  gradient(:) = result_gradient(:)
+  status = 0
+end subroutine
+
+! Failure of the last run of api_dl_find. The message is NUL-terminated and
+! truncated to fit into length characters.
+subroutine api_dlf_get_error(nvar, coords, status, message, length, failed, has_coords) bind(c)
+  use mod_error, only: tfailed, error_status, error_message, error_coords
+  use iso_c_binding, only: c_int, c_double, c_char, c_null_char
+
+  implicit none
+  integer(c_int), intent(in), value :: nvar ! number of xyz variables (3*nat)
+  real(c_double), intent(out) :: coords(nvar) ! coordinates when DL-FIND failed
+  integer(c_int), intent(out) :: status ! last non-zero status of an energy callback, 0 if none
+  integer(c_int), intent(in), value :: length ! size of message
+  character(kind=c_char), intent(out) :: message(length) ! error message of DL-FIND
+  integer(c_int), intent(out) :: failed ! 1 if the last run failed, 0 otherwise
+  integer(c_int), intent(out) :: has_coords ! 1 if coords was set, 0 otherwise
+  integer :: i, n
+
+  failed = merge(1, 0, tfailed)
+  status = error_status
+  has_coords = 0
+  n = 0
+  if (allocated(error_message)) n = min(len(error_message), length - 1)
+  do i = 1, n
+    message(i) = error_message(i:i)
+  end do
+  if (length > 0) message(n + 1) = c_null_char
+  if (.not. allocated(error_coords)) return
+  if (size(error_coords) /= nvar) return
+  coords(:) = error_coords(:)
+  has_coords = 1
+end subroutine
+
+! Timers and counters of the current or last run. The clocks are, in order:
+! total, energy and gradient, step direction, coordinate transformation,
+! checkpoint file I/O and xyz file I/O. Clocks that are running include the
+! time since they were started, so that they can be read during a run.
+subroutine api_dlf_get_timers(cpu_time, wall_time, counters) bind(c)
+  use dlf_time, only: clock, maxclock
+  use dlf_stat, only: stat
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  real(c_double), intent(out) :: cpu_time(6) ! accumulated CPU time of each clock (s)
+  real(c_double), intent(out) :: wall_time(6) ! accumulated wall time of each clock (s)
+  integer(c_int), intent(out) :: counters(6) ! energy evaluations, energy evaluations on this
+  ! processor, cycles, accepted steps, microiterative cycles, accepted microiterations
+  real(c_double) :: cpu_now, wall_now
+  integer :: iclock
+
+  call get_cpu_time(cpu_now)
+  call get_wall_time(wall_now)
+  do iclock = 1, maxclock
+    cpu_time(iclock) = clock(iclock)%accum_cpu_time
+    wall_time(iclock) = clock(iclock)%accum_wall_time
+    if (clock(iclock)%running) then
+      cpu_time(iclock) = cpu_time(iclock) + cpu_now - clock(iclock)%start_cpu_time
+      wall_time(iclock) = wall_time(iclock) + wall_now - clock(iclock)%start_wall_time
+    end if
+  end do
+  counters(1) = stat%sene
+  counters(2) = stat%pene
+  counters(3) = stat%ccycle
+  counters(4) = stat%caccepted
+  counters(5) = stat%tmiccycle
+  counters(6) = stat%tmicaccepted
+end subroutine
+
+subroutine api_dlf_get_convergence(values, tolerances, tested) bind(c)
+  use dlf_convergence, only: ttested, valg, valrmsg, vals, valrmss, valde
+  use dlf_global, only: glob
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  real(c_double), intent(out) :: values(5) ! maximum and RMS gradient, maximum and RMS step, energy change
+  real(c_double), intent(out) :: tolerances(5) ! tolerances of the values
+  integer(c_int), intent(out) :: tested ! 1 if convergence has been tested in this run, 0 otherwise
+
+  ! Same as in convergence_test, so that they are known before the first test
+  tolerances(1) = glob%tolerance
+  tolerances(2) = glob%tolerance / 1.5d0
+  tolerances(3) = glob%tolerance * 4.d0
+  tolerances(4) = glob%tolerance * 8.d0 / 3.d0
+  tolerances(5) = glob%tolerance_e
+  if (ttested) then
+    values = [valg, valrmsg, vals, valrmss, valde]
+    tested = 1
+  else
+    values = -1.d0
+    tested = 0
+  end if
+end subroutine
+
+subroutine api_dlf_set_gradient_batch(dlf_get_gradient_batch_c) bind(c)
+  use mod_globals, only: dlf_get_gradient_batch_callback
+  use iso_c_binding, only: c_funptr, c_f_procpointer, c_associated
+
+  implicit none
+  type(c_funptr), intent(in), value :: dlf_get_gradient_batch_c ! Function received from C side, or NULL to unset
+
+  if (c_associated(dlf_get_gradient_batch_c)) then
+    call c_f_procpointer(dlf_get_gradient_batch_c, dlf_get_gradient_batch_callback)
+  else
+    nullify (dlf_get_gradient_batch_callback)
+  end if
+end subroutine
+
+subroutine api_dlf_set_hessian_batch(dlf_get_hessian_batch_c) bind(c)
+  use mod_globals, only: dlf_get_hessian_batch_callback
+  use iso_c_binding, only: c_funptr, c_f_procpointer, c_associated
+
+  implicit none
+  type(c_funptr), intent(in), value :: dlf_get_hessian_batch_c ! Function received from C side, or NULL to unset
+
+  if (c_associated(dlf_get_hessian_batch_c)) then
+    call c_f_procpointer(dlf_get_hessian_batch_c, dlf_get_hessian_batch_callback)
+  else
+    nullify (dlf_get_hessian_batch_callback)
+  end if
+end subroutine
+
+subroutine api_dlf_set_checkpoint_dir(path) bind(c)
+  use mod_checkpoint, only: checkpoint_dir
+  use iso_c_binding, only: c_ptr, c_char, c_null_char, c_associated, c_f_pointer
+
+  implicit none
+  type(c_ptr), intent(in), value :: path ! NUL-terminated directory, or NULL for the working directory
+  character(kind=c_char), pointer :: chars(:)
+  integer :: length
+
+  if (allocated(checkpoint_dir)) deallocate (checkpoint_dir)
+  if (.not. c_associated(path)) return
+  call c_f_pointer(path, chars, [huge(0)])
+  length = 0
+  do while (chars(length + 1) /= c_null_char)
+    length = length + 1
+  end do
+  if (length == 0) return
+  allocate (character(len=length) :: checkpoint_dir)
+  checkpoint_dir = transfer(chars(1:length), checkpoint_dir)
+  if (checkpoint_dir(length:length) /= "/") checkpoint_dir = checkpoint_dir//"/"
+end subroutine
+
+! Names of the checkpoint files of the latest complete set written by the
+! current or last run, each followed by a newline. The list is NUL-terminated
+! and truncated to fit into length characters.
+subroutine api_dlf_get_checkpoint_files(names, length) bind(c)
+  use mod_checkpoint, only: checkpoint_names
+  use iso_c_binding, only: c_int, c_char, c_null_char
+
+  implicit none
+  integer(c_int), intent(in), value :: length ! size of names
+  character(kind=c_char), intent(out) :: names(length) ! file names
+  integer :: i, n
+
+  n = 0
+  if (allocated(checkpoint_names)) n = min(len(checkpoint_names), length - 1)
+  do i = 1, n
+    names(i) = checkpoint_names(i:i)
+  end do
+  if (length > 0) names(n + 1) = c_null_char
+end subroutine
+
+subroutine api_dlf_set_output_dir(path) bind(c)
+  use mod_output, only: output_dir, from_c_string
+  use iso_c_binding, only: c_ptr
+
+  implicit none
+  type(c_ptr), intent(in), value :: path ! NUL-terminated directory, or NULL for the working directory
+  integer :: length
+
+  if (allocated(output_dir)) deallocate (output_dir)
+  output_dir = from_c_string(path)
+  length = len(output_dir)
+  if (length == 0) then
+    deallocate (output_dir)
+  else if (output_dir(length:length) /= "/") then
+    output_dir = output_dir//"/"
+  end if
+end subroutine
+
+subroutine api_dlf_set_log_file(path) bind(c)
+  use mod_output, only: output_open_log, output_close_log, from_c_string
+  use iso_c_binding, only: c_ptr
+
+  implicit none
+  type(c_ptr), intent(in), value :: path ! NUL-terminated file, or NULL for the standard streams
+  character(len=:), allocatable :: file
+
+  file = from_c_string(path)
+  if (len(file) == 0) then
+    call output_close_log()
+  else
+    call output_open_log(file)
+  end if
+end subroutine
+
+subroutine api_dlf_set_checkpoint(dlf_checkpoint_c) bind(c)
+  use mod_globals, only: dlf_checkpoint_callback
+  use iso_c_binding, only: c_funptr, c_f_procpointer, c_associated
+
+  implicit none
+  type(c_funptr), intent(in), value :: dlf_checkpoint_c ! Function received from C side, or NULL to unset
+
+  if (c_associated(dlf_checkpoint_c)) then
+    call c_f_procpointer(dlf_checkpoint_c, dlf_checkpoint_callback)
+  else
+    nullify (dlf_checkpoint_callback)
+  end if
+end subroutine
+
+! Stop the run before the next energy evaluation once the int pointed to by
+! flag is non-zero. The int can be set from another thread. Pass NULL to unset.
+subroutine api_dlf_set_cancel_flag(flag) bind(c)
+  use mod_stop, only: cancel_flag
+  use iso_c_binding, only: c_ptr
+
+  implicit none
+  type(c_ptr), intent(in), value :: flag ! int owned by the caller, or NULL
+
+  cancel_flag = flag
+end subroutine
+
+subroutine api_dlf_set_time_limit(seconds) bind(c)
+  use mod_stop, only: time_limit
+  use iso_c_binding, only: c_double
+
+  implicit none
+  real(c_double), intent(in), value :: seconds ! wall time limit of a run (s), none if not positive
+
+  time_limit = seconds
+end subroutine
+
+! Use the sparse primitive B matrix and iterative HDLC transformations for
+! residues with at least min_atoms atoms. Off if not positive.
+subroutine api_dlf_set_sparse_hdlc(min_atoms) bind(c)
+  use mod_sparse, only: sparse_hdlc_atoms
+  use iso_c_binding, only: c_int
+
+  implicit none
+  integer(c_int), intent(in), value :: min_atoms ! minimum number of atoms in a residue
+
+  sparse_hdlc_atoms = max(min_atoms, 0)
+end subroutine
+
+! Initial Hessian in internal coordinates of the next runs, used instead of
+! the one set with inithessian. Unset if n is 0.
+subroutine api_dlf_set_initial_hessian(n, hessian) bind(c)
+  use mod_state, only: initial_hessian
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: n ! number of internal coordinates
+  real(c_double), intent(in) :: hessian(n, n) ! Hessian
+
+  if (allocated(initial_hessian)) deallocate (initial_hessian)
+  if (n <= 0) return
+  allocate (initial_hessian(n, n))
+  initial_hessian(:, :) = hessian(:, :)
+end subroutine
+
+! Initial L-BFGS memory of the next runs, oldest pair first. Unset if n or
+! npair is 0.
+subroutine api_dlf_set_initial_lbfgs(n, npair, steps, dgrads) bind(c)
+  use mod_state, only: initial_steps, initial_dgrads
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: n ! number of internal coordinates
+  integer(c_int), intent(in), value :: npair ! number of pairs
+  real(c_double), intent(in) :: steps(n, npair) ! steps
+  real(c_double), intent(in) :: dgrads(n, npair) ! gradient differences
+
+  if (allocated(initial_steps)) deallocate (initial_steps)
+  if (allocated(initial_dgrads)) deallocate (initial_dgrads)
+  if (n <= 0 .or. npair <= 0) return
+  allocate (initial_steps(n, npair), initial_dgrads(n, npair))
+  initial_steps(:, :) = steps(:, :)
+  initial_dgrads(:, :) = dgrads(:, :)
+end subroutine
+
+! Sizes of the optimizer state at the end of the last run. Zero for the parts
+! that the optimizer did not keep.
+subroutine api_dlf_get_state_size(nhessian, nlbfgs, npair) bind(c)
+  use mod_state, only: final_hessian, final_steps
+  use iso_c_binding, only: c_int
+
+  implicit none
+  integer(c_int), intent(out) :: nhessian ! number of internal coordinates of the Hessian
+  integer(c_int), intent(out) :: nlbfgs ! number of internal coordinates of the L-BFGS memory
+  integer(c_int), intent(out) :: npair ! number of L-BFGS pairs
+
+  nhessian = 0
+  nlbfgs = 0
+  npair = 0
+  if (allocated(final_hessian)) nhessian = size(final_hessian, 1)
+  if (allocated(final_steps)) then
+    nlbfgs = size(final_steps, 1)
+    npair = size(final_steps, 2)
+  end if
+end subroutine
+
+! Hessian in internal coordinates at the end of the last run
+subroutine api_dlf_get_final_hessian(n, hessian) bind(c)
+  use mod_state, only: final_hessian
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: n ! number of internal coordinates, from api_dlf_get_state_size
+  real(c_double), intent(out) :: hessian(n, n) ! Hessian
+
+  if (.not. allocated(final_hessian)) return
+  if (size(final_hessian, 1) /= n) return
+  hessian(:, :) = final_hessian(:, :)
+end subroutine
+
+! L-BFGS memory at the end of the last run, oldest pair first
+subroutine api_dlf_get_final_lbfgs(n, npair, steps, dgrads) bind(c)
+  use mod_state, only: final_steps, final_dgrads
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: n ! number of internal coordinates, from api_dlf_get_state_size
+  integer(c_int), intent(in), value :: npair ! number of pairs, from api_dlf_get_state_size
+  real(c_double), intent(out) :: steps(n, npair) ! steps
+  real(c_double), intent(out) :: dgrads(n, npair) ! gradient differences
+
+  if (.not. allocated(final_steps)) return
+  if (size(final_steps, 1) /= n .or. size(final_steps, 2) /= npair) return
+  steps(:, :) = final_steps(:, :)
+  dgrads(:, :) = final_dgrads(:, :)
+end subroutine
+
+subroutine api_dlf_set_stop(dlf_stop_c) bind(c)
+  use mod_globals, only: dlf_stop_callback
+  use iso_c_binding, only: c_funptr, c_f_procpointer, c_associated
+
+  implicit none
+  type(c_funptr), intent(in), value :: dlf_stop_c ! Function received from C side, or NULL to unset
+
+  if (c_associated(dlf_stop_c)) then
+    call c_f_procpointer(dlf_stop_c, dlf_stop_callback)
+  else
+    nullify (dlf_stop_callback)
+  end if
+end subroutine
+
+! Why the last run was stopped: 0 if it was not, 1 if the cancel flag was set,
+! 2 if the time limit passed and 3 if the stop callback asked for it
+function api_dlf_get_stop_reason() result(reason) bind(c)
+  use mod_stop, only: stop_reason
+  use iso_c_binding, only: c_int
+
+  implicit none
+  integer(c_int) :: reason
+
+  reason = stop_reason
+end function
+
 subroutine dlf_error()
   use mod_globals, only: dlf_error_callback
 
   implicit none
 
-  call dlf_error_callback()
+  interface
+    subroutine api_dlf_unwind() bind(c)
+    end subroutine
+  end interface
+
+  if (associated(dlf_error_callback)) call dlf_error_callback()
+  ! Does not return if DL-FIND was called through api_dl_find_recoverable
+  call api_dlf_unwind()
   error stop "DL-FIND crashed after calling dlf_error."
 end subroutine
 
 subroutine dlf_get_gradient(nvar, coords, energy, gradient, iimage, kiter, status)
-  use mod_globals, only: dlf_get_gradient_callback
+  use mod_globals, only: dlf_get_gradient_callback, dlf_get_gradient_batch_callback
+  use mod_batch, only: batch_lookup
+  use mod_result, only: result_record
+  use mod_error, only: error_status
+  use dlf_hessian, only: fd_hess_running
   use dlf_parameter_module, only: rk
 
   implicit none
@@ -64,12 +484,190 @@ subroutine dlf_get_gradient(nvar, coords, energy, gradient, iimage, kiter, statu
   integer, intent(in) :: iimage ! current image (for NEB)
   integer, intent(in) :: kiter ! flag related to microiterations
   integer, intent(out) :: status ! return code
+  logical :: found, tbatch
+
+  found = .false.
+  if (associated(dlf_get_gradient_batch_callback)) then
+    call batch_lookup(nvar, coords, kiter, energy, gradient, found)
+    if (found) then
+      status = 0
+    else
+      call neb_batch(nvar, coords, iimage, kiter, tbatch, status)
+      if (.not. tbatch) call fdhessian_batch(nvar, coords, iimage, kiter, tbatch, status)
+      if (tbatch) then
+        if (status /= 0) then
+          error_status = status
+          return
+        end if
+        call batch_lookup(nvar, coords, kiter, energy, gradient, found)
+      end if
+    end if
+  end if
+
+  if (.not. found) then
+    if (associated(dlf_get_gradient_callback)) then
+      call dlf_get_gradient_callback(nvar, coords, energy, gradient, iimage, kiter, status)
+    else
+      status = 1
+    end if
+  end if
+  if (status /= 0) error_status = status
+
+  ! Keep the last evaluation for api_dlf_get_result
+  if (status == 0 .and. .not. fd_hess_running) call result_record(nvar, coords, energy, gradient)
+end subroutine
+
+! Evaluate the remaining images of a NEB cycle in one batch, starting with the
+! requested one. tbatch is false if coords is not the geometry of a NEB image.
+subroutine neb_batch(nvar, coords, iimage, kiter, tbatch, status)
+  use dlf_parameter_module, only: rk
+  use dlf_global, only: glob
+  use dlf_neb, only: neb
+  use mod_batch, only: batch_evaluate
+
+  implicit none
+  integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+  real(rk), intent(in) :: coords(nvar) ! coordinates
+  integer, intent(in) :: iimage ! current image (for NEB)
+  integer, intent(in) :: kiter ! flag related to microiterations
+  logical, intent(out) :: tbatch ! images were evaluated as a batch
+  integer, intent(out) :: status ! return code
+  integer :: jimage, nbatch
+  integer :: images(neb%nimage)
+
+  tbatch = .false.
+  status = 0
+  if (glob%icoord/100 /= 1 .or. .not. allocated(neb%xcoords)) return
+  if (iimage < 1 .or. iimage > neb%nimage .or. size(neb%xcoords, 1) /= nvar) return
+  if (any(neb%xcoords(:, iimage) /= coords(:))) return
+
+  ! Frozen images are skipped by DL-FIND and are not requested
+  nbatch = 0
+  do jimage = iimage, neb%nimage
+    if (jimage > iimage .and. neb%tfreeze) then
+      if (neb%frozen(jimage)) cycle
+    end if
+    nbatch = nbatch + 1
+    images(nbatch) = jimage
+  end do
+
+  call batch_evaluate(nvar, nbatch, neb%xcoords(:, images(1:nbatch)), images(1:nbatch), kiter, status)
+  tbatch = .true.
+end subroutine
+
+! Evaluate the remaining displaced geometries of a finite-difference Hessian in
+! one batch, starting with the requested one. The displacements are generated
+! with fd_next_displacement like in dlf_fdhessian, which then requests them one
+! by one and assembles the Hessian from the results as usual. Only done for
+! Cartesian coordinates, as the HDLC back-transformation changes the state of
+! the HDLC residues. tbatch is false if no batch was evaluated.
+subroutine fdhessian_batch(nvar, coords, iimage, kiter, tbatch, status)
+  use dlf_parameter_module, only: rk
+  use dlf_global, only: glob
+  use dlf_hessian, only: fd_hess_running, nihvar, numfd, iivar, direction, twopoint, fracrec, &
+                         fd_next_displacement
+  use dlf_allocate, only: allocate, deallocate
+  use mod_batch, only: batch_evaluate
+
+  implicit none
+  integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+  real(rk), intent(in) :: coords(nvar) ! coordinates
+  integer, intent(in) :: iimage ! current image (for NEB)
+  integer, intent(in) :: kiter ! flag related to microiterations
+  logical, intent(out) :: tbatch ! geometries were evaluated as a batch
+  integer, intent(out) :: status ! return code
+  integer :: jvar, jdirection, nbatch, maxbatch
+  logical :: tok
+  real(rk), allocatable :: icoords(:), xcoords(:), batch_coords(:, :)
+  integer, allocatable :: images(:)
+
+  tbatch = .false.
+  status = 0
+  if (.not. fd_hess_running .or. glob%icoord /= 0 .or. glob%ntasks > 1) return
+  if (nvar /= glob%nvar .or. any(glob%xcoords(:, :) /= reshape(coords, shape(glob%xcoords)))) return
 
-  call dlf_get_gradient_callback(nvar, coords, energy, gradient, iimage, kiter, status)
+  maxbatch = numfd - iivar + 1
+  if (twopoint) maxbatch = 2*maxbatch
+  call allocate(icoords, glob%nivar)
+  call allocate(xcoords, nvar)
+  call allocate(batch_coords, nvar, maxbatch)
+  allocate (images(maxbatch))
+
+  icoords(:) = glob%icoords(:)
+  xcoords(:) = coords(:)
+  jvar = iivar
+  jdirection = direction
+  nbatch = 1
+  batch_coords(:, 1) = xcoords(:)
+  do while (jvar < numfd .or. (twopoint .and. jdirection == 1))
+    call fd_next_displacement(nihvar, icoords(1:nihvar), jvar, jdirection, fracrec)
+    call dlf_direct_itox(glob%nvar, glob%nivar, glob%nicore, icoords, xcoords, tok)
+    if (.not. tok) exit
+    nbatch = nbatch + 1
+    batch_coords(:, nbatch) = xcoords(:)
+  end do
+
+  if (nbatch > 1) then
+    images(:) = iimage
+    call batch_evaluate(nvar, nbatch, batch_coords(:, 1:nbatch), images(1:nbatch), kiter, status)
+    tbatch = .true.
+  end if
+
+  call deallocate(icoords)
+  call deallocate(xcoords)
+  call deallocate(batch_coords)
+  deallocate (images)
+end subroutine
+
+! Evaluate the members of a population of the parallel optimizers in one batch.
+! dlf_parallel_opt then requests them one by one and receives the results from
+! the buffer. If the batch fails, they are evaluated one by one instead. Only
+! done for Cartesian coordinates, where the conversion from the working
+! coordinates is repeated exactly for the requests.
+subroutine population_batch(nmember, pop_icoords)
+  use dlf_parameter_module, only: rk
+  use dlf_global, only: glob
+  use dlf_allocate, only: allocate, deallocate
+  use mod_globals, only: dlf_get_gradient_batch_callback
+  use mod_batch, only: batch_evaluate
+
+  implicit none
+  integer, intent(in) :: nmember ! number of members to evaluate
+  real(rk), intent(in) :: pop_icoords(nmember, glob%nivar) ! working coordinates of the members
+  integer :: m, iimage, status
+  real(rk), allocatable :: icoords(:), xcoords(:, :), batch_coords(:, :)
+  integer, allocatable :: images(:)
+
+  if (.not. associated(dlf_get_gradient_batch_callback)) return
+  if (nmember < 1 .or. glob%icoord /= 0 .or. glob%ntasks > 1) return
+
+  call allocate(icoords, glob%nivar)
+  call allocate(xcoords, 3, glob%nat)
+  call allocate(batch_coords, glob%nvar, nmember)
+  allocate (images(nmember))
+
+  icoords(:) = glob%icoords(:)
+  xcoords(:, :) = glob%xcoords(:, :)
+  do m = 1, nmember
+    glob%icoords(:) = pop_icoords(m, :)
+    call dlf_coords_itox(iimage)
+    batch_coords(:, m) = reshape(glob%xcoords, (/glob%nvar/))
+  end do
+  glob%icoords(:) = icoords(:)
+  glob%xcoords(:, :) = xcoords(:, :)
+
+  images(:) = iimage
+  call batch_evaluate(glob%nvar, nmember, batch_coords, images, -1, status)
+
+  call deallocate(icoords)
+  call deallocate(xcoords)
+  call deallocate(batch_coords)
+  deallocate (images)
 end subroutine
 
 subroutine dlf_get_hessian(nvar, coords, hessian, status)
-  use mod_globals, only: dlf_get_hessian_callback
+  use mod_globals, only: dlf_get_hessian_callback, dlf_get_hessian_batch_callback
+  use mod_batch, only: hessian_batch_lookup
   use dlf_parameter_module, only: rk
 
   implicit none
@@ -77,12 +675,61 @@ subroutine dlf_get_hessian(nvar, coords, hessian, status)
   real(rk), intent(in) :: coords(nvar) ! coordinates
   real(rk), intent(out) :: hessian(nvar, nvar) ! hessian
   integer, intent(out) :: status ! return code
+  logical :: found, tbatch
 
-  call dlf_get_hessian_callback(nvar, coords, hessian, status)
+  found = .false.
+  if (associated(dlf_get_hessian_batch_callback)) then
+    call hessian_batch_lookup(nvar, coords, hessian, found)
+    if (.not. found) then
+      call qts_hessian_batch(nvar, coords, tbatch)
+      if (tbatch) call hessian_batch_lookup(nvar, coords, hessian, found)
+    end if
+  end if
+
+  if (found) then
+    status = 0
+  else if (associated(dlf_get_hessian_callback)) then
+    call dlf_get_hessian_callback(nvar, coords, hessian, status)
+  else
+    status = 1
+  end if
+end subroutine
+
+! Calculate the Hessians of the remaining images of a QTS (instanton) path in
+! one batch, starting with the requested one. dlf_qts_get_hessian then requests
+! them image by image and receives them from the buffer. If the batch fails,
+! they are calculated one by one instead. Only done when the Hessians of all
+! images are calculated analytically (hessian_mode 0 or 11 and inithessian 0),
+! as in rate calculations. tbatch is false if coords is not the geometry of the
+! image whose Hessian is due.
+subroutine qts_hessian_batch(nvar, coords, tbatch)
+  use dlf_parameter_module, only: rk
+  use dlf_global, only: glob
+  use dlf_neb, only: neb
+  use dlf_qts, only: qts
+  use mod_batch, only: hessian_batch_evaluate
+
+  implicit none
+  integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+  real(rk), intent(in) :: coords(nvar) ! coordinates
+  logical, intent(out) :: tbatch ! Hessians were calculated as a batch
+  integer :: jimage, status
+
+  tbatch = .false.
+  if (glob%icoord /= 190 .or. glob%inithessian /= 0 .or. glob%ntasks > 1) return
+  if (qts%hessian_mode /= 0 .and. qts%hessian_mode /= 11) return
+  if (.not. allocated(neb%xcoords)) return
+  jimage = qts%image_status
+  if (jimage < 1 .or. jimage > neb%nimage .or. size(neb%xcoords, 1) /= nvar) return
+  if (any(neb%xcoords(:, jimage) /= coords(:))) return
+
+  call hessian_batch_evaluate(nvar, neb%nimage - jimage + 1, neb%xcoords(:, jimage:neb%nimage), status)
+  tbatch = .true.
 end subroutine
 
 subroutine dlf_get_multistate_gradients(nvar, coords, energy, gradient, coupling, needcoupling, iimage, status)
   use mod_globals, only: dlf_get_multistate_gradients_callback
+  use mod_error, only: error_status
   use dlf_parameter_module, only: rk
 
   implicit none
@@ -94,7 +741,14 @@ subroutine dlf_get_multistate_gradients(nvar, coords, energy, gradient, coupling
   integer, intent(in) :: needcoupling ! true if interstate coupling gradients should be calculated
   integer, intent(in) :: iimage ! current image (for NEB)
   integer, intent(out) :: status ! return code
+
+  if (.not. associated(dlf_get_multistate_gradients_callback)) then
+    status = 1
+    error_status = status
+    return
+  end if
   call dlf_get_multistate_gradients_callback(nvar, coords, energy, gradient, coupling, needcoupling, iimage, status)
+  if (status /= 0) error_status = status
 end subroutine
 
 subroutine dlf_get_params( &
@@ -215,7 +869,7 @@ subroutine dlf_put_coords(nvar, switch, energy, coords, iam)
   real(rk), intent(in) :: coords(nvar) ! coordinates
   integer, intent(in) :: iam ! flag for MPI runs
 
-  call dlf_put_coords_callback(nvar, switch, energy, coords, iam)
+  if (associated(dlf_put_coords_callback)) call dlf_put_coords_callback(nvar, switch, energy, coords, iam)
 end subroutine
 
 subroutine dlf_update()
@@ -223,5 +877,5 @@ subroutine dlf_update()
 
   implicit none
 
-  call dlf_update_callback()
+  if (associated(dlf_update_callback)) call dlf_update_callback()
 end subroutine
@@ -0,0 +1,126 @@
+/*
+ *  Copyright 2021 Kjell Jorner
+ *
+ *  This file is part of libdlfind.
+ *
+ *  libdlfind is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU Lesser General Public License as
+ *  published by the Free Software Foundation, either version 3 of the
+ *  License, or (at your option) any later version.
+ *
+ *  libdlfind is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU Lesser General Public License for more details.
+ *
+ *  You should have received a copy of the GNU Lesser General Public
+ *  License along with libdlfind.  If not, see
+ *  <http://www.gnu.org/licenses/>.
+ */
+
+/* Threads of the BLAS library that DL-FIND is linked against. The library is
+   found at run time as the one providing dgemm, and its thread functions are
+   looked up in it, so that libdlfind works with any BLAS and only controls the
+   threads of those it knows. */
+
+#ifndef _GNU_SOURCE
+#define _GNU_SOURCE
+#endif
+
+#include <stdint.h>
+#include <string.h>
+
+#ifndef _WIN32
+#include <dlfcn.h>
+#include <pthread.h>
+#endif
+
+#include "libdlfind.h"
+
+extern void dgemm_(void);
+
+static char blas_library[4096] = "";
+static const char *blas_vendor = "unknown";
+static int (*get_threads)(void) = NULL;
+static void (*set_threads)(int) = NULL;
+/* BLIS counts threads with its 64-bit dim_t */
+static int64_t (*bli_get_threads)(void) = NULL;
+static void (*bli_set_threads)(int64_t) = NULL;
+
+/* Find the BLAS library and its thread functions */
+static void probe_blas(void)
+{
+#ifndef _WIN32
+    Dl_info info;
+    void *handle;
+
+    if (dladdr((void *)dgemm_, &info) == 0 || info.dli_fname == NULL) return;
+    strncpy(blas_library, info.dli_fname, sizeof(blas_library) - 1);
+    handle = dlopen(info.dli_fname, RTLD_LAZY | RTLD_NOLOAD);
+    if (handle == NULL) return;
+
+    if (dlsym(handle, "openblas_set_num_threads") != NULL) {
+        blas_vendor = "OpenBLAS";
+        *(void **)&get_threads = dlsym(handle, "openblas_get_num_threads");
+        *(void **)&set_threads = dlsym(handle, "openblas_set_num_threads");
+    } else if (dlsym(handle, "MKL_Set_Num_Threads") != NULL) {
+        blas_vendor = "MKL";
+        *(void **)&get_threads = dlsym(handle, "MKL_Get_Max_Threads");
+        *(void **)&set_threads = dlsym(handle, "MKL_Set_Num_Threads");
+    } else if (dlsym(handle, "flexiblas_set_num_threads") != NULL) {
+        blas_vendor = "FlexiBLAS";
+        *(void **)&get_threads = dlsym(handle, "flexiblas_get_num_threads");
+        *(void **)&set_threads = dlsym(handle, "flexiblas_set_num_threads");
+    } else if (dlsym(handle, "bli_thread_set_num_threads") != NULL) {
+        blas_vendor = "BLIS";
+        *(void **)&bli_get_threads = dlsym(handle, "bli_thread_get_num_threads");
+        *(void **)&bli_set_threads = dlsym(handle, "bli_thread_set_num_threads");
+    } else {
+        blas_vendor = "reference";
+    }
+    dlclose(handle);
+#endif
+}
+
+#ifdef _WIN32
+/* Linked statically on Windows, where the library cannot be told apart */
+#define PROBE_BLAS()
+#else
+static pthread_once_t blas_probed = PTHREAD_ONCE_INIT;
+#define PROBE_BLAS() pthread_once(&blas_probed, probe_blas)
+#endif
+
+const char *api_dlf_get_blas_library(void)
+{
+    PROBE_BLAS();
+    return blas_library;
+}
+
+const char *api_dlf_get_blas_vendor(void)
+{
+    PROBE_BLAS();
+    return blas_vendor;
+}
+
+int api_dlf_get_blas_threads(void)
+{
+    PROBE_BLAS();
+    if (get_threads != NULL) return get_threads();
+    if (bli_get_threads != NULL) return (int)bli_get_threads();
+    return -1;
+}
+
+int api_dlf_set_blas_threads(int nthreads)
+{
+    int previous = api_dlf_get_blas_threads();
+
+    if (nthreads < 1 || previous < 0) return -1;
+    if (set_threads != NULL) {
+        set_threads(nthreads);
+    } else if (bli_set_threads != NULL) {
+        bli_set_threads(nthreads);
+    } else {
+        return -1;
+    }
+    return previous;
+}
@@ -0,0 +1,346 @@
+/*
+ *  Copyright 2021 Kjell Jorner
+ *
+ *  This file is part of libdlfind.
+ *
+ *  libdlfind is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU Lesser General Public License as
+ *  published by the Free Software Foundation, either version 3 of the
+ *  License, or (at your option) any later version.
+ *
+ *  libdlfind is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU Lesser General Public License for more details.
+ *
+ *  You should have received a copy of the GNU Lesser General Public
+ *  License along with libdlfind.  If not, see
+ *  <http://www.gnu.org/licenses/>.
+ */
+
+/* Context handles for api_dl_find. The trampolines below forward the
+   callbacks of DL-FIND to the callbacks of the context that is currently
+   running, together with its user_data pointer. Runs are serialized with the
+   lock of api_dl_find_recoverable, see recover.c. */
+
+#include <stdlib.h>
+
+#include "libdlfind.h"
+
+struct dlf_context {
+    int nvarin;
+    int nvarin2;
+    int nspec;
+    int master;
+    dlf_callbacks callbacks;
+    void *user_data;
+    int *cancel_flag;
+    double time_limit;
+};
+
+/* Context of the current run, only accessed while holding the run lock */
+static dlf_context *current = NULL;
+
+static void error_trampoline(void)
+{
+    dlf_context *ctx = current;
+    if (ctx->callbacks.error != NULL)
+        ctx->callbacks.error(ctx->user_data);
+}
+
+static void get_gradient_trampoline(
+    int nvar,
+    double *coords,
+    double *energy,
+    double *gradient,
+    int iimage,
+    int kiter,
+    int *status)
+{
+    dlf_context *ctx = current;
+    if (ctx->callbacks.get_gradient == NULL) {
+        *status = 1;
+        return;
+    }
+    ctx->callbacks.get_gradient(
+        nvar, coords, energy, gradient, iimage, kiter, status, ctx->user_data);
+}
+
+static void get_hessian_trampoline(
+    int nvar,
+    double *coords,
+    double *hessian,
+    int *status)
+{
+    dlf_context *ctx = current;
+    if (ctx->callbacks.get_hessian == NULL) {
+        *status = 1;
+        return;
+    }
+    ctx->callbacks.get_hessian(nvar, coords, hessian, status, ctx->user_data);
+}
+
+static void get_multistate_gradients_trampoline(
+    int nvar,
+    double *coords,
+    double *energy,
+    double *gradient,
+    double *coupling,
+    int needcoupling,
+    int iimage,
+    int *status)
+{
+    dlf_context *ctx = current;
+    if (ctx->callbacks.get_multistate_gradients == NULL) {
+        *status = 1;
+        return;
+    }
+    ctx->callbacks.get_multistate_gradients(
+        nvar, coords, energy, gradient, coupling, needcoupling, iimage, status,
+        ctx->user_data);
+}
+
+static void get_params_trampoline(
+    int nvar,
+    int nvar2,
+    int nspec,
+    double *coords,
+    double *coords2,
+    int *spec,
+    int *ierr,
+    double *tolerance,
+    int *printl,
+    int *maxcycle,
+    int *maxene,
+    int *tatoms,
+    int *icoord,
+    int *iopt,
+    int *iline,
+    double *maxstep,
+    double *scalestep,
+    int *lbfgs_mem,
+    int *nimage,
+    double *nebk,
+    int *dump,
+    int *restart,
+    int *nz,
+    int *ncons,
+    int *nconn,
+    int *update,
+    int *maxupd,
+    double *delta,
+    double *soft,
+    int *inithessian,
+    int *carthessian,
+    int *tsrel,
+    int *maxrot,
+    double *tolrot,
+    int *nframe,
+    int *nmass,
+    int *nweight,
+    double *timestep,
+    double *fric0,
+    double *fricfac,
+    double *fricp,
+    int *imultistate,
+    int *state_i,
+    int *state_j,
+    double *pf_c1,
+    double *pf_c2,
+    double *gp_c3,
+    double *gp_c4,
+    double *ln_t1,
+    double *ln_t2,
+    int *printfile,
+    double *tolerance_e,
+    double *distort,
+    int *massweight,
+    double *minstep,
+    int *maxdump,
+    int *task,
+    double *temperature,
+    int *po_pop_size,
+    double *po_radius,
+    double *po_contraction,
+    double *po_tolerance_r,
+    double *po_tolerance_g,
+    int *po_distribution,
+    int *po_maxcycle,
+    int *po_init_pop_size,
+    int *po_reset,
+    double *po_mutation_rate,
+    double *po_death_rate,
+    double *po_scalefac,
+    int *po_nsave,
+    int *ntasks,
+    int *tdlf_farm,
+    int *n_po_scaling,
+    double *neb_climb_test,
+    double *neb_freeze_test,
+    int *nzero,
+    int *coupled_states,
+    int *qtsflag,
+    int *imicroiter,
+    int *maxmicrocycle,
+    int *micro_esp_fit)
+{
+    dlf_context *ctx = current;
+    ctx->callbacks.get_params(
+        nvar, nvar2, nspec, coords, coords2, spec, ierr, tolerance, printl,
+        maxcycle, maxene, tatoms, icoord, iopt, iline, maxstep, scalestep,
+        lbfgs_mem, nimage, nebk, dump, restart, nz, ncons, nconn, update, maxupd,
+        delta, soft, inithessian, carthessian, tsrel, maxrot, tolrot, nframe, nmass,
+        nweight, timestep, fric0, fricfac, fricp, imultistate, state_i, state_j,
+        pf_c1, pf_c2, gp_c3, gp_c4, ln_t1, ln_t2, printfile, tolerance_e, distort,
+        massweight, minstep, maxdump, task, temperature, po_pop_size, po_radius,
+        po_contraction, po_tolerance_r, po_tolerance_g, po_distribution,
+        po_maxcycle, po_init_pop_size, po_reset, po_mutation_rate, po_death_rate,
+        po_scalefac, po_nsave, ntasks, tdlf_farm, n_po_scaling, neb_climb_test,
+        neb_freeze_test, nzero, coupled_states, qtsflag, imicroiter, maxmicrocycle,
+        micro_esp_fit, ctx->user_data);
+}
+
+static void put_coords_trampoline(
+    int nvar,
+    int switch_,
+    double energy,
+    double *coords,
+    int iam)
+{
+    dlf_context *ctx = current;
+    if (ctx->callbacks.put_coords != NULL)
+        ctx->callbacks.put_coords(nvar, switch_, energy, coords, iam, ctx->user_data);
+}
+
+static void update_trampoline(void)
+{
+    dlf_context *ctx = current;
+    if (ctx->callbacks.update != NULL)
+        ctx->callbacks.update(ctx->user_data);
+}
+
+static void get_gradient_batch_trampoline(
+    int nvar,
+    int nbatch,
+    double *coords,
+    double *energy,
+    double *gradient,
+    int *iimage,
+    int kiter,
+    int *status)
+{
+    dlf_context *ctx = current;
+    ctx->callbacks.get_gradient_batch(
+        nvar, nbatch, coords, energy, gradient, iimage, kiter, status,
+        ctx->user_data);
+}
+
+static void checkpoint_trampoline(int nenergy, int ncycle)
+{
+    dlf_context *ctx = current;
+    ctx->callbacks.checkpoint(nenergy, ncycle, ctx->user_data);
+}
+
+static void stop_trampoline(
+    int nvar,
+    double *coords,
+    double energy,
+    int nenergy,
+    int ncycle,
+    int *stop)
+{
+    dlf_context *ctx = current;
+    ctx->callbacks.stop(nvar, coords, energy, nenergy, ncycle, stop, ctx->user_data);
+}
+
+static void get_hessian_batch_trampoline(
+    int nvar,
+    int nbatch,
+    double *coords,
+    double *hessian,
+    int *status)
+{
+    dlf_context *ctx = current;
+    ctx->callbacks.get_hessian_batch(nvar, nbatch, coords, hessian, status, ctx->user_data);
+}
+
+dlf_context *dlf_context_create(
+    int nvarin,
+    int nvarin2,
+    int nspec,
+    int master,
+    const dlf_callbacks *callbacks,
+    void *user_data)
+{
+    dlf_context *ctx = calloc(1, sizeof(dlf_context));
+    if (ctx == NULL)
+        return NULL;
+    ctx->nvarin = nvarin;
+    ctx->nvarin2 = nvarin2;
+    ctx->nspec = nspec < 0 ? 2 * (nvarin / 3) : nspec;
+    ctx->master = master;
+    if (callbacks != NULL)
+        ctx->callbacks = *callbacks;
+    ctx->user_data = user_data;
+    return ctx;
+}
+
+void dlf_context_set_cancel_flag(dlf_context *ctx, int *flag)
+{
+    ctx->cancel_flag = flag;
+}
+
+void dlf_context_set_time_limit(dlf_context *ctx, double seconds)
+{
+    ctx->time_limit = seconds;
+}
+
+int dlf_context_run(dlf_context *ctx)
+{
+    int status;
+
+    if (ctx == NULL || ctx->callbacks.get_params == NULL)
+        return -1;
+
+    if (api_dlf_lock_runs() != 0)
+        return -2;
+    current = ctx;
+    api_dlf_set_gradient_batch(
+        ctx->callbacks.get_gradient_batch != NULL ? get_gradient_batch_trampoline : NULL);
+    api_dlf_set_checkpoint(
+        ctx->callbacks.checkpoint != NULL ? checkpoint_trampoline : NULL);
+    api_dlf_set_stop(ctx->callbacks.stop != NULL ? stop_trampoline : NULL);
+    api_dlf_set_hessian_batch(
+        ctx->callbacks.get_hessian_batch != NULL ? get_hessian_batch_trampoline : NULL);
+    api_dlf_set_cancel_flag(ctx->cancel_flag);
+    api_dlf_set_time_limit(ctx->time_limit);
+    status = api_dl_find_recoverable(
+        ctx->nvarin,
+        ctx->nvarin2,
+        ctx->nspec,
+        ctx->master,
+        ctx->callbacks.error != NULL ? error_trampoline : NULL,
+        ctx->callbacks.get_gradient != NULL ? get_gradient_trampoline : NULL,
+        ctx->callbacks.get_hessian != NULL ? get_hessian_trampoline : NULL,
+        ctx->callbacks.get_multistate_gradients != NULL
+            ? get_multistate_gradients_trampoline
+            : NULL,
+        get_params_trampoline,
+        ctx->callbacks.put_coords != NULL ? put_coords_trampoline : NULL,
+        ctx->callbacks.update != NULL ? update_trampoline : NULL);
+    api_dlf_set_gradient_batch(NULL);
+    api_dlf_set_checkpoint(NULL);
+    api_dlf_set_stop(NULL);
+    api_dlf_set_hessian_batch(NULL);
+    api_dlf_set_cancel_flag(NULL);
+    api_dlf_set_time_limit(0.0);
+    current = NULL;
+    api_dlf_unlock_runs();
+
+    return status;
+}
+
+void dlf_context_destroy(dlf_context *ctx)
+{
+    free(ctx);
+}
@@ -336,6 +336,8 @@ subroutine dlf_run( &
   use dlf_global, only: glob,stdout,printl,printf
   use dlf_stat, only: stat
   use dlf_allocate, only: allocate,deallocate
+  use mod_stop, only: stop_check ! libdlfind
+  use mod_output, only: output_file ! libdlfind
   implicit none
 #ifdef GAMESS
   real(rk) :: core(*) ! GAMESS memory, not used in DL-FIND
@@ -429,45 +431,45 @@ subroutine dlf_run( &
     if(printf>=3) then
       if(stat%sene>0) THEN
         if (glob%iam == 0) then
-          open(unit=330,file="path.xyz",position="APPEND")
-          open(unit=331,file="path_active.xyz",position="APPEND")
+          open(unit=330,file=output_file("path.xyz"),position="APPEND")
+          open(unit=331,file=output_file("path_active.xyz"),position="APPEND")
           ! Only open for TS search methods
           if (glob%iopt == 10 .or. (glob%icoord >= 100 .and. glob%icoord < 300)) then
-             open(unit=332,file="path_tsmode.xyz",position="APPEND")
+             open(unit=332,file=output_file("path_tsmode.xyz"),position="APPEND")
           end if
           ! Only for microiterative optimisations
           if (glob%imicroiter > 0) then
-             open(unit=333,file="path_micro.xyz",position="APPEND")
+             open(unit=333,file=output_file("path_micro.xyz"),position="APPEND")
           end if
         end if
       ELSE
         if (glob%iam == 0) then
-          open(unit=330,file="path.xyz")
-          open(unit=331,file="path_active.xyz")
+          open(unit=330,file=output_file("path.xyz"))
+          open(unit=331,file=output_file("path_active.xyz"))
           ! Only open for TS search methods
           if (glob%iopt == 10 .or. (glob%icoord >= 100 .and. glob%icoord < 300)) then
-             open(unit=332,file="path_tsmode.xyz")
+             open(unit=332,file=output_file("path_tsmode.xyz"))
           end if
           ! Only for microiterative optimisations
           if (glob%imicroiter > 0) then
-             open(unit=333,file="path_micro.xyz")
+             open(unit=333,file=output_file("path_micro.xyz"))
           end if
         end if
       end if
     end if
     if(printf>=4.and.glob%iam == 0) then
       if(stat%sene>0) THEN
-        open(unit=300,file="path_force.xyz",position="APPEND")
+        open(unit=300,file=output_file("path_force.xyz"),position="APPEND")
         !open(unit=301,file="paths.xyz",position="APPEND")
       ELSE
-        open(unit=300,file="path_force.xyz")
+        open(unit=300,file=output_file("path_force.xyz"))
         !open(unit=301,file="paths.xyz")
       end if
     end if
     call clock_stop("XYZ")
   else
     if (glob%iam == 0) then
-       open(unit=330,file="path.inc")
+       open(unit=330,file=output_file("path.inc"))
        !open(unit=330,file="path.inc",position="append")
     end if
   end if
@@ -529,6 +531,15 @@ subroutine dlf_run( &
       exit
     end if
 
+    ! libdlfind: get out of main cycle if the caller asks to stop
+    if(stop_check()) then
+      stat%ccycle= stat%ccycle-1
+      stat%sene=stat%sene-1
+      if(printl>=2) write(stdout,"(&
+          &'Stopping: requested by the caller')")
+      exit
+    end if
+
     ! Parallel NEB: determine whether this workgroup should calculate a gradient
     !if (glob%icoord/100 == 1 .and. glob%ntasks > 1 .and. glob%iopt/=12 ) then
     call dlf_qts_get_int("TASKFARM_MODE",taskfarm_mode)
@@ -687,6 +698,7 @@ subroutine dlf_run( &
           if(printl>=6) write(stdout,"('Writing restart information')")
           call dlf_checkpoint_write(status)
           call clock_stop("CHECKPOINT")
+          call dlf_checkpoint_notify() ! libdlfind
         end if
       end if
     end if
@@ -757,6 +769,7 @@ subroutine dlf_run( &
           if(printl>=6) write(stdout,"('Writing restart information')")
           call dlf_checkpoint_write(status)
           call clock_stop("CHECKPOINT")
+          call dlf_checkpoint_notify() ! libdlfind
         end if
       end if
     end if    
@@ -1020,7 +1033,7 @@ subroutine dlf_run( &
   ! again some rubbish for printing ...
   if(glob%icoord/100==1.and..not.glob%tatoms) then
     if (glob%iam == 0) then
-       open(unit=330,file="path.inc")
+       open(unit=330,file=output_file("path.inc"))
        do ivar=1,glob%nimage
          write(330,"('sphere{<',f12.4,',',f12.4,',',f12.4,'> 0.04}')") &
              glob%icoords(ivar*2-1),1.D0,glob%icoords(ivar*2)
@@ -1324,8 +1337,10 @@ subroutine dlf_fail(msg)
 !! SOURCE
   use dlf_global, only: glob, stdout, stderr
   use dlf_store, only: store_delete_all
+  use mod_error, only: error_record ! libdlfind
   implicit none
   character(*),intent(in) :: msg
+  call error_record(msg) ! libdlfind
   call flush(stdout)
   call flush(stderr)
   write(stderr,"(/,a,/,a,/)") "DL-FIND ERROR:",msg
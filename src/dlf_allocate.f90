@@ -66,6 +66,9 @@ contains
   ! only dummies. These subroutines should never be called
   subroutine allocate_report
   end subroutine allocate_report
+  subroutine allocate_set_stdout(unit)
+    integer, intent(in) :: unit
+  end subroutine allocate_set_stdout
   subroutine allocate
   end subroutine allocate
   subroutine deallocate
@@ -79,6 +82,7 @@ contains
   Public :: allocate
   Public :: deallocate
   Public :: allocate_report
+  Public :: allocate_set_stdout ! libdlfind
 
   interface allocate
     module procedure allocate_r1
@@ -409,7 +413,7 @@ contains
 ! %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
   subroutine allocate_error(fail)
     integer, intent(in) :: fail
-    print*,"Error number",fail
+    write(stdout,*) "Error number",fail
     ! g95: 211 - allocated
     !      210 - Operating system error: Cannot allocate memory
     ! ifort: 151 allocated
@@ -478,6 +482,12 @@ contains
   end subroutine allocate_report
 !!****
 
+  ! libdlfind: unit the memory report is written to
+  subroutine allocate_set_stdout(unit)
+    integer, intent(in) :: unit
+    stdout=unit
+  end subroutine allocate_set_stdout
+
 #endif
 
 end module dlf_allocate
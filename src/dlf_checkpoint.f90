@@ -124,6 +124,7 @@ subroutine dlf_checkpoint_read(status,tok)
   use dlf_global, only: glob,stdout,printl
   use dlf_stat, only: stat
   use dlf_checkpoint, only: tchkform, read_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   integer,intent(out) :: status
   logical,intent(out) :: tok
@@ -147,16 +148,16 @@ subroutine dlf_checkpoint_read(status,tok)
   tok=.false.
 
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_global.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_global.chk"),EXIST=tchk)
   if(.not.tchk) then
     write(stdout,10) "File dlf_global.chk not found"
     return
   end if
 
   if(tchkform) then
-    open(unit=ifunit,file="dlf_global.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_global.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_global.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_global.chk"),form="unformatted")
   end if
   
   call read_separator(ifunit,"Global sizes",tchk)
@@ -408,6 +409,7 @@ subroutine dlf_checkpoint_write(status)
   use dlf_global, only: glob,printl
   use dlf_stat, only: stat
   use dlf_checkpoint, only: tchkform, write_separator
+  use mod_checkpoint, only: checkpoint_file, checkpoint_begin ! libdlfind
   implicit none
   integer, intent(in) :: status
   character(20) :: separator
@@ -417,6 +419,7 @@ subroutine dlf_checkpoint_write(status)
 ! Only want one processor to do the writing; that processor must know 
 ! all the necessary information.
   if (glob%iam /= 0) return
+  call checkpoint_begin() ! libdlfind
   ! Q: Should task-farming really be treated differently?
   ! It might be better for each 
   ! workgroup to write its own checkpoint so task-farming 
@@ -430,7 +433,7 @@ subroutine dlf_checkpoint_write(status)
   ! NB: File names would have to be labelled by workgroup too 
   ! as we cannot assume each has its own scratch directory.
   if(tchkform) then
-    open(unit=ifunit,file="dlf_global.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_global.chk"),form="formatted")
     call write_separator(ifunit,"Global sizes")
     write(ifunit,*) &
         glob%nvar, glob%iopt, glob%iline, glob%lbfgs_mem, glob%icoord, &
@@ -476,7 +479,7 @@ subroutine dlf_checkpoint_write(status)
     call write_separator(ifunit,"END")
 
   else
-    open(unit=ifunit,file="dlf_global.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_global.chk"),form="unformatted")
     call write_separator(ifunit,"Global sizes")
     write(ifunit) &
         glob%nvar, glob%iopt, glob%iline, glob%lbfgs_mem, glob%icoord, &
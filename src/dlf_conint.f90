@@ -1092,6 +1092,7 @@ subroutine dlf_checkpoint_conint_write
    use dlf_global, only: glob
    use dlf_conint, only: conint
    use dlf_checkpoint, only: tchkform, write_separator
+   use mod_checkpoint, only: checkpoint_file ! libdlfind
    implicit none
   ! YL 15/12/2020: we need avoid using file units ifunit, 101, or 102 to make Cray compiler happy
   !                see pp 141: http://103.251.184.12/wp-content/uploads/2018/01/Cray_Fortran_Reference_Manual_S-3901_86.pdf
@@ -1110,9 +1111,9 @@ subroutine dlf_checkpoint_conint_write
       ! No checkpoint required
    case (3)
       if (tchkform) then
-         open(unit=ifunit, file="dlf_conint.chk", form="formatted")
+         open(unit=ifunit, file=checkpoint_file("dlf_conint.chk"), form="formatted")
       else
-         open(unit=ifunit, file="dlf_conint.chk", form="unformatted")
+         open(unit=ifunit, file=checkpoint_file("dlf_conint.chk"), form="unformatted")
       end if
       call write_separator(ifunit, "LN data")
       if (tchkform) then
@@ -1155,6 +1156,7 @@ subroutine dlf_checkpoint_conint_read(tok)
    use dlf_global, only: glob, stdout
    use dlf_conint, only: conint
    use dlf_checkpoint, only: tchkform, read_separator
+   use mod_checkpoint, only: checkpoint_file ! libdlfind
    implicit none
    logical, intent(out) :: tok
    logical :: tchk
@@ -1171,15 +1173,15 @@ subroutine dlf_checkpoint_conint_read(tok)
       tok = .true.
    case (3)
       ! check if checkpoint file exists
-      inquire(file="dlf_conint.chk", exist=tchk)
+      inquire(file=checkpoint_file("dlf_conint.chk"), exist=tchk)
       if(.not.tchk) then
          write(stdout,10) "File dlf_conint.chk not found"
          return
       end if
       if (tchkform) then
-         open(unit=ifunit, file="dlf_conint.chk", form="formatted")
+         open(unit=ifunit, file=checkpoint_file("dlf_conint.chk"), form="formatted")
       else
-         open(unit=ifunit, file="dlf_conint.chk", form="unformatted")
+         open(unit=ifunit, file=checkpoint_file("dlf_conint.chk"), form="unformatted")
       end if
       call read_separator(ifunit, "LN data", tchk)
       if (.not. tchk) return
@@ -56,6 +56,9 @@ module dlf_convergence
   real(rk),save     :: vals    ! Maximum step value
   integer ,save     :: locs(1) ! location of the maximum step val
   real(rk),save     :: valrmss ! RMS step value
+  ! libdlfind: state of the last test for the callbacks
+  logical ,save     :: ttested=.false. ! convergence tested in this run?
+  real(rk),save     :: valde=-1.D0 ! energy change, negative if not tested
 end module dlf_convergence
 
 ! %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
@@ -88,6 +91,9 @@ subroutine convergence_test(icycle,tene,tconv)
   real(rk) :: svar
 ! **********************************************************************
 
+  ttested=.true. ! libdlfind
+  valde=-1.D0 ! libdlfind
+
   ! This is initialisation in reality
   if(glob%tolerance<0.D0) call dlf_fail("Convergence tolerance < 0")
   tolg=glob%tolerance
@@ -111,6 +117,7 @@ subroutine convergence_test(icycle,tene,tconv)
 
     ! energy convergence
     svar=abs(vale-glob%oldenergy_conv)
+    valde=svar ! libdlfind
     le=(svar < tole)
     if(printl>0) then
       if(le) then
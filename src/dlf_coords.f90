@@ -368,7 +368,7 @@ subroutine dlf_coords_xtoi(trerun_energy,testconv,iimage)
   testconv=.false.
   iimage=1
   
-  if(printl>=6) print*,"Transforming X to I"
+  if(printl>=6) write(stdout,*) "Transforming X to I"
   trerun_energy=.false.
 
   select case (glob%icoord/10)
@@ -452,7 +452,7 @@ subroutine dlf_coords_itox(iimage)
 ! **********************************************************************
   iimage=1
 
-  if(printl>=6) print*,"Transforming I to X"
+  if(printl>=6) write(stdout,*) "Transforming I to X"
 
   select case (glob%icoord/10)
 
@@ -786,7 +786,7 @@ subroutine dlf_cartesian_xtoi(nat,nivar,nicore,massweight,xcoords,xgradient,&
     icoords,igradient)
 !! SOURCE
   use dlf_parameter_module, only: rk
-  use dlf_global, only: glob,stderr
+  use dlf_global, only: glob,stderr,stdout
   implicit none
   integer ,intent(in)  :: nat,nivar,nicore
   logical ,intent(in)  :: massweight
@@ -866,11 +866,11 @@ subroutine dlf_cartesian_xtoi(nat,nivar,nicore,massweight,xcoords,xgradient,&
     end if    
   end do
   if(iinner /= nicore + 1) then
-    print*,iinner-1,nicore
+    write(stdout,*) iinner-1,nicore
     call dlf_fail("Error in the transformation cartesian_xtoi (inner)")
   end if
   if(iouter /= nivar + 1) then
-    print*,iouter-1,nivar
+    write(stdout,*) iouter-1,nivar
     call dlf_fail("Error in the transformation cartesian_xtoi (outer)")
   end if
 end subroutine dlf_cartesian_xtoi
@@ -898,7 +898,7 @@ end subroutine dlf_cartesian_xtoi
 subroutine dlf_cartesian_itox(nat,nivar,nicore,massweight,icoords,xcoords)
 !! SOURCE
   use dlf_parameter_module, only: rk
-  use dlf_global, only: glob,stderr
+  use dlf_global, only: glob,stderr,stdout
   implicit none
   integer ,intent(in)   :: nat,nivar,nicore
   logical ,intent(in)   :: massweight
@@ -968,11 +968,11 @@ subroutine dlf_cartesian_itox(nat,nivar,nicore,massweight,icoords,xcoords)
     end if
   end do
   if(iinner /= nicore + 1) then
-    print*,iinner-1,nicore
+    write(stdout,*) iinner-1,nicore
     call dlf_fail("Error in the transformation cartesian_itox (inner)")
   end if
   if(iouter /= nivar + 1) then
-    print*,iouter-1,nivar
+    write(stdout,*) iouter-1,nivar
     call dlf_fail("Error in the transformation cartesian_itox (outer)")
   end if
 end subroutine dlf_cartesian_itox
@@ -999,7 +999,7 @@ end subroutine dlf_cartesian_itox
 subroutine dlf_cartesian_gradient_itox(nat,nivar,nicore,massweight,igradient,xgradient)
 !! SOURCE
   use dlf_parameter_module, only: rk
-  use dlf_global, only: glob,stderr
+  use dlf_global, only: glob,stderr,stdout
   implicit none
   integer ,intent(in)   :: nat,nivar,nicore
   logical ,intent(in)   :: massweight
@@ -1072,11 +1072,11 @@ subroutine dlf_cartesian_gradient_itox(nat,nivar,nicore,massweight,igradient,xgr
     end if
   end do
   if(iinner /= nicore + 1) then
-    print*,iinner-1,nicore
+    write(stdout,*) iinner-1,nicore
     call dlf_fail("Error in the transformation cartesian_gradient_itox (inner)")
   end if
   if(iouter /= nivar + 1) then
-    print*,iouter-1,nivar
+    write(stdout,*) iouter-1,nivar
     call dlf_fail("Error in the transformation cartesian_gradient_itox (outer)")
   end if
 end subroutine dlf_cartesian_gradient_itox
@@ -1147,7 +1147,7 @@ subroutine dlf_cartesian_hessian_xtoi(nat,nvar,nivar,massweight,xhessian,&
     spec,mass,ihessian)
 !! SOURCE
   use dlf_parameter_module, only: rk
-  use dlf_global, only: glob,stderr
+  use dlf_global, only: glob,stderr,stdout
   implicit none
   integer ,intent(in)  :: nat,nvar,nivar
   logical ,intent(in)  :: massweight
@@ -1211,7 +1211,7 @@ subroutine dlf_cartesian_hessian_xtoi(nat,nvar,nivar,massweight,xhessian,&
     end if
   end do
   if(iivar/=nivar+1) then
-    print*,iivar-1,nivar
+    write(stdout,*) iivar-1,nivar
     call dlf_fail("Error in the transformation cartesian_xtoi")
   end if
   ! now transform the hessian
@@ -1243,7 +1243,7 @@ subroutine dlf_cartesian_hessian_itox(nat,nvar,nivar,massweight,ihessian,&
     spec,mass,xhessian)
 !! SOURCE
   use dlf_parameter_module, only: rk
-  use dlf_global, only: stderr
+  use dlf_global, only: stderr,stdout
   implicit none
   integer ,intent(in)  :: nat,nvar,nivar
   logical ,intent(in)  :: massweight
@@ -1303,7 +1303,7 @@ subroutine dlf_cartesian_hessian_itox(nat,nvar,nivar,massweight,ihessian,&
     end if
   end do
   if(iivar/=nivar+1) then
-    print*,iivar-1,nivar
+    write(stdout,*) iivar-1,nivar
     call dlf_fail("Error in the transformation cartesian_itox")
   end if
   ! now transform the hessian
@@ -1353,7 +1353,7 @@ subroutine dlf_coords_tranrot(nvar,vector)
   if(glob%massweight) return
   if(.not.glob%tatoms) return
   if(minval(glob%spec(:)) < 0) then
-    print*,"Warning: removal of rotation and translation not possible&
+    write(stdout,*) "Warning: removal of rotation and translation not possible&
         & for frozen atoms"
     return
   end if
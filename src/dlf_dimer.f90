@@ -123,6 +123,7 @@ subroutine dlf_dimer_init(icoord)
   use dlf_global, only: glob,stderr,stdout,printl,pi
   use dlf_dimer
   use dlf_allocate, only: allocate,deallocate
+  use mod_output, only: output_file ! libdlfind
   implicit none
   integer, intent(in)   :: icoord ! choice of dimer details 
   integer               :: ivar,iat
@@ -186,8 +187,8 @@ subroutine dlf_dimer_init(icoord)
           svar=sum(vnormal*glob%xcoords2(:,iat,1))
           glob%xcoords2(:,iat,1)=glob%xcoords2(:,iat,1)-svar*vnormal
         end do
-        print*,"Random direction after planarising:"
-        write(*,'(3f10.5)') glob%xcoords2
+        write(stdout,*) "Random direction after planarising:"
+        write(stdout,'(3f10.5)') glob%xcoords2
       end if
     end if
 
@@ -328,8 +329,8 @@ subroutine dlf_dimer_init(icoord)
   ! rubbish for printing
   if(.not.glob%tatoms) then
     if (glob%iam == 0) then
-       open(unit=40,file="axis.inc")
-       open(unit=41,file="dimer.xy",position="append")
+       open(unit=40,file=output_file("axis.inc"))
+       open(unit=41,file=output_file("dimer.xy"),position="append")
     end if
   end if
 
@@ -735,9 +736,9 @@ subroutine dlf_dimer_was_g1(internal,stoprot)
     ! normalise dimer%vector:
     svar=dsqrt(ddot(dimer%varperimage,dimer%vector,1,dimer%vector,1))
     if(dimer%cdelta.and.abs(svar-dimer%delta) > 1.D-6 ) then
-      print*,"Error: dimer distance wrong:"
-      print*,"Distance after step:",svar
-      print*,"Required distance:",dimer%delta
+      write(stdout,*) "Error: dimer distance wrong:"
+      write(stdout,*) "Distance after step:",svar
+      write(stdout,*) "Required distance:",dimer%delta
       call dlf_fail("Wrong dimer distance!")
     end if
     dimer%vector=dimer%vector/svar
@@ -910,10 +911,10 @@ subroutine dlf_dimer_was_g1prime(stoprot,phi1)
     write(stdout,"('Expected curvature at dimer minimum       ',f12.5)") curve2
   end if
   if( curve2 > dimer%curve ) then
-    if(printl>=6) print*,"Obtained angle seems to be a maximum: ",curve2
+    if(printl>=6) write(stdout,*) "Obtained angle seems to be a maximum: ",curve2
     dimer%phi=dimer%phi-0.5d0 * pi
     curve2=0.5D0 * a0 + a1 * cos(2.D0 * dimer%phi) + b1 * sin(2.D0 * dimer%phi)
-    if(printl>=6) print*,"New curvature, now hopefully a minimum",curve2
+    if(printl>=6) write(stdout,*) "New curvature, now hopefully a minimum",curve2
   end if
   if(abs(dimer%phi-phi1) > pi*0.5D0) then
     if(dimer%phi<phi1) then
@@ -1032,7 +1033,7 @@ subroutine dlf_dimer_checkstep
     ss= ddot(dimer%varperimage,glob%step(dimer%varperimage+1:), 1, &
         glob%step(dimer%varperimage+1:), 1)
 
-    write(*,'("Distance scaled from",F10.5," to",F10.5)') SQRT(ss),dimer%delta
+    write(stdout,'("Distance scaled from",F10.5," to",F10.5)') SQRT(ss),dimer%delta
     glob%step(dimer%varperimage+1:) = glob%step(dimer%varperimage+1:) &
         / dsqrt(ss) * dimer%delta
     ! make sure N does not change by more than 90 deg (as then -step is the relevant step)
@@ -1095,9 +1096,9 @@ subroutine dlf_dimer_checkstep
     ss= sqrt(ddot(dimer%varperimage,glob%icoords(dimer%varperimage+1:), 1, &
         glob%icoords(dimer%varperimage+1:), 1))
     if(abs(ss-dimer%delta) .gt. 1.D-6) then
-      print*,"Error: dimer distance wrong:"
-      print*,"Distance after step:",ss
-      print*,"Required distance:",dimer%delta
+      write(stdout,*) "Error: dimer distance wrong:"
+      write(stdout,*) "Distance after step:",ss
+      write(stdout,*) "Required distance:",dimer%delta
       call dlf_fail("Wrong dimer distance")
     end if
     glob%icoords(dimer%varperimage+1:)=glob%icoords(dimer%varperimage+1:)- &
@@ -1196,6 +1197,7 @@ subroutine dlf_checkpoint_dimer_write
   use dlf_global, only: stderr
   use dlf_dimer, only: dimer
   use dlf_checkpoint, only: tchkform,write_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   ! YL 15/12/2020: we need avoid using file units ifunit, 101, or 102 to make Cray compiler happy
   !                see pp 141: http://103.251.184.12/wp-content/uploads/2018/01/Cray_Fortran_Reference_Manual_S-3901_86.pdf
@@ -1209,7 +1211,7 @@ subroutine dlf_checkpoint_dimer_write
 ! **********************************************************************
   if(tchkform) then
 
-    open(unit=ifunit,file="dlf_dimer.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_dimer.chk"),form="formatted")
 
     call write_separator(ifunit,"Dimer Sizes")
     write(ifunit,*) dimer%varperimage
@@ -1227,7 +1229,7 @@ subroutine dlf_checkpoint_dimer_write
 
   else
 
-    open(unit=ifunit,file="dlf_dimer.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_dimer.chk"),form="unformatted")
 
     call write_separator(ifunit,"Dimer Sizes")
     write(ifunit) dimer%varperimage
@@ -1262,6 +1264,7 @@ subroutine dlf_checkpoint_dimer_read(tok)
   use dlf_global, only: stderr,stdout,printl
   use dlf_dimer, only: dimer
   use dlf_checkpoint, only: tchkform,read_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical,intent(out) :: tok
   logical             :: tchk
@@ -1271,16 +1274,16 @@ subroutine dlf_checkpoint_dimer_read(tok)
   tok=.false.
 
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_dimer.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_dimer.chk"),EXIST=tchk)
   if(.not.tchk) then
     write(stdout,10) "File dlf_dimer.chk not found"
     return
   end if
 
   if(tchkform) then
-    open(unit=ifunit,file="dlf_dimer.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_dimer.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_dimer.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_dimer.chk"),form="unformatted")
   end if
 
 
@@ -107,6 +107,52 @@ module dlf_hessian
   real(rk)            ,save :: minstep      ! minimum step length for Hessian update to be performed
                                        ! set in formstep_init
   logical,save              :: fracrec ! recalculate a fraction of the hessian?
+
+contains
+
+  ! libdlfind: Move coords from the finite-difference displacement of variable
+  ! ivar in direction dir to the next one. Used by dlf_fdhessian and by the
+  ! batched evaluation of the displacements, so that both request exactly the
+  ! same geometries.
+  subroutine fd_next_displacement(nvar_,coords,ivar,dir,fracrecalc)
+    use dlf_global, only: glob
+    implicit none
+    integer,intent(in)     :: nvar_
+    real(rk),intent(inout) :: coords(nvar_)
+    integer,intent(inout)  :: ivar,dir
+    logical,intent(in)     :: fracrecalc
+
+    if(dir==1.and.twopoint) then
+      dir=-1
+      if(fracrecalc) then
+        coords(:)=coords(:) - 2.D0 * glob%delta * eigvec(1:nvar_,ivar)
+      else
+        coords(ivar)=coords(ivar)-2.D0*glob%delta
+      end if
+    else
+      !set back coordinates
+      if(twopoint) then
+        if(fracrecalc) then
+          coords(:)=coords(:) + glob%delta * eigvec(1:nvar_,ivar)
+        else
+          coords(ivar)=coords(ivar)+glob%delta
+        end if
+        dir=1
+      else
+        if(fracrecalc) then
+          coords(:)=coords(:) - glob%delta * eigvec(1:nvar_,ivar)
+        else
+          coords(ivar)=coords(ivar)-glob%delta
+        end if
+      end if
+      ivar=ivar+1
+      if(fracrecalc) then
+        coords(:)=coords(:) + glob%delta * eigvec(1:nvar_,ivar)
+      else
+        coords(ivar)=coords(ivar)+glob%delta
+      end if
+    end if
+  end subroutine fd_next_displacement
 end module dlf_hessian
 
 ! %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
@@ -182,7 +228,7 @@ subroutine dlf_formstep
 
       if(trestart) then
         gamma = 0.D0
-        if(printl >= 2) print*,"Restarting CG algorithm"
+        if(printl >= 2) write(stdout,*) "Restarting CG algorithm"
       else
 
         ! should old gradient and old step be stored in the global module
@@ -190,7 +236,7 @@ subroutine dlf_formstep
         gamma=dot_product( &
             glob%igradient(:)-oldg1(:) , glob%igradient(:) ) / &
             dot_product( oldg1(:) , oldg1(:) )
-        if(printl>=6) print*,"Continuing CG algorithm"
+        if(printl>=6) write(stdout,*) "Continuing CG algorithm"
       end if
 
       glob%step(:)= -1.D0 * glob%igradient(:) + gamma * oldstep(:)
@@ -514,6 +560,7 @@ subroutine dlf_formstep_init(needhessian_)
 ! L-BFGS
   case (3)
     call dlf_lbfgs_init(glob%nivar,glob%lbfgs_mem)
+    call dlf_lbfgs_set_state ! libdlfind
   case (9)
 ! fd-test
     needhessian=.true.
@@ -587,6 +634,7 @@ subroutine dlf_formstep_destroy
   use dlf_formstep_module
   use dlf_hessian
   use dlf_allocate, only: deallocate
+  use mod_state, only: state_save_hessian ! libdlfind
   implicit none
 ! **********************************************************************
 
@@ -599,6 +647,7 @@ subroutine dlf_formstep_destroy
 
 ! L-BFGS
   case (3)
+    call dlf_lbfgs_get_state ! libdlfind
     call dlf_lbfgs_destroy
 ! P-RFO
   case (10)
@@ -606,6 +655,8 @@ subroutine dlf_formstep_destroy
   end select
 
   if(allocated(glob%ihessian)) then
+    ! libdlfind: keep the Hessian for the next run
+    if(glob%havehessian) call state_save_hessian(size(glob%ihessian,1),glob%ihessian)
     call deallocate(glob%ihessian)
     glob%havehessian=.false.
 
@@ -632,6 +683,7 @@ subroutine dlf_checkpoint_formstep_write
   use dlf_formstep_module
   use dlf_hessian
   use dlf_checkpoint, only: tchkform,write_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   ! YL 15/12/2020: we need avoid using file units ifunit, 101, or 102 to make Cray compiler happy
   !                see pp 141: http://103.251.184.12/wp-content/uploads/2018/01/Cray_Fortran_Reference_Manual_S-3901_86.pdf
@@ -646,9 +698,9 @@ subroutine dlf_checkpoint_formstep_write
 
 ! Open the checkpoint file (it may result in an empty file)
   if(tchkform) then
-    open(unit=ifunit,file="dlf_formstep.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_formstep.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_formstep.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_formstep.chk"),form="unformatted")
   end if
 
 ! Data for dlf_formstep_set_tsmode
@@ -749,7 +801,7 @@ subroutine dlf_checkpoint_formstep_write
 ! ======================================================================
   if(allocated(glob%ihessian)) then
     if(tchkform) then
-      open(unit=ifunit,file="dlf_hessian.chk",form="formatted")
+      open(unit=ifunit,file=checkpoint_file("dlf_hessian.chk"),form="formatted")
       call write_separator(ifunit,"Hessian size")
       write(ifunit,*) nihvar
       call write_separator(ifunit,"Hessian data")
@@ -760,7 +812,7 @@ subroutine dlf_checkpoint_formstep_write
       call write_separator(ifunit,"END")
       close(ifunit)
     else
-      open(unit=ifunit,file="dlf_hessian.chk",form="unformatted")
+      open(unit=ifunit,file=checkpoint_file("dlf_hessian.chk"),form="unformatted")
       call write_separator(ifunit,"Hessian size")
       write(ifunit) nihvar
       call write_separator(ifunit,"Hessian data")
@@ -783,6 +835,7 @@ subroutine dlf_checkpoint_formstep_read(tok)
   use dlf_hessian
   use dlf_allocate, only: allocate, deallocate
   use dlf_checkpoint, only: tchkform, read_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical,intent(out) :: tok
   logical             :: tchk
@@ -793,7 +846,7 @@ subroutine dlf_checkpoint_formstep_read(tok)
   tok=.false.
 
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_formstep.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_formstep.chk"),EXIST=tchk)
   if(.not.tchk) then
     write(stdout,10) "File dlf_formstep.chk not found"
     return
@@ -801,9 +854,9 @@ subroutine dlf_checkpoint_formstep_read(tok)
   
   ! open the checkpoint file
   if(tchkform) then
-    open(unit=ifunit,file="dlf_formstep.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_formstep.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_formstep.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_formstep.chk"),form="unformatted")
   end if
 
 ! Data for dlf_formstep_set_tsmode
@@ -853,9 +906,9 @@ subroutine dlf_checkpoint_formstep_read(tok)
   else
     ! the checkpoint file has to be reopened
     if(tchkform) then
-      open(unit=ifunit,file="dlf_formstep.chk",form="formatted")
+      open(unit=ifunit,file=checkpoint_file("dlf_formstep.chk"),form="formatted")
     else
-      open(unit=ifunit,file="dlf_formstep.chk",form="unformatted")
+      open(unit=ifunit,file=checkpoint_file("dlf_formstep.chk"),form="unformatted")
     end if
   end if
 
@@ -939,15 +992,15 @@ subroutine dlf_checkpoint_formstep_read(tok)
   if(allocated(glob%ihessian)) then
     tok=.false.
     ! check if checkpoint file exists
-    INQUIRE(FILE="dlf_hessian.chk",EXIST=tchk)
+    INQUIRE(FILE=checkpoint_file("dlf_hessian.chk"),EXIST=tchk)
     if(.not.tchk) then
       write(stdout,10) "File dlf_hessian.chk not found"
       return
     end if
     if(tchkform) then
-      open(unit=ifunit,file="dlf_hessian.chk",form="formatted")
+      open(unit=ifunit,file=checkpoint_file("dlf_hessian.chk"),form="formatted")
     else
-      open(unit=ifunit,file="dlf_hessian.chk",form="unformatted")
+      open(unit=ifunit,file=checkpoint_file("dlf_hessian.chk"),form="unformatted")
     end if
 
     call read_separator(ifunit,"Hessian size",tchk)
@@ -959,7 +1012,7 @@ subroutine dlf_checkpoint_formstep_read(tok)
       read(ifunit,end=201,err=200) var
     end if
     if(var/=nihvar) then
-      print*,var,nihvar
+      write(stdout,*) var,nihvar
       write(stdout,10) "Inconsistent Hessian size"
       close(ifunit)
       return
@@ -1056,6 +1109,7 @@ subroutine dlf_makehessian(trerun_energy,tconv)
   use dlf_constants, only: dlf_constants_get
   use dlf_allocate
   use dlf_hessian
+  use mod_state, only: state_take_hessian ! libdlfind
   implicit none
   logical, intent(inout) :: trerun_energy
   logical, intent(inout) :: tconv
@@ -1124,7 +1178,10 @@ subroutine dlf_makehessian(trerun_energy,tconv)
         if(tconv) return
       end if
 
-      if (glob%inithessian == 4) then
+      ! libdlfind: start from the Hessian of an earlier run
+      if (state_take_hessian(nihvar, glob%ihessian)) glob%havehessian = .true.
+
+      if (glob%inithessian == 4 .and. .not. glob%havehessian) then ! libdlfind
          ! Initial Hessian is the identity matrix
          glob%ihessian = 0.0d0
          do i = 1, nihvar
@@ -1133,7 +1190,7 @@ subroutine dlf_makehessian(trerun_energy,tconv)
          glob%havehessian = .true.
       end if
 
-      if (glob%inithessian == 0) then
+      if (glob%inithessian == 0 .and. .not. glob%havehessian) then ! libdlfind
          if (glob%imicroiter > 0) call dlf_fail(&
               "inithessian = 0 with microiterative opt not yet implemented")
          ! try to get an analytic Hessian - care about allocation business
@@ -1421,51 +1478,35 @@ subroutine dlf_fdhessian(nvar_,fracrecalc,energy,coords,gradient,hess,havehessia
       if (glob%dotask) then
         hess(iivar,:)=gradient(:)
       end if
-      direction=-1
-      if(fracrecalc) then
-        coords(:)=coords(:) - 2.D0 * glob%delta * eigvec(1:nvar_,iivar)
-      else
-        coords(iivar)=coords(iivar)-2.D0*glob%delta
-      end if
+      call fd_next_displacement(nvar_,coords,iivar,direction,fracrecalc) ! libdlfind
     else
       if(twopoint) then
-        !set back coordinates
         if(fracrecalc) then
           gradient(:)=(hess(iivar,:)-gradient(:))/(2.D0*glob%delta)
           call dlf_matrix_multiply(1,nvar_,nvar_,1.D0,gradient,eigvec(1:nvar_,1:nvar_), &
                0.D0,hess(iivar,:))
-          coords(:)=coords(:) + glob%delta * eigvec(1:nvar_,iivar)
         else
           if (glob%dotask) then
             hess(iivar,:)=(hess(iivar,:)-gradient(:))/(2.D0*glob%delta)
           end if
-          coords(iivar)=coords(iivar)+glob%delta
         end if
-        direction=1
       else
         if(fracrecalc) then
           gradient(:)=(gradient(:)-storegrad(1:nvar_)) / glob%delta
           call dlf_matrix_multiply(1,nvar_,nvar_,1.D0,gradient,eigvec(1:nvar_,1:nvar_), &
                0.D0,hess(iivar,:))
-          coords(:)=coords(:) - glob%delta * eigvec(1:nvar_,iivar)
         else
           if (glob%dotask) then 
             hess(iivar,:)=(gradient(:)-storegrad(1:nvar_)) / glob%delta
           end if
-          coords(iivar)=coords(iivar)-glob%delta
         end if
       end if
-      iivar=iivar+1
+      call fd_next_displacement(nvar_,coords,iivar,direction,fracrecalc) ! libdlfind
       ! Task-farming: next allocation
       call dlf_qts_get_int("TASKFARM_MODE",taskfarm_mode)
       if (.not. fracrecalc .and. glob%ntasks > 1.and.taskfarm_mode==1) then
         glob%dotask = (mod(iivar,glob%ntasks) == glob%mytask)
       end if
-      if(fracrecalc) then
-        coords(:)=coords(:) + glob%delta * eigvec(1:nvar_,iivar)
-      else
-        coords(iivar)=coords(iivar)+glob%delta
-      end if
     end if
       
     havehessian=.false.
@@ -2114,18 +2155,18 @@ subroutine dlf_prfo_step(nvar,coords,gradient,hessian,step)
       ! we are converged
 
       if(lam>lowev) then
-        print*,"Lambda > lowest non-TS eigenvalue, bad Hessian?"
+        write(stdout,*) "Lambda > lowest non-TS eigenvalue, bad Hessian?"
         err=.true.
       end if
 
       if(lam>0.D0 .and. lowev>0.D0) then
-        print*,"Lambda and lowest non-TS eigenvalue >0. Bad Hessian?"
-        print*,"Lambda:",lam
+        write(stdout,*) "Lambda and lowest non-TS eigenvalue >0. Bad Hessian?"
+        write(stdout,*) "Lambda:",lam
         !err=.true.
       end if
 
       if(dbg.and..not.err) then
-        print*,"Lambda converged in",iter,"iterations"
+        write(stdout,*) "Lambda converged in",iter,"iterations"
       end if
       
       conv=.true.
@@ -2181,7 +2222,7 @@ subroutine dlf_prfo_step(nvar,coords,gradient,hessian,step)
         lam_thresh=1.D-5
       end if
       if( abs(lam-eigval(ivar)) < lam_thresh ) then 
-        print*,"WARNING: lam-eigval(ivar) small for non-TS mode",ivar,"!"
+        write(stdout,*) "WARNING: lam-eigval(ivar) small for non-TS mode",ivar,"!"
         ug(ivar)= -1.D0 / eigval(ivar) ! take a newton-raphson step for this one
       else
         ug(ivar)=ug(ivar) / (eigval(ivar) - lam)
@@ -2225,6 +2266,7 @@ subroutine dlf_formstep_set_tsmode(nvar,mode,coords)
   use dlf_formstep_module, only: tscoords, tsmode_r, energy, tenergy, &
       tsc_ok, tsm_ok
   use dlf_allocate, only: allocate, deallocate
+  use mod_output, only: output_file ! libdlfind
   implicit none
   integer ,intent(in) :: nvar
   integer ,intent(in) :: mode
@@ -2320,7 +2362,12 @@ subroutine dlf_formstep_set_tsmode(nvar,mode,coords)
       else
         call dlf_put_coords(glob%nvar,2,energy,tscoords+tsmode_r,glob%iam) 
       end if
-      if(printf>=3.and.glob%iam == 0) call write_xyz(32,glob%nat,glob%znuc,tsmode_r)
+      if(printf>=3.and.glob%iam == 0) then
+        ! libdlfind: named file instead of fort.32 in the working directory
+        open(unit=32,file=output_file("tsmode.xyz"))
+        call write_xyz(32,glob%nat,glob%znuc,tsmode_r)
+        close(32)
+      end if
     end if
     !call deallocate(tscoords)
     !call deallocate(tsmode_r)
@@ -2410,6 +2457,7 @@ subroutine dlf_thermal()
   use dlf_stat, only: stat
   use dlf_constants, only : dlf_constants_get
   use dlf_hessian
+  use mod_output, only: output_file ! libdlfind
   implicit none
   real(rk)        :: frequency_factor,svar
   real(rk)        :: temperature,planck,boltz,wavenumber
@@ -2525,13 +2573,13 @@ subroutine dlf_thermal()
       svibtot=svibtot+svib
     end if
   end do
-  write(*,"('total',35x,3f15.10)") &
+  write(stdout,"('total',35x,3f15.10)") &
       zpetot/hartree,evibtot/hartree,-svibtot/hartree*temperature
-  write(*,"('total vibrational energy correction to E_electronic',&
+  write(stdout,"('total vibrational energy correction to E_electronic',&
       &f15.10,' H')") (zpetot+evibtot-svibtot*temperature)/hartree
-  write(*,"('total ZPE  ',f15.5,' J/mol')") zpetot*avog
-  write(*,"('total E vib',f15.5,' J/mol')") evibtot*avog
-  write(*,"('total S vib',f15.5,' J/mol/K')") svibtot*avog
+  write(stdout,"('total ZPE  ',f15.5,' J/mol')") zpetot*avog
+  write(stdout,"('total E vib',f15.5,' J/mol')") evibtot*avog
+  write(stdout,"('total S vib',f15.5,' J/mol/K')") svibtot*avog
   
   ! write out the hessian and the energy of the "Midpoint" in qts format
   call dlf_constants_get("AMU",svar2)
@@ -2550,7 +2598,7 @@ subroutine dlf_thermal()
     if(printf>=4) then
 
       ! write an xyz file of the transition mode
-      open(unit=55,file="tsmode_mov.xyz")
+      open(unit=55,file=output_file("tsmode_mov.xyz"))
       call write_xyz(55,glob%nat,glob%znuc,glob%xcoords)
       svar=glob%distort
       call dlf_cartesian_xtoi(glob%nat,glob%nivar,glob%nicore,glob%massweight,glob%xcoords, &
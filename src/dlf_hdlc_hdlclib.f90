@@ -30,6 +30,7 @@ MODULE dlfhdlc_hdlclib
   USE dlfhdlc_matrixlib
   USE dlfhdlc_primitive
   USE dlfhdlc_constraint
+  use mod_sparse ! libdlfind
   IMPLICIT NONE
 
 !------------------------------------------------------------------------------
@@ -484,13 +485,13 @@ CONTAINS
             if(prim(nip)-res%biasv(nip) < -pi ) prim(nip)=prim(nip)+ 2.D0 * pi
             ! now bprim should be within pi to bias, if not terminate
             if(prim(nip)-res%biasv(nip) > pi ) then
-              print*,res%biasv(nip)
-              print*,prim(nip)
+              write(stdout,*) res%biasv(nip)
+              write(stdout,*) prim(nip)
               call dlf_fail("HDLC Bias problem")
             end if
             if(prim(nip)-res%biasv(nip) < -pi) then
-              print*,res%biasv(nip)
-              print*,prim(nip)
+              write(stdout,*) res%biasv(nip)
+              write(stdout,*) prim(nip)
               call dlf_fail("HDLC Bias problem")
             end if
             if(printl >= 4 .and. abs(prim(nip)-res%biasv(nip)) > 3.D0) then
@@ -554,13 +555,13 @@ CONTAINS
         if(prim(nip)-res%biasv(nip) < -pi ) prim(nip)=prim(nip)+ 2.D0 * pi
         ! now bprim should be within pi to bias, if not terminate
         if(prim(nip)-res%biasv(nip) > pi ) then
-          print*,res%biasv(nip)
-          print*,prim(nip)
+          write(stdout,*) res%biasv(nip)
+          write(stdout,*) prim(nip)
           call dlf_fail("HDLC Bias problem")
         end if
         if(prim(nip)-res%biasv(nip) < -pi) then
-          print*,res%biasv(nip)
-          print*,prim(nip)
+          write(stdout,*) res%biasv(nip)
+          write(stdout,*) prim(nip)
           call dlf_fail("HDLC Bias problem")
         end if
         if(printl >= 4 .and. abs(prim(nip)-res%biasv(nip)) > 3.D0) then
@@ -606,6 +607,10 @@ CONTAINS
     end IF
 
 ! to find HDLC, multiply each row of UT by the primitive internals and sum up
+! libdlfind: at once for residues with a sparse B matrix
+    IF (sparse_hdlc_active(res%natom)) THEN
+      p(1:n6) = matmul(res%ut%data,prim(1:res%np))
+    ELSE
     DO i = 1, n6
       p(i) = 0.0D0
       idum = matrix_get_row(res%ut,size(iut),iut,i)
@@ -614,6 +619,7 @@ CONTAINS
       END DO
 !      write (stdout,'(a,i4,a,f20.14)') 'HDLC coordinate ', i, ': ', p(i)
     END DO
+    END IF ! libdlfind
 
 ! if in internals, set last 6 to zero
     IF (hdlc%internal) THEN
@@ -658,6 +664,9 @@ CONTAINS
     REAL (rk), DIMENSION (:), ALLOCATABLE :: x, y, z
     REAL (rk), DIMENSION (:,:), POINTER :: ghdlc_dat
     TYPE (matrix) :: bprim, bhdlc, bthdlc, ighdlc, primweight
+    TYPE (sparse_matrix) :: bsparse ! libdlfind
+    REAL (rk), DIMENSION (:), ALLOCATABLE :: gprim, rhs ! libdlfind
+    REAL (rk), DIMENSION (:,:), ALLOCATABLE :: chol ! libdlfind
 
 ! begin, the following exception should never occur
     IF (res%natom/=matrix_dimension(gxyz,1)/3) THEN
@@ -680,6 +689,30 @@ CONTAINS
       n6 = n
     END IF
 
+! libdlfind: for large residues, solve G * HDLC gradient = Ut * B * Cartesian
+! gradient with the sparse B matrix instead
+    IF (sparse_hdlc_active(res%natom)) THEN
+      CALL hdlc_make_bprim(res%natom,x,y,z,res%nconn,res%iconn,res%nbend, &
+        res%ibend,res%nrots,res%irots,res%np,bprim,ni,res%xweight,primweight, &
+        bsparse)
+      idum=matrix_destroy(primweight)
+      call allocate (gprim,ni)
+      call allocate (rhs,n6)
+      CALL sparse_multiply(bsparse,gxyz%data(:,1),gprim)
+      rhs = matmul(res%ut%data,gprim)
+      CALL sparse_hdlc_solve(bsparse,res%ut%data,chol,rhs,ghdlc%data(:,1), &
+        failed)
+      CALL hdlc_report_failure(res,failed,'intgrd')
+      CALL sparse_destroy(bsparse)
+      IF (allocated(chol)) deallocate (chol)
+      call deallocate (rhs)
+      call deallocate (gprim)
+      call deallocate (z)
+      call deallocate (y)
+      call deallocate (x)
+      RETURN
+    END IF
+
 ! generate a primitive B matrix (force generation of a new matrix)
     idum = matrix_destroy(bprim)
     CALL hdlc_make_bprim(res%natom,x,y,z,res%nconn,res%iconn,res%nbend, &
@@ -836,6 +869,11 @@ CONTAINS
       ighdlc, bprim, scrdif
     ! for printing redudant internals
     TYPE (matrix) :: umat,qmat,primweight
+    ! libdlfind: sparse B matrix and HDLC step for large residues
+    LOGICAL tsparse
+    TYPE (sparse_matrix) :: bsparse
+    REAL (rk), DIMENSION (:), ALLOCATABLE :: ydif, pdif
+    REAL (rk), DIMENSION (:,:), ALLOCATABLE :: chol
 
 ! begin, the following exception should never occur
     IF (res%natom/=matrix_dimension(xyz,1)/3) THEN
@@ -865,9 +903,15 @@ CONTAINS
     END IF
 
 ! generate some work matrices
+    tsparse = sparse_hdlc_active(res%natom) ! libdlfind
     dif = matrix_create(n6,1,'HDLC diff')
     xdif = matrix_create(n,1,'Cart diff')
-    bthdlc = matrix_create(n6,n,'HDLC_BT')
+    IF (tsparse) THEN ! libdlfind
+      call allocate (ydif,n6)
+      call allocate (pdif,res%np)
+    ELSE
+      bthdlc = matrix_create(n6,n,'HDLC_BT')
+    END IF
     xyzbak = matrix_create(n,1,'Cart backup')
     ! xyzback is used in case of breakdown to copy back the original cartesians
     xyzback = matrix_create(n,1,'Cart store')
@@ -1000,6 +1044,15 @@ CONTAINS
     oldprim => prim
     prim => tmp_prim
 
+! libdlfind: only the sparse B matrix is needed for large residues, the HDLC
+! step is solved for below
+    IF (tsparse) THEN
+      CALL hdlc_make_bprim(res%natom,x,y,z,res%nconn,res%iconn,res%nbend, &
+        res%ibend,res%nrots,res%irots,res%np,bprim,ni,res%xweight,primweight, &
+        bsparse)
+      idum=matrix_destroy(primweight)
+    ELSE
+
 ! generate a primitive B matrix from current cartesians
     CALL hdlc_make_bprim(res%natom,x,y,z,res%nconn,res%iconn,res%nbend, &
       res%ibend,res%nrots,res%irots,res%np,bprim,ni,res%xweight,primweight)
@@ -1019,6 +1072,7 @@ CONTAINS
 
 ! make [Bt**-1]t
     idum = matrix_transpose(bthdlc)
+    END IF ! libdlfind
 
 ! get difference between input HDLC and HDLC of the current iteration (olhdlc)
 
@@ -1095,8 +1149,17 @@ CONTAINS
       idum = matrix_copy(xyz,xyzbak)
 
 ! set xyz = oldxyz + [Bt**-1] * trust * [HDLC-HDLC(xyz(i))]
+! libdlfind: [Bt**-1] * dif = B**t * Ut**t * y with G * y = dif
+      IF (tsparse) THEN
+        CALL sparse_hdlc_solve(bsparse,res%ut%data,chol,dif%data(:,1),ydif, &
+          failed)
+        CALL hdlc_report_failure(res,failed,'getcrt')
+        pdif = matmul(ydif,res%ut%data)
+        CALL sparse_multiply_transpose(bsparse,pdif,xdif%data(:,1))
+        idum = matrix_scale(xdif,trust)
+        idum = matrix_add(xyz,xdif,res%oldxyz)
 ! if internal, create a scratch copy of dif with the last six elements missing
-      IF (hdlc%internal) THEN
+      ELSE IF (hdlc%internal) THEN
         scrdif = matrix_create(n6,1,'scrdif')
         call allocate (tmp_dif,n)
         idum = matrix_get(dif,n,tmp_dif)
@@ -1115,7 +1178,7 @@ CONTAINS
 ! now xyz contains a guess - recompute the HDLC
     END IF ! (mag.lt.dy)
     idum = matrix_copy(xyz,res%oldxyz)
-    idum = matrix_transpose(bthdlc)
+    IF ( .NOT. tsparse) idum = matrix_transpose(bthdlc) ! libdlfind
     iter = iter + 1
     GO TO 100
 
@@ -1145,6 +1208,12 @@ CONTAINS
     IF (associated(oldprim)) deallocate (oldprim)
     idum = matrix_destroy(dif)
     idum = matrix_destroy(xdif)
+    IF (tsparse) THEN ! libdlfind
+      CALL sparse_destroy(bsparse)
+      IF (allocated(chol)) deallocate (chol)
+      call deallocate (ydif)
+      call deallocate (pdif)
+    END IF
     idum = matrix_destroy(ighdlc)
     idum = matrix_destroy(bthdlc)
     idum = matrix_destroy(bhdlc)
@@ -1239,7 +1308,7 @@ CONTAINS
 !//////////////////////////////////////////////////////////////////////////////
 
   SUBROUTINE hdlc_make_bprim(natom,x,y,z,nconn,iconn,nbend,ibend,nrots,irots, &
-      np,bprim,ni,xweight,primweight)
+      np,bprim,ni,xweight,primweight,bsparse)
 
 ! args
     INTEGER,intent(in) ::  natom
@@ -1248,6 +1317,7 @@ CONTAINS
     REAL (rk)          :: x(natom), y(natom), z(natom)
     TYPE (matrix)      :: bprim,primweight
     real (rk)          :: xweight(natom)
+    TYPE (sparse_matrix), optional :: bsparse ! libdlfind: sparse B matrix instead of bprim
 
 ! local params
     INTEGER ib(4), noint, k, idum
@@ -1295,7 +1365,9 @@ CONTAINS
 ! allocate memory for one row and the B matrix if required
     call allocate (brow,3,natom)
 
-    IF ( .NOT. allocated(bprim%data)) THEN
+    IF (present(bsparse)) THEN ! libdlfind
+      CALL sparse_create(bsparse,ni,3*natom,12*ni)
+    ELSE IF ( .NOT. allocated(bprim%data)) THEN
       IF (printl>=6) WRITE (stdout,'(7X,A)') 'Allocating new B matrix'
       bprim = matrix_create(ni,3*natom,'B matrix')
     END IF
@@ -1339,7 +1411,7 @@ CONTAINS
           brow(k,iconn(j,i)) = b(k,j)
         END DO
       END DO
-      idum = matrix_set_row(bprim,size(brow),brow,noint)
+      CALL store_row(iconn(:,i)) ! libdlfind
 
 ! re-zero brow
       DO j = 1, 2
@@ -1377,7 +1449,7 @@ CONTAINS
               brow(k,ibend(j,i)) = b(k,j)
             END DO
           END DO
-          idum = matrix_set_row(bprim,size(brow),brow,noint)
+          CALL store_row(ibend(1:3,i)) ! libdlfind
 
 ! re-zero brow
           DO j = 1, 3
@@ -1423,7 +1495,7 @@ CONTAINS
               brow(k,ibend(j,i)) = b(k,j)
             END DO
           END DO
-          idum = matrix_set_row(bprim,size(brow),brow,noint)
+          CALL store_row(ibend(1:4,i)) ! libdlfind
 
 ! re-zero brow
           DO j = 1, 4
@@ -1481,7 +1553,7 @@ CONTAINS
           brow(2,ibend(2,i)) = 1.0D0
 
 ! construct row of bmatrix
-          idum = matrix_set_row(bprim,size(brow),brow,noint)
+          CALL store_row(ibend(1:3,i)) ! libdlfind
 
 ! re-zero brow
           DO j = 1, 3
@@ -1544,7 +1616,7 @@ CONTAINS
           END IF
 
 ! construct row of bmatrix
-          idum = matrix_set_row(bprim,size(brow),brow,noint)
+          CALL store_row(ibend(1:3,i)) ! libdlfind
 
 ! re-zero brow
           DO j = 1, 3
@@ -1584,7 +1656,7 @@ CONTAINS
           brow(k,irots(j,i)) = b(k,j)
         END DO
       END DO
-      idum = matrix_set_row(bprim,size(brow),brow,noint)
+      CALL store_row(irots(:,i)) ! libdlfind
 
 ! re-zero brow
       DO j = 1, 4
@@ -1610,7 +1682,7 @@ CONTAINS
 ! if  the added value is too large, the Gram-Schmidt orthogonalization 
 ! in constraints.f90:ortho_mat produces too many non-zero eigenvalues
 !brow(j,i) = fact + dble(i-1)* 3.D-5 + dble(j-1)* 1.D-5 
-          idum = matrix_set_row(bprim,size(brow),brow,noint)
+          CALL store_row((/i/)) ! libdlfind
           brow(j,i) = 0.0D0
         END DO
       END DO
@@ -1618,7 +1690,7 @@ CONTAINS
 
 ! set the number of primitives and print the matrix if requested
     np = noint
-    IF (printl>=6) i = matrix_print(bprim)
+    IF (printl>=6 .AND. .NOT. present(bsparse)) i = matrix_print(bprim) ! libdlfind
 
     call deallocate(brow)
 
@@ -1630,6 +1702,17 @@ CONTAINS
 !//////////////////////////////////////////////////////////////////////////////
 
   CONTAINS
+    ! libdlfind: store the row of the primitive depending on atoms
+    SUBROUTINE store_row(atoms)
+      INTEGER atoms(:)
+
+      IF (present(bsparse)) THEN
+        CALL sparse_set_row(bsparse,noint,atoms,brow)
+      ELSE
+        idum = matrix_set_row(bprim,size(brow),brow,noint)
+      END IF
+    END SUBROUTINE store_row
+
     SUBROUTINE str_dlc(noint,i,j,b,ib,c)
       INTEGER i, j, ib(4,*), noint
       REAL (rk) c(*), b(3,4,1)
@@ -2362,19 +2445,19 @@ CONTAINS
       CALL hdlc_rd_matrix(iunit,res%ut,lform,lerr)
       if(lerr) then
         tok=.false.
-        print*,"Error reading UT matrix from checkpoint"
+        write(stdout,*) "Error reading UT matrix from checkpoint"
         return
       end if
       CALL hdlc_rd_matrix(iunit,res%iweight,lform,lerr)
       if(lerr) then
         tok=.false.
-        print*,"Error reading iweight matrix from checkpoint"
+        write(stdout,*) "Error reading iweight matrix from checkpoint"
         return
       end if
       CALL hdlc_rd_matrix(iunit,res%oldxyz,lform,lerr)
       if(lerr) then
         tok=.false.
-        print*,"Error reading OldXYZ matrix from checkpoint"
+        write(stdout,*) "Error reading OldXYZ matrix from checkpoint"
         return
       end if
 
@@ -2552,9 +2635,10 @@ CONTAINS
 END MODULE dlfhdlc_hdlclib
 
 subroutine hdlc_errflag(msg,action)
+  use dlf_global, only: stdout
   implicit none
   character(*),intent(in) :: msg,action
-  write(*,'("HDLC-errflag, action: ",a)') action
+  write(stdout,'("HDLC-errflag, action: ",a)') action
   call dlf_fail(msg)
 end subroutine hdlc_errflag
 
@@ -106,7 +106,7 @@ subroutine dlf_hdlc_init(nat,spec,icoord,nconstr,iconstr,nincon,incon)
   call allocate(hdlc%resn,nat)
 
   !  hdlc%resn(:)=spec(:)
-  if(dbg) print*,"spec",spec
+  if(dbg) write(stdout,*) "spec",spec
   hdlc%resn=0
   ! attention: ngoups is calculated here as well as in dlf_hdlc_create.
   ! it may be smaller there, as residues may have been deleted
@@ -160,12 +160,12 @@ subroutine dlf_hdlc_init(nat,spec,icoord,nconstr,iconstr,nincon,incon)
     if(rlength(ires)==1) ndel=ndel+1
   end do
   if(ndel>0 .and. printl>=4 ) then
-    print*,ndel," groups will be deleted as they only contain one atom"
+    write(stdout,*) ndel," groups will be deleted as they only contain one atom"
   end if
   ngroups=ngroups-ndel
 
-  if(dbg) print*,"hdlc%resn",hdlc%resn
-  if(dbg) PRINT*,"ngroups",ngroups
+  if(dbg) write(stdout,*) "hdlc%resn",hdlc%resn
+  if(dbg) write(stdout,*) "ngroups",ngroups
 
   IF(ngroups==0) then
     call dlf_fail("No residues present in dfl_hdlc_init")
@@ -1145,14 +1145,15 @@ subroutine dlf_checkpoint_hdlc_write
   ! Write HDLC data to checkpoint file
   use dlfhdlc_hdlclib, only: hdlc,hdlc_wr_hdlc
   use dlf_checkpoint, only: tchkform
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical :: lerr
   integer, parameter :: ifunit = 104
 ! **********************************************************************
   if(tchkform) then
-    open(unit=ifunit,file="dlf_hdlc.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_hdlc.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_hdlc.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_hdlc.chk"),form="unformatted")
   end if
 
   call hdlc_wr_hdlc(ifunit,hdlc,tchkform,lerr)
@@ -1166,14 +1167,15 @@ subroutine dlf_checkpoint_hdlc_read(lerr)
   ! Read HDLC data from checkpoint file
   use dlfhdlc_hdlclib, only: hdlc,hdlc_rd_hdlc
   use dlf_checkpoint, only: tchkform
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical ,intent(out) :: lerr
   integer, parameter :: ifunit = 104
 ! **********************************************************************
   if(tchkform) then
-    open(unit=ifunit,file="dlf_hdlc.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_hdlc.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_hdlc.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_hdlc.chk"),form="unformatted")
   end if
 
   call hdlc_rd_hdlc(ifunit,hdlc,tchkform,lerr)
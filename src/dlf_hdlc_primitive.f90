@@ -512,9 +512,9 @@ CONTAINS
     DO i = 1, nconn
       j = iconn(1,i)
       if (j<=0 .OR. j>natom) then
-        print*,"Connection no",i
-        print*,"Connection between atoms",iconn(1,i),iconn(2,i)
-        print*,"Number of atoms",natom
+        write(stdout,*) "Connection no",i
+        write(stdout,*) "Connection between atoms",iconn(1,i),iconn(2,i)
+        write(stdout,*) "Number of atoms",natom
         CALL hdlc_errflag('Error: atom of connection out of range','stop')
       end if
       ivale(j) = ivale(j) + 1
@@ -106,6 +106,7 @@ MODULE LBFGS_MODULE
     
     integer                 :: point ! CURRENT POSITION IN THE WORK ARRAY
     INTEGER                 :: iter ! number of iteration
+    integer                 :: nstart = 0 ! libdlfind: pairs set by dlf_lbfgs_set_state for the first step
     logical                 :: tinit
     character(40)           :: tag
     type(lbfgs_type),pointer  :: next
@@ -148,11 +149,11 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
 ! **********************************************************************
   if(.not.tinit) call dlf_fail("LBFGS not initialised!")
   if(.not.lbfgs%tinit) then
-    print*,"Instance of L-BFGS:",trim(lbfgs%tag)
+    write(stdout,*) "Instance of L-BFGS:",trim(lbfgs%tag)
     call dlf_fail("This instance of LBFGS not initialised!")
   end if
 
-  if(lbfgs%iter==0) then ! first iteration, steepest descent!
+  if(lbfgs%iter==0.and.lbfgs%nstart==0) then ! first iteration, steepest descent!
     lbfgs%point = 1
     oldpoint = 1
 
@@ -172,6 +173,15 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
   ! All steps but first: calculate L-BFGS Step
   ! ====================================================================
 
+  if(lbfgs%iter==0) then
+    ! libdlfind: first step from the pairs in slots 1..nstart
+    oldpoint = lbfgs%nstart
+    lbfgs%point = lbfgs%nstart + 1
+    IF ( lbfgs%point>lbfgs%m ) lbfgs%point = 1
+    lbfgs%iter = lbfgs%nstart + 1
+    lbfgs%nstart = 0
+  else
+
   ! COMPUTE THE NEW STEP AND GRADIENT CHANGE
   lbfgs%step(:,lbfgs%point) = x(:) - lbfgs%store2(:) 
   lbfgs%dgrad(:,lbfgs%point) = g(:) - lbfgs%store(:)
@@ -184,9 +194,11 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
 
   lbfgs%iter = lbfgs%iter + 1
 
-  if(dbg) print*,"@100 lbfgs%point=",lbfgs%point
-  if(dbg) print*,"lbfgs%dgrad",lbfgs%dgrad
-  if(dbg) print*,"lbfgs%step",lbfgs%step
+  end if ! libdlfind
+
+  if(dbg) write(stdout,*) "@100 lbfgs%point=",lbfgs%point
+  if(dbg) write(stdout,*) "lbfgs%dgrad",lbfgs%dgrad
+  if(dbg) write(stdout,*) "lbfgs%step",lbfgs%step
 
   bound = lbfgs%iter - 1
   IF ( lbfgs%iter>lbfgs%m ) bound = lbfgs%m
@@ -195,7 +207,7 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
   diag(:) = ys/yy ! default guess for diag
   !print*,"JK precon scale factor:",ys/yy
 
-  if(dbg) print*,"Before 200: ys,yy",ys,yy
+  if(dbg) write(stdout,*) "Before 200: ys,yy",ys,yy
 
   ! ====================================================================
   ! COMPUTE -H*G USING THE FORMULA GIVEN IN: Nocedal, J. 1980,
@@ -205,8 +217,8 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
   !
   cp = lbfgs%point
   lbfgs%rho(oldpoint) = 1.D0/ys
-  if(dbg) print*,"lbfgs%rho",lbfgs%rho
-  if(dbg) print*,"bound",bound
+  if(dbg) write(stdout,*) "lbfgs%rho",lbfgs%rho
+  if(dbg) write(stdout,*) "bound",bound
 
   lbfgs%store(:) = -g(:)
   cp = lbfgs%point
@@ -218,8 +230,8 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
     !CALL DAXPY(lbfgs%n,-lbfgs%alpha(cp),lbfgs%dgrad(:,cp),1,lbfgs%store(:),1) 
     lbfgs%store(:)=lbfgs%store(:)-lbfgs%alpha(cp)*lbfgs%dgrad(:,cp)
   END DO
-  if(dbg) print*,"removed DAXPY"
-  if(dbg) print*,"AFTER CALL TO DAXPY"
+  if(dbg) write(stdout,*) "removed DAXPY"
+  if(dbg) write(stdout,*) "AFTER CALL TO DAXPY"
   !
   if(lbfgs%tprecon) then
     ! diag= lbfgs%precon * lbfgs%store manually :-(
@@ -234,7 +246,7 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
   end if
   !
   DO i = 1 , bound
-    if(dbg) print*,"cp",cp
+    if(dbg) write(stdout,*) "cp",cp
     yr = DDOT(lbfgs%n,lbfgs%dgrad(:,cp),1,lbfgs%store(:),1)
     beta = lbfgs%rho(cp)*yr
     beta = lbfgs%alpha(cp) - beta
@@ -263,10 +275,10 @@ SUBROUTINE dlf_lbfgs_step(x,g,step_)
   end if
 
   if(dbg) then
-    print*,"stp",stp
-    print*,"lbfgs%step(:,:)",lbfgs%step(:,:)
-    print*,"lbfgs%point",lbfgs%point
-    print*,"lbfgs%step(:,lbfgs%point)",lbfgs%step(:,lbfgs%point)
+    write(stdout,*) "stp",stp
+    write(stdout,*) "lbfgs%step(:,:)",lbfgs%step(:,:)
+    write(stdout,*) "lbfgs%point",lbfgs%point
+    write(stdout,*) "lbfgs%step(:,lbfgs%point)",lbfgs%step(:,lbfgs%point)
   end if
 
   ! set step (return value)
@@ -296,7 +308,7 @@ subroutine dlf_lbfgs_restart
   ! **********************************************************************
   if(.not.tinit) call dlf_fail("LBFGS not initialised!")
   if(.not.lbfgs%tinit) then
-    print*,"Instance of L-BFGS:",trim(lbfgs%tag)
+    write(stdout,*) "Instance of L-BFGS:",trim(lbfgs%tag)
     call dlf_fail("This instance of LBFGS not initialised!")
   end if
 
@@ -309,6 +321,7 @@ subroutine dlf_lbfgs_restart
     end if
   end if
   lbfgs%iter=0
+  lbfgs%nstart=0 ! libdlfind
 end subroutine dlf_lbfgs_restart
 !!****
 
@@ -326,6 +339,7 @@ end subroutine dlf_lbfgs_restart
 subroutine dlf_lbfgs_select(tag,newinstance)
 !! SOURCE
   USE lbfgs_module
+  use dlf_global, only: stdout ! libdlfind
   implicit none
   character(*), intent(in)  :: tag
   logical     , intent(in)  :: newinstance
@@ -346,7 +360,7 @@ subroutine dlf_lbfgs_select(tag,newinstance)
 
   if(newinstance) then
     if(trim(lbfgs%tag)==trim(tag)) then 
-      print*,"Error, instance ",trim(tag)," already exists and selected &
+      write(stdout,*) "Error, instance ",trim(tag)," already exists and selected &
           &with flag 'new'"
       call dlf_fail("Error selecting new hdlcopt instance")
     end if
@@ -354,11 +368,11 @@ subroutine dlf_lbfgs_select(tag,newinstance)
     ! last instance selected, newtag contains name of new instance
   else
     if(lbfgs%tag/=tag) then
-      print*,"Error, instance ",trim(tag)," does not exist"
-      print*,"Existing inctances:"
+      write(stdout,*) "Error, instance ",trim(tag)," does not exist"
+      write(stdout,*) "Existing inctances:"
       lbfgs=>lbfgs_first
       do while (associated(lbfgs))
-        print*,"--",trim(lbfgs%tag),"--"
+        write(stdout,*) "--",trim(lbfgs%tag),"--"
         lbfgs=>lbfgs%next
       end do
       call dlf_fail("Error selecting new hdlcopt instance")
@@ -366,7 +380,7 @@ subroutine dlf_lbfgs_select(tag,newinstance)
     end if
     ! instance with %tag = tag selected
   end if
-  if(dbg) PRINT*,"SELECTED -",trim(tag),"-"
+  if(dbg) write(stdout,*) "SELECTED -",trim(tag),"-"
 end subroutine dlf_lbfgs_select
 !!****
 
@@ -436,7 +450,7 @@ end subroutine dlf_lbfgs_exists
 subroutine dlf_lbfgs_init(nvar,nmem)
 !! SOURCE
   use dlf_parameter_module, only: rk
-  use dlf_global, only: stderr
+  use dlf_global, only: stderr,stdout
   USE lbfgs_module
   use dlf_allocate, only: allocate, deallocate
   implicit none
@@ -462,14 +476,14 @@ subroutine dlf_lbfgs_init(nvar,nmem)
     else
 
       ! lbfgs should now point to the last existing instance
-      if(dbg) print*,"Current lbfgs instance: ",trim(lbfgs%tag)
+      if(dbg) write(stdout,*) "Current lbfgs instance: ",trim(lbfgs%tag)
       
       ! check that no instance with tag=newtag exists
       lbfgs=>lbfgs_first
       do while (associated(lbfgs%next))
         lbfgs=>lbfgs%next
         if(trim(lbfgs%tag)==trim(newtag)) then
-          print*,"Instance with name ",trim(newtag)," already initialised"
+          write(stdout,*) "Instance with name ",trim(newtag)," already initialised"
           call dlf_fail("Instance with name already initialised")
         end if
       end do
@@ -497,7 +511,7 @@ subroutine dlf_lbfgs_init(nvar,nmem)
   lbfgs%tag=newtag
   lbfgs%tinit=.true.
 
-  if(dbg) print*,"Allocating ",trim(lbfgs%tag)
+  if(dbg) write(stdout,*) "Allocating ",trim(lbfgs%tag)
   lbfgs%n=nvar
   lbfgs%m=nmem
   lbfgs%tprecon=.false.
@@ -514,6 +528,7 @@ subroutine dlf_lbfgs_init(nvar,nmem)
 
   ! variables to set at the beginning
   lbfgs%iter = 0
+  lbfgs%nstart = 0 ! libdlfind
 
   ! initialise (mainly to avoid NaNs in checkpointing)
   lbfgs%store(:)=0.D0
@@ -619,12 +634,13 @@ subroutine dlf_lbfgs_precon(precon)
   !use dlf_global, only: glob,stderr
   USE lbfgs_module
   use dlf_allocate, only: allocate
+  use dlf_global, only: stdout ! libdlfind
   implicit none
   real(rk)  ,intent(in):: precon(lbfgs%N,lbfgs%N)
   ! **********************************************************************
   if(.not.tinit) call dlf_fail("LBFGS not initialised in lbfgs_precon!")
   if(.not.lbfgs%tinit) then
-    print*,"Instance of L-BFGS:",trim(lbfgs%tag)
+    write(stdout,*) "Instance of L-BFGS:",trim(lbfgs%tag)
     call dlf_fail("This instance of LBFGS not initialised!")
   end if
   if(.not.lbfgs%tprecon) then
@@ -635,6 +651,89 @@ subroutine dlf_lbfgs_precon(precon)
 end subroutine dlf_lbfgs_precon
 !!****
 
+! %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+!!****f* lbfgs/dlf_lbfgs_set_state
+!!
+!! FUNCTION
+!!
+!! libdlfind: Fill the memory of the current instance with the steps and
+!! gradient differences of an earlier run (mod_state). The first step is then
+!! an L-BFGS step instead of steepest descent. Pairs without positive
+!! curvature are skipped, and only the newest M are kept.
+!!
+!! SYNOPSIS
+subroutine dlf_lbfgs_set_state
+!! SOURCE
+  use dlf_global, only: stdout, printl
+  USE lbfgs_module
+  use mod_state, only: initial_steps, initial_dgrads
+  implicit none
+  integer  :: ipair, slot
+  real(rk) :: ys
+  real(RK) ,external :: ddot
+  ! **********************************************************************
+  if(.not.tinit) call dlf_fail("LBFGS not initialised in lbfgs_set_state!")
+  if(.not.allocated(initial_steps)) return
+  if(size(initial_steps,1)/=lbfgs%n) &
+      call dlf_fail("Size of the initial L-BFGS memory does not match the internal coordinates")
+
+  slot=0
+  do ipair=max(1,size(initial_steps,2)-lbfgs%m+1),size(initial_steps,2)
+    ys=ddot(lbfgs%n,initial_dgrads(:,ipair),1,initial_steps(:,ipair),1)
+    if(ys<=0.D0) cycle
+    slot=slot+1
+    lbfgs%step(:,slot)=initial_steps(:,ipair)
+    lbfgs%dgrad(:,slot)=initial_dgrads(:,ipair)
+    lbfgs%rho(slot)=1.D0/ys
+  end do
+  lbfgs%iter=0
+  lbfgs%nstart=slot
+  if(printl>=4) write(stdout,'("Starting L-BFGS from ",i0," stored steps")') slot
+end subroutine dlf_lbfgs_set_state
+!!****
+
+! %%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%%
+!!****f* lbfgs/dlf_lbfgs_get_state
+!!
+!! FUNCTION
+!!
+!! libdlfind: Keep the steps and gradient differences in the memory of the
+!! current instance in mod_state, oldest first
+!!
+!! SYNOPSIS
+subroutine dlf_lbfgs_get_state
+!! SOURCE
+  USE lbfgs_module
+  use mod_state, only: final_steps, final_dgrads
+  implicit none
+  integer  :: npair, ipair, slot
+  ! **********************************************************************
+  ! Nothing to keep if LBFGS has not been initialised, e.g., in dlf_fail
+  if(.not.tinit) return
+  if(lbfgs%nstart>0) then
+    ! no step taken, the memory is still the one that was set
+    npair=lbfgs%nstart
+    slot=npair
+  else
+    ! the slot at point holds the last search direction
+    npair=max(0,min(lbfgs%iter-1,lbfgs%m-1))
+    slot=lbfgs%point-1
+    if(slot==0) slot=lbfgs%m
+  end if
+
+  if(allocated(final_steps)) deallocate(final_steps)
+  if(allocated(final_dgrads)) deallocate(final_dgrads)
+  allocate(final_steps(lbfgs%n,npair))
+  allocate(final_dgrads(lbfgs%n,npair))
+  do ipair=npair,1,-1
+    final_steps(:,ipair)=lbfgs%step(:,slot)
+    final_dgrads(:,ipair)=lbfgs%dgrad(:,slot)
+    slot=slot-1
+    if(slot==0) slot=lbfgs%m
+  end do
+end subroutine dlf_lbfgs_get_state
+!!****
+
 !   ----------------------------------------------------------
 !   local routine, only to be used if no external ddot is
 !   available (which is not recommended!)
@@ -710,6 +809,7 @@ subroutine dlf_checkpoint_lbfgs_write
   use dlf_global, only: stderr
   USE lbfgs_module
   use dlf_checkpoint, only: tchkform,write_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   type(lbfgs_type),pointer :: lbfgs_current
   ! YL 15/12/2020: we need avoid using file units ifunit, 101, or 102 to make Cray compiler happy
@@ -728,7 +828,7 @@ subroutine dlf_checkpoint_lbfgs_write
   lbfgs => lbfgs_first
 
   if(tchkform) then
-    open(unit=ifunit,file="dlf_lbfgs.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_lbfgs.chk"),form="formatted")
     call write_separator(ifunit,"current")
     write(ifunit,*) lbfgs_current%tag
     do while (associated(lbfgs))
@@ -742,7 +842,7 @@ subroutine dlf_checkpoint_lbfgs_write
     end do
     call write_separator(ifunit,"END")
   else
-    open(unit=ifunit,file="dlf_lbfgs.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_lbfgs.chk"),form="unformatted")
     call write_separator(ifunit,"current")
     write(ifunit) lbfgs_current%tag
     do while (associated(lbfgs))
@@ -766,6 +866,7 @@ subroutine dlf_checkpoint_lbfgs_read(tok)
   use dlf_global, only: stdout,printl
   USE lbfgs_module
   use dlf_checkpoint, only: tchkform, read_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical,intent(out) :: tok
   logical             :: tchk
@@ -777,16 +878,16 @@ subroutine dlf_checkpoint_lbfgs_read(tok)
   if(.not.tinit) call dlf_fail("LBFGS not initialised! (in checkpoint read)")
 
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_lbfgs.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_lbfgs.chk"),EXIST=tchk)
   if(.not.tchk) then
     write(stdout,10) "File dlf_lbfgs.chk not found"
     return
   end if
 
   if(tchkform) then
-    open(unit=ifunit,file="dlf_lbfgs.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_lbfgs.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_lbfgs.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_lbfgs.chk"),form="unformatted")
   end if
 
   lbfgs => lbfgs_first
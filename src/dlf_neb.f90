@@ -110,6 +110,7 @@ subroutine dlf_neb_init(nimage,icoord)
   use dlf_global, only: glob,stderr,stdout,printf,printl
   use dlf_neb, only: neb,unitp,xyzall,maxxyzfile
   use dlf_allocate, only: allocate,deallocate
+  use mod_output, only: output_file ! libdlfind
   implicit none
   integer, intent(in)  :: nimage
   integer, intent(in)  :: icoord ! choice of NEB details
@@ -388,7 +389,7 @@ subroutine dlf_neb_init(nimage,icoord)
         write(filename,'(i4)') iimage
       end if
       filename="neb_"//trim(adjustl(filename))//".xyz"
-      if (glob%iam == 0) open(unit=unitp+iimage,file=filename)
+      if (glob%iam == 0) open(unit=unitp+iimage,file=output_file(trim(filename)))
     end do
 
     ! write initial xyz coordinates
@@ -721,6 +722,7 @@ subroutine dlf_neb_improved_tangent_neb
   use dlf_parameter_module, only: rk
   use dlf_global, only: glob,stderr,stdout,pi,printl,printf
   use dlf_neb, only: neb,unitp,xyzall,string
+  use mod_output, only: output_file ! libdlfind
   implicit none
   integer               :: cstart,cend
   integer               :: iimage,jimage,ivar
@@ -823,15 +825,15 @@ subroutine dlf_neb_improved_tangent_neb
           neb%ene(iimage)>neb%ene(iimage-1)) then
         ! Tau+
         neb%tau(cstart:cend)=path(:,iimage)
-        if(dbg) print*,"Image",iimage," Tau+"
+        if(dbg) write(stdout,*) "Image",iimage," Tau+"
       else if(neb%ene(iimage+1)<neb%ene(iimage) .and. &
           neb%ene(iimage)<neb%ene(iimage-1)) then
         ! Tau-
         neb%tau(cstart:cend)=path(:,iimage-1)
-        if(dbg) print*,"Image",iimage," Tau-"
+        if(dbg) write(stdout,*) "Image",iimage," Tau-"
       else
         
-        if(dbg) print*,"Image",iimage," Tau+-"
+        if(dbg) write(stdout,*) "Image",iimage," Tau+-"
         ! iimage is either a minimum or a maximum
         emin=min(abs(neb%ene(iimage+1)-neb%ene(iimage)), &
             abs(neb%ene(iimage-1)-neb%ene(iimage)))
@@ -928,7 +930,7 @@ subroutine dlf_neb_improved_tangent_neb
     ! project out the parallel component of the true force
     ! ================================================================
     ! improve - blas
-    if(dbg) print*,"Image",iimage,"F_t||=",sum(glob%igradient(cstart:cend)*neb%tau(cstart:cend))
+    if(dbg) write(stdout,*) "Image",iimage,"F_t||=",sum(glob%igradient(cstart:cend)*neb%tau(cstart:cend))
     glob%igradient(cstart:cend)=glob%igradient(cstart:cend)- &
         sum(glob%igradient(cstart:cend)*neb%tau(cstart:cend))*neb%tau(cstart:cend)
     fper(iimage)=dsqrt(sum((glob%igradient(cstart:cend))**2)/dble(neb%varperimage))
@@ -1185,7 +1187,7 @@ subroutine dlf_neb_improved_tangent_neb
     tmass=(neb%varperimage==glob%nat*3)
     ! list of energies (and work?)
     if (glob%iam == 0) then
-      open(unit=501,file="nebinfo")
+      open(unit=501,file=output_file("nebinfo"))
       if(tmass) then
         write(501,"('# Path length     Energy      Work       Effective Mass')")
       else
@@ -1216,7 +1218,7 @@ subroutine dlf_neb_improved_tangent_neb
     if (glob%iam == 0) close(501)
     
     ! nebpath.xyz
-    if (glob%iam == 0) open(unit=501,file="nebpath.xyz")
+    if (glob%iam == 0) open(unit=501,file=output_file("nebpath.xyz"))
     do iimage=1,neb%nimage-1
       ! here, always write the whole system
       !if(xyzall) then
@@ -1292,13 +1294,13 @@ subroutine dlf_neb_checkstep
   do iimage=2,neb%nimage-2
     if(.not.treduce(iimage)) cycle
     if(iimage==neb%maximage) cycle
-    PRINT*,"-------- Path corrections -----------"
+    write(stdout,*) "-------- Path corrections -----------"
     do jimage=iimage+1,neb%nimage-2
       if(.not.treduce(jimage)) exit
       if(jimage==neb%maximage) exit
       treduce(jimage)=.false. ! will be covered now
     end do
-    print*,"Resetting images",iimage," to ",jimage-1
+    write(stdout,*) "Resetting images",iimage," to ",jimage-1
     ! This does not appear to cause problems for microiterative opts
     ! (at least, no more than the problems it causes for standard opts)
     ! but keeping an eye on it...
@@ -1446,7 +1448,7 @@ subroutine dlf_neb_itox(external_iimage)
           &maximum is an endpoint of the path")')
     end if !(neb%tclimb) 
   end if ! (neb%tclimb .and. neb%frozen(neb%nimage))
-  if(neb%iimage/=neb%nimage) print*,"Warning, NEB images have been tampered with!"
+  if(neb%iimage/=neb%nimage) write(stdout,*) "Warning, NEB images have been tampered with!"
 
   if (glob%tatoms) then
      call allocate( xtmp,3*glob%nat,neb%nimage)
@@ -1950,10 +1952,10 @@ subroutine string_reparametrise(treduce)
     if(.not.treduce(iimage)) then
       count=count+1
     else
-      write(*,'("Image",i4," is reset to string")') iimage
+      write(stdout,'("Image",i4," is reset to string")') iimage
     end if
   end do
-  print*,"Number of images considered for the string:",count
+  write(stdout,*) "Number of images considered for the string:",count
 
 !  call spline_init(neb%nimage-1,neb%varperimage)
 !  call spline_init(count,neb%varperimage)
@@ -2083,7 +2085,7 @@ subroutine string_reparametrise(treduce)
   
   do iimage=1,neb%nimage-1
     svar=sqrt(sum((glob%step(neb%cstart(iimage):neb%cend(iimage)))**2))
-    write(*,"('Img ',i3,' Step lenth:',f10.5)") iimage,svar
+    write(stdout,"('Img ',i3,' Step lenth:',f10.5)") iimage,svar
   end do
 
   call spline_destroy
@@ -2097,6 +2099,7 @@ subroutine dlf_checkpoint_neb_write
   use dlf_global, only: glob,stderr
   use dlf_neb, only: neb
   use dlf_checkpoint, only: tchkform,write_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   ! YL 15/12/2020: we need avoid using file units ifunit, 101, or 102 to make Cray compiler happy
   !                see pp 141: http://103.251.184.12/wp-content/uploads/2018/01/Cray_Fortran_Reference_Manual_S-3901_86.pdf
@@ -2110,7 +2113,7 @@ subroutine dlf_checkpoint_neb_write
 ! **********************************************************************
   if(tchkform) then
 
-    open(unit=ifunit,file="dlf_neb.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_neb.chk"),form="formatted")
 
     call write_separator(ifunit,"NEB Sizes")
     write(ifunit,*) neb%nimage,neb%varperimage
@@ -2124,7 +2127,7 @@ subroutine dlf_checkpoint_neb_write
 
   else
 
-    open(unit=ifunit,file="dlf_neb.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_neb.chk"),form="unformatted")
 
     call write_separator(ifunit,"NEB Sizes")
     write(ifunit) neb%nimage,neb%varperimage
@@ -2147,6 +2150,7 @@ subroutine dlf_checkpoint_neb_read(tok)
   use dlf_global, only: stdout,printl
   use dlf_neb, only: neb
   use dlf_checkpoint, only: tchkform, read_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical,intent(out) :: tok
   logical             :: tchk
@@ -2156,16 +2160,16 @@ subroutine dlf_checkpoint_neb_read(tok)
   tok=.false.
 
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_neb.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_neb.chk"),EXIST=tchk)
   if(.not.tchk) then
     write(stdout,10) "File dlf_neb.chk not found"
     return
   end if
 
   if(tchkform) then
-    open(unit=ifunit,file="dlf_neb.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_neb.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_neb.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_neb.chk"),form="unformatted")
   end if
 
   call read_separator(ifunit,"NEB Sizes",tchk)
@@ -252,7 +252,7 @@ subroutine dlf_parallel_opt(trestarted_report, tconv &
           ! evaluate initial point
           call clock_start("EANDG")
           call dlf_get_gradient(glob%nvar,glob%xcoords,energy_best, &
-               glob%xgradient,iimage,&
+               glob%xgradient,iimage,-1,& ! libdlfind: kiter
 #ifdef GAMESS
                core,&
 #endif
@@ -333,6 +333,7 @@ subroutine dlf_parallel_opt(trestarted_report, tconv &
 
           ! ...then work out the energy of each individual...
           init_pop_energies(:) = 0.0D0
+          call population_batch(glob%po_init_pop_size, init_pop_icoords) ! libdlfind
           do j = 1, glob%po_init_pop_size
              k = mod(j,glob%ntasks)
              stat%sene = stat%sene + 1
@@ -352,7 +353,7 @@ subroutine dlf_parallel_opt(trestarted_report, tconv &
 !!! CODE it will not be used before it is filled with the proper values, and
 !!! to save memory I don't want an unnecessary init_pop_xgradient array.
                 call dlf_get_gradient(glob%nvar,glob%xcoords, &
-                     init_pop_energies(j), pop_xgradient(1,:,:),iimage,&
+                     init_pop_energies(j), pop_xgradient(1,:,:),iimage,-1,& ! libdlfind: kiter
 #ifdef GAMESS
                      core,&
 #endif
@@ -625,6 +626,10 @@ subroutine dlf_get_engarrays
 
 integer :: l, m, status
 
+    ! libdlfind: evaluate the population as one batch, taken from the buffer below
+    if (lower_index <= glob%po_pop_size) call population_batch( &
+         glob%po_pop_size - lower_index + 1, pop_icoords(lower_index:,:))
+
     do m = lower_index, glob%po_pop_size
        l = mod(m,glob%ntasks)
        stat%sene = stat%sene + 1
@@ -641,7 +646,7 @@ integer :: l, m, status
 
           call clock_start("EANDG")
           call dlf_get_gradient(glob%nvar,glob%xcoords,pop_energies(m), &
-               pop_xgradient(m,:,:),iimage,&
+               pop_xgradient(m,:,:),iimage,-1,& ! libdlfind: kiter
 #ifdef GAMESS
                core,&
 #endif
@@ -1068,6 +1073,7 @@ end subroutine dlf_genetic_mutate
 !! SYNOPSIS
 subroutine dlf_stoch_endcycle
 !! SOURCE
+  use mod_output, only: output_file ! libdlfind
  
 integer :: l, k
 
@@ -1112,8 +1118,8 @@ integer :: l, k
 
        if (printf>=2 .and. glob%iam == 0) then
           call clock_start("XYZ")
-          open(unit=400,file="best.xyz")
-          open(unit=401,file="best_active.xyz")
+          open(unit=400,file=output_file("best.xyz"))
+          open(unit=401,file=output_file("best_active.xyz"))
           call write_xyz(400,glob%nat,glob%znuc,xcoords_best)
           call write_xyz_active(401,glob%nat,glob%znuc,glob%spec,xcoords_best)
           close(400)
@@ -1160,6 +1166,7 @@ integer :: l, k
        call dlf_checkpoint_write(status)
        call dlf_checkpoint_po_write
        call clock_stop("CHECKPOINT")
+       call dlf_checkpoint_notify() ! libdlfind
     end if
 
     write(stdout,'(1x,a,es16.9)')"Lowest energy = ",energy_best
@@ -1218,6 +1225,7 @@ end subroutine dlf_stoch_endcycle
 !! SYNOPSIS
 subroutine dlf_genetic_endcycle
 !! SOURCE
+  use mod_output, only: output_file ! libdlfind
 
 integer  :: m, l
 real(rk) :: mean_e, mean_e2, sigma_e
@@ -1280,8 +1288,8 @@ real(rk) :: mean_e, mean_e2, sigma_e
 
        if (printf>=2 .and. glob%iam == 0) then
           call clock_start("XYZ")
-          open(unit=400,file="best.xyz",position="APPEND")
-          open(unit=401,file="best_active.xyz",position="APPEND")
+          open(unit=400,file=output_file("best.xyz"),position="APPEND")
+          open(unit=401,file=output_file("best_active.xyz"),position="APPEND")
           call write_xyz(400,glob%nat,glob%znuc,xcoords_best)
           call write_xyz_active(401,glob%nat,glob%znuc,glob%spec,xcoords_best)
           close(400)
@@ -1321,6 +1329,7 @@ real(rk) :: mean_e, mean_e2, sigma_e
        call dlf_checkpoint_write(status)
        call dlf_checkpoint_po_write
        call clock_stop("CHECKPOINT")
+       call dlf_checkpoint_notify() ! libdlfind
     end if
 
     call flush(stdout)
@@ -1385,6 +1394,7 @@ end subroutine dlf_po_destroy
 !! SYNOPSIS
 subroutine dlf_checkpoint_po_read
 !! SOURCE
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
 
 logical               :: tchk, tallocated
 real(rk), allocatable :: dummy(:,:,:)
@@ -1401,7 +1411,7 @@ real(rk), allocatable :: dummy(:,:,:)
   trestarted=.false.
     
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_parallel_opt.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_parallel_opt.chk"),EXIST=tchk)
   if (.not.tchk) then
     write(stdout,10) "File dlf_parallel_opt.chk not found"
     return
@@ -1409,9 +1419,9 @@ real(rk), allocatable :: dummy(:,:,:)
 
   ! open the checkpoint file
   if (tchkform) then
-    open(unit=ifunit,file="dlf_parallel_opt.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_parallel_opt.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_parallel_opt.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_parallel_opt.chk"),form="unformatted")
   end if
 
   if (stochastic) then
@@ -1499,6 +1509,7 @@ end subroutine dlf_checkpoint_po_read
 !! SYNOPSIS
 subroutine dlf_checkpoint_po_write
 !! SOURCE
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
 
   integer, parameter :: ifunit = 104
 ! Only want one processor to do the writing; that processor must know         
@@ -1507,9 +1518,9 @@ subroutine dlf_checkpoint_po_write
 
 ! Open the checkpoint file
   if (tchkform) then
-    open(unit=ifunit,file="dlf_parallel_opt.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_parallel_opt.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_parallel_opt.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_parallel_opt.chk"),form="unformatted")
   end if
 
   if (stochastic) then
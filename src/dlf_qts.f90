@@ -528,6 +528,7 @@ subroutine dlf_qts_trans_force(trerun,tok_back)
   use dlf_global, only: glob, pi,printl,printf
   use dlf_neb, only: neb,unitp,xyzall,beta_hbar
   use dlf_qts
+  use mod_output, only: output_file ! libdlfind
 
   implicit none
   logical, intent(out)  :: trerun ! calculate all E&G once more
@@ -669,7 +670,7 @@ subroutine dlf_qts_trans_force(trerun,tok_back)
     if (glob%ntasks > 1) then
       open(unit=501,file="../qtsinfo")
     else
-      open(unit=501,file="qtsinfo")
+      open(unit=501,file=output_file("qtsinfo"))
     end if
     write(501,"('# S_0:   ',f20.10)") qts%S_0
     write(501,"('# S_pot: ',f20.10)") qts%S_pot
@@ -700,7 +701,7 @@ subroutine dlf_qts_trans_force(trerun,tok_back)
     if (glob%ntasks > 1) then
       open(unit=501,file="../qtspath.xyz")
     else
-      open(unit=501,file="qtspath.xyz")
+      open(unit=501,file=output_file("qtspath.xyz"))
     end if
     
     do iimage=1,neb%nimage
@@ -723,7 +724,7 @@ subroutine dlf_qts_trans_force(trerun,tok_back)
       if (glob%ntasks > 1) then
         open(unit=501,file="../qtspath2.xyz")
       else
-        open(unit=501,file="qtspath2.xyz")
+        open(unit=501,file=output_file("qtspath2.xyz"))
       end if
       do iimage=1,neb%nimage
         call write_xyz(501,glob%nat,glob%znuc,neb%xcoords(:,iimage))
@@ -1099,6 +1100,7 @@ subroutine qts_gradient_etos(grad_action)
   use dlf_constants, only: dlf_constants_get
   use dlf_stat, only: stat
   use dlf_qts
+  use mod_output, only: output_file ! libdlfind
   implicit none
   real(rk),intent(out)  :: grad_action(neb%varperimage*neb%nimage) ! dS_E / dy
   real(rk)  :: svar
@@ -1238,7 +1240,7 @@ subroutine qts_gradient_etos(grad_action)
 
   ! print status file
   if(printf>=4) then ! this if statement should be removed because etunnel is not set otherwise IMPROVE
-    open(file="etunnel",unit=110)
+    open(file=output_file("etunnel"),unit=110)
     write(110,*) "#r(iimage), tunnelling energy"
     write(110,*) 0.D0, svar ! global value
     write(110,*) sum(sqrt(deltay(1:nimage-1))), svar
@@ -1353,8 +1355,8 @@ subroutine dlf_qts_min_phi_part1(trerun,stoprot)
       qts%d_actionS_alt(:))+&
       2.D0*svar*qts%tau_qts(:)
 
-  write(*,*) 'svar', svar
-  write(*,*)
+  write(stdout,*) 'svar', svar
+  write(stdout,*)
 
   !Compute theta
   call dlf_lbfgs_select("dimer rotation",.false.)
@@ -1368,8 +1370,8 @@ subroutine dlf_qts_min_phi_part1(trerun,stoprot)
       qts%d_actionS_alt(:)),&
       qts%tau_qts(:))/glob%delta
 
-  write(*,*) 'qts%C_Tau',qts%C_Tau
-  write(*,*)
+  write(stdout,*) 'qts%C_Tau',qts%C_Tau
+  write(stdout,*)
   write(stdout,"('Curvature before dimer rotation           ',es12.5)") qts%C_Tau
 
   !b_1 dC_taudPhi=0
@@ -1386,8 +1388,8 @@ subroutine dlf_qts_min_phi_part1(trerun,stoprot)
   ! write(*,*) 'phi_1', qts%phi_1
   !qts%phi_1=0.5D0
 
-  write(*,*) 'phi_1', qts%phi_1, qts%phi_1/pi*180.D0
-  write(*,*) 'b_1', qts%b_1
+  write(stdout,*) 'phi_1', qts%phi_1, qts%phi_1/pi*180.D0
+  write(stdout,*) 'b_1', qts%b_1
 
   if(abs(qts%phi_1)>tolrot) then
     !   !Rotation of endpoint to x_prime
@@ -1404,7 +1406,7 @@ subroutine dlf_qts_min_phi_part1(trerun,stoprot)
 
   else 
     !converged, do translation
-    write(*,*) 'QTS rotation converged 1, translation'
+    write(stdout,*) 'QTS rotation converged 1, translation'
     glob%icoords=qts%coords_midp
     trerun=.false.
     stoprot=.true.
@@ -1457,13 +1459,13 @@ subroutine dlf_qts_min_phi_part2(trerun,stoprot)
     end if
   end if
 
-  write(*,*) 'phi_min', phi_min,phi_min/pi*180.D0 
-  write(*,*) "phi_min, phi1 deg",phi_min/pi*180.D0 ,qts%phi_1/pi*180.D0 
-  write(*,*) 
-  write(*,*) 'a_1', a_1 
-  write(*,*)
-  write(*,*) 'a_0', a_0 
-  write(*,*)
+  write(stdout,*) 'phi_min', phi_min,phi_min/pi*180.D0 
+  write(stdout,*) "phi_min, phi1 deg",phi_min/pi*180.D0 ,qts%phi_1/pi*180.D0 
+  write(stdout,*) 
+  write(stdout,*) 'a_1', a_1 
+  write(stdout,*)
+  write(stdout,*) 'a_0', a_0 
+  write(stdout,*)
 
   C_Tau2=0.5D0*a_0+a_1*cos(2.D0*phi_min)+qts%b_1*sin(2.D0*phi_min)
 
@@ -1499,8 +1501,8 @@ subroutine dlf_qts_min_phi_part2(trerun,stoprot)
     !Rotation of endpoint to x_min
     glob%icoords=qts%coords_midp+qts%tau_qts*glob%delta
 
-    write(*,*) 'C_Tau2',C_Tau2  
-    write(*,*)
+    write(stdout,*) 'C_Tau2',C_Tau2  
+    write(stdout,*)
 
     qts%status=2
     stoprot=.false.
@@ -1508,7 +1510,7 @@ subroutine dlf_qts_min_phi_part2(trerun,stoprot)
     return
   else
     !converged, translation
-    write(*,*) 'QTS rotation converged 2, translation'
+    write(stdout,*) 'QTS rotation converged 2, translation'
     write(stdout,"('Curvature after rotations converged       ',es12.5)") C_Tau2
     !rotate tau
     ! qts%tau_qts=qts%tau_prime/dsqrt(sum(qts%tau_prime**2))
@@ -2542,6 +2544,7 @@ subroutine dlf_qts_rate()
   use dlf_allocate, only: allocate,deallocate
   use dlf_constants, only : dlf_constants_get
   use dlf_qts
+  use mod_output, only: output_file ! libdlfind
   implicit none
   real(rk),allocatable :: total_hessian(:,:) ! (neb%varperimage*neb%nimage*2,neb%varperimage*neb%nimage*2)
   real(rk),allocatable :: evals_hess(:)   ! (neb%varperimage*neb%nimage*2)
@@ -2685,7 +2688,7 @@ subroutine dlf_qts_rate()
         -vec0(neb%cstart(iimage):neb%cend(iimage)) 
   end do
   vec0=vec0/sqrt(sum(vec0**2))
-  write(*,'("Expectation value of vec0:",es18.9)') sum(vec0*matmul(total_hessian,vec0))
+  write(stdout,'("Expectation value of vec0:",es18.9)') sum(vec0*matmul(total_hessian,vec0))
 
   if(printl>=4) write(stdout,"('Diagonalising the Hessian matrix ...')")
   call allocate(evals_hess, neb%varperimage*neb%nimage*2)
@@ -2754,7 +2757,7 @@ subroutine dlf_qts_rate()
       else
         filename="qtsmode"//chr2//".xyz"
       end if
-      open(unit=501,file=filename)
+      open(unit=501,file=output_file(trim(filename)))
       do iimage=1,2*neb%nimage
         call dlf_cartesian_itox(glob%nat,neb%varperimage,neb%varperimage,glob%massweight,&
             evecs_hess((iimage-1)*neb%varperimage+1:iimage*neb%varperimage,ival),&
@@ -2769,7 +2772,7 @@ subroutine dlf_qts_rate()
     else
       filename="qtsmode_vec0.xyz"
     end if
-    open(unit=501,file=filename)
+    open(unit=501,file=output_file(trim(filename)))
     do iimage=1,2*neb%nimage
       call dlf_cartesian_itox(glob%nat,neb%varperimage,neb%varperimage,glob%massweight,&
           vec0((iimage-1)*neb%varperimage+1:iimage*neb%varperimage),xmode)
@@ -3563,6 +3566,7 @@ subroutine write_qts_coords(nat,nimage,varperimage,temperature,&
 !! SOURCE
   use dlf_parameter_module, only: rk
   use dlf_global, only: glob
+  use mod_output, only: output_file ! libdlfind
   implicit none
   integer, intent(in) :: nat,nimage,varperimage
   real(rk),intent(in) :: temperature,S_0,S_pot,S_ins
@@ -3578,7 +3582,7 @@ subroutine write_qts_coords(nat,nimage,varperimage,temperature,&
   filename="qts_coords.txt"
   if (glob%ntasks > 1) filename="../"//trim(filename)
 
-  open(unit=555,file=filename, action='write')
+  open(unit=555,file=output_file(trim(filename)), action='write')
   write(555,*) "Coordinates of the qTS path written by dl-find"
   write(555,*) nat,nimage,varperimage
   write(555,*) temperature
@@ -3717,6 +3721,7 @@ subroutine write_qts_hessian(nat,nimage,varperimage,temperature,&
   use dlf_global, only: glob,printl,stdout
   use dlf_constants, only: dlf_constants_get
   use dlf_qts, only: taskfarm_mode
+  use mod_output, only: output_file ! libdlfind
   implicit none
   integer, intent(in) :: nat,nimage,varperimage
   real(rk),intent(in) :: temperature
@@ -3748,7 +3753,7 @@ subroutine write_qts_hessian(nat,nimage,varperimage,temperature,&
   end if
   if (glob%ntasks > 1) filename="../"//trim(filename)
   
-  open(unit=555,file=filename, action='write')
+  open(unit=555,file=output_file(trim(filename)), action='write')
   write(555,*) "Coordinates and Hessian of the qTS path written by dl-find"
   write(555,*) nat,nimage,varperimage
   write(555,*) temperature
@@ -3826,15 +3831,15 @@ subroutine read_qts_hessian(nat,nimage,varperimage,temperature_,&
   read(555,FMT='(a)',end=201,err=200) 
   read(555,*,end=201,err=200) nat_,nimage_,varperimage_
   if(nat/=nat_) then
-    if(printl>=4) write(*,*) "Error reading ",trim(filename)," file: Number of &
+    if(printl>=4) write(stdout,*) "Error reading ",trim(filename)," file: Number of &
         &atoms not consistent"
-    if(printl>=4) write(*,*) "Number of atoms expected",nat
-    if(printl>=4) write(*,*) "Number of atoms got     ",nat_
+    if(printl>=4) write(stdout,*) "Number of atoms expected",nat
+    if(printl>=4) write(stdout,*) "Number of atoms got     ",nat_
     close(555)
     return
   end if
   if(varperimage/=varperimage_) then
-    if(printl>=4) write(*,*) "Error reading ",trim(filename)," file: Variables &
+    if(printl>=4) write(stdout,*) "Error reading ",trim(filename)," file: Variables &
         &per image not consistent"
     close(555)
     return
@@ -3971,6 +3976,7 @@ subroutine write_qts_reactant(nat,varperimage,&
 !! SOURCE
   use dlf_parameter_module, only: rk
   use dlf_global, only: glob,printl,stdout ! for masses
+  use mod_output, only: output_file ! libdlfind
 !  use dlf_neb, only: neb ! cstart and cend
   implicit none
   integer, intent(in) :: nat,varperimage
@@ -3993,7 +3999,7 @@ subroutine write_qts_reactant(nat,varperimage,&
   end if
   if (glob%ntasks > 1) filename="../"//trim(filename)
 
-  open(unit=555,file=filename, action='write')
+  open(unit=555,file=output_file(trim(filename)), action='write')
   write(555,'(a)') "Energy and Hessian eigenvalues of the reactant for qTS written by dl-find &
       &(for bimolecular reactions: add energy of incoming atom and include mass (in amu) after the energy)"
   write(555,*) nat,varperimage
@@ -4073,12 +4079,12 @@ subroutine read_qts_reactant(nat,varperimage,&
   read(555,*,end=201,err=200) nat_,varperimage_
   ! allow for bimolecular reactions
   if(nat<nat_) then
-    if(printl>=2) write(*,*) "Error reading ",trim(filename)," file: Number of &
+    if(printl>=2) write(stdout,*) "Error reading ",trim(filename)," file: Number of &
         &atoms not consistent"
     return
   end if
   if(varperimage<varperimage_) then
-    if(printl>=2) write(*,*) "Error reading qts_reactant.txt file: Variables &
+    if(printl>=2) write(stdout,*) "Error reading qts_reactant.txt file: Variables &
         &per image not consistent"
     return
   end if
@@ -4250,6 +4256,7 @@ subroutine dlf_htst_rate
 !  use dlf_qts
   use dlf_allocate, only: allocate,deallocate
   use dlf_constants, only: dlf_constants_init,dlf_constants_get
+  use mod_output, only: output_file ! libdlfind
   implicit none
   ! user parameters
   integer   :: nat !  number of atoms TS
@@ -4389,7 +4396,7 @@ subroutine dlf_htst_rate
   if(bimolat.and.mu_bim<0.D0) then
     ! bimolecular case with more than one atom, read in complete RS data below
     tok=.true.
-    print*,"Bimolecular case"
+    write(stdout,*) "Bimolecular case"
   end if
 
   if(.not.tok.and.(.not.bimolat)) then ! the same is done for the TS below ...
@@ -4773,7 +4780,7 @@ subroutine dlf_htst_rate
 1003 continue
     if(tkie) then
       if(printl>=4) write(stdout,*) "File rate_H found, calculating KIE and writing to file kie."
-      open(file="kie",unit=13)
+      open(file=output_file("kie"),unit=13)
       write(13,'(a)') "#       T[K]              KIE  classical   KIE w. quant. vib   KIE simpl. Wigner   KIE Eckart"
     else
       if(printl>0) write(stdout,*) "File rate_H found, but not readable, no KIE calculated."
@@ -4784,9 +4791,9 @@ subroutine dlf_htst_rate
   call dlf_constants_get("PLANCK",planck)
   call dlf_constants_get("KBOLTZ",kboltz)
 
-  open(file="arrhenius",unit=15)
-  open(file="arrhenius_polywigner",unit=17)
-  open(file="free_energy_barrier",unit=16)
+  open(file=output_file("arrhenius"),unit=15)
+  open(file=output_file("arrhenius_polywigner"),unit=17)
+  open(file=output_file("free_energy_barrier"),unit=16)
   if(printl>=2) write(stdout,'(a)') &
       "       1000/T           rate classical       quantised vib.      simpl. Wigner       Eckart"
   write(15,'(a)') &
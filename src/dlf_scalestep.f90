@@ -133,8 +133,8 @@ subroutine dlf_scalestep
 
     svar=dsqrt(sum(glob%step(1:geomCoords)**2))
     if(printl >= 2) then
-      write(*,"(' Predicted step length ',es10.4)") svar
-      write(*,"(' Trust radius          ',es10.4)") tr%radius
+      write(stdout,"(' Predicted step length ',es10.4)") svar
+      write(stdout,"(' Trust radius          ',es10.4)") tr%radius
     end if
     if(svar > tr%radius) then
       svar= tr%radius/svar
@@ -192,8 +192,8 @@ subroutine dlf_scalestep_microiter(nvar, step)
 
   svar=dsqrt(sum(step(1:nvar)**2.0d0))
   if(printl >= 2) then
-     write(*,"(' Predicted step length ',es10.4)") svar
-     write(*,"(' Trust radius          ',es10.4)") trmic%radius
+     write(stdout,"(' Predicted step length ',es10.4)") svar
+     write(stdout,"(' Trust radius          ',es10.4)") trmic%radius
   end if
   if(svar > trmic%radius) then
      svar= trmic%radius/svar
@@ -270,7 +270,7 @@ subroutine test_acceptance
 
     svar=dsqrt(dot_product(glob%step(:),glob%step(:)))
     tr%radius= min(svar,tr%radius) * 0.5D0
-    if(printl >=4) write(*,"(' Trust radius          ',es10.4)") tr%radius
+    if(printl >=4) write(stdout,"(' Trust radius          ',es10.4)") tr%radius
 
     if (glob%imicroiter == 1) then
        call dlf_microiter_reset_macrostep
@@ -311,7 +311,7 @@ subroutine test_acceptance
 
   end if
 
-  if(printl >=6) write(*,"(' Trust radius ',es10.3)") &
+  if(printl >=6) write(stdout,"(' Trust radius ',es10.3)") &
       tr%radius
 
 end subroutine test_acceptance
@@ -390,7 +390,7 @@ subroutine test_acceptance_microiter(nvar, energy, igradient, &
 
     svar=dsqrt(dot_product(step(:), step(:)))
     trmic%radius= min(svar,trmic%radius) * 0.5D0
-    if(printl >=4) write(*,"(' Trust radius          ',es10.4)") trmic%radius
+    if(printl >=4) write(stdout,"(' Trust radius          ',es10.4)") trmic%radius
 
 
     step(:) = step(:) * 0.5D0
@@ -425,7 +425,7 @@ subroutine test_acceptance_microiter(nvar, energy, igradient, &
 
   end if
 
-  if(printl >=6) write(*,"(' Trust radius ',es10.3)") &
+  if(printl >=6) write(stdout,"(' Trust radius ',es10.3)") &
       trmic%radius
 
 end subroutine test_acceptance_microiter
@@ -528,7 +528,7 @@ subroutine test_acceptance_g
   end if
   tr%radius= min(tr%radius,tr%maxrad)
 
-  if(printl >=6) write(*,"(' Trust radius ',es10.3)") &
+  if(printl >=6) write(stdout,"(' Trust radius ',es10.3)") &
       tr%radius
 
 end subroutine test_acceptance_g
@@ -631,10 +631,10 @@ subroutine linesearch
     glob%taccepted=.true.
 
 ! debug print
-print*,"qq Current accepted"
-    write(*,'("qq Position ",2es15.5)') glob%icoords(:)
-    write(*,'("qq Gradient ",2es15.5)') glob%igradient(:)
-    write(*,'("qq Step     ",2es15.5)') glob%step(:)
+write(stdout,*) "qq Current accepted"
+    write(stdout,'("qq Position ",2es15.5)') glob%icoords(:)
+    write(stdout,'("qq Gradient ",2es15.5)') glob%igradient(:)
+    write(stdout,'("qq Step     ",2es15.5)') glob%step(:)
 
     ! start values for the following line search
     alpha=1.D0
@@ -645,21 +645,21 @@ print*,"qq Current accepted"
     ! Start or continue line search
     ! ==================================================================
 
-    if(printl >=6) write(*,"(' Projection of gradient on step: ',es10.3,&
+    if(printl >=6) write(stdout,"(' Projection of gradient on step: ',es10.3,&
         &' oldproj ',es10.3)") proj,oldproj
 
- write(*,"('qq Projection of gradient on step: ',es10.3,&
+ write(stdout,"('qq Projection of gradient on step: ',es10.3,&
           &' energy ',es10.3)") proj,glob%energy
 
-    write(*,'("qq Position ",2es15.5)') glob%icoords(:)
-    write(*,'("qq Gradient ",2es15.5)') glob%igradient(:)
-    write(*,'("qq Step     ",2es15.5)') glob%step(:)
+    write(stdout,'("qq Position ",2es15.5)') glob%icoords(:)
+    write(stdout,'("qq Gradient ",2es15.5)') glob%igradient(:)
+    write(stdout,'("qq Step     ",2es15.5)') glob%step(:)
 
     if(printl >=2) write(stdout,"(' Line search continuing')")
     if(printl >=6) write(stdout,"(' Projection of gradient on step: ',es10.3,&
         &' oldproj ',es10.3)") proj,oldproj
 
- write(*,"('qq Projection of gradient on step: ',es10.3,&
+ write(stdout,"('qq Projection of gradient on step: ',es10.3,&
           &' energy ',es10.3)") proj,glob%energy
 
       svar=oldproj/(oldproj-proj) 
@@ -677,7 +677,7 @@ print*,"qq Current accepted"
         if(newalpha/alpha < 0.6D0 ) newalpha=0.6D0*alpha
       end if
 
-      write(*,'("newal, alpha, frac",3f10.5)') newalpha,alpha,newalpha/alpha
+      write(stdout,'("newal, alpha, frac",3f10.5)') newalpha,alpha,newalpha/alpha
 
       ! set back coordinates
       glob%icoords(:)= glob%icoords(:) + glob%step(:) * (newalpha-alpha)
@@ -688,15 +688,15 @@ print*,"qq Current accepted"
 
     glob%taccepted=.false.
 
-    write(*,'("qq Position ",2es15.5)') glob%icoords(:)
+    write(stdout,'("qq Position ",2es15.5)') glob%icoords(:)
 
   end if
 
   oldgradient=glob%igradient(:)
 
-  if(printl >=6) write(*,"(' Trust radius ',es10.3)") &
+  if(printl >=6) write(stdout,"(' Trust radius ',es10.3)") &
       tr%radius
-  if(printl >=6) write(*,"(' Current scaling ',2es10.3)") &
+  if(printl >=6) write(stdout,"(' Current scaling ',2es10.3)") &
       alpha,proj
   
 end subroutine linesearch
@@ -710,6 +710,7 @@ subroutine dlf_checkpoint_linesearch_write
   use dlf_scalestep_module, only: tr
 
   use dlf_checkpoint, only: tchkform,write_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   integer :: fail
   ! YL 15/12/2020: we need avoid using file units ifunit, 101, or 102 to make Cray compiler happy
@@ -724,13 +725,13 @@ subroutine dlf_checkpoint_linesearch_write
 ! **********************************************************************
   if (glob%iline/=1.and.glob%iline/=2.and.glob%iline/=3) return
   if(tchkform) then
-    open(unit=ifunit,file="dlf_linesearch.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_linesearch.chk"),form="formatted")
     call write_separator(ifunit,"Linesearch-Arrays")
     write(ifunit,*) oldgradient,tr
     call write_separator(ifunit,"END")
     close(ifunit)
   else
-    open(unit=ifunit,file="dlf_linesearch.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_linesearch.chk"),form="unformatted")
     call write_separator(ifunit,"Linesearch-Arrays")
     write(ifunit) oldgradient,tr
     call write_separator(ifunit,"END")
@@ -747,6 +748,7 @@ subroutine dlf_checkpoint_linesearch_read(tok)
   use dlf_scalestep_module, only: tr
 
   use dlf_checkpoint, only: tchkform,read_separator
+  use mod_checkpoint, only: checkpoint_file ! libdlfind
   implicit none
   logical,intent(out) :: tok
   logical             :: tchk
@@ -757,16 +759,16 @@ subroutine dlf_checkpoint_linesearch_read(tok)
   tok=.false.
 
   ! check if checkpoint file exists
-  INQUIRE(FILE="dlf_linesearch.chk",EXIST=tchk)
+  INQUIRE(FILE=checkpoint_file("dlf_linesearch.chk"),EXIST=tchk)
   if(.not.tchk) then
     write(stdout,10) "File dlf_linesearch.chk not found"
     return
   end if
 
   if(tchkform) then
-    open(unit=ifunit,file="dlf_linesearch.chk",form="formatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_linesearch.chk"),form="formatted")
   else
-    open(unit=ifunit,file="dlf_linesearch.chk",form="unformatted")
+    open(unit=ifunit,file=checkpoint_file("dlf_linesearch.chk"),form="unformatted")
   end if
 
   call read_separator(ifunit,"Linesearch-Arrays",tchk)
@@ -72,6 +72,7 @@ subroutine dlf_task( &
   use dlf_allocate, only: allocate,deallocate
   use dlf_task_module, only: tconverged
   use dlf_store
+  use mod_output, only: output_file ! libdlfind
   implicit none
 #ifdef GAMESS
   real(rk) :: core(*) ! GAMESS memory, not used in DL-FIND
@@ -249,7 +250,7 @@ subroutine dlf_task( &
 
     ! write an xyz file with the TS structure
     if(printf>=4 .and. glob%iam == 0) then
-      open(unit=601,file="TS.xyz")
+      open(unit=601,file=output_file("TS.xyz"))
       call write_xyz(601,glob%nat,glob%znuc,glob%xcoords)
       close(601)
       call dlf_put_coords(glob%nvar,3,glob%energy,glob%xcoords,glob%iam)
@@ -285,7 +286,7 @@ subroutine dlf_task( &
 
     ! write an xyz file with the minimum structure
     if(tconverged.and.printf>=4 .and. glob%iam == 0) then
-      open(unit=601,file="minimum_+.xyz")
+      open(unit=601,file=output_file("minimum_+.xyz"))
       call write_xyz(601,glob%nat,glob%znuc,glob%xcoords)
       close(601)
       call dlf_put_coords(glob%nvar,4,glob%energy,glob%xcoords,glob%iam)
@@ -311,7 +312,7 @@ subroutine dlf_task( &
 
     ! write an xyz file with the minimum structure
     if(tconverged.and.printf>=4 .and. glob%iam == 0) then
-      open(unit=601,file="minimum_-.xyz")
+      open(unit=601,file=output_file("minimum_-.xyz"))
       call write_xyz(601,glob%nat,glob%znuc,glob%xcoords)
       close(601)
       call dlf_put_coords(glob%nvar,5,glob%energy,glob%xcoords,glob%iam)
@@ -57,8 +57,9 @@ subroutine get_wall_time(time)
   use dlf_parameter_module, only: rk
   implicit none
   real(rk) ,intent(out) :: time
-  integer  :: count,count_rate,count_max
-  integer,save :: lastcount=0
+  ! libdlfind: 64-bit counts for sub-millisecond resolution
+  integer(8) :: count,count_rate,count_max
+  integer(8),save :: lastcount=0
 ! **********************************************************************
   call system_clock(count,count_rate,count_max)
   if(count<lastcount) count=count+count_max
@@ -67,6 +68,7 @@ end subroutine get_wall_time
 
 subroutine map_clock(name,number)
   use dlf_time
+  use dlf_global, only: stdout ! libdlfind
   implicit none
   character(*),intent(IN) :: name
   integer     ,intent(out):: number
@@ -84,13 +86,14 @@ subroutine map_clock(name,number)
     NUMBER=6
   else 
     warning=.true.
-    print*,"Warning: clock not recognised",name
+    write(stdout,*) "Warning: clock not recognised",name
     number=-1
   end if
 end subroutine map_clock
 
 subroutine clock_start(name)
   use dlf_time
+  use dlf_global, only: stdout ! libdlfind
   implicit none
   character(*),intent(IN) :: name
   integer                 :: number
@@ -100,7 +103,7 @@ subroutine clock_start(name)
   if(number<=0) return
   if(clock(number)%running) then
     warning=.true.
-    print*,"Warning: clock",name," already running"
+    write(stdout,*) "Warning: clock",name," already running"
     return
   end if
   clock(number)%running=.true.
@@ -112,6 +115,7 @@ end subroutine clock_start
 
 subroutine clock_stop(name)
   use dlf_time
+  use dlf_global, only: stdout ! libdlfind
   implicit none
   character(*),intent(IN) :: name
   integer                 :: number
@@ -123,7 +127,7 @@ subroutine clock_stop(name)
   if(number<=0) return
   if(.not.clock(number)%running) then
     warning=.true.
-    print*,"Warning: clock",name," not running"
+    write(stdout,*) "Warning: clock",name," not running"
     return
   end if
   clock(number)%running=.false.
@@ -87,6 +87,7 @@ module dlf_bspline
 
   use dlf_parameter_module, only: rk
   use dlf_allocate, only: allocate,deallocate
+  use dlf_global, only: stdout ! libdlfind
   implicit none
 
   public :: spline_init, spline_create, spline_get, spline_destroy, spline_create_clamped
@@ -340,7 +341,7 @@ contains
     if(ifunc<1) call dlf_fail("ifunc < 1 in spline_get")
     if(ifunc>nfunc) call dlf_fail("ifunc > nfunc in spline_get")
     if(.not.created(ifunc)) then
-      print*,"Number of spline:",ifunc
+      write(stdout,*) "Number of spline:",ifunc
       call dlf_fail("spline_get must not be called&
         & before spline_create!")
     end if
@@ -474,7 +475,7 @@ contains
     this%tag=tag
     this%size=size
     !print*,"allocated(this%array)",associated(this%array)
-    if(associated(this%array)) print*,"shape(this%array)",shape(this%array)
+    if(associated(this%array)) write(stdout,*) "shape(this%array)",shape(this%array)
     allocate (this%array(size)) ! pointer
 
   end subroutine store_allocate
@@ -674,6 +675,7 @@ end module dlf_store
 !!****
 module dlf_constants
   use dlf_parameter_module, only: rk
+  use dlf_global, only: stdout ! libdlfind
   implicit none
 
   Public :: dlf_constants_get
@@ -765,8 +767,8 @@ contains
       ! converts hartree to wave numbers (cm^-1)
       val=(hartree/planck)/speed_of_light*1.D-2  ! 219474.63160039327
     case default
-      print*,"Tag not recognized:",tag
-      print*,"Available tags (and their values):"
+      write(stdout,*) "Tag not recognized:",tag
+      write(stdout,*) "Available tags (and their values):"
       call dlf_constants_report
       call dlf_fail("Wrong tag in dlf_constants_get")
     end select
@@ -881,7 +883,7 @@ subroutine dlf_print_wavenumber(h_eigval,twavenum)
     call dlf_constants_get("AMU",svar)
     call dlf_constants_get("KBOLTZ_AU",kboltz_au)
     call dlf_constants_get("PI",pi)
-    write(*,"('Crossover temperature for tunnelling',f15.5,' K')") &
+    write(stdout,"('Crossover temperature for tunnelling',f15.5,' K')") &
         sqrt(abs(h_eigval)) / kboltz_au / (2.D0*pi) / sqrt(svar) !(1.66054D-27/9.10939D-31)
   end if
 end subroutine dlf_print_wavenumber
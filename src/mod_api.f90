@@ -41,6 +41,46 @@ module mod_api
     end subroutine
   end interface
 
+  abstract interface
+    subroutine dlf_get_gradient_batch_interface(nvar, nbatch, coords, energy, gradient, iimage, kiter, status) bind(c)
+      import c_double, c_int
+
+      implicit none
+      integer(c_int), intent(in), value :: nvar
+      integer(c_int), intent(in), value :: nbatch
+      real(c_double), intent(in) :: coords(nvar, nbatch)
+      real(c_double), intent(out) :: energy(nbatch)
+      real(c_double), intent(out) :: gradient(nvar, nbatch)
+      integer(c_int), intent(in) :: iimage(nbatch)
+      integer(c_int), intent(in), value :: kiter
+      integer(c_int), intent(out) :: status
+    end subroutine
+  end interface
+
+  abstract interface
+    subroutine dlf_checkpoint_interface(nenergy, ncycle) bind(c)
+      import c_int
+
+      implicit none
+      integer(c_int), intent(in), value :: nenergy
+      integer(c_int), intent(in), value :: ncycle
+    end subroutine
+  end interface
+
+  abstract interface
+    subroutine dlf_stop_interface(nvar, coords, energy, nenergy, ncycle, stop) bind(c)
+      import c_double, c_int
+
+      implicit none
+      integer(c_int), intent(in), value :: nvar
+      real(c_double), intent(in) :: coords(nvar)
+      real(c_double), intent(in), value :: energy
+      integer(c_int), intent(in), value :: nenergy
+      integer(c_int), intent(in), value :: ncycle
+      integer(c_int), intent(out) :: stop
+    end subroutine
+  end interface
+
   abstract interface
     subroutine dlf_get_hessian_interface(nvar, coords, hessian, status) bind(c)
       import c_double, c_int
@@ -53,6 +93,19 @@ module mod_api
     end subroutine
   end interface
 
+  abstract interface
+    subroutine dlf_get_hessian_batch_interface(nvar, nbatch, coords, hessian, status) bind(c)
+      import c_double, c_int
+
+      implicit none
+      integer(c_int), intent(in), value :: nvar
+      integer(c_int), intent(in), value :: nbatch
+      real(c_double), intent(in) :: coords(nvar, nbatch)
+      real(c_double), intent(out) :: hessian(nvar, nvar, nbatch)
+      integer(c_int), intent(out) :: status
+    end subroutine
+  end interface
+
   abstract interface
     subroutine dlf_get_multistate_gradients_interface(nvar, coords, energy, gradient, coupling, needcoupling, iimage, status) &
         bind(c)
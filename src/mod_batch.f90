@@ -0,0 +1,152 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Buffer for batched gradient evaluations. Geometries that DL-FIND will request
+! one by one are evaluated together through dlf_get_gradient_batch_callback,
+! and the results are handed out by dlf_get_gradient when they are requested.
+! Every result is handed out once. Hessians are buffered in the same way through
+! dlf_get_hessian_batch_callback and handed out by dlf_get_hessian.
+module mod_batch
+  use iso_c_binding, only: c_double, c_int
+
+  implicit none
+  integer :: nbuffer = 0 ! number of geometries in the buffer
+  integer(c_int) :: buffer_kiter ! kiter of the buffered evaluations
+  real(c_double), allocatable :: buffer_coords(:, :) ! (nvar, nbuffer)
+  real(c_double), allocatable :: buffer_energy(:) ! (nbuffer)
+  real(c_double), allocatable :: buffer_gradient(:, :) ! (nvar, nbuffer)
+  logical, allocatable :: buffer_valid(:) ! (nbuffer) result not handed out yet
+  integer :: nhessian_buffer = 0 ! number of geometries in the Hessian buffer
+  real(c_double), allocatable :: hessian_buffer_coords(:, :) ! (nvar, nhessian_buffer)
+  real(c_double), allocatable :: hessian_buffer(:, :, :) ! (nvar, nvar, nhessian_buffer)
+  logical, allocatable :: hessian_buffer_valid(:) ! (nhessian_buffer) Hessian not handed out yet
+
+contains
+
+  ! Evaluate a batch of geometries and store the results in the buffer
+  subroutine batch_evaluate(nvar, nbatch, coords, iimage, kiter, status)
+    use mod_globals, only: dlf_get_gradient_batch_callback
+
+    implicit none
+    integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+    integer, intent(in) :: nbatch ! number of geometries
+    real(c_double), intent(in) :: coords(nvar, nbatch) ! coordinates
+    integer(c_int), intent(in) :: iimage(nbatch) ! image of each geometry (for NEB)
+    integer, intent(in) :: kiter ! flag related to microiterations
+    integer, intent(out) :: status ! return code
+
+    call batch_reset()
+    allocate (buffer_coords(nvar, nbatch), buffer_energy(nbatch), buffer_gradient(nvar, nbatch), &
+              buffer_valid(nbatch))
+    buffer_coords(:, :) = coords(:, :)
+    buffer_kiter = kiter
+    call dlf_get_gradient_batch_callback(nvar, nbatch, buffer_coords, buffer_energy, buffer_gradient, iimage, kiter, &
+                                         status)
+    buffer_valid(:) = (status == 0)
+    nbuffer = nbatch
+  end subroutine
+
+  ! Hand out the result for coords if it is in the buffer
+  subroutine batch_lookup(nvar, coords, kiter, energy, gradient, found)
+    implicit none
+    integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+    real(c_double), intent(in) :: coords(nvar) ! coordinates
+    integer, intent(in) :: kiter ! flag related to microiterations
+    real(c_double), intent(out) :: energy ! energy
+    real(c_double), intent(out) :: gradient(nvar) ! gradient
+    logical, intent(out) :: found ! result was in the buffer
+    integer :: ibuffer
+
+    found = .false.
+    if (nbuffer == 0 .or. kiter /= buffer_kiter) return
+    if (size(buffer_coords, 1) /= nvar) return
+    do ibuffer = 1, nbuffer
+      if (.not. buffer_valid(ibuffer)) cycle
+      if (all(buffer_coords(:, ibuffer) == coords(:))) then
+        energy = buffer_energy(ibuffer)
+        gradient(:) = buffer_gradient(:, ibuffer)
+        buffer_valid(ibuffer) = .false.
+        found = .true.
+        return
+      end if
+    end do
+  end subroutine
+
+  ! Empty the buffer
+  subroutine batch_reset()
+    implicit none
+
+    if (allocated(buffer_coords)) deallocate (buffer_coords)
+    if (allocated(buffer_energy)) deallocate (buffer_energy)
+    if (allocated(buffer_gradient)) deallocate (buffer_gradient)
+    if (allocated(buffer_valid)) deallocate (buffer_valid)
+    nbuffer = 0
+  end subroutine
+
+  ! Calculate the Hessians of a batch of geometries and store them in the buffer
+  subroutine hessian_batch_evaluate(nvar, nbatch, coords, status)
+    use mod_globals, only: dlf_get_hessian_batch_callback
+
+    implicit none
+    integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+    integer, intent(in) :: nbatch ! number of geometries
+    real(c_double), intent(in) :: coords(nvar, nbatch) ! coordinates
+    integer, intent(out) :: status ! return code
+
+    call hessian_batch_reset()
+    allocate (hessian_buffer_coords(nvar, nbatch), hessian_buffer(nvar, nvar, nbatch), hessian_buffer_valid(nbatch))
+    hessian_buffer_coords(:, :) = coords(:, :)
+    call dlf_get_hessian_batch_callback(nvar, nbatch, hessian_buffer_coords, hessian_buffer, status)
+    hessian_buffer_valid(:) = (status == 0)
+    nhessian_buffer = nbatch
+  end subroutine
+
+  ! Hand out the Hessian for coords if it is in the buffer
+  subroutine hessian_batch_lookup(nvar, coords, hessian, found)
+    implicit none
+    integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+    real(c_double), intent(in) :: coords(nvar) ! coordinates
+    real(c_double), intent(out) :: hessian(nvar, nvar) ! hessian
+    logical, intent(out) :: found ! Hessian was in the buffer
+    integer :: ibuffer
+
+    found = .false.
+    if (nhessian_buffer == 0) return
+    if (size(hessian_buffer_coords, 1) /= nvar) return
+    do ibuffer = 1, nhessian_buffer
+      if (.not. hessian_buffer_valid(ibuffer)) cycle
+      if (all(hessian_buffer_coords(:, ibuffer) == coords(:))) then
+        hessian(:, :) = hessian_buffer(:, :, ibuffer)
+        hessian_buffer_valid(ibuffer) = .false.
+        found = .true.
+        return
+      end if
+    end do
+  end subroutine
+
+  ! Empty the Hessian buffer
+  subroutine hessian_batch_reset()
+    implicit none
+
+    if (allocated(hessian_buffer_coords)) deallocate (hessian_buffer_coords)
+    if (allocated(hessian_buffer)) deallocate (hessian_buffer)
+    if (allocated(hessian_buffer_valid)) deallocate (hessian_buffer_valid)
+    nhessian_buffer = 0
+  end subroutine
+
+end module
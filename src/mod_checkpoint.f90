@@ -0,0 +1,78 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Location of the checkpoint files of DL-FIND. The files are written to and
+! read from checkpoint_dir instead of the working directory if it is set, and
+! dlf_checkpoint_callback is called every time a complete set of checkpoint
+! files has been written. The names of the files of that set are collected in
+! checkpoint_names, so that files of other runs in the same directory are not
+! taken for part of it.
+module mod_checkpoint
+  implicit none
+  character(len=:), allocatable :: checkpoint_dir ! directory including the trailing separator
+  character(len=:), allocatable :: checkpoint_names ! names written since checkpoint_begin, each followed by a newline
+  logical :: recording = .false. ! whether a set of checkpoint files is being written
+
+contains
+
+  ! Path of the checkpoint file name
+  function checkpoint_file(name) result(path)
+    implicit none
+    character(*), intent(in) :: name ! file name, e.g., dlf_global.chk
+    character(len=:), allocatable :: path
+
+    if (allocated(checkpoint_dir)) then
+      path = checkpoint_dir//name
+    else
+      path = name
+    end if
+    if (recording) then
+      if (index(checkpoint_names, name//new_line("a")) == 0) then
+        checkpoint_names = checkpoint_names//name//new_line("a")
+      end if
+    end if
+  end function
+
+  ! Start collecting the names of a new set of checkpoint files
+  subroutine checkpoint_begin()
+    implicit none
+
+    checkpoint_names = ""
+    recording = .true.
+  end subroutine
+
+  ! Forget the checkpoint files of the last run
+  subroutine checkpoint_reset()
+    implicit none
+
+    checkpoint_names = ""
+    recording = .false.
+  end subroutine
+
+end module
+
+! Tell the caller that a complete set of checkpoint files has been written
+subroutine dlf_checkpoint_notify()
+  use mod_globals, only: dlf_checkpoint_callback
+  use mod_checkpoint, only: recording
+  use dlf_stat, only: stat
+  implicit none
+
+  recording = .false.
+  if (associated(dlf_checkpoint_callback)) call dlf_checkpoint_callback(stat%sene, stat%ccycle)
+end subroutine
@@ -0,0 +1,57 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Failure of the last run. dlf_fail records the message and the coordinates
+! before DL-FIND cleans up, and the wrappers of the energy callbacks record the
+! status they returned.
+module mod_error
+  use iso_c_binding, only: c_double, c_int
+
+  implicit none
+  logical :: tfailed = .false. ! the last run failed
+  integer(c_int) :: error_status = 0 ! last non-zero status of an energy callback
+  character(len=:), allocatable :: error_message ! message passed to dlf_fail
+  real(c_double), allocatable :: error_coords(:) ! (nvar) coordinates when failing
+
+contains
+
+  ! Record a failure of DL-FIND
+  subroutine error_record(msg)
+    use dlf_global, only: glob
+
+    implicit none
+    character(*), intent(in) :: msg ! message passed to dlf_fail
+
+    ! Only the first failure is kept, dlf_fail can be reached again during clean up
+    if (tfailed) return
+    tfailed = .true.
+    error_message = msg
+    if (allocated(glob%xcoords)) error_coords = reshape(glob%xcoords, [size(glob%xcoords)])
+  end subroutine
+
+  ! Forget the recorded failure
+  subroutine error_reset()
+    implicit none
+
+    tfailed = .false.
+    error_status = 0
+    if (allocated(error_message)) deallocate (error_message)
+    if (allocated(error_coords)) deallocate (error_coords)
+  end subroutine
+
+end module
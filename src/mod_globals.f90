@@ -27,5 +27,9 @@ module mod_globals
   procedure(dlf_get_params_interface), pointer :: dlf_get_params_callback => null()
   procedure(dlf_put_coords_interface), pointer :: dlf_put_coords_callback => null()
   procedure(dlf_update_interface), pointer :: dlf_update_callback => null()
+  procedure(dlf_get_gradient_batch_interface), pointer :: dlf_get_gradient_batch_callback => null()
+  procedure(dlf_checkpoint_interface), pointer :: dlf_checkpoint_callback => null()
+  procedure(dlf_stop_interface), pointer :: dlf_stop_callback => null()
+  procedure(dlf_get_hessian_batch_interface), pointer :: dlf_get_hessian_batch_callback => null()
 
 end module
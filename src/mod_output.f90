@@ -0,0 +1,94 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Destination of the printout and auxiliary files of DL-FIND. Auxiliary files
+! such as path.xyz, nebinfo and qtsinfo are written to output_dir instead of
+! the working directory if it is set, and while a log file is open, the
+! printout goes to it instead of the standard output and error streams. Input
+! files such as qts_coords.txt are always read from the working directory.
+module mod_output
+  implicit none
+  character(len=:), allocatable :: output_dir ! directory including the trailing separator
+  integer :: log_unit = -1 ! unit of the open log file, or -1 if none
+
+contains
+
+  ! Path of the auxiliary file name
+  function output_file(name) result(path)
+    implicit none
+    character(*), intent(in) :: name ! file name, e.g., nebinfo
+    character(len=:), allocatable :: path
+
+    if (allocated(output_dir)) then
+      path = output_dir//name
+    else
+      path = name
+    end if
+  end function
+
+  ! Send the printout to the file path, replacing its contents
+  subroutine output_open_log(path)
+    use dlf_global, only: stdout, stderr
+    use dlf_allocate, only: allocate_set_stdout
+    implicit none
+    character(*), intent(in) :: path
+
+    call output_close_log()
+    open (newunit=log_unit, file=path, status="replace", action="write")
+    stdout = log_unit
+    stderr = log_unit
+    call allocate_set_stdout(log_unit)
+  end subroutine
+
+  ! Close the log file and send the printout to the standard streams again
+  subroutine output_close_log()
+    use dlf_global, only: stdout, stderr
+    use dlf_allocate, only: allocate_set_stdout
+    implicit none
+
+    if (log_unit < 0) return
+    close (log_unit)
+    log_unit = -1
+    stdout = 6
+    stderr = 0
+    call allocate_set_stdout(6)
+  end subroutine
+
+  ! Fortran string from a NUL-terminated C string, empty for NULL
+  function from_c_string(c_string) result(string)
+    use iso_c_binding, only: c_ptr, c_char, c_null_char, c_associated, c_f_pointer
+    implicit none
+    type(c_ptr), intent(in) :: c_string
+    character(len=:), allocatable :: string
+    character(kind=c_char), pointer :: chars(:)
+    integer :: length
+
+    if (.not. c_associated(c_string)) then
+      string = ""
+      return
+    end if
+    call c_f_pointer(c_string, chars, [huge(0)])
+    length = 0
+    do while (chars(length + 1) /= c_null_char)
+      length = length + 1
+    end do
+    allocate (character(len=length) :: string)
+    string = transfer(chars(1:length), string)
+  end function
+
+end module
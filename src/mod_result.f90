@@ -0,0 +1,59 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Last energy evaluation of the optimizer, kept after the run has finished.
+! Displaced geometries of finite-difference Hessians are not recorded.
+module mod_result
+  use iso_c_binding, only: c_double
+
+  implicit none
+  logical :: tresult = .false. ! an energy evaluation has been recorded
+  real(c_double) :: result_energy ! energy
+  real(c_double), allocatable :: result_coords(:) ! (nvar) coordinates
+  real(c_double), allocatable :: result_gradient(:) ! (nvar) gradient
+
+contains
+
+  ! Record an energy evaluation
+  subroutine result_record(nvar, coords, energy, gradient)
+    implicit none
+    integer, intent(in) :: nvar ! number of xyz variables (3*nat)
+    real(c_double), intent(in) :: coords(nvar) ! coordinates
+    real(c_double), intent(in) :: energy ! energy
+    real(c_double), intent(in) :: gradient(nvar) ! gradient
+
+    if (allocated(result_coords)) then
+      if (size(result_coords) /= nvar) call result_reset()
+    end if
+    if (.not. allocated(result_coords)) allocate (result_coords(nvar), result_gradient(nvar))
+    result_coords(:) = coords(:)
+    result_energy = energy
+    result_gradient(:) = gradient(:)
+    tresult = .true.
+  end subroutine
+
+  ! Forget the recorded energy evaluation
+  subroutine result_reset()
+    implicit none
+
+    if (allocated(result_coords)) deallocate (result_coords)
+    if (allocated(result_gradient)) deallocate (result_gradient)
+    tresult = .false.
+  end subroutine
+
+end module
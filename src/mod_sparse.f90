@@ -0,0 +1,270 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Sparse primitive B matrix for HDLC residues. Every primitive internal depends
+! on at most four atoms, so its row of the B matrix has at most twelve non-zero
+! elements. For residues with at least sparse_hdlc_atoms atoms, the B matrix is
+! stored in compressed sparse row format and the HDLC transformations solve
+! with the HDLC G matrix (Ut B)(Ut B)^T by conjugate gradients instead of
+! forming and inverting it in every iteration. The G matrix is only factorized
+! to precondition the conjugate gradients, and the factor is reused for as
+! long as it keeps them converging quickly.
+module mod_sparse
+  use iso_c_binding, only: c_double
+
+  implicit none
+  integer :: sparse_hdlc_atoms = 0 ! minimum number of atoms in a residue, 0 to switch off
+
+  ! Relative residual at which the conjugate gradients have converged
+  real(c_double), parameter :: sparse_tolerance = 1.0d-10
+  ! Iterations after which the preconditioner is made again
+  integer, parameter :: sparse_max_iter = 20
+
+  type sparse_matrix
+    integer :: nrow = 0 ! number of rows
+    integer :: ncol = 0 ! number of columns
+    integer :: nset = 0 ! number of rows set so far
+    integer, allocatable :: rowptr(:) ! (nrow + 1) start of each row in col and val
+    integer, allocatable :: col(:) ! column of each element
+    real(c_double), allocatable :: val(:) ! value of each element
+  end type sparse_matrix
+
+contains
+
+  ! Whether a residue with natom atoms uses the sparse B matrix
+  logical function sparse_hdlc_active(natom)
+    implicit none
+    integer, intent(in) :: natom ! number of atoms in the residue
+
+    sparse_hdlc_active = (sparse_hdlc_atoms > 0 .and. natom >= sparse_hdlc_atoms)
+  end function
+
+  ! Allocate an empty matrix with room for nnz elements
+  subroutine sparse_create(b, nrow, ncol, nnz)
+    implicit none
+    type(sparse_matrix), intent(inout) :: b ! matrix
+    integer, intent(in) :: nrow ! number of rows
+    integer, intent(in) :: ncol ! number of columns
+    integer, intent(in) :: nnz ! expected number of non-zero elements
+
+    call sparse_destroy(b)
+    b%nrow = nrow
+    b%ncol = ncol
+    b%nset = 0
+    allocate (b%rowptr(nrow + 1), b%col(max(nnz, 1)), b%val(max(nnz, 1)))
+    b%rowptr(:) = 1
+  end subroutine
+
+  ! Free the memory of the matrix
+  subroutine sparse_destroy(b)
+    implicit none
+    type(sparse_matrix), intent(inout) :: b ! matrix
+
+    if (allocated(b%rowptr)) deallocate (b%rowptr)
+    if (allocated(b%col)) deallocate (b%col)
+    if (allocated(b%val)) deallocate (b%val)
+    b%nrow = 0
+    b%ncol = 0
+    b%nset = 0
+  end subroutine
+
+  ! Set row irow from the Cartesian derivatives brow, which are only read for
+  ! the listed atoms. Rows are set in order, skipped rows are left empty.
+  subroutine sparse_set_row(b, irow, atoms, brow)
+    implicit none
+    type(sparse_matrix), intent(inout) :: b ! matrix
+    integer, intent(in) :: irow ! row to set
+    integer, intent(in) :: atoms(:) ! atoms the primitive depends on
+    real(c_double), intent(in) :: brow(:, :) ! (3, natom) derivatives
+    integer, allocatable :: col(:)
+    real(c_double), allocatable :: val(:)
+    integer :: i, k, pos
+
+    if (irow <= b%nset .or. irow > b%nrow) stop "sparse_set_row: rows must be set in order"
+    b%rowptr(b%nset + 2:irow) = b%rowptr(b%nset + 1)
+    pos = b%rowptr(irow)
+    if (pos + 3*size(atoms) - 1 > size(b%col)) then
+      allocate (col(2*size(b%col) + 3*size(atoms)), val(2*size(b%val) + 3*size(atoms)))
+      col(:pos - 1) = b%col(:pos - 1)
+      val(:pos - 1) = b%val(:pos - 1)
+      call move_alloc(col, b%col)
+      call move_alloc(val, b%val)
+    end if
+    do i = 1, size(atoms)
+      ! Atoms listed twice would be counted twice in the products
+      if (any(atoms(:i - 1) == atoms(i))) cycle
+      do k = 1, 3
+        b%col(pos) = 3*(atoms(i) - 1) + k
+        b%val(pos) = brow(k, atoms(i))
+        pos = pos + 1
+      end do
+    end do
+    b%rowptr(irow + 1:) = pos
+    b%nset = irow
+  end subroutine
+
+  ! y = B x
+  subroutine sparse_multiply(b, x, y)
+    implicit none
+    type(sparse_matrix), intent(in) :: b ! matrix
+    real(c_double), intent(in) :: x(b%ncol) ! vector
+    real(c_double), intent(out) :: y(b%nrow) ! product
+    integer :: irow
+
+    do irow = 1, b%nrow
+      y(irow) = sum(b%val(b%rowptr(irow):b%rowptr(irow + 1) - 1)*x(b%col(b%rowptr(irow):b%rowptr(irow + 1) - 1)))
+    end do
+  end subroutine
+
+  ! x = B^T y
+  subroutine sparse_multiply_transpose(b, y, x)
+    implicit none
+    type(sparse_matrix), intent(in) :: b ! matrix
+    real(c_double), intent(in) :: y(b%nrow) ! vector
+    real(c_double), intent(out) :: x(b%ncol) ! product
+    integer :: irow, pos
+
+    x(:) = 0.0d0
+    do irow = 1, b%nrow
+      do pos = b%rowptr(irow), b%rowptr(irow + 1) - 1
+        x(b%col(pos)) = x(b%col(pos)) + b%val(pos)*y(irow)
+      end do
+    end do
+  end subroutine
+
+  ! Cholesky factor of the HDLC G matrix (Ut B)(Ut B)^T, used as preconditioner
+  subroutine sparse_hdlc_factorize(b, ut, chol, failed)
+    implicit none
+    type(sparse_matrix), intent(in) :: b ! primitive B matrix (np, n)
+    real(c_double), intent(in) :: ut(:, :) ! (n6, np) Ut matrix
+    real(c_double), intent(out) :: chol(size(ut, 1), size(ut, 1)) ! lower triangle of the factor
+    logical, intent(out) :: failed ! G matrix not positive definite
+    real(c_double), allocatable :: bhdlc(:, :)
+    integer :: irow, pos, n6, info
+
+    ! Ut B from the columns of Ut, one element of B at a time
+    n6 = size(ut, 1)
+    allocate (bhdlc(n6, b%ncol))
+    bhdlc(:, :) = 0.0d0
+    do irow = 1, b%nrow
+      do pos = b%rowptr(irow), b%rowptr(irow + 1) - 1
+        bhdlc(:, b%col(pos)) = bhdlc(:, b%col(pos)) + b%val(pos)*ut(:, irow)
+      end do
+    end do
+    call dsyrk('L', 'N', n6, b%ncol, 1.0d0, bhdlc, n6, 0.0d0, chol, n6)
+    call dpotrf('L', n6, chol, n6, info)
+    failed = (info /= 0)
+  end subroutine
+
+  ! q = (Ut B)(Ut B)^T p
+  subroutine sparse_hdlc_g_multiply(b, ut, p, q, work_prim, work_cart)
+    implicit none
+    type(sparse_matrix), intent(in) :: b ! primitive B matrix (np, n)
+    real(c_double), intent(in) :: ut(:, :) ! (n6, np) Ut matrix
+    real(c_double), intent(in) :: p(size(ut, 1)) ! vector
+    real(c_double), intent(out) :: q(size(ut, 1)) ! product
+    real(c_double), intent(inout) :: work_prim(b%nrow) ! workspace
+    real(c_double), intent(inout) :: work_cart(b%ncol) ! workspace
+    integer :: n6
+
+    n6 = size(ut, 1)
+    call dgemv('T', n6, b%nrow, 1.0d0, ut, n6, p, 1, 0.0d0, work_prim, 1)
+    call sparse_multiply_transpose(b, work_prim, work_cart)
+    call sparse_multiply(b, work_cart, work_prim)
+    call dgemv('N', n6, b%nrow, 1.0d0, ut, n6, work_prim, 1, 0.0d0, q, 1)
+  end subroutine
+
+  ! Solve (Ut B)(Ut B)^T y = r by conjugate gradients, preconditioned with the
+  ! Cholesky factor chol of the G matrix of an earlier geometry
+  subroutine sparse_hdlc_cg(b, ut, chol, r, y, maxiter, converged)
+    implicit none
+    type(sparse_matrix), intent(in) :: b ! primitive B matrix (np, n)
+    real(c_double), intent(in) :: ut(:, :) ! (n6, np) Ut matrix
+    real(c_double), intent(in) :: chol(size(ut, 1), size(ut, 1)) ! Cholesky factor of G
+    real(c_double), intent(in) :: r(size(ut, 1)) ! right-hand side
+    real(c_double), intent(out) :: y(size(ut, 1)) ! solution
+    integer, intent(in) :: maxiter ! maximum number of iterations
+    logical, intent(out) :: converged ! residual below sparse_tolerance
+    real(c_double), allocatable :: res(:), z(:), p(:), q(:), work_prim(:), work_cart(:)
+    real(c_double) :: alpha, pq, rz, rz_old, rnorm
+    integer :: iter, n6, info
+
+    n6 = size(ut, 1)
+    y(:) = 0.0d0
+    converged = .true.
+    rnorm = sqrt(sum(r**2))
+    if (rnorm == 0.0d0) return
+
+    converged = .false.
+    allocate (res(n6), z(n6), p(n6), q(n6), work_prim(b%nrow), work_cart(b%ncol))
+    res(:) = r(:)
+    z(:) = res(:)
+    call dpotrs('L', n6, 1, chol, n6, z, n6, info)
+    p(:) = z(:)
+    rz = dot_product(res, z)
+    do iter = 1, maxiter
+      call sparse_hdlc_g_multiply(b, ut, p, q, work_prim, work_cart)
+      pq = dot_product(p, q)
+      if (pq <= 0.0d0) return
+      alpha = rz/pq
+      y(:) = y(:) + alpha*p(:)
+      res(:) = res(:) - alpha*q(:)
+      if (sqrt(sum(res**2)) <= sparse_tolerance*rnorm) then
+        converged = .true.
+        return
+      end if
+      z(:) = res(:)
+      call dpotrs('L', n6, 1, chol, n6, z, n6, info)
+      rz_old = rz
+      rz = dot_product(res, z)
+      p(:) = z(:) + (rz/rz_old)*p(:)
+    end do
+  end subroutine
+
+  ! Solve (Ut B)(Ut B)^T y = r. The Cholesky factor chol is kept between calls
+  ! for the slowly changing B matrices of an iterative transformation, and made
+  ! again from the current B matrix if it is missing or the solution does not
+  ! converge in sparse_max_iter iterations with it.
+  subroutine sparse_hdlc_solve(b, ut, chol, r, y, failed)
+    implicit none
+    type(sparse_matrix), intent(in) :: b ! primitive B matrix (np, n)
+    real(c_double), intent(in) :: ut(:, :) ! (n6, np) Ut matrix
+    real(c_double), allocatable, intent(inout) :: chol(:, :) ! (n6, n6) Cholesky factor of G
+    real(c_double), intent(in) :: r(size(ut, 1)) ! right-hand side
+    real(c_double), intent(out) :: y(size(ut, 1)) ! solution
+    logical, intent(out) :: failed ! G matrix singular
+    logical :: converged
+
+    if (allocated(chol)) then
+      call sparse_hdlc_cg(b, ut, chol, r, y, sparse_max_iter, converged)
+      failed = .not. converged
+      if (converged) return
+    else
+      allocate (chol(size(ut, 1), size(ut, 1)))
+    end if
+    call sparse_hdlc_factorize(b, ut, chol, failed)
+    if (failed) then
+      deallocate (chol)
+      y(:) = 0.0d0
+      return
+    end if
+    call sparse_hdlc_cg(b, ut, chol, r, y, sparse_max_iter, converged)
+    failed = .not. converged
+  end subroutine
+
+end module mod_sparse
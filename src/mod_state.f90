@@ -0,0 +1,85 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! State of the optimizer in internal coordinates carried from one run to the
+! next: the Hessian of the Hessian-based optimizers and the memory of L-BFGS.
+! The initial state is set before a run and used in place of the initial
+! Hessian and the first steepest-descent step. The final state is kept after
+! the run has finished.
+module mod_state
+  use iso_c_binding, only: c_double
+
+  implicit none
+  real(c_double), allocatable :: initial_hessian(:, :) ! (nivar, nivar) Hessian to start from
+  real(c_double), allocatable :: initial_steps(:, :) ! (nivar, npairs) L-BFGS steps, oldest first
+  real(c_double), allocatable :: initial_dgrads(:, :) ! (nivar, npairs) L-BFGS gradient differences
+  logical :: thessian_used = .false. ! the initial Hessian has been used in this run
+  real(c_double), allocatable :: final_hessian(:, :) ! (nivar, nivar) Hessian at the end of the run
+  real(c_double), allocatable :: final_steps(:, :) ! (nivar, npairs) L-BFGS steps, oldest first
+  real(c_double), allocatable :: final_dgrads(:, :) ! (nivar, npairs) L-BFGS gradient differences
+
+contains
+
+  ! Copy the initial Hessian into hessian, once per run. Returns .false. if
+  ! there is none or it has been used.
+  function state_take_hessian(n, hessian) result(taken)
+    implicit none
+    integer, intent(in) :: n ! number of internal coordinates of the Hessian
+    real(c_double), intent(inout) :: hessian(n, n) ! Hessian of the optimizer
+    logical :: taken
+
+    taken = .false.
+    if (.not. allocated(initial_hessian) .or. thessian_used) return
+    if (size(initial_hessian, 1) /= n) &
+      call dlf_fail("Size of the initial Hessian does not match the internal coordinates")
+    hessian(:, :) = initial_hessian(:, :)
+    thessian_used = .true.
+    taken = .true.
+  end function
+
+  ! Keep the Hessian at the end of the run
+  subroutine state_save_hessian(n, hessian)
+    implicit none
+    integer, intent(in) :: n ! number of internal coordinates of the Hessian
+    real(c_double), intent(in) :: hessian(n, n) ! Hessian of the optimizer
+
+    if (allocated(final_hessian)) deallocate (final_hessian)
+    allocate (final_hessian(n, n))
+    final_hessian(:, :) = hessian(:, :)
+  end subroutine
+
+  ! Forget the final state of the last run
+  subroutine state_reset()
+    implicit none
+
+    if (allocated(final_hessian)) deallocate (final_hessian)
+    if (allocated(final_steps)) deallocate (final_steps)
+    if (allocated(final_dgrads)) deallocate (final_dgrads)
+    thessian_used = .false.
+  end subroutine
+
+  ! Forget the initial state
+  subroutine state_reset_initial()
+    implicit none
+
+    if (allocated(initial_hessian)) deallocate (initial_hessian)
+    if (allocated(initial_steps)) deallocate (initial_steps)
+    if (allocated(initial_dgrads)) deallocate (initial_dgrads)
+  end subroutine
+
+end module
@@ -0,0 +1,82 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Stopping a run before it has converged. The main cycle of DL-FIND calls
+! stop_check before every energy evaluation, which stops the run if the
+! caller has set the cancel flag, if the time limit has passed or if
+! dlf_stop_callback asks for it.
+module mod_stop
+  use iso_c_binding, only: c_double, c_int, c_ptr, c_null_ptr
+
+  implicit none
+  integer, parameter :: stop_none = 0, stop_cancelled = 1, stop_time_limit = 2, stop_callback = 3
+  type(c_ptr) :: cancel_flag = c_null_ptr ! int owned by the caller, non-zero to stop
+  real(c_double) :: time_limit = 0.0d0 ! wall time limit of a run (s), none if not positive
+  integer :: stop_reason = stop_none ! why the last run was stopped
+  integer(kind=8) :: start_count ! system clock count at the start of the run
+  integer(kind=8) :: count_rate ! system clock counts per second
+
+contains
+
+  ! Start the clock for the time limit and forget the previous stop reason
+  subroutine stop_reset()
+    implicit none
+
+    stop_reason = stop_none
+    call system_clock(start_count, count_rate)
+  end subroutine
+
+  ! Whether the run should stop before the next energy evaluation
+  function stop_check() result(tstop)
+    use mod_globals, only: dlf_stop_callback
+    use mod_result, only: tresult, result_coords, result_energy
+    use dlf_stat, only: stat
+    use iso_c_binding, only: c_associated, c_f_pointer
+    implicit none
+    logical :: tstop
+    integer(c_int), pointer :: flag
+    integer(kind=8) :: count
+    integer(c_int) :: stop
+
+    tstop = .true.
+    if (c_associated(cancel_flag)) then
+      call c_f_pointer(cancel_flag, flag)
+      if (flag /= 0) then
+        stop_reason = stop_cancelled
+        return
+      end if
+    end if
+    if (time_limit > 0.0d0) then
+      call system_clock(count)
+      if (real(count - start_count, c_double) / real(count_rate, c_double) > time_limit) then
+        stop_reason = stop_time_limit
+        return
+      end if
+    end if
+    if (associated(dlf_stop_callback) .and. tresult) then
+      stop = 0
+      call dlf_stop_callback(size(result_coords), result_coords, result_energy, stat%sene - 1, stat%ccycle - 1, stop)
+      if (stop /= 0) then
+        stop_reason = stop_callback
+        return
+      end if
+    end if
+    tstop = .false.
+  end function
+
+end module
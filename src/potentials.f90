@@ -0,0 +1,167 @@
+!  Copyright 2021 Kjell Jorner
+!
+!  This file is part of libdlfind.
+!
+!  libdlfind is free software: you can redistribute it and/or modify
+!  it under the terms of the GNU Lesser General Public License as
+!  published by the Free Software Foundation, either version 3 of the
+!  License, or (at your option) any later version.
+!
+!  libdlfind is distributed in the hope that it will be useful,
+!  but WITHOUT ANY WARRANTY; without even the implied warranty of
+!  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+!  GNU Lesser General Public License for more details.
+!
+!  You should have received a copy of the GNU Lesser General Public
+!  License along with libdlfind.  If not, see
+!  <http://www.gnu.org/licenses/>.
+
+! Analytic test potentials with the interface of dlf_get_gradient, which can be
+! passed directly as callbacks to api_dl_find. The parameters of the
+! Lennard-Jones and Morse potentials are shared by all calls and can be changed
+! with the setter functions.
+module mod_potentials
+  use iso_c_binding, only: c_double
+
+  implicit none
+  ! Mueller-Brown parameters, as in main.f90 of DL-FIND
+  real(c_double), parameter :: mb_ebarr = 0.5D0
+  real(c_double), parameter :: mb_acap(4) = (/-200.D0, -100.D0, -170.D0, 15.D0/)*mb_ebarr/106.D0
+  real(c_double), parameter :: mb_a(4) = (/-1.D0, -1.D0, -6.5D0, 0.7D0/)
+  real(c_double), parameter :: mb_b(4) = (/0.D0, 0.D0, 11.D0, 0.6D0/)
+  real(c_double), parameter :: mb_c(4) = (/-10.D0, -10.D0, -6.5D0, 0.7D0/)
+  real(c_double), parameter :: mb_x0(4) = (/1.D0, 0.D0, -0.5D0, -1.D0/)
+  real(c_double), parameter :: mb_y0(4) = (/0.D0, 0.5D0, 1.5D0, 1.D0/)
+  real(c_double), parameter :: mb_shift = 0.692D0
+  ! Lennard-Jones parameters
+  real(c_double) :: lj_epsilon = 1.D0 ! well depth
+  real(c_double) :: lj_sigma = 1.D0 ! distance where the potential is zero
+  ! Morse parameters
+  real(c_double) :: morse_d = 1.D0 ! well depth
+  real(c_double) :: morse_a = 1.D0 ! width parameter
+  real(c_double) :: morse_r0 = 1.D0 ! equilibrium distance
+
+end module
+
+! Mueller-Brown potential in the x and y coordinates of the first atom. Other
+! coordinates do not contribute.
+! see K Mueller and L. D. Brown, Theor. Chem. Acta 53, 75 (1979)
+subroutine potential_muller_brown(nvar, coords, energy, gradient, iimage, kiter, status) bind(c)
+  use mod_potentials
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: nvar ! number of xyz variables (3*nat)
+  real(c_double), intent(in) :: coords(nvar) ! coordinates
+  real(c_double), intent(out) :: energy ! energy
+  real(c_double), intent(out) :: gradient(nvar) ! gradient
+  integer(c_int), intent(in), value :: iimage ! current image (for NEB)
+  integer(c_int), intent(in), value :: kiter ! flag related to microiterations
+  integer(c_int), intent(out) :: status ! return code
+  real(c_double) :: x, y, svar
+  integer :: icount
+
+  status = 1
+  if (nvar < 2) return
+  x = coords(1)
+  y = coords(2)
+  energy = mb_shift
+  gradient(:) = 0.D0
+  do icount = 1, 4
+    svar = mb_acap(icount)*exp(mb_a(icount)*(x - mb_x0(icount))**2 + &
+                               mb_b(icount)*(x - mb_x0(icount))*(y - mb_y0(icount)) + &
+                               mb_c(icount)*(y - mb_y0(icount))**2)
+    energy = energy + svar
+    gradient(1) = gradient(1) + svar*(2.D0*mb_a(icount)*(x - mb_x0(icount)) + mb_b(icount)*(y - mb_y0(icount)))
+    gradient(2) = gradient(2) + svar*(2.D0*mb_c(icount)*(y - mb_y0(icount)) + mb_b(icount)*(x - mb_x0(icount)))
+  end do
+  status = 0
+end subroutine
+
+! Lennard-Jones cluster with all pairs of atoms
+subroutine potential_lennard_jones(nvar, coords, energy, gradient, iimage, kiter, status) bind(c)
+  use mod_potentials, only: lj_epsilon, lj_sigma
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: nvar ! number of xyz variables (3*nat)
+  real(c_double), intent(in) :: coords(3, nvar/3) ! coordinates
+  real(c_double), intent(out) :: energy ! energy
+  real(c_double), intent(out) :: gradient(3, nvar/3) ! gradient
+  integer(c_int), intent(in), value :: iimage ! current image (for NEB)
+  integer(c_int), intent(in), value :: kiter ! flag related to microiterations
+  integer(c_int), intent(out) :: status ! return code
+  real(c_double) :: dvec(3), r2, sr6, svar
+  integer :: iat, jat
+
+  energy = 0.D0
+  gradient(:, :) = 0.D0
+  do iat = 1, nvar/3
+    do jat = iat + 1, nvar/3
+      dvec(:) = coords(:, iat) - coords(:, jat)
+      r2 = sum(dvec**2)
+      sr6 = (lj_sigma**2/r2)**3
+      energy = energy + 4.D0*lj_epsilon*(sr6**2 - sr6)
+      svar = -24.D0*lj_epsilon*(2.D0*sr6**2 - sr6)/r2
+      gradient(:, iat) = gradient(:, iat) + svar*dvec(:)
+      gradient(:, jat) = gradient(:, jat) - svar*dvec(:)
+    end do
+  end do
+  status = 0
+end subroutine
+
+! Linear chain of atoms with Morse bonds between neighbours
+subroutine potential_morse_chain(nvar, coords, energy, gradient, iimage, kiter, status) bind(c)
+  use mod_potentials, only: morse_d, morse_a, morse_r0
+  use iso_c_binding, only: c_int, c_double
+
+  implicit none
+  integer(c_int), intent(in), value :: nvar ! number of xyz variables (3*nat)
+  real(c_double), intent(in) :: coords(3, nvar/3) ! coordinates
+  real(c_double), intent(out) :: energy ! energy
+  real(c_double), intent(out) :: gradient(3, nvar/3) ! gradient
+  integer(c_int), intent(in), value :: iimage ! current image (for NEB)
+  integer(c_int), intent(in), value :: kiter ! flag related to microiterations
+  integer(c_int), intent(out) :: status ! return code
+  real(c_double) :: dvec(3), r, svar, svar2
+  integer :: iat
+
+  energy = 0.D0
+  gradient(:, :) = 0.D0
+  do iat = 1, nvar/3 - 1
+    dvec(:) = coords(:, iat) - coords(:, iat + 1)
+    r = sqrt(sum(dvec**2))
+    svar = exp(-morse_a*(r - morse_r0))
+    energy = energy + morse_d*(1.D0 - svar)**2
+    svar2 = 2.D0*morse_d*morse_a*(1.D0 - svar)*svar/r
+    gradient(:, iat) = gradient(:, iat) + svar2*dvec(:)
+    gradient(:, iat + 1) = gradient(:, iat + 1) - svar2*dvec(:)
+  end do
+  status = 0
+end subroutine
+
+subroutine potential_set_lennard_jones(epsilon, sigma) bind(c)
+  use mod_potentials, only: lj_epsilon, lj_sigma
+  use iso_c_binding, only: c_double
+
+  implicit none
+  real(c_double), intent(in), value :: epsilon ! well depth
+  real(c_double), intent(in), value :: sigma ! distance where the potential is zero
+
+  lj_epsilon = epsilon
+  lj_sigma = sigma
+end subroutine
+
+subroutine potential_set_morse(d, a, r0) bind(c)
+  use mod_potentials, only: morse_d, morse_a, morse_r0
+  use iso_c_binding, only: c_double
+
+  implicit none
+  real(c_double), intent(in), value :: d ! well depth
+  real(c_double), intent(in), value :: a ! width parameter
+  real(c_double), intent(in), value :: r0 ! equilibrium distance
+
+  morse_d = d
+  morse_a = a
+  morse_r0 = r0
+end subroutine
@@ -0,0 +1,147 @@
+/*
+ *  Copyright 2021 Kjell Jorner
+ *
+ *  This file is part of libdlfind.
+ *
+ *  libdlfind is free software: you can redistribute it and/or modify
+ *  it under the terms of the GNU Lesser General Public License as
+ *  published by the Free Software Foundation, either version 3 of the
+ *  License, or (at your option) any later version.
+ *
+ *  libdlfind is distributed in the hope that it will be useful,
+ *  but WITHOUT ANY WARRANTY; without even the implied warranty of
+ *  MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+ *  GNU Lesser General Public License for more details.
+ *
+ *  You should have received a copy of the GNU Lesser General Public
+ *  License along with libdlfind.  If not, see
+ *  <http://www.gnu.org/licenses/>.
+ */
+
+/* Recoverable runs of api_dl_find. DL-FIND calls dlf_error when it fails,
+   after it has deallocated its arrays so that it can be called again.
+   api_dlf_unwind then jumps back to api_dl_find_recoverable instead of
+   letting dlf_error terminate the process. Callbacks have always returned
+   when DL-FIND fails, so no frames of the calling code are skipped.
+
+   The state of DL-FIND lives in Fortran modules, so runs are serialized with
+   a process-wide lock. It is recursive so that callers can hold it while they
+   set up a run and read its results, and a run started from a callback of a
+   running one is refused instead of deadlocking. */
+
+#include <setjmp.h>
+#include <stddef.h>
+
+#include "libdlfind.h"
+
+#ifdef _WIN32
+#include <windows.h>
+static CRITICAL_SECTION run_lock;
+static INIT_ONCE run_lock_once = INIT_ONCE_STATIC_INIT;
+
+static BOOL CALLBACK init_run_lock(PINIT_ONCE once, PVOID param, PVOID *context)
+{
+    InitializeCriticalSection(&run_lock);
+    return TRUE;
+}
+
+#define RUN_LOCK()                                                    \
+    do {                                                              \
+        InitOnceExecuteOnce(&run_lock_once, init_run_lock, NULL, NULL); \
+        EnterCriticalSection(&run_lock);                              \
+    } while (0)
+#define RUN_UNLOCK() LeaveCriticalSection(&run_lock)
+#else
+#include <pthread.h>
+static pthread_mutex_t run_lock;
+static pthread_once_t run_lock_once = PTHREAD_ONCE_INIT;
+
+static void init_run_lock(void)
+{
+    pthread_mutexattr_t attr;
+
+    pthread_mutexattr_init(&attr);
+    pthread_mutexattr_settype(&attr, PTHREAD_MUTEX_RECURSIVE);
+    pthread_mutex_init(&run_lock, &attr);
+    pthread_mutexattr_destroy(&attr);
+}
+
+#define RUN_LOCK()                                        \
+    do {                                                  \
+        pthread_once(&run_lock_once, init_run_lock);      \
+        pthread_mutex_lock(&run_lock);                    \
+    } while (0)
+#define RUN_UNLOCK() pthread_mutex_unlock(&run_lock)
+#endif
+
+/* Whether DL-FIND is running, only accessed while holding run_lock */
+static int running = 0;
+
+/* Innermost active call of api_dl_find_recoverable */
+static jmp_buf *recover_point = NULL;
+
+int api_dlf_lock_runs(void)
+{
+    RUN_LOCK();
+    if (running) {
+        /* Only the thread of the running call gets here */
+        RUN_UNLOCK();
+        return -1;
+    }
+    return 0;
+}
+
+void api_dlf_unlock_runs(void)
+{
+    RUN_UNLOCK();
+}
+
+int api_dl_find_recoverable(
+    int nvarin,
+    int nvarin2,
+    int nspec,
+    int master,
+    c_dlf_error c_dlf_error_,
+    c_dlf_get_gradient c_dlf_get_gradient_,
+    c_dlf_get_hessian c_dlf_get_hessian_,
+    c_dlf_get_multistate_gradients c_dlf_get_multistate_gradients_,
+    c_dlf_get_params c_dlf_get_params_,
+    c_dlf_put_coords c_dlf_put_coords_,
+    c_dlf_update c_dlf_update_)
+{
+    jmp_buf point;
+    jmp_buf *previous = recover_point;
+
+    if (api_dlf_lock_runs() != 0)
+        return -1;
+    running = 1;
+    if (setjmp(point) != 0) {
+        recover_point = previous;
+        running = 0;
+        RUN_UNLOCK();
+        return 1;
+    }
+    recover_point = &point;
+    api_dl_find(
+        nvarin,
+        nvarin2,
+        nspec,
+        master,
+        c_dlf_error_,
+        c_dlf_get_gradient_,
+        c_dlf_get_hessian_,
+        c_dlf_get_multistate_gradients_,
+        c_dlf_get_params_,
+        c_dlf_put_coords_,
+        c_dlf_update_);
+    recover_point = previous;
+    running = 0;
+    RUN_UNLOCK();
+    return 0;
+}
+
+void api_dlf_unwind(void)
+{
+    if (recover_point != NULL)
+        longjmp(*recover_point, 1);
+}
@@ -1,21 +1,75 @@
 """Tests for libdlfind."""
 from __future__ import annotations
 
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from ctypes import (
+    addressof,
+    c_double,
+    c_int,
+    c_void_p,
+    cast,
+    CFUNCTYPE,
+    POINTER,
+    Structure,
+)
 import functools
+import logging
+import multiprocessing
+from pathlib import Path
+import threading
+import time
+from typing import Callable, Optional
 
 import numpy as np
 from numpy.testing import assert_allclose
 from numpy.typing import ArrayLike, NDArray
+import pytest
 import rdkit
 from rdkit import Chem
 from rdkit.Chem import AllChem
 
-from libdlfind import dl_find
+from libdlfind import (
+    CancelToken,
+    ConvergenceState,
+    dl_find,
+    dl_find_batched,
+    dl_find_many,
+    DLFindError,
+    get_blas_info,
+    get_statistics,
+    Job,
+    OptimizationResult,
+    OptimizerState,
+    SteppingOptimizer,
+)
+from libdlfind.cache import GradientCache, HessianCache
 from libdlfind.callback import (
+    dlf_get_gradient_batch_wrapper,
+    dlf_get_gradient_inplace_wrapper,
     dlf_get_gradient_wrapper,
+    dlf_get_hessian_batch_wrapper,
+    dlf_get_hessian_wrapper,
     dlf_put_coords_wrapper,
     make_dlf_get_params,
+    make_gradient_batch,
+    make_hessian_batch,
 )
+from libdlfind.checkpoint import Checkpoint, CheckpointWriter
+from libdlfind.function_types import type_dlf_get_gradient, type_dlf_get_params
+from libdlfind.lib import get_result, lib
+from libdlfind.output import RunOutput
+from libdlfind.potentials import (
+    evaluate,
+    lennard_jones,
+    lennard_jones_cluster,
+    morse_chain,
+    morse_chain_coordinates,
+    muller_brown,
+)
+from libdlfind.replay import CallbackRecorder, CallbackReplayer, read_exchanges
+from libdlfind.surrogate import GPSurrogate
+from libdlfind.trajectory import TrajectoryRecorder
 
 
 def add_conformers_to_mol(mol: Chem.Mol, conformer_coordinates: ArrayLike) -> None:
@@ -46,6 +100,34 @@ def e_g_func(
     return energy, gradient
 
 
+def harmonic(
+    coordinates: NDArray[np.float64],
+    iimage: int,
+    kiter: int,
+    center: NDArray[np.float64],
+) -> tuple[float, NDArray[np.float64]]:
+    """Energy and gradient of an isotropic harmonic well."""
+    displacement = coordinates - center
+    return 0.5 * float(np.sum(displacement**2)), displacement
+
+
+def double_well(
+    coordinates: NDArray[np.float64], iimage: int, kiter: int
+) -> tuple[float, NDArray[np.float64]]:
+    """Energy and gradient of a coupled double well along x."""
+    x, y, z = coordinates[0]
+    energy = (x**2 - 1) ** 2 + y**2 + z**2 + 0.5 * x * y
+    gradient = np.array([[4 * x * (x**2 - 1) + 0.5 * y, 2 * y + 0.5 * x, 2 * z]])
+    return energy, gradient
+
+
+def nan_energy(
+    coordinates: NDArray[np.float64], iimage: int, kiter: int
+) -> tuple[float, NDArray[np.float64]]:
+    """Energy that is NaN, as from a failed calculation."""
+    return float("nan"), np.zeros_like(coordinates)
+
+
 @dlf_put_coords_wrapper
 def store_results(
     switch: int,
@@ -80,7 +162,7 @@ def test_methane_rdkit() -> None:
     )
 
     # Run DL-FIND
-    dl_find(
+    result = dl_find(
         nvarin=mol.GetNumAtoms() * 3,
         dlf_get_gradient=dlf_get_gradient,
         dlf_get_params=dlf_get_params,
@@ -88,3 +170,1342 @@ def test_methane_rdkit() -> None:
     )
 
     assert_allclose(traj_energies[-1], 0.02638, atol=1e-5)
+    assert result is not None
+    assert result.converged
+    assert result.energy == traj_energies[-1]
+    assert_allclose(result.coordinates, traj_coordinates[-1])
+    assert result.n_energy_evaluations == len(traj_energies)
+    assert 0 < result.n_accepted <= result.n_cycles
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Test functions are only picklable for forked workers",
+)
+def test_dl_find_many() -> None:
+    """Test to run independent optimizations in a process pool."""
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(6, 3, 3))
+    jobs = [
+        Job(
+            e_g_func=functools.partial(harmonic, center=center),
+            params={"coords": center + 0.5},
+        )
+        for center in centers
+    ]
+
+    results = dict(
+        dl_find_many(jobs, n_workers=2, mp_context=multiprocessing.get_context("fork"))
+    )
+
+    assert sorted(results) == list(range(len(jobs)))
+    for index, result in results.items():
+        assert_allclose(result.coordinates, centers[index], atol=1e-3)
+        assert result.converged
+        assert result.n_energy_evaluations > 1
+
+
+def test_gradient_inplace_wrapper() -> None:
+    """Test gradient callback writing into the arrays of DL-FIND."""
+    center = np.array([[0.0, 0.0, 0.0], [1.0, 0.5, -0.5]])
+    arrays = []
+
+    @dlf_get_gradient_inplace_wrapper
+    def e_g_func(
+        coordinates: NDArray[np.float64],
+        gradient: NDArray[np.float64],
+        iimage: int,
+        kiter: int,
+    ) -> float:
+        arrays.append(gradient)
+        np.subtract(coordinates, center, out=gradient)
+        return 0.5 * float(np.sum(gradient**2))
+
+    traj_energies: list[float] = []
+    traj_coordinates: list[NDArray[np.float64]] = []
+    dl_find(
+        nvarin=center.size,
+        dlf_get_gradient=e_g_func,
+        dlf_get_params=make_dlf_get_params(coords=center + 0.3),
+        dlf_put_coords=functools.partial(
+            store_results, traj_coords=traj_coordinates, traj_energies=traj_energies
+        ),
+    )
+
+    assert_allclose(traj_coordinates[-1], center, atol=1e-3)
+    assert all(array is arrays[0] for array in arrays)
+
+
+def test_gradient_cache(tmp_path: Path) -> None:
+    """Test that repeated optimizations are served from the cache."""
+    center = np.array([[0.0, 0.0, 0.0], [1.0, 0.5, -0.5]])
+    path = tmp_path / "cache.npz"
+    cache = GradientCache(functools.partial(harmonic, center=center), path=path)
+
+    def run(cache: GradientCache) -> None:
+        dl_find(
+            nvarin=center.size,
+            dlf_get_gradient=dlf_get_gradient_wrapper(cache),
+            dlf_get_params=make_dlf_get_params(coords=center + 0.3),
+        )
+
+    run(cache)
+    n_misses = cache.misses
+    assert n_misses > 0 and cache.hits == 0
+    run(cache)
+    assert cache.misses == n_misses and cache.hits == n_misses
+
+    # New entries go to the journal instead of rewriting the cache file
+    journal_path = tmp_path / "cache.npz.log"
+    assert journal_path.exists() and not path.exists()
+    # A truncated entry from a crash is skipped
+    with open(journal_path, "ab") as f:
+        f.write(b"\x93NUMPY")
+    restarted = GradientCache(functools.partial(harmonic, center=center), path=path)
+    assert len(restarted) == len(cache)
+    run(restarted)
+    assert restarted.misses == 0 and restarted.hits == n_misses
+
+    cache.close()
+    assert path.exists() and not journal_path.exists()
+    with GradientCache(
+        functools.partial(harmonic, center=center), path=path
+    ) as reloaded:
+        assert len(reloaded) == len(cache)
+
+    # Concurrent hits, misses and evictions from the threads of a batch
+    shared = GradientCache(
+        functools.partial(harmonic, center=center),
+        tolerance=1e-6,
+        maxsize=16,
+        path=tmp_path / "shared.npz",
+    )
+    points = [center + 0.01 * (i % 40) for i in range(400)]
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        list(executor.map(lambda x: shared(x, 0, 0), points))
+    assert shared.hits + shared.misses == len(points)
+    assert len(shared) == 16
+    shared.close()
+    assert len(GradientCache(harmonic, path=tmp_path / "shared.npz")) == 16
+
+
+def test_neb_gradient_batch() -> None:
+    """Test that NEB images are evaluated in batches with unchanged results."""
+    batch_sizes: list[int] = []
+    batch_func = make_gradient_batch(double_well, ThreadPoolExecutor(max_workers=4))
+
+    def record_batch(
+        coordinates: NDArray[np.float64], iimages: NDArray[np.int32], kiter: int
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        batch_sizes.append(len(iimages))
+        return batch_func(coordinates, iimages, kiter)
+
+    def run(batched: bool) -> list[float]:
+        traj_energies: list[float] = []
+        dl_find(
+            nvarin=3,
+            nvarin2=3,
+            dlf_get_gradient=dlf_get_gradient_wrapper(double_well),
+            dlf_get_params=make_dlf_get_params(
+                coords=np.array([-1.0, 0.1, 0.0]),
+                coords2=np.array([1.0, -0.1, 0.0]),
+                nframe=1,
+                icoord=110,
+                nimage=7,
+                tolerance=1e-3,
+                printl=0,
+            ),
+            dlf_put_coords=functools.partial(
+                store_results, traj_coords=[], traj_energies=traj_energies
+            ),
+            dlf_get_gradient_batch=(
+                dlf_get_gradient_batch_wrapper(record_batch) if batched else None
+            ),
+        )
+        return traj_energies
+
+    serial = run(batched=False)
+    batched = run(batched=True)
+
+    assert max(batch_sizes) > 1
+    assert_allclose(batched, serial)
+
+
+def test_fd_hessian_gradient_batch() -> None:
+    """Test that finite-difference Hessian displacements are evaluated in a batch."""
+    batch_sizes: list[int] = []
+    requested: list[NDArray[np.float64]] = []
+    n_single = 0
+
+    def e_g_func(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        nonlocal n_single
+        n_single += 1
+        requested.append(coordinates.copy())
+        return double_well(coordinates, iimage, kiter)
+
+    def batch_func(
+        coordinates: NDArray[np.float64], iimages: NDArray[np.int32], kiter: int
+    ) -> tuple[NDArray[np.float64], NDArray[np.float64]]:
+        batch_sizes.append(len(coordinates))
+        requested.extend(coordinates.copy())
+        results = [
+            double_well(coordinates[i], iimages[i], kiter)
+            for i in range(len(coordinates))
+        ]
+        energies = np.array([result[0] for result in results])
+        gradients = np.array([result[1] for result in results])
+        return energies, gradients
+
+    def run(
+        batched: bool, inithessian: int, maxcycle: int = 100
+    ) -> tuple[list[float], Optional[OptimizationResult]]:
+        traj_energies: list[float] = []
+        result = dl_find(
+            nvarin=3,
+            dlf_get_gradient=dlf_get_gradient_wrapper(e_g_func),
+            dlf_get_params=make_dlf_get_params(
+                coords=np.array([0.2, 0.1, 0.05]),
+                iopt=10,
+                inithessian=inithessian,
+                tolerance=1e-5,
+                maxcycle=maxcycle,
+                printl=0,
+            ),
+            dlf_put_coords=functools.partial(
+                store_results, traj_coords=[], traj_energies=traj_energies
+            ),
+            dlf_get_gradient_batch=(
+                dlf_get_gradient_batch_wrapper(batch_func) if batched else None
+            ),
+        )
+        return traj_energies, result
+
+    serial, _ = run(batched=False, inithessian=2)
+    n_serial = n_single
+    n_single = 0
+    batched, _ = run(batched=True, inithessian=2)
+
+    # Two-point finite differences for three coordinates
+    assert batch_sizes == [6]
+    assert n_single == n_serial - 6
+    assert_allclose(batched, serial)
+
+    # The batch holds exactly the geometries of the serial finite differences,
+    # which give the same Hessian, for one-point and two-point differences
+    for inithessian in (1, 2):
+        hessians = []
+        displacements = []
+        for batched_run in (False, True):
+            requested.clear()
+            _, result = run(batched=batched_run, inithessian=inithessian, maxcycle=1)
+            assert result is not None and result.optimizer_state is not None
+            hessians.append(result.optimizer_state.hessian)
+            displacements.append(np.array(requested))
+        assert_allclose(displacements[1], displacements[0], rtol=0, atol=0)
+        assert_allclose(hessians[1], hessians[0], rtol=0, atol=0)
+
+
+def test_population_gradient_batch() -> None:
+    """Test that the populations of the parallel optimizers are batched."""
+    coordinates = lennard_jones_cluster(5)
+    n_serial = 0
+    batch_sizes: list[int] = []
+
+    @dlf_get_gradient_wrapper
+    def e_g_func(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        nonlocal n_serial
+        n_serial += 1
+        return evaluate(lennard_jones, coordinates, iimage, kiter)
+
+    @dlf_get_gradient_batch_wrapper
+    def batch_func(
+        coordinates: NDArray[np.float64], iimages: NDArray[np.int32], kiter: int
+    ) -> tuple[list[float], list[NDArray[np.float64]]]:
+        batch_sizes.append(len(coordinates))
+        energies, gradients = zip(
+            *(evaluate(lennard_jones, c, 1, kiter) for c in coordinates)
+        )
+        return list(energies), list(gradients)
+
+    # Stochastic search evaluates the starting geometry first
+    result = dl_find(
+        nvarin=coordinates.size,
+        dlf_get_gradient=e_g_func,
+        dlf_get_gradient_batch=batch_func,
+        dlf_get_params=make_dlf_get_params(
+            coords=coordinates, iopt=51, po_pop_size=10, po_maxcycle=5
+        ),
+    )
+
+    assert result is not None
+    assert n_serial == 1
+    assert batch_sizes == [10] * 5
+    assert result.n_energy_evaluations == 51
+
+    # Genetic algorithm keeps the fittest member between generations
+    n_serial = 0
+    batch_sizes.clear()
+    result = dl_find(
+        nvarin=coordinates.size,
+        dlf_get_gradient=e_g_func,
+        dlf_get_gradient_batch=batch_func,
+        dlf_get_params=make_dlf_get_params(
+            coords=coordinates,
+            iopt=52,
+            po_pop_size=10,
+            po_init_pop_size=20,
+            po_maxcycle=5,
+        ),
+    )
+
+    assert result is not None
+    assert n_serial == 0
+    assert batch_sizes == [20] + [9] * 5
+    assert result.n_energy_evaluations == 65
+
+
+def test_qts_hessian_batch(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test that the image Hessians of a QTS rate calculation are batched and cached."""
+    monkeypatch.chdir(tmp_path)
+    ts = np.array([[-0.822, 0.624, 0.0]])
+    direction = np.array([[0.05, -0.02, 0.0]])
+    n_serial = 0
+    batch_sizes: list[int] = []
+
+    def hessian(coordinates: NDArray[np.float64]) -> NDArray[np.float64]:
+        """Hessian of the Müller-Brown surface from central differences."""
+        x = np.ravel(coordinates)
+        result = np.zeros((x.size, x.size))
+        for i in range(x.size):
+            step = np.zeros(x.size)
+            step[i] = 1e-5
+            g_plus = evaluate(muller_brown, (x + step).reshape(-1, 3))[1]
+            g_minus = evaluate(muller_brown, (x - step).reshape(-1, 3))[1]
+            result[:, i] = np.ravel(g_plus - g_minus) / 2e-5
+        return (result + result.T) / 2
+
+    def serial_hessian(coordinates: NDArray[np.float64]) -> NDArray[np.float64]:
+        nonlocal n_serial
+        n_serial += 1
+        return hessian(coordinates)
+
+    def run(
+        iopt: int,
+        temperature: float,
+        batch_func: Optional[Callable],
+        recorder: Optional[CallbackRecorder] = None,
+        **kwargs,
+    ) -> None:
+        arguments = dict(
+            nvarin=3,
+            nvarin2=3,
+            dlf_get_gradient=muller_brown,
+            dlf_get_hessian=dlf_get_hessian_wrapper(serial_hessian),
+            dlf_get_hessian_batch=(
+                dlf_get_hessian_batch_wrapper(batch_func) if batch_func else None
+            ),
+            dlf_get_params=make_dlf_get_params(
+                coords=ts - direction,
+                coords2=ts + direction,
+                nframe=1,
+                icoord=190,
+                iopt=iopt,
+                nimage=8,
+                temperature=temperature,
+                maxcycle=10,
+                printl=0,
+            ),
+        )
+        if recorder is not None:
+            arguments = recorder.wrap(**arguments)
+        dl_find(**arguments, **kwargs)
+
+    # The instanton optimization writes the path for the rate calculations
+    run(3, 300.0, None)
+    run(12, 300.0, None)
+    assert n_serial == 8
+    serial = (tmp_path / "qts_hessian.txt").read_text()
+
+    n_serial = 0
+    cache = HessianCache(hessian, path=tmp_path / "hessians.npz")
+    batch_func = make_hessian_batch(cache, ThreadPoolExecutor(max_workers=4))
+
+    def record_batch(coordinates: NDArray[np.float64]) -> NDArray[np.float64]:
+        batch_sizes.append(len(coordinates))
+        return batch_func(coordinates)
+
+    run(12, 300.0, record_batch)
+    assert n_serial == 0
+    assert batch_sizes == [8]
+    assert (tmp_path / "qts_hessian.txt").read_text() == serial
+    assert cache.misses == 8 and cache.hits == 0 and len(cache) == 8
+
+    # The Hessians of the path are reused at another temperature
+    restarted = HessianCache(hessian, path=tmp_path / "hessians.npz")
+    batch_func = make_hessian_batch(restarted, ThreadPoolExecutor(max_workers=4))
+    run(12, 250.0, record_batch)
+    assert n_serial == 0
+    assert restarted.misses == 0 and restarted.hits == 8
+
+    # The path is read from the working directory when only the output is
+    # captured, and the rate files are written to the output
+    output = RunOutput()
+    run(12, 250.0, record_batch, output=output)
+    assert n_serial == 0
+    assert batch_sizes[-1] == 8
+    assert "qts_hessian.txt" in output.files
+
+    # The batches of Hessians are recorded and replayed
+    path = tmp_path / "rate.dlfrec"
+    with CallbackRecorder(path) as recorder:
+        run(12, 300.0, record_batch, recorder)
+    exchanges = list(read_exchanges(path))
+    assert [e.name for e in exchanges].count("dlf_get_hessian_batch") == 1
+    (tmp_path / "qts_hessian.txt").unlink()
+    replayer = CallbackReplayer(path)
+    dl_find(**replayer.dl_find_kwargs())
+    assert replayer.n_replayed == len(exchanges) - 1
+    assert (tmp_path / "qts_hessian.txt").read_text() == serial
+
+
+def test_native_function_pointers() -> None:
+    """Test callbacks given as addresses of C functions."""
+    center = np.array([[0.0, 0.0, 0.0], [1.0, 0.5, -0.5]])
+    e_g_func = dlf_get_gradient_wrapper(functools.partial(harmonic, center=center))
+
+    # Stands in for a function from a C extension or numba.cfunc
+    native = type_dlf_get_gradient(e_g_func)
+    address = cast(native, c_void_p).value
+    assert isinstance(address, int)
+
+    result = dl_find(
+        nvarin=center.size,
+        dlf_get_gradient=address,
+        dlf_get_params=make_dlf_get_params(coords=center + 0.3),
+    )
+
+    assert result is not None
+    assert_allclose(result.coordinates, center, atol=1e-3)
+
+    # Without Python callbacks other than dlf_get_params, no Python runs in the loop
+    coordinates = lennard_jones_cluster(5)
+    result = dl_find(
+        nvarin=coordinates.size,
+        dlf_get_gradient=lennard_jones,
+        dlf_get_params=make_dlf_get_params(coords=coordinates),
+    )
+    assert result is not None
+    assert result.converged
+    assert result.statistics is not None
+    assert set(result.statistics.callback_calls) == {"dlf_get_params"}
+    assert result.statistics.callback_calls["dlf_get_params"] == 1
+
+
+type_dlf_get_gradient_ud = CFUNCTYPE(None, *type_dlf_get_gradient._argtypes_, c_void_p)
+type_dlf_get_params_ud = CFUNCTYPE(None, *type_dlf_get_params._argtypes_, c_void_p)
+
+
+class DLFCallbacks(Structure):
+    """dlf_callbacks of libdlfind.h with the functions as addresses."""
+
+    _fields_ = [
+        (name, c_void_p)
+        for name in (
+            "error",
+            "get_gradient",
+            "get_hessian",
+            "get_multistate_gradients",
+            "get_params",
+            "put_coords",
+            "update",
+            "get_gradient_batch",
+            "checkpoint",
+            "stop",
+            "get_hessian_batch",
+        )
+    ]
+
+
+lib.dlf_context_create.restype = c_void_p
+lib.dlf_context_create.argtypes = [
+    c_int,
+    c_int,
+    c_int,
+    c_int,
+    POINTER(DLFCallbacks),
+    c_void_p,
+]
+lib.dlf_context_run.restype = c_int
+lib.dlf_context_run.argtypes = [c_void_p]
+lib.dlf_context_destroy.restype = None
+lib.dlf_context_destroy.argtypes = [c_void_p]
+
+
+def test_context_api() -> None:
+    """Test the C context API, its user_data and the serialization of runs."""
+    sources: list[str] = []
+    nested: list[int] = []
+    contexts: list[Optional[int]] = []
+
+    @type_dlf_get_gradient_ud
+    def get_gradient(nvar, coords, energy, gradient, iimage, kiter, status, data):
+        # user_data points to the evaluation counter of the context
+        cast(data, POINTER(c_int))[0] += 1
+        sources.append("context")
+        if not nested:
+            nested.append(lib.dlf_context_run(contexts[0]))
+        time.sleep(1e-3)
+        muller_brown(nvar, coords, energy, gradient, iimage, kiter, status)
+
+    params = make_dlf_get_params(coords=np.array([-0.5, 1.4, 0.0]), spec=[-4])
+    get_params = type_dlf_get_params_ud(lambda *args: params(*args[:-1]))
+    callbacks = DLFCallbacks(
+        get_gradient=cast(get_gradient, c_void_p).value,
+        get_params=cast(get_params, c_void_p).value,
+    )
+    counters = [c_int(0), c_int(0)]
+    contexts.extend(
+        lib.dlf_context_create(3, 0, -1, 1, callbacks, addressof(counter))
+        for counter in counters
+    )
+    try:
+        assert lib.dlf_context_run(contexts[0]) == 0
+        assert counters[0].value == len(sources) > 0
+        assert counters[1].value == 0
+        # A run started from a callback is refused
+        assert nested == [-2]
+        result = get_result(3)
+        assert result is not None
+        assert result.converged
+        assert_allclose(result.coordinates[0, :2], [-0.558, 1.442], atol=1e-3)
+
+        # Runs of the context API and of dl_find in other threads do not overlap
+        sources.clear()
+
+        @dlf_get_gradient_wrapper
+        def python_gradient(
+            coordinates: NDArray[np.float64], iimage: int, kiter: int
+        ) -> tuple[float, NDArray[np.float64]]:
+            sources.append("python")
+            time.sleep(1e-3)
+            return evaluate(muller_brown, coordinates)
+
+        thread = threading.Thread(target=lib.dlf_context_run, args=(contexts[1],))
+        thread.start()
+        dl_find(
+            nvarin=3,
+            dlf_get_gradient=python_gradient,
+            dlf_get_params=make_dlf_get_params(
+                coords=np.array([0.5, 0.1, 0.0]), spec=[-4]
+            ),
+        )
+        thread.join()
+        assert counters[1].value > 0
+        assert len(set(sources)) == 2
+        switches = sum(a != b for a, b in zip(sources, sources[1:]))
+        assert switches == 1
+    finally:
+        for ctx in contexts:
+            lib.dlf_context_destroy(ctx)
+
+    # dl_find from its own callback raises instead of deadlocking
+    @dlf_get_gradient_wrapper
+    def recursive(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        dl_find(nvarin=3, dlf_get_params=make_dlf_get_params(coords=coordinates))
+        return evaluate(muller_brown, coordinates)
+
+    with pytest.raises(DLFindError) as excinfo:
+        dl_find(
+            nvarin=3,
+            dlf_get_gradient=recursive,
+            dlf_get_params=make_dlf_get_params(coords=np.array([0.5, 0.1, 0.0])),
+        )
+    assert isinstance(excinfo.value.__cause__, RuntimeError)
+
+
+def test_analytic_potentials() -> None:
+    """Test gradients of the analytic potentials and a saddle point search."""
+    for potential, coordinates in [
+        (lennard_jones, lennard_jones_cluster(5)),
+        (morse_chain, morse_chain_coordinates(5)),
+    ]:
+        _, gradient = evaluate(potential, coordinates)
+        numerical = np.zeros_like(coordinates)
+        for index in np.ndindex(coordinates.shape):
+            displaced = coordinates.copy()
+            displaced[index] += 1e-6
+            e_plus, _ = evaluate(potential, displaced)
+            displaced[index] -= 2e-6
+            e_minus, _ = evaluate(potential, displaced)
+            numerical[index] = (e_plus - e_minus) / 2e-6
+        assert_allclose(gradient, numerical, atol=1e-6)
+
+    # P-RFO to the saddle point with z frozen
+    result = dl_find(
+        nvarin=3,
+        dlf_get_gradient=muller_brown,
+        dlf_get_params=make_dlf_get_params(
+            coords=np.array([-0.8, 0.6, 0.0]),
+            spec=np.array([-4, 0]),
+            iopt=10,
+            inithessian=2,
+            printl=0,
+        ),
+    )
+
+    assert result is not None
+    assert result.converged
+    assert_allclose(result.coordinates[0, :2], [-0.822, 0.624], atol=1e-3)
+
+
+def test_sparse_hdlc() -> None:
+    """Test that the sparse B matrix follows the dense HDLC transformations."""
+    n_atoms = 20
+    coordinates = morse_chain_coordinates(n_atoms)
+    # The whole chain as one residue
+    spec = np.concatenate([np.ones(n_atoms), np.zeros(n_atoms)])
+
+    # HDLC and DLC
+    for icoord in (1, 3):
+        results = []
+        for sparse_hdlc in (None, n_atoms):
+            result = dl_find(
+                nvarin=coordinates.size,
+                dlf_get_gradient=morse_chain,
+                dlf_get_params=make_dlf_get_params(
+                    coords=coordinates, icoord=icoord, spec=spec, printl=0
+                ),
+                sparse_hdlc=sparse_hdlc,
+            )
+            assert result is not None
+            assert result.converged
+            results.append(result)
+        dense, sparse = results
+        assert sparse.n_energy_evaluations == dense.n_energy_evaluations
+        assert_allclose(sparse.coordinates, dense.coordinates, atol=1e-8)
+        assert_allclose(sparse.energy, dense.energy, atol=1e-10)
+
+
+def test_optimizer_state() -> None:
+    """Test that a related run started from the optimizer state is faster."""
+
+    def minimize(
+        coordinates: NDArray[np.float64], initial_state: Optional[OptimizerState]
+    ) -> OptimizationResult:
+        result = dl_find(
+            nvarin=coordinates.size,
+            dlf_get_gradient=morse_chain,
+            dlf_get_params=make_dlf_get_params(coords=coordinates, printl=0),
+            initial_state=initial_state,
+        )
+        assert result is not None
+        assert result.converged
+        return result
+
+    # L-BFGS memory from a neighbouring Morse chain
+    first = minimize(morse_chain_coordinates(10, seed=0), None)
+    state = first.optimizer_state
+    assert state is not None
+    assert state.hessian is None
+    assert state.lbfgs_steps is not None
+    assert state.lbfgs_gradient_differences is not None
+    assert state.lbfgs_steps.shape[1] == 30
+    assert state.lbfgs_steps.shape == state.lbfgs_gradient_differences.shape
+    coordinates = morse_chain_coordinates(10, seed=1)
+    cold = minimize(coordinates, None)
+    warm = minimize(coordinates, state)
+    assert warm.n_energy_evaluations < cold.n_energy_evaluations
+    assert_allclose(warm.energy, cold.energy, atol=1e-6)
+
+    # P-RFO Hessian skips the finite-difference Hessian
+    def saddle(
+        coordinates: list[float], initial_state: Optional[OptimizerState]
+    ) -> OptimizationResult:
+        result = dl_find(
+            nvarin=3,
+            dlf_get_gradient=muller_brown,
+            dlf_get_params=make_dlf_get_params(
+                coords=np.array(coordinates),
+                spec=np.array([-4, 0]),
+                iopt=10,
+                inithessian=2,
+                printl=0,
+            ),
+            initial_state=initial_state,
+        )
+        assert result is not None
+        assert result.converged
+        return result
+
+    first = saddle([-0.8, 0.6, 0.0], None)
+    state = first.optimizer_state
+    assert state is not None
+    assert state.hessian is not None
+    assert state.hessian.shape == (2, 2)
+    assert state.lbfgs_steps is None
+    cold = saddle([-0.81, 0.61, 0.0], None)
+    warm = saddle([-0.81, 0.61, 0.0], state)
+    assert warm.n_energy_evaluations < cold.n_energy_evaluations
+    assert_allclose(warm.coordinates, cold.coordinates, atol=1e-3)
+
+    # The state must match the internal coordinates
+    with pytest.raises(DLFindError, match="initial Hessian"):
+        saddle([-0.8, 0.6, 0.0], OptimizerState(hessian=np.eye(3)))
+
+
+def test_gp_surrogate() -> None:
+    """Test that optimizing on a surrogate saves energy evaluations."""
+    coordinates = lennard_jones_cluster(8)
+
+    def e_g_func(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        return evaluate(lennard_jones, coordinates, iimage, kiter)
+
+    reference = dl_find(
+        nvarin=coordinates.size,
+        dlf_get_gradient=dlf_get_gradient_wrapper(e_g_func),
+        dlf_get_params=make_dlf_get_params(coords=coordinates),
+    )
+    surrogate = GPSurrogate(e_g_func)
+    result = surrogate.optimize({"coords": coordinates})
+
+    assert reference is not None and reference.converged
+    assert result.converged
+    assert result.n_energy_evaluations == surrogate.n_true_evaluations
+    assert result.n_cycles == result.n_energy_evaluations - 1
+    assert 0 < result.n_accepted <= result.n_cycles
+    assert result.n_energy_evaluations < reference.n_energy_evaluations
+    assert surrogate.n_surrogate_evaluations > reference.n_energy_evaluations
+    assert np.max(np.abs(result.gradient)) <= 4.5e-4
+    assert result.energy == pytest.approx(reference.energy, abs=1e-6)
+
+    # Transition state search with P-RFO on the model
+    surrogate = GPSurrogate(
+        lambda coordinates, iimage, kiter: evaluate(
+            muller_brown, coordinates, iimage, kiter
+        )
+    )
+    result = surrogate.optimize(
+        {
+            "coords": np.array([-0.8, 0.6, 0.0]),
+            "spec": np.array([-4, 0]),
+            "iopt": 10,
+            "inithessian": 2,
+        }
+    )
+
+    assert result.converged
+    assert_allclose(result.coordinates[0, :2], [-0.822, 0.624], atol=1e-3)
+
+    # Farther away, the search continues from the last geometry reached
+    # instead of returning to the lowest energy seen
+    result = surrogate.optimize(
+        {
+            "coords": np.array([-0.6, 0.9, 0.0]),
+            "spec": np.array([-4, 0]),
+            "iopt": 10,
+            "inithessian": 2,
+        }
+    )
+
+    assert result.converged
+    assert_allclose(result.coordinates[0, :2], [-0.822, 0.624], atol=1e-3)
+    assert result.n_accepted == result.n_cycles
+
+
+def test_run_statistics() -> None:
+    """Test timers and counters during and after a run."""
+    center = np.array([[0.0, 0.0, 0.0], [1.0, 0.5, -0.5]])
+    n_evaluations: list[int] = []
+
+    @dlf_put_coords_wrapper
+    def put_coords(
+        switch: int, energy: float, coordinates: NDArray[np.float64], iam: int
+    ) -> None:
+        n_evaluations.append(get_statistics().n_energy_evaluations)
+
+    result = dl_find(
+        nvarin=center.size,
+        dlf_get_gradient=dlf_get_gradient_wrapper(
+            functools.partial(harmonic, center=center)
+        ),
+        dlf_get_params=make_dlf_get_params(coords=center + 0.3),
+        dlf_put_coords=put_coords,
+    )
+
+    assert result is not None
+    statistics = result.statistics
+    assert statistics is not None
+    assert n_evaluations == list(range(1, result.n_energy_evaluations + 1))
+    assert statistics.n_energy_evaluations == result.n_energy_evaluations
+    assert statistics.n_cycles == result.n_cycles
+    assert statistics.callback_calls["dlf_get_gradient"] == result.n_energy_evaluations
+    assert statistics.callback_calls["dlf_put_coords"] == len(n_evaluations)
+    wall_time = statistics.wall_time
+    assert wall_time["total"] >= wall_time["energy_and_gradient"] > 0
+    assert (
+        wall_time["energy_and_gradient"]
+        >= statistics.callback_wall_time["dlf_get_gradient"]
+        > 0
+    )
+
+
+def test_convergence_state() -> None:
+    """Test that callbacks receive the convergence state of the run."""
+    center = np.array([[0.0, 0.0, 0.0], [1.0, 0.5, -0.5], [-1.0, 0.5, 0.5]])
+    states: list[ConvergenceState] = []
+
+    @dlf_get_gradient_wrapper(convergence=True)
+    def e_g_func(
+        coordinates: NDArray[np.float64],
+        iimage: int,
+        kiter: int,
+        convergence: ConvergenceState,
+    ) -> tuple[float, NDArray[np.float64]]:
+        states.append(convergence)
+        return harmonic(coordinates, iimage, kiter, center=0.1 * center)
+
+    coords = center + np.array([[0.3, -0.2, 0.1]])
+    result = dl_find(
+        nvarin=center.size,
+        dlf_get_gradient=e_g_func,
+        dlf_get_params=make_dlf_get_params(coords=coords, tolerance=1e-5),
+    )
+
+    assert result is not None and result.converged
+    assert len(states) == result.n_energy_evaluations >= 3
+    assert states[0].max_gradient is None and states[0].gradient_ratio is None
+    assert [state.n_energy_evaluations for state in states] == list(
+        range(1, len(states) + 1)
+    )
+    assert states[-1].max_gradient is not None
+    assert states[-1].tolerance == pytest.approx(1e-5)
+    assert states[-1].tolerance_step == pytest.approx(4e-5)
+    assert states[1].gradient_ratio > states[-1].gradient_ratio
+
+
+def test_blas_threads() -> None:
+    """Test that the BLAS threads are limited for the duration of a run."""
+    info = get_blas_info()
+    if info.num_threads is None:
+        pytest.skip(f"threads of {info.vendor} BLAS cannot be controlled")
+    assert info.library
+    before = info.num_threads
+    limit = 1 if before > 1 else 2
+    center = np.array([[0.0, 0.0, 0.0], [1.0, 0.5, -0.5]])
+    during: list[Optional[int]] = []
+
+    def e_g_func(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        during.append(get_blas_info().num_threads)
+        return harmonic(coordinates, iimage, kiter, center)
+
+    result = dl_find(
+        nvarin=center.size,
+        dlf_get_gradient=dlf_get_gradient_wrapper(e_g_func),
+        dlf_get_params=make_dlf_get_params(coords=center + 0.3),
+        blas_threads=limit,
+    )
+
+    assert result is not None
+    assert set(during) == {limit}
+    assert get_blas_info().num_threads == before
+    with pytest.raises(ValueError):
+        dl_find(
+            nvarin=center.size,
+            dlf_get_gradient=dlf_get_gradient_wrapper(e_g_func),
+            dlf_get_params=make_dlf_get_params(coords=center + 0.3),
+            blas_threads=0,
+        )
+    assert get_blas_info().num_threads == before
+
+
+def test_checkpoint_restart(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test checkpoints in memory and in a directory, and restarts from them."""
+    monkeypatch.chdir(tmp_path)
+    coords = lennard_jones_cluster(13).reshape(-1)
+
+    def run(**kwargs) -> Optional[OptimizationResult]:
+        options = {
+            key: kwargs.pop(key)
+            for key in ("checkpoint", "checkpoint_dir", "restart_from")
+            if key in kwargs
+        }
+        return dl_find(
+            nvarin=coords.size,
+            dlf_get_gradient=lennard_jones,
+            dlf_get_params=make_dlf_get_params(coords=coords, icoord=0, **kwargs),
+            **options,
+        )
+
+    reference = run()
+    assert reference is not None
+
+    checkpoints: list[Checkpoint] = []
+    writer = CheckpointWriter(tmp_path / "background")
+
+    def store(checkpoint: Checkpoint) -> None:
+        checkpoints.append(checkpoint)
+        writer(checkpoint)
+
+    with writer:
+        run(maxcycle=20, dump=1, checkpoint=store)
+    assert len(checkpoints) == 20
+    assert checkpoints[-1].n_energy_evaluations == 20
+    assert "dlf_global.chk" in checkpoints[-1].files
+    assert 0 < writer.n_written <= 20
+    assert Checkpoint.read(tmp_path / "background") == Checkpoint(checkpoints[-1].files)
+    assert not list(tmp_path.glob("*.chk"))
+
+    # Restart from memory
+    result = run(restart=1, restart_from=checkpoints[-1].to_bytes())
+    assert result is not None
+    assert result.n_energy_evaluations == reference.n_energy_evaluations
+    assert_allclose(result.energy, reference.energy)
+
+    # Restart from a directory
+    checkpoint_dir = tmp_path / "run"
+    checkpoint_dir.mkdir()
+    run(maxcycle=20, dump=1, checkpoint_dir=checkpoint_dir)
+    result = run(restart=1, checkpoint_dir=checkpoint_dir)
+    assert result is not None
+    assert result.n_energy_evaluations == reference.n_energy_evaluations
+    assert not list(tmp_path.glob("*.chk"))
+
+    # Stale files of other runs in the directory are not part of a checkpoint
+    (checkpoint_dir / "dlf_neb.chk").write_bytes(b"stale")
+    checkpoints.clear()
+    run(
+        maxcycle=2, dump=1, checkpoint_dir=checkpoint_dir, checkpoint=checkpoints.append
+    )
+    assert "dlf_global.chk" in checkpoints[-1].files
+    assert "dlf_neb.chk" not in checkpoints[-1].files
+
+
+def test_trajectory_recorder(tmp_path: Path) -> None:
+    """Test recording trajectories in memory and spilled to disk."""
+    coords = lennard_jones_cluster(7)
+
+    def run(dlf_put_coords: Callable) -> None:
+        dl_find(
+            nvarin=coords.size,
+            dlf_get_gradient=lennard_jones,
+            dlf_get_params=make_dlf_get_params(coords=coords, icoord=0, printl=0),
+            dlf_put_coords=dlf_put_coords,
+        )
+
+    traj_coords: list[NDArray[np.float_]] = []
+    traj_energies: list[float] = []
+    run(
+        functools.partial(
+            store_results, traj_coords=traj_coords, traj_energies=traj_energies
+        )
+    )
+
+    recorder = TrajectoryRecorder(len(coords), capacity=1)
+    run(recorder)
+    assert len(recorder) == len(traj_energies) > 3
+    assert_allclose(recorder.coordinates, traj_coords)
+    assert_allclose(recorder.energies, traj_energies)
+    assert np.all(recorder.switches == 1)
+
+    with TrajectoryRecorder(len(coords), tmp_path / "traj", chunk_size=3) as spilled:
+        run(spilled)
+        assert len(spilled._energies) == 3
+    assert_allclose(np.load(tmp_path / "traj" / "coordinates.npy"), traj_coords)
+    assert_allclose(spilled.energies, traj_energies)
+    assert len(spilled.switches) == len(traj_energies)
+
+    # Coordinates of another system are not read past their end
+    recorder = TrajectoryRecorder(coords.shape[0] + 1)
+    frame = (c_double * coords.size)(*coords.ravel())
+    with pytest.raises(ValueError, match="recorder is for"):
+        recorder(coords.size, 1, 0.0, cast(frame, POINTER(c_double)), 0)
+    assert len(recorder) == 0
+
+
+def test_recoverable_failure() -> None:
+    """Test that failures raise DLFindError and DL-FIND can be called again."""
+    coords = lennard_jones_cluster(7)
+
+    def run(dlf_get_gradient: Callable) -> Optional[OptimizationResult]:
+        return dl_find(
+            nvarin=coords.size,
+            dlf_get_gradient=dlf_get_gradient,
+            dlf_get_params=make_dlf_get_params(coords=coords, printl=0),
+        )
+
+    reference = run(lennard_jones)
+
+    n_calls = 0
+
+    @dlf_get_gradient_wrapper
+    def failing(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        nonlocal n_calls
+        n_calls += 1
+        if n_calls == 3:
+            raise ValueError("Calculation failed")
+        return evaluate(lennard_jones, coordinates)
+
+    with pytest.raises(DLFindError, match="Calculation failed") as excinfo:
+        run(failing)
+    assert excinfo.value.status == 1
+    assert excinfo.value.coordinates.shape == coords.shape
+    assert isinstance(excinfo.value.__cause__, ValueError)
+
+    # KeyboardInterrupt stops DL-FIND and is re-raised as it is
+    @dlf_get_gradient_wrapper
+    def interrupted(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        run(interrupted)
+
+    with pytest.raises(DLFindError) as excinfo:
+        run(dlf_get_gradient_wrapper(nan_energy))
+    assert excinfo.value.status == 0
+    assert_allclose(excinfo.value.coordinates, coords)
+
+    result = run(lennard_jones)
+    assert result is not None
+    assert result.n_energy_evaluations == reference.n_energy_evaluations
+    assert_allclose(result.coordinates, reference.coordinates)
+
+    jobs = [
+        Job(e_g_func=nan_energy, params={"coords": coords}),
+        Job(
+            e_g_func=functools.partial(harmonic, center=coords),
+            params={"coords": coords + 0.1},
+        ),
+    ]
+    results = dict(
+        dl_find_many(
+            jobs,
+            n_workers=1,
+            mp_context=multiprocessing.get_context("fork"),
+            return_exceptions=True,
+        )
+    )
+    assert isinstance(results[0], DLFindError)
+    assert results[1].converged
+
+
+def test_stop_early() -> None:
+    """Test cancellation, time limits and early stopping."""
+    coords = lennard_jones_cluster(13)
+
+    def run(
+        dlf_get_gradient: Callable = lennard_jones, **kwargs
+    ) -> Optional[OptimizationResult]:
+        return dl_find(
+            nvarin=coords.size,
+            dlf_get_gradient=dlf_get_gradient,
+            dlf_get_params=make_dlf_get_params(coords=coords, printl=0),
+            **kwargs,
+        )
+
+    reference = run()
+    assert reference is not None
+    assert reference.stop_reason is None
+
+    # Stop once the energy is below a threshold
+    threshold = 0.5 * reference.energy
+    result = run(early_stop=lambda energy, coordinates: energy < threshold)
+    assert result is not None
+    assert result.stop_reason == "early_stop"
+    assert not result.converged
+    assert result.energy < threshold
+    assert result.n_energy_evaluations < reference.n_energy_evaluations
+
+    # Cancel from a callback, as from another thread
+    token = CancelToken()
+
+    @dlf_get_gradient_wrapper
+    def cancelling(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        if get_statistics().n_energy_evaluations == 5:
+            token.cancel()
+        return evaluate(lennard_jones, coordinates)
+
+    result = run(cancelling, cancel=token)
+    assert result is not None
+    assert result.stop_reason == "cancelled"
+    assert result.n_energy_evaluations == 5
+    assert run(cancel=token) is None
+
+    @dlf_get_gradient_wrapper
+    def slow(
+        coordinates: NDArray[np.float64], iimage: int, kiter: int
+    ) -> tuple[float, NDArray[np.float64]]:
+        time.sleep(0.02)
+        return evaluate(lennard_jones, coordinates)
+
+    result = run(slow, time_limit=0.1)
+    assert result is not None
+    assert result.stop_reason == "time_limit"
+    assert result.n_energy_evaluations < reference.n_energy_evaluations
+
+    # The conditions do not carry over to the next run
+    result = run()
+    assert result is not None
+    assert result.stop_reason is None
+    assert result.n_energy_evaluations == reference.n_energy_evaluations
+
+
+def test_stepping_optimizer() -> None:
+    """Test driving optimizations with ask and tell."""
+    coords = lennard_jones_cluster(7)
+    reference = dl_find(
+        nvarin=coords.size,
+        dlf_get_gradient=lennard_jones,
+        dlf_get_params=make_dlf_get_params(coords=coords, printl=0),
+    )
+    assert reference is not None
+    mp_context = multiprocessing.get_context("fork")
+
+    with SteppingOptimizer(
+        {"coords": coords, "printl": 0}, mp_context=mp_context
+    ) as optimizer:
+        request = optimizer.ask()
+        assert request is not None
+        assert optimizer.ask() is request
+        while request is not None:
+            optimizer.tell(*evaluate(lennard_jones, request.coordinates))
+            request = optimizer.ask()
+    assert optimizer.done
+    assert optimizer.result is not None
+    assert optimizer.result.n_energy_evaluations == reference.n_energy_evaluations
+    assert_allclose(optimizer.result.coordinates, reference.coordinates)
+
+    async def drive(optimizer: SteppingOptimizer) -> Optional[OptimizationResult]:
+        while (request := await optimizer.ask_async()) is not None:
+            await asyncio.sleep(0)
+            optimizer.tell(*evaluate(lennard_jones, request.coordinates))
+        return optimizer.result
+
+    async def drive_all() -> list[Optional[OptimizationResult]]:
+        optimizers = [
+            SteppingOptimizer({"coords": coords, "printl": 0}, mp_context=mp_context)
+            for _ in range(4)
+        ]
+        return await asyncio.gather(*map(drive, optimizers))
+
+    for result in asyncio.run(drive_all()):
+        assert result is not None
+        assert_allclose(result.energy, reference.energy)
+
+    with SteppingOptimizer(
+        {"coords": coords, "printl": 0}, mp_context=mp_context
+    ) as optimizer:
+        optimizer.ask()
+        optimizer.fail(status=7)
+        with pytest.raises(DLFindError) as excinfo:
+            optimizer.ask()
+    assert excinfo.value.status == 7
+
+
+def test_dl_find_batched() -> None:
+    """Test to run optimizations in lockstep with batched gradients."""
+    rng = np.random.default_rng(42)
+    centers = rng.normal(size=(7, 3, 3))
+    starts = centers + rng.uniform(0.2, 1.0, size=(7, 1, 1))
+    batch_sizes = []
+
+    def batched_energy_gradient(
+        coordinates: list[NDArray[np.float64]],
+    ) -> tuple[list[float], list[NDArray[np.float64]]]:
+        batch_sizes.append(len(coordinates))
+        # Each geometry belongs to the center it is closest to
+        results = [
+            harmonic(
+                x, 0, 0, centers[np.argmin(np.sum((centers - x) ** 2, axis=(1, 2)))]
+            )
+            for x in coordinates
+        ]
+        return [energy for energy, _ in results], [gradient for _, gradient in results]
+
+    # Count the worker processes started
+    processes = []
+
+    class Context:
+        def __getattr__(self, name: str):
+            return getattr(multiprocessing.get_context("fork"), name)
+
+        def Process(self, *args, **kwargs) -> multiprocessing.Process:
+            processes.append(
+                multiprocessing.get_context("fork").Process(*args, **kwargs)
+            )
+            return processes[-1]
+
+    results = dict(
+        dl_find_batched(
+            ({"coords": start, "printl": 0} for start in starts),
+            batched_energy_gradient,
+            batch_size=3,
+            mp_context=Context(),
+        )
+    )
+
+    assert sorted(results) == list(range(len(starts)))
+    for index, result in results.items():
+        assert_allclose(result.coordinates, centers[index], atol=1e-3)
+        assert result.converged
+    assert max(batch_sizes) == 3
+    assert sum(batch_sizes) == sum(
+        result.n_energy_evaluations for result in results.values()
+    )
+    # Batches are refilled with new jobs as optimizations finish, which run on
+    # the workers of the finished ones
+    assert all(size == 3 for size in batch_sizes[: len(batch_sizes) // 2])
+    assert len(processes) == 3
+    assert not any(process.is_alive() for process in processes)
+
+
+def test_run_output(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test capturing the printout and auxiliary files of DL-FIND."""
+    monkeypatch.chdir(tmp_path)
+    records: list[str] = []
+
+    class Handler(logging.Handler):
+        def emit(self, record: logging.LogRecord) -> None:
+            records.append(record.getMessage())
+
+    logger = logging.getLogger("libdlfind.test")
+    logger.addHandler(Handler())
+    logger.setLevel(logging.INFO)
+
+    def run(**kwargs) -> None:
+        dl_find(
+            nvarin=3,
+            nvarin2=3,
+            dlf_get_gradient=dlf_get_gradient_wrapper(double_well),
+            dlf_get_params=make_dlf_get_params(
+                coords=np.array([-1.0, 0.1, 0.0]),
+                coords2=np.array([1.0, -0.1, 0.0]),
+                nframe=1,
+                icoord=110,
+                nimage=7,
+                tolerance=1e-3,
+                printl=4,
+                printf=4,
+            ),
+            **kwargs,
+        )
+
+    output = RunOutput(max_lines=50, logger=logger)
+    run(output=output)
+    assert list(tmp_path.iterdir()) == []
+    assert len(output.lines) == 50
+    assert output.lines[-1].startswith("Maximum memory usage")
+    assert records[-50:] == list(output.lines)
+    assert len(records) > 50
+    assert "nebinfo" in output.files
+    assert "path.xyz" in output.files
+
+    output_dir = tmp_path / "output"
+    output_dir.mkdir()
+    run(output_dir=output_dir)
+    assert (output_dir / "nebinfo").read_bytes() == output.files["nebinfo"]
+    assert list(tmp_path.iterdir()) == [output_dir]
+
+
+def test_record_replay(tmp_path: Path) -> None:
+    """Test recording the callback exchanges of runs and replaying them."""
+    coords = lennard_jones_cluster(7)
+    path = tmp_path / "lj.dlfrec"
+    with CallbackRecorder(path) as recorder:
+        reference = dl_find(
+            **recorder.wrap(
+                nvarin=coords.size,
+                dlf_get_gradient=lennard_jones,
+                dlf_get_params=make_dlf_get_params(coords=coords, printl=0),
+            ),
+        )
+    assert reference is not None
+    exchanges = list(read_exchanges(path))
+    assert [e.name for e in exchanges[:3]] == [
+        "dl_find",
+        "dlf_get_params",
+        "dlf_get_gradient",
+    ]
+    assert len(exchanges) == reference.n_energy_evaluations + 2
+
+    replayer = CallbackReplayer(path)
+    result = dl_find(**replayer.dl_find_kwargs())
+    assert result is not None
+    assert replayer.n_replayed == len(exchanges) - 1
+    assert result.n_energy_evaluations == reference.n_energy_evaluations
+    assert_allclose(result.coordinates, reference.coordinates, rtol=0, atol=0)
+
+    # A run that diverges from the recording fails
+    replayer.exchanges[3].arrays["coords"][0] += 0.1
+    with pytest.raises(DLFindError) as excinfo:
+        dl_find(**replayer.dl_find_kwargs())
+    assert isinstance(excinfo.value.__cause__, RuntimeError)
+
+    # A raising Python callback fails the run and is recorded as failed
+    def failing_gradient(
+        coords: NDArray, iimage: int, kiter: int
+    ) -> tuple[float, NDArray]:
+        raise ValueError("No energy")
+
+    path = tmp_path / "failed.dlfrec"
+    with CallbackRecorder(path) as recorder:
+        with pytest.raises(DLFindError) as excinfo:
+            dl_find(
+                **recorder.wrap(
+                    nvarin=coords.size,
+                    dlf_get_gradient=dlf_get_gradient_wrapper(failing_gradient),
+                    dlf_get_params=make_dlf_get_params(coords=coords, printl=0),
+                ),
+            )
+    assert isinstance(excinfo.value.__cause__, ValueError)
+    exchanges = list(read_exchanges(path))
+    assert [e.name for e in exchanges] == [
+        "dl_find",
+        "dlf_get_params",
+        "dlf_get_gradient",
+    ]
+    assert exchanges[-1].values["status"] == 1
+
+    # NEB with batches of images
+    path = tmp_path / "neb.dlfrec"
+    params = make_dlf_get_params(
+        coords=np.array([-1.0, 0.1, 0.0]),
+        coords2=np.array([1.0, -0.1, 0.0]),
+        nframe=1,
+        icoord=110,
+        nimage=7,
+        tolerance=1e-3,
+        printl=0,
+    )
+    with CallbackRecorder(path) as recorder:
+        reference = dl_find(
+            **recorder.wrap(
+                nvarin=3,
+                nvarin2=3,
+                dlf_get_gradient=dlf_get_gradient_wrapper(double_well),
+                dlf_get_gradient_batch=dlf_get_gradient_batch_wrapper(
+                    make_gradient_batch(double_well, ThreadPoolExecutor(max_workers=2))
+                ),
+                dlf_get_params=params,
+            ),
+        )
+    assert reference is not None
+    assert any(e.name == "dlf_get_gradient_batch" for e in read_exchanges(path))
+    result = dl_find(**CallbackReplayer(path).dl_find_kwargs())
+    assert result is not None
+    assert_allclose(result.coordinates, reference.coordinates, rtol=0, atol=0)